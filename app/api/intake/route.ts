@@ -76,7 +76,9 @@ export async function POST(req: NextRequest) {
       signal: AbortSignal.timeout(10000),
     });
     const j = await r.json().catch(() => ({ ok: true }));
-    return NextResponse.json(j, { status: r.status, headers: cors });
+    // 429 от VPS (очередь приёма полна) — Retry-After отдаём расширению как есть
+    const retry = r.headers.get('retry-after');
+    return NextResponse.json(j, { status: r.status, headers: retry ? { ...cors, 'Retry-After': retry } : cors });
   } catch {
     return NextResponse.json({ ok: false, error: 'forward' }, { status: 502, headers: cors });
   }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Релей: прежний путь (каждая пачка от расширения — новое соединение urllib и
+синхронная пересылка на VPS, ответ расширению после ответа VPS) против спула
+(ответ после записи на локальный диск, пересылка склеенными сжатыми POST по одному
+keep-alive соединению).
+
+VPS поддельный, на localhost: на каждое новое соединение — пауза --connect-ms
+(TLS-рукопожатие по домашнему аплинку), на каждый POST — --rtt-ms. Расширение
+шлёт --posts пачек по --cards карточек с паузой ~--gap-ms.
+
+Запуск:
+    python3 scripts/avito-extension/bench_relay.py
+    python3 scripts/avito-extension/bench_relay.py --posts 200 --rtt-ms 120 --connect-ms 300
+
+Печатает p50/p95 ответа расширению, число POST и соединений на VPS, байт на VPS.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import relay  # noqa: E402
+
+relay.print = lambda *a, **k: None
+
+
+class SlowVPS(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.conns += 1
+        time.sleep(self.server.connect_sec)
+
+    def do_GET(self):          # согласование формата (как у intake-сервера)
+        b = json.dumps({'ok': True, 'wire': relay.intake_wire.offer()}).encode()
+        self.send_response(200)
+        self.send_header('content-length', str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def do_POST(self):
+        n = int(self.headers.get('content-length', 0))
+        self.rfile.read(n)
+        self.server.posts += 1
+        self.server.bytes += n
+        time.sleep(self.server.rtt_sec)
+        b = b'{"ok": true, "added": 1}'
+        self.send_response(200)
+        self.send_header('content-length', str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def log_message(self, *a):
+        pass
+
+
+def _vps(args):
+    srv = relay.ThreadingHTTPServer(('127.0.0.1', 0), SlowVPS)
+    srv.daemon_threads = True
+    srv.conns = srv.posts = srv.bytes = 0
+    srv.connect_sec, srv.rtt_sec = args.connect_ms / 1000, args.rtt_ms / 1000
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def _batches(args):
+    rng = random.Random(5)
+    return [[{'url': 'https://www.avito.ru/moskva/noutbuki/macbook_air_13_m2_%d_%d' % (i, j),
+              'title': 'MacBook Air 13 M2 16/512 идеальное состояние', 'price': 60000 + j,
+              'date': 'сегодня'} for j in range(args.cards)]
+            for i in range(args.posts)], rng
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] * 1000
+
+
+def _old(args, url, batches, rng):
+    """Прежний relay.py: urlopen на каждую пачку, ответ — после VPS."""
+    lat = []
+    for cards in batches:
+        t0 = time.perf_counter()
+        req = urllib.request.Request(url, data=json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8'),
+                                     headers={'content-type': 'application/json', 'x-intake-token': 't'})
+        urllib.request.urlopen(req, timeout=30).read()
+        lat.append(time.perf_counter() - t0)
+        time.sleep(rng.expovariate(1000 / args.gap_ms))
+    return lat
+
+
+def _new(args, url, batches, rng):
+    srv = relay.make_server(0, Path(tempfile.mkdtemp()) / 'spool.jsonl', url,
+                            coalesce_ms=args.coalesce_ms)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    local = 'http://127.0.0.1:%d/intake' % srv.server_address[1]
+    lat = []
+    for cards in batches:
+        t0 = time.perf_counter()
+        req = urllib.request.Request(local, data=json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8'),
+                                     headers={'content-type': 'application/json', 'x-intake-token': 't'})
+        urllib.request.urlopen(req, timeout=30).read()
+        lat.append(time.perf_counter() - t0)
+        time.sleep(rng.expovariate(1000 / args.gap_ms))
+    total = len(batches) * args.cards
+    deadline = time.time() + 60
+    while srv.forwarder.sent_cards < total and time.time() < deadline:
+        time.sleep(0.05)
+    srv.shutdown()
+    srv.forwarder.stop()
+    srv.server_close()
+    return lat
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--posts', type=int, default=60, help='пачек от расширения')
+    ap.add_argument('--cards', type=int, default=20, help='карточек в пачке')
+    ap.add_argument('--gap-ms', type=float, default=100, help='средняя пауза между пачками')
+    ap.add_argument('--rtt-ms', type=float, default=80, help='ответ VPS на POST')
+    ap.add_argument('--connect-ms', type=float, default=250, help='новое соединение (TLS) с VPS')
+    ap.add_argument('--coalesce-ms', type=int, default=relay.COALESCE_MS)
+    args = ap.parse_args(argv)
+
+    print("пачек %d × %d карточек, VPS: соединение %g мс, POST %g мс"
+          % (args.posts, args.cards, args.connect_ms, args.rtt_ms))
+    print("%8s %9s %9s %10s %11s %10s" % ('режим', 'p50, мс', 'p95, мс', 'POST VPS', 'соединений', 'КБ на VPS'))
+    for name, fn in (('прежний', _old), ('спул', _new)):
+        vps = _vps(args)
+        batches, rng = _batches(args)
+        lat = fn(args, 'http://127.0.0.1:%d/intake' % vps.server_address[1], batches, rng)
+        print("%8s %9.1f %9.1f %10d %11d %10.1f" % (name, _pct(lat, 0.5), _pct(lat, 0.95),
+                                                   vps.posts, vps.conns, vps.bytes / 1024))
+        vps.shutdown()
+        vps.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,16 +9,53 @@ HTTPS к Vercel/bestmac.ru (устаревший TLS / корневой серт
 
   Chrome (парсит Авито) → http://127.0.0.1:8765  →  relay.py  →  http://VPS:8787  → Telegram
 
+Приём и пересылка разведены — сбой VPS больше не отдаёт расширению 502 и не теряет
+карточки:
+  - POST /intake дописывается строкой в локальный спул (RELAY_SPOOL_PATH, JSONL, fsync)
+    и сразу получает 200 — ответ стоит записи на локальный диск;
+  - фоновый пересыльщик ждёт RELAY_COALESCE_MS после первой пачки, склеивает всё
+    накопленное (до RELAY_BATCH_CARDS карточек за POST) в один сжатый POST и шлёт по
+    одному keep-alive TLS-соединению. Формат (gzip/zstd, компактная схема cards/1 —
+    common/intake_wire.py) согласуется с VPS по его GET / при каждом новом
+    соединении; RELAY_ENCODING / RELAY_COMPACT — принудительно. VPS недоступен, 429 или 5xx — спул ждёт, повтор
+    с нарастающей паузой (до RELAY_RETRY_MAX_SEC), в том числе после перезапуска
+    релея. 400/413 — пачка не пройдёт никогда: в лог и мимо; 403 (токен не совпал) —
+    тоже, а расширение с этим токеном следующие 10 минут сразу получает 403;
+  - доставленное — смещение в файле <спул>.offset; доставлено всё — спул обнуляется.
+    Повтор после сбоя может переслать пачку дважды — сервер дедупит по url.
+GET / — состояние: сколько ждёт в спуле, последняя доставка и ошибка.
+
 Запуск на Mac:   python3 relay.py
 В попапе расширения укажи endpoint:   http://127.0.0.1:8765/intake
+Только стандартная библиотека (Python 3.6+). Скопирован без scripts/common — шлёт
+gzip обычным JSON.
 """
 import os
+import sys
 import json
+import gzip
+import time
 import functools
-import urllib.request
-import urllib.error
+import threading
+import http.client
+from pathlib import Path
+from urllib.parse import urlsplit
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:          # Python 3.6
+    from socketserver import ThreadingMixIn
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/ (common.*)
+try:
+    from common import intake_wire
+except ImportError:          # релей скопирован один — gzip, обычный JSON
+    intake_wire = None
+
 print = functools.partial(print, flush=True)   # сразу видеть активность в консоли
 
 PORT = int(os.environ.get('RELAY_PORT', '8765'))
@@ -29,6 +66,20 @@ VPS_URL = os.environ.get('RELAY_VPS_URL', 'https://intake.bestmac.ru/intake')
 # CORS сужён до origin страницы, где работает расширение (по умолчанию Avito).
 _ALLOWED = {o.strip() for o in os.environ.get(
     'RELAY_ALLOWED_ORIGINS', 'https://www.avito.ru,https://m.avito.ru').split(',') if o.strip()}
+# Очередь на диске: переживает падение VPS, сети и самого релея
+SPOOL_PATH = Path(os.environ.get('RELAY_SPOOL_PATH',
+                                 str(Path.home() / '.bestmac-relay' / 'spool.jsonl')))
+COALESCE_MS = int(os.environ.get('RELAY_COALESCE_MS', '500'))      # окно склейки пачек
+BATCH_CARDS = int(os.environ.get('RELAY_BATCH_CARDS', '500'))      # карточек в одном POST
+RETRY_MAX_SEC = int(os.environ.get('RELAY_RETRY_MAX_SEC', '300'))  # потолок паузы повтора
+# Сжатие на VPS: auto (лучшее общее) | zstd | gzip | identity; компактная схема
+# cards/1: auto (только без сжатия — поверх него почти ничего не даёт) | 1 | 0
+ENCODING = os.environ.get('RELAY_ENCODING', 'auto').strip().lower()
+COMPACT = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False}.get(
+    os.environ.get('RELAY_COMPACT', 'auto').strip().lower(), 'auto')
+MAX_BODY = 2 * 1024 * 1024   # тело от расширения (как MAX_BODY intake-сервера)
+TIMEOUT = 15
+TOKEN_BAN_SEC = 600          # после 403 от VPS токен отбивается сразу столько секунд
 
 
 def _cors(origin):
@@ -42,6 +93,294 @@ def _cors(origin):
     return h
 
 
+class Spool:
+    """Локальная очередь пачек: строки JSONL {"token", "cards"}, каждая дописывается с
+    fsync. Доставленное — смещение в <спул>.offset (пишется атомарно); когда
+    доставлено всё, спул обнуляется."""
+
+    def __init__(self, path=SPOOL_PATH):
+        self.path = Path(path)
+        self.offset_path = self.path.with_name(self.path.name + '.offset')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            self.offset = int(self.offset_path.read_text().strip() or 0)
+        except (OSError, ValueError):
+            self.offset = 0
+        self._seal_tail()
+
+    def _seal_tail(self):
+        """Недописанная строка (релей упал посреди записи) закрывается переводом
+        строки: pending() её пропустит, а следующая запись с ней не склеится."""
+        try:
+            with open(str(self.path), 'rb+') as f:
+                f.seek(0, 2)
+                if f.tell():
+                    f.seek(-1, 2)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+        except FileNotFoundError:
+            pass
+
+    def size(self):
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, token, cards):
+        line = (json.dumps({'token': token, 'cards': cards}, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def pending(self, max_cards=BATCH_CARDS):
+        """Недоставленные пачки с головы очереди → ([(token, cards)], смещение после
+        них): не больше max_cards карточек, но хотя бы одна пачка. Битые строки
+        пропускаются (смещение их тоже проходит)."""
+        out, n = [], 0
+        with self._lock:
+            if self.offset > self.size():      # спул обнулён, а смещение не успели
+                self.offset = 0
+            end = self.offset
+            try:
+                with open(str(self.path), 'rb') as f:
+                    f.seek(self.offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        try:
+                            e = json.loads(line.decode('utf-8'))
+                            cards, token = list(e['cards']), e.get('token', '')
+                        except (ValueError, KeyError, TypeError, AttributeError):
+                            end += len(line)
+                            continue
+                        if out and n + len(cards) > max_cards:
+                            break
+                        out.append((token, cards))
+                        n += len(cards)
+                        end += len(line)
+            except FileNotFoundError:
+                pass
+        return out, end
+
+    def commit(self, end):
+        """Доставлено до смещения end. Всё — спул обнуляется (сначала смещение: упадём
+        между — перешлём лишнее, а не потеряем)."""
+        with self._lock:
+            if end >= self.size():
+                self._write_offset(0)
+                open(str(self.path), 'wb').close()
+                end = 0
+            else:
+                self._write_offset(end)
+            self.offset = end
+
+    def _write_offset(self, end):
+        tmp = self.offset_path.with_name(self.offset_path.name + '.tmp')
+        tmp.write_text(str(end))
+        os.replace(str(tmp), str(self.offset_path))
+
+
+def _choose(offer, prefer, compact):
+    """Формат для VPS с его "wire" → (сжатие, компактная схема)."""
+    if intake_wire is not None:
+        return intake_wire.choose(offer, prefer, compact)
+    gz = 'gzip' in ((offer or {}).get('encodings') or ()) and prefer in ('auto', 'gzip')
+    return ('gzip' if gz else 'identity'), False
+
+
+def _encode(cards, encoding, compact):
+    if intake_wire is not None:
+        return intake_wire.encode_batch(cards, encoding, compact)
+    body = json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8')
+    headers = {'content-type': 'application/json'}
+    if encoding == 'gzip':
+        body = gzip.compress(body)
+        headers['content-encoding'] = 'gzip'
+    return body, headers
+
+
+class Forwarder:
+    """Пересыльщик спула на VPS (фоновый поток): одно keep-alive соединение,
+    склейка пачек за coalesce_ms, сжатие, повторы с нарастающей паузой."""
+
+    def __init__(self, spool, url=VPS_URL, coalesce_ms=COALESCE_MS, batch_cards=BATCH_CARDS,
+                 retry_max=RETRY_MAX_SEC, encoding=ENCODING, compact=COMPACT):
+        u = urlsplit(url)
+        self.spool = spool
+        self.url = url
+        self.https = u.scheme == 'https'
+        self.host, self.port = u.hostname, u.port
+        self.target = (u.path or '/') + ('?' + u.query if u.query else '')
+        self.health = (u.path or '/').rsplit('/', 1)[0] + '/'    # GET / intake-сервера
+        self.coalesce = coalesce_ms / 1000
+        self.batch_cards = batch_cards
+        self.retry_max = retry_max
+        self.prefer, self.compact = encoding, compact
+        self.wire = None            # (сжатие, схема) — согласуется на каждое соединение
+        self.refused = set()        # сжатия, на которые VPS ответил 415
+        self._said = None           # какой формат уже писали в лог
+        self.retry_in = 0.0
+        self.sent_cards = 0
+        self.posts = 0
+        self.last_ok_at = None
+        self.last_error = ''
+        self.banned = {}            # токен → когда VPS ответил 403
+        self._conn = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='forwarder', daemon=True)
+        self._thread.start()
+        self._wake.set()            # что осталось в спуле с прошлого запуска — сразу
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=TIMEOUT + 5)
+        self._reset()
+
+    def notify(self):
+        """Новая пачка в спуле."""
+        self._wake.set()
+
+    def token_banned(self, token):
+        at = self.banned.get(token)
+        return at is not None and time.time() - at < TOKEN_BAN_SEC
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            self._stop.wait(self.coalesce)         # даём догнать соседним пачкам
+            if self.flush():
+                self.retry_in = 0.0
+                continue
+            # пауза не сбивается новыми пачками: лежащий VPS не долбим на каждый POST
+            self.retry_in = min(self.retry_max, max(1.0, self.retry_in * 2))
+            print("[relay] VPS недоступен (%s), в спуле %d Б — повтор через %.0f с"
+                  % (self.last_error, self.spool.size() - self.spool.offset, self.retry_in))
+            self._stop.wait(self.retry_in)
+            self._wake.set()
+
+    def flush(self):
+        """Доставляет всё, что ждёт в спуле. False — VPS недоступен (повторить позже)."""
+        while not self._stop.is_set():
+            entries, end = self.spool.pending(self.batch_cards)
+            if not entries:
+                if end != self.spool.offset:
+                    self.spool.commit(end)
+                return True
+            by_token = {}
+            for token, cards in entries:           # обычно токен один — один POST
+                by_token.setdefault(token, []).extend(cards)
+            for token, cards in by_token.items():
+                code = self._post(token, cards)
+                if code is None or code == 429 or code >= 500:
+                    if code is not None:
+                        self.last_error = 'HTTP %d' % code
+                    return False
+                if code == 403:
+                    self.banned[token] = time.time()
+                if code >= 400:
+                    print("[relay] VPS HTTP %d — %d карточек отброшено" % (code, len(cards)))
+                    continue
+                self.banned.pop(token, None)
+                self.sent_cards += len(cards)
+                self.last_ok_at = time.time()
+                print("[relay] -> VPS: %d карточек одним POST" % len(cards))
+            self.spool.commit(end)
+        return False
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=TIMEOUT)
+        return self._conn
+
+    def _reset(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        self.wire = None            # новое соединение — VPS мог обновиться
+
+    def _request(self, method, path, body=None, headers=None):
+        """Запрос на VPS → (код, тело) или None (сеть). Соединение живёт между
+        запросами; протухшее (сервер закрыл keep-alive) — одна переподключка сразу."""
+        for _ in range(2):
+            try:
+                conn = self._connection()
+                conn.request(method, path, body=body, headers=headers or {})
+                r = conn.getresponse()
+                data = r.read()
+                if (r.getheader('connection') or '').lower() == 'close':
+                    self._reset()
+                return r.status, data
+            except (http.client.HTTPException, OSError) as e:
+                self._reset()
+                self.last_error = str(e) or e.__class__.__name__
+        return None
+
+    def _negotiate(self):
+        """Что понимает VPS (GET / → "wire") → self.wire; старый сервер без "wire" —
+        обычный JSON без сжатия. False — сеть."""
+        res = self._request('GET', self.health)
+        if res is None:
+            return False
+        try:
+            offer = json.loads(res[1].decode('utf-8')).get('wire') if res[0] == 200 else None
+        except (ValueError, AttributeError):
+            offer = None
+        if offer:
+            offer = dict(offer, encodings=[e for e in offer.get('encodings') or () if e not in self.refused])
+        wire = _choose(offer, self.prefer, self.compact)
+        if wire != self._said:
+            print("[relay] формат для VPS: сжатие %s, схема %s" % (wire[0], 'cards/1' if wire[1] else 'json'))
+            self._said = wire
+        self.wire = wire
+        return True
+
+    def _post(self, token, cards):
+        """Один POST на VPS → HTTP-код (None — сеть). 415 — это сжатие VPS не
+        понимает: больше его не предлагаем и сразу пересылаем иначе."""
+        if self.wire is None and not self._negotiate():
+            return None
+        encoding, compact = self.wire
+        body, headers = _encode(cards, encoding, compact)
+        headers['x-intake-token'] = token
+        res = self._request('POST', self.target, body, headers)
+        if res is None:
+            return None
+        self.posts += 1
+        if res[0] == 415 and encoding != 'identity':
+            print("[relay] VPS не принимает %s — согласую заново" % encoding)
+            self.refused.add(encoding)
+            self.wire = None
+            return self._post(token, cards)
+        return res[0]
+
+    def status(self):
+        wire = self.wire and {'encoding': self.wire[0], 'compact': self.wire[1]}
+        return {'pending_bytes': max(0, self.spool.size() - self.spool.offset),
+                'sent_cards': self.sent_cards, 'posts': self.posts, 'wire': wire,
+                'last_ok_at': self.last_ok_at, 'last_error': self.last_error,
+                'retry_in': self.retry_in}
+
+
 class Handler(BaseHTTPRequestHandler):
     def _send(self, code, obj):
         b = json.dumps(obj).encode('utf-8')
@@ -60,40 +399,50 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
 
     def do_GET(self):
-        self._send(200, {'ok': True, 'service': 'bestmac-relay', 'vps': VPS_URL})
+        self._send(200, {'ok': True, 'service': 'bestmac-relay', 'vps': VPS_URL,
+                         **self.server.forwarder.status()})
 
     def do_POST(self):
         try:
             n = int(self.headers.get('content-length', 0))
+            if n > MAX_BODY:
+                return self._send(413, {'ok': False, 'error': 'too large'})
             data = json.loads(self.rfile.read(n) or b'{}')
         except Exception:
             return self._send(400, {'ok': False, 'error': 'json'})
         # Токен — из заголовка (новое расширение шлёт так); тело оставлено фолбэком.
         token = self.headers.get('x-intake-token', '') or data.get('token', '')
         cards = data.get('cards') or []
-        try:
-            req = urllib.request.Request(
-                VPS_URL,
-                data=json.dumps({'cards': cards}).encode('utf-8'),
-                headers={'content-type': 'application/json', 'x-intake-token': token},
-                method='POST',
-            )
-            with urllib.request.urlopen(req, timeout=15) as r:
-                body = r.read().decode('utf-8', 'ignore')
-                self._send(getattr(r, 'status', 200), json.loads(body) if body else {'ok': True})
-            print("[relay] -> VPS: %d карточек отправлено" % len(cards))
-        except urllib.error.HTTPError as e:
-            print("[relay] VPS HTTP %d" % e.code)
-            self._send(e.code, {'ok': False, 'error': 'vps %d' % e.code})
-        except Exception as e:
-            print("[relay] ошибка форварда: %s" % e)
-            self._send(502, {'ok': False, 'error': 'forward: %s' % e})
+        if not isinstance(cards, list):
+            return self._send(400, {'ok': False, 'error': 'cards'})
+        fwd = self.server.forwarder
+        if fwd.token_banned(token):
+            return self._send(403, {'ok': False, 'error': 'token (VPS)'})
+        if cards:
+            try:
+                self.server.spool.append(token, cards)
+            except OSError as e:
+                print("[relay] спул: %s" % e)
+                return self._send(503, {'ok': False, 'error': 'spool: %s' % e})
+            fwd.notify()
+        self._send(200, {'ok': True, 'queued': len(cards)})
 
     def log_message(self, *a):
         pass  # тихо (свои print'ы выше)
 
 
+def make_server(port=PORT, spool_path=SPOOL_PATH, url=VPS_URL, **kw):
+    """Локальный приём + пересыльщик (запущенный) поверх спула."""
+    spool = Spool(spool_path)
+    srv = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    srv.spool = spool
+    srv.forwarder = Forwarder(spool, url, **kw).start()
+    return srv
+
+
 if __name__ == '__main__':
+    srv = make_server()
     print("BestMac relay: http://127.0.0.1:%d  ->  %s" % (PORT, VPS_URL))
+    print("Спул: %s (ждёт %d Б)" % (SPOOL_PATH, srv.forwarder.status()['pending_bytes']))
     print("В попапе расширения укажи endpoint: http://127.0.0.1:%d/intake" % PORT)
-    HTTPServer(('127.0.0.1', PORT), Handler).serve_forever()
+    srv.serve_forever()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты релея: спул (fsync, смещение, недописанный хвост), пересыльщик
+(склейка пачек, сжатие и его согласование, keep-alive, повтор после недоступного
+VPS, 415/403) — против поддельного VPS на localhost."""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+import relay  # noqa: E402
+from common import intake_wire  # noqa: E402
+
+relay.print = lambda *a, **k: None
+
+
+class FakeVPS(BaseHTTPRequestHandler):
+    """Поддельный intake: пишет, что пришло; код ответа — server.code; GET / —
+    "wire" (server.wire; None — старый сервер без него)."""
+    protocol_version = 'HTTP/1.1'     # keep-alive, как у настоящего
+
+    def do_GET(self):
+        self.server.gets += 1
+        self._reply(200, {'ok': True, **({'wire': self.server.wire} if self.server.wire else {})})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        if self.server.dead:                # «лёг» — рвём и keep-alive соединение
+            self.close_connection = True
+            return
+        enc = self.headers.get('content-encoding', '')
+        code = self.server.code
+        if enc == 'gzip' and not self.server.gzip_ok:
+            code = 415
+        if code == 200:
+            got = intake_wire.decode_batch(body, enc, 1 << 20)
+            self.server.got.append({'token': self.headers.get('x-intake-token'), 'enc': enc,
+                                    'port': self.client_address[1], 'compact': b'cards/1' in body,
+                                    'urls': [c['url'] for c in got]})
+        self._reply(code, {'ok': code == 200})
+
+    def _reply(self, code, obj):
+        b = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header('content-length', str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def log_message(self, *a):
+        pass
+
+
+def fake_vps(port=0, code=200, gzip_ok=True, wire=intake_wire.offer()):
+    srv = relay.ThreadingHTTPServer(('127.0.0.1', port), FakeVPS)
+    srv.daemon_threads = True
+    srv.got, srv.code, srv.gzip_ok, srv.dead, srv.wire, srv.gets = [], code, gzip_ok, False, wire, 0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def post(port, cards, token='t0k'):
+    req = urllib.request.Request('http://127.0.0.1:%d/intake' % port, method='POST',
+                                 data=json.dumps({'cards': cards}).encode(),
+                                 headers={'x-intake-token': token, 'content-type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait(cond, sec=5.0):
+    t = time.time() + sec
+    while time.time() < t:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return cond()
+
+
+def cards(prefix, n):
+    return [{'url': '%s%d' % (prefix, i), 'price': 1000 + i} for i in range(n)]
+
+
+def test_spool():
+    tmp = Path(tempfile.mkdtemp()) / 'spool.jsonl'
+    sp = relay.Spool(tmp)
+    sp.append('t', cards('a', 3))
+    sp.append('t', cards('b', 3))
+    sp.append('u', cards('c', 3))
+    entries, end = sp.pending(max_cards=5)
+    assert [len(c) for _, c in entries] == [3], 'не больше max_cards, но хотя бы одна пачка'
+    entries, end = sp.pending(max_cards=100)
+    assert [t for t, _ in entries] == ['t', 't', 'u'] and end == sp.size()
+    first_end = sp.pending(max_cards=3)[1]
+    sp.commit(first_end)
+    # перезапуск: смещение с диска, доставленное не повторяется
+    sp2 = relay.Spool(tmp)
+    assert sp2.offset == first_end
+    assert [c[0]['url'] for _, c in sp2.pending(100)[0]] == ['b0', 'c0']
+    # недописанный хвост (упали посреди записи) запечатывается и пропускается
+    with open(tmp, 'ab') as f:
+        f.write(b'{"token": "t", "cards": [{"url": "br')
+    sp3 = relay.Spool(tmp)
+    sp3.append('t', cards('d', 1))
+    entries, end = sp3.pending(100)
+    assert [c[0]['url'] for _, c in entries] == ['b0', 'c0', 'd0'], entries
+    sp3.commit(end)
+    assert sp3.size() == 0 and sp3.offset == 0, 'всё доставлено — спул обнулён'
+    # смещение пережило обнуление спула (упали между) — начинаем с головы
+    sp3._write_offset(10 ** 6)
+    sp4 = relay.Spool(tmp)
+    sp4.append('t', cards('e', 1))
+    assert [c[0]['url'] for _, c in sp4.pending(100)[0]] == ['e0']
+
+
+def test_forward():
+    vps = fake_vps()
+    vport = vps.server_address[1]
+    tmp = Path(tempfile.mkdtemp()) / 'spool.jsonl'
+    rel = relay.make_server(0, tmp, 'http://127.0.0.1:%d/intake' % vport, coalesce_ms=300)
+    rport = rel.server_address[1]
+    threading.Thread(target=rel.serve_forever, daemon=True).start()
+
+    # три быстрых POST от расширения — один POST на VPS, сжатый
+    for p in 'abc':
+        assert post(rport, cards(p, 2)) == (200, {'ok': True, 'queued': 2})
+    assert wait(lambda: sum(len(g['urls']) for g in vps.got) == 6)
+    best = intake_wire.ENCODINGS[0]
+    assert len(vps.got) == 1 and vps.got[0]['enc'] == best and vps.got[0]['token'] == 't0k', vps.got
+    assert vps.gets == 1 and not vps.got[0]['compact'], 'формат согласован один раз, схема поверх сжатия не нужна'
+    assert wait(lambda: rel.spool.size() == 0)
+    # следующая пачка — по тому же соединению (keep-alive)
+    post(rport, cards('d', 1))
+    assert wait(lambda: len(vps.got) == 2)
+    assert vps.got[1]['port'] == vps.got[0]['port'], 'соединение переиспользуется'
+    assert vps.gets == 1, 'на том же соединении формат не пересогласуется'
+
+    # VPS лёг: расширение всё равно получает 200, карточки ждут в спуле
+    vps.dead = True
+    vps.shutdown()
+    vps.server_close()
+    assert post(rport, cards('e', 2))[0] == 200
+    assert wait(lambda: rel.forwarder.retry_in > 0)
+    st = json.loads(urllib.request.urlopen('http://127.0.0.1:%d/' % rport, timeout=5).read())
+    assert st['pending_bytes'] > 0 and st['last_error'] and st['sent_cards'] == 7, st
+    assert st['wire'] is None, 'соединение потеряно — формат согласуем заново'
+    rel.shutdown()
+    rel.forwarder.stop()
+    rel.server_close()
+
+    # перезапуск релея при поднявшемся VPS — спул дослан с диска
+    vps2 = fake_vps(vport)
+    rel2 = relay.make_server(0, tmp, 'http://127.0.0.1:%d/intake' % vport, coalesce_ms=50)
+    assert wait(lambda: [g['urls'] for g in vps2.got] == [['e0', 'e1']]), vps2.got
+    assert wait(lambda: rel2.spool.size() == 0)
+    rel2.forwarder.stop()
+    rel2.server_close()
+    vps2.shutdown()
+    vps2.server_close()
+
+
+def test_vps_answers():
+    tmp = Path(tempfile.mkdtemp()) / 'spool.jsonl'
+    # VPS обещал gzip, но отвечает 415 → сжатие вычеркнуто, без него — компактная схема
+    vps = fake_vps(gzip_ok=False, wire={'encodings': ['gzip'], 'schemas': [intake_wire.SCHEMA]})
+    sp = relay.Spool(tmp)
+    fwd = relay.Forwarder(sp, 'http://127.0.0.1:%d/intake' % vps.server_address[1], coalesce_ms=0)
+    sp.append('t0k', cards('a', 2))
+    assert fwd.flush() and fwd.wire == ('identity', True) and fwd.refused == {'gzip'}
+    assert [(g['enc'], g['compact'], g['urls']) for g in vps.got] == [('', True, ['a0', 'a1'])]
+    fwd._reset()
+    sp.append('t0k', cards('z', 1))
+    assert fwd.flush() and fwd.wire == ('identity', True), 'вычеркнутое не предлагается и после переподключки'
+    # старый сервер без "wire" — обычный JSON без сжатия
+    vps.wire = None
+    fwd._reset()
+    sp.append('t0k', cards('y', 1))
+    assert fwd.flush() and fwd.wire == ('identity', False) and not vps.got[-1]['compact']
+    # 429 — ждём и повторяем (спул не трогаем)
+    vps.code = 429
+    sp.append('t0k', cards('b', 1))
+    assert not fwd.flush() and sp.size() > 0
+    # 403 — отбрасываем, токен отбивается сразу у релея
+    vps.code = 403
+    assert fwd.flush() and sp.size() == 0
+    assert fwd.token_banned('t0k') and not fwd.token_banned('other')
+    vps.code = 200
+    sp.append('t0k', cards('c', 1))
+    fwd.banned['t0k'] -= relay.TOKEN_BAN_SEC + 1
+    assert fwd.flush() and not fwd.token_banned('t0k')
+    assert vps.got[-1]['urls'] == ['c0']
+    fwd.stop()
+    vps.shutdown()
+    vps.server_close()
+
+
+def run():
+    test_spool()
+    test_forward()
+    test_vps_answers()
+    print('✅ relay тесты прошли')
+
+
+if __name__ == '__main__':
+    run()
@@ -32,9 +32,7 @@ import logging
 import os
 import random
 import re
-import statistics
 import sys
-import time
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -49,8 +47,13 @@ except ImportError:
     sys.exit(1)
 
 from common.config import VALID_RAM, VALID_SSD, MIN_PRICE, MAX_PRICE, JUNK_KEYWORDS
-from common.classifier import classify
+from common.classifier import CACHE as CLASSIFY_CACHE, classify_many
 from common.canary import run_canary
+from common.market import modal_center
+from common.extract import listings_from_page
+from common.browser import ResourceFilter, launch_chromium, new_context
+from common.session_store import default_store
+from common.pacing import SCALE_AFTER_DEEP, default_pacer
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("Parser")
@@ -170,9 +173,16 @@ def solve_captcha(page, target_url: str = None) -> bool:
         return False
 
 
+# Сохранённая сессия Авито (common.session_store), общая со сканером
+SESSIONS = default_store()
+# Темп запросов (AIMD по хосту, common.pacing) — общий со сканером
+PACER = default_pacer()
+PARSER_PAGE_SCALE = 1.6
+
+
 def navigate(page, url: str) -> bool:
     try:
-        page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        resp = page.goto(url, wait_until='domcontentloaded', timeout=30000)
         page.wait_for_timeout(random.randint(1500, 3000))
     except PWTimeout:
         logger.warning(f"⏱ Таймаут: {url[:60]}")
@@ -180,44 +190,32 @@ def navigate(page, url: str) -> bool:
     except Exception as e:
         logger.warning(f"⚠️ Ошибка goto: {e}")
         return False
+    if resp is not None and getattr(resp, 'status', 200) == 429:
+        PACER.backoff(url, 'http429')
 
+    solved = False
     for attempt in range(1, 4):
         if not is_captcha_page(page):
+            SESSIONS.passed(page.context, solved=solved)
+            if not solved:
+                PACER.success(url)
             return True
         logger.warning(f"🛡 Капча (попытка {attempt}/3)")
+        SESSIONS.captcha(page.context)
+        PACER.backoff(url, 'captcha')
         if not solve_captcha(page, target_url=url):
             return False
+        solved = True
         page.wait_for_timeout(2000)
 
-    return not is_captcha_page(page)
+    if is_captcha_page(page):
+        return False
+    SESSIONS.passed(page.context, solved=solved)
+    return True
 
 
 # ─── Аналитика цен ───────────────────────────────────────────────────────────
 
-def modal_center(prices, window=None):
-    """Центр самого ПЛОТНОГО ценового кластера (где предложений больше всего в
-    коридоре шириной `window`). Для скошенных вправо распределений (хвост перекупов
-    и комплектов «+SSD/клавиатура») даёт цифру у «горба», а не серединную медиану,
-    задранную хвостом. По умолчанию окно = 12% от медианы (~5–10тр в нашем сегменте)."""
-    prices = sorted(prices)
-    n = len(prices)
-    if n < 4:
-        return int(statistics.median(prices)) if prices else 0
-    if window is None:
-        window = max(5000, int(statistics.median(prices) * 0.12))
-    best_cnt, best_i = -1, 0
-    for i in range(n):
-        hi = prices[i] + window
-        j = i
-        while j < n and prices[j] <= hi:
-            j += 1
-        if (j - i) > best_cnt:
-            best_cnt, best_i = j - i, i
-    hi = prices[best_i] + window
-    cluster = [p for p in prices if prices[best_i] <= p <= hi]
-    return int(statistics.median(cluster))
-
-
 def market_analysis(prices: list[int]) -> tuple[int, int, int]:
     if not prices:
         return 0, 0, 0
@@ -292,23 +290,10 @@ def extract_chip_from_text(text: str) -> str:
 
 class AvitoParser:
     def __init__(self, playwright):
-        self.browser = playwright.chromium.launch(
-            headless=True,
-            args=["--no-sandbox", "--disable-setuid-sandbox",
-                  "--disable-blink-features=AutomationControlled"],
-        )
-        self.context = self.browser.new_context(
-            viewport={"width": 1440, "height": 900},
-            user_agent=USER_AGENT,
-            locale="ru-RU",
-            timezone_id="Europe/Moscow",
-            extra_http_headers={"Accept-Language": "ru-RU,ru;q=0.9"},
-        )
-        self.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            Object.defineProperty(navigator, 'plugins',   { get: () => [1, 2, 3] });
-            window.chrome = { runtime: {} };
-        """)
+        # Фильтр запросов: только document/script/xhr/fetch и капча (common.browser)
+        self.rfilter = ResourceFilter()
+        self.browser = launch_chromium(playwright)
+        self.context = new_context(self.browser, USER_AGENT, self.rfilter, store=SESSIONS)
         self.page = self.context.new_page()
         # GST-61: сырые объявления {model_name, processor, ram, ssd, price, url, title}
         # для каждого распознанного лота — чтобы сигнал стал кликабельным (ссылки на живые лоты).
@@ -389,58 +374,34 @@ class AvitoParser:
         items_all: list[dict] = []
         for page_num in range(1, max_pages + 1):
             page_url = f"{url}&p={page_num}" if "?" in url else f"{url}?p={page_num}"
-            time.sleep(random.uniform(4, 7))
+            # Парсер ходит с IP датацентра — реже сканера (было 4–7 с против 2–5)
+            PACER.wait(page_url, PARSER_PAGE_SCALE)
             logger.info(f"   ➡️  GET стр. {page_num}: {page_url[:100]}")
             ok = navigate(self.page, page_url)
             if not ok:
                 logger.warning(f"   ⚠️ navigate→False (стр. {page_num}), прерываем")
                 break
-            soup = BeautifulSoup(self.page.content(), "lxml")
-
-            # Отсекаем «есть в других городах»
-            other = soup.find(string=re.compile(r"объявлени\S* есть в других городах", re.I))
-            if other:
-                parent = other.find_parent(["div", "section", "h2", "h3", "span"])
-                if parent:
-                    for sib in list(parent.find_next_siblings()):
-                        sib.decompose()
-                    parent.decompose()
-
-            items = soup.select('[data-marker="item"]')
-            logger.info(f"   📄 Стр. {page_num}: {len(items)} объявлений")
-            if not items:
+            # Состояние страницы (page.evaluate), иначе один проход lxml по DOM;
+            # «есть в других городах» в выдачу не попадает
+            items, n_items = listings_from_page(self.page, drop_other_cities=True)
+            logger.info(f"   📄 Стр. {page_num}: {n_items} объявлений")
+            if not n_items:
+                if page_num == 1:
+                    PACER.backoff(page_url, 'empty')
                 break
 
-            for item in items:
-                try:
-                    title_tag = item.select_one('[data-marker="item-title"]')
-                    if not title_tag:
-                        continue
-                    title = title_tag.get("title", "") or title_tag.get_text(strip=True)
-
-                    snippet_tag = item.select_one('[data-marker="item-description"]')
-                    snippet = snippet_tag.get_text(" ", strip=True) if snippet_tag else ""
-
-                    price_tag = item.select_one('[itemprop="price"]')
-                    if not price_tag:
-                        continue
-                    price = int(price_tag["content"])
-                    if price < MIN_PRICE or price > MAX_PRICE:
-                        continue
-
-                    href = title_tag.get("href", "")
-                    listing_url = ("https://www.avito.ru" + href).split("?")[0] if href else ""
-
-                    items_all.append({
-                        "title": title,
-                        "snippet": snippet,
-                        "price": price,
-                        "url": listing_url,
-                    })
-                except Exception:
+            for it in items:
+                price = it["price"]
+                if price is None or price < MIN_PRICE or price > MAX_PRICE:
                     continue
-
-            if len(items) < 10:
+                items_all.append({
+                    "title": it["title"],
+                    "snippet": " ".join(it["description"].split()),
+                    "price": price,
+                    "url": ("https://www.avito.ru" + it["href"]).split("?")[0] if it["href"] else "",
+                })
+
+            if n_items < 10:
                 break
         return items_all
 
@@ -471,6 +432,7 @@ class AvitoParser:
         skipped_junk = 0
         unmatched = 0
 
+        kept, texts = [], []
         for it in listings:
             text  = it["title"] + " " + it["snippet"]
             lower = text.lower()
@@ -478,8 +440,10 @@ class AvitoParser:
             if any(w in lower for w in JUNK_KEYWORDS):
                 skipped_junk += 1
                 continue
+            kept.append(it)
+            texts.append(text)
 
-            cfg = classify(text)
+        for it, cfg in zip(kept, classify_many(texts)):
             key = (cfg.ram, cfg.ssd)
             if key not in entry_map:
                 unmatched += 1
@@ -547,7 +511,7 @@ class AvitoParser:
                     ram = deep["ram"]
                 if not ssd and deep["ssd"]:
                     ssd = deep["ssd"]
-                time.sleep(random.uniform(0.8, 1.8))
+                PACER.wait(it["url"], SCALE_AFTER_DEEP)
 
             # Финальная проверка: должны быть все 3 параметра
             if not chip or not ram or not ssd:
@@ -573,6 +537,9 @@ class AvitoParser:
     def close(self):
         self.context.close()
         self.browser.close()
+        self.rfilter.log_summary(logger)
+        PACER.log_summary(logger)
+        CLASSIFY_CACHE.log_summary(logger)
 
 
 # ─── Загрузка конфига ────────────────────────────────────────────────────────
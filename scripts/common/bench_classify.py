@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк классификатора: однопроходный движок common.classifier против прежней
+реализации (семь паттернов семейства + чип, Intel, экран, год и спеки — каждый
+своим проходом по заголовку; оставлена здесь как эталон — classify_reference).
+
+Запуск:
+    python3 scripts/common/bench_classify.py                  # корпус из public/data
+    python3 scripts/common/bench_classify.py titles.txt       # по заголовку в строке
+
+Корпус по умолчанию — ручные заголовки, строки базы цен и слаги URL из
+seen-hot-deals.json (в слаге — тот же заголовок латиницей). Печатает заголовков/с:
+эталон, движок без кэша, classify_many с пустым и с прогретым кэшем — и число
+расхождений движка с эталоном (должно быть 0).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# кэш classify — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.classifier import (  # noqa: E402
+    AppleConfig, ClassifyCache, VALID_RAM, VALID_SSD, _classify, _infer_screen, _infer_year,
+)
+
+DATA = Path(__file__).resolve().parent.parent.parent / 'public' / 'data'
+TITLES = [
+    "MacBook Air 13 M3 16/256", "Apple Macbook Air 13 M3 16/256 ГБ", "MacBook Pro 14 M3 Pro 18/512",
+    "Макбук эйр 15 м2 8 256", "MacBook Pro 16 M1 Max 32gb 1tb", "iMac 24 M4 16/256", "Mac mini M4 Pro 24/512",
+    "Mac Studio M2 Ultra 64/1TB", "Mac Pro 2019", "MacBook Pro 13 2019 i5 8/256", "Macbook 14 M1 Pro 16/512",
+    "MBA M2 8/512 2022", "Ноутбук Apple MacBook Air 13\xa0M1 8/256", "macbook pro 15 2018 core i7 16 512",
+    "MacBook  Air  15\"  M3  24/1TB", "MacBook Air M5 16/512 новый", "iPhone 15 Pro 256GB", "",
+    "iMac Pro 27 2017", "Аймак 24 м1 8/256", "Макбук про 16 2019 i9 32/1тб", "MacBook 12 2017 8/256",
+]
+
+
+def corpus():
+    """Заголовки: ручные + строки базы цен + слаги URL из выдачи."""
+    out = list(TITLES)
+    try:
+        for s in json.loads((DATA / 'avito-prices.json').read_text(encoding='utf-8'))['stats']:
+            out.append(f"{s['model_name']} {s.get('processor', '')} {s.get('ram', 0)}/{s.get('ssd', 0)}")
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        seen = json.loads((DATA / 'seen-hot-deals.json').read_text(encoding='utf-8'))
+        for url in list(seen.get('seen_urls') or []):
+            slug = url.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+            out.append(slug.rsplit('_', 1)[0].replace('_', ' '))
+    except (OSError, ValueError, AttributeError):
+        pass
+    return out
+
+
+# ─── Эталон: прежняя реализация ──────────────────────────────────────────────
+# ─── Паттерны семейств (порядок важен — более специфичные сначала) ────────────
+_FAMILY_PATTERNS = [
+    (re.compile(r'mac\s*studio', re.I),                    'Mac Studio'),
+    (re.compile(r'mac\s*mini', re.I),                      'Mac mini'),
+    (re.compile(r'mac\s*pro\b(?!.*book)', re.I),           'Mac Pro'),
+    (re.compile(r'imac|аймак', re.I),                      'iMac'),
+    (re.compile(r'macbook\s*pro|mbp|макбук\s*про', re.I),  'MacBook Pro'),
+    (re.compile(r'macbook\s*air|mba|макбук\s*эйр', re.I),  'MacBook Air'),
+    (re.compile(r'macbook|макбук', re.I),                   'MacBook'),  # ambiguous
+]
+
+# ─── Паттерн чипа ────────────────────────────────────────────────────────────
+_CHIP_PATTERN = re.compile(
+    r'\b(m[1-9])\s*(pro|max|ultra)?\b',
+    re.I,
+)
+
+# ─── Паттерн Intel ───────────────────────────────────────────────────────────
+_INTEL_PATTERN = re.compile(
+    r'\b(i[3579]|intel|core)\b',
+    re.I,
+)
+
+# ─── Паттерн экрана ──────────────────────────────────────────────────────────
+# Исключаем совпадения с RAM/SSD: "16/512", "16gb", "16 gb"
+_SCREEN_PATTERN = re.compile(
+    r'\b(13|14|15|16|24|27)(?!\s*/\s*\d)(?!\s*(?:gb|гб))["\s\-]?\s*(?:inch|дюйм|"|\'\')?',
+    re.I,
+)
+
+# ─── Паттерн года ────────────────────────────────────────────────────────────
+_YEAR_PATTERN = re.compile(r'\b(20[12]\d)\b')
+
+# ─── Паттерн RAM/SSD из слешевой записи: "16/512", "24/1TB" ─────────────────
+_SLASH_SPEC = re.compile(
+    r'\b(\d{1,3})\s*/\s*(\d{1,4})\s*(gb|гб|tb|тб)?\b',
+    re.I,
+)
+
+# ─── Паттерн отдельных значений: "16GB", "512GB", "1TB" ─────────────────────
+_UNIT_SPEC = re.compile(
+    r'(\d{1,4})\s*(gb|гб|tb|тб)\b',
+    re.I,
+)
+
+
+def _normalize_storage(val: int, unit: Optional[str]) -> int:
+    """Конвертирует TB в GB."""
+    if unit and unit.lower() in ('tb', 'тб'):
+        return val * 1024
+    return val
+
+
+def _extract_specs_from_text(text: str) -> tuple[int, int]:
+    """
+    Извлекает RAM и SSD из текста.
+    Приоритет: слешевая запись (16/512) > отдельные значения (16GB ... 512GB).
+    Возвращает (ram, ssd). Если не найдено, (0, 0).
+    """
+    text_clean = text.lower().replace('\xa0', ' ')
+
+    # Попытка 1: слешевая запись "16/512GB", "24/1TB"
+    slash_match = _SLASH_SPEC.search(text_clean)
+    if slash_match:
+        left = int(slash_match.group(1))
+        right = int(slash_match.group(2))
+        unit = slash_match.group(3)
+        right = _normalize_storage(right, unit)
+
+        if left in VALID_RAM and right in VALID_SSD:
+            return left, right
+        # Может быть наоборот? Маловероятно, но проверим
+        if right in VALID_RAM and left in VALID_SSD:
+            return right, left
+
+    # Попытка 2: пробельная запись без единиц: "16 256", "24 512", "8 1024"
+    space_match = re.search(r'\b(\d{1,3})\s+(\d{3,4})\b', text_clean)
+    if space_match:
+        left = int(space_match.group(1))
+        right = int(space_match.group(2))
+        if left in VALID_RAM and right in VALID_SSD:
+            return left, right
+
+    # Попытка 3: отдельные значения с единицами
+    found_values = []
+    for m in _UNIT_SPEC.finditer(text_clean):
+        val = int(m.group(1))
+        unit = m.group(2)
+        val = _normalize_storage(val, unit)
+        # Пропускаем годы
+        if 2015 <= val <= 2030:
+            continue
+        found_values.append(val)
+
+    ram, ssd = 0, 0
+    for val in found_values:
+        if val in VALID_RAM and ram == 0:
+            ram = val
+        elif val in VALID_SSD and ssd == 0:
+            ssd = val
+
+    return ram, ssd
+
+
+def classify_reference(title: str, specs: Optional[dict] = None) -> AppleConfig:
+    """Прежний classify(): паттерны по очереди, каждый — свой проход по заголовку."""
+    text = title.strip()
+    text_lower = text.lower()
+
+    # ── Семейство ────────────────────────────────────────────────────────────
+    family = None
+    for pattern, name in _FAMILY_PATTERNS:
+        if pattern.search(text_lower):
+            family = name
+            break
+
+    # "MacBook" без Air/Pro — попробуем определить по экрану
+    if family == 'MacBook':
+        # 13" после 2020 = Air, 14"/16" = Pro
+        screen_m = _SCREEN_PATTERN.search(text_lower)
+        if screen_m:
+            s = int(screen_m.group(1))
+            if s in (14, 16):
+                family = 'MacBook Pro'
+            elif s in (13, 15):
+                family = 'MacBook Air'
+
+    # ── Чип ──────────────────────────────────────────────────────────────────
+    chip_gen = None
+    chip_tier = 'base'
+
+    chip_match = _CHIP_PATTERN.search(text)
+    if chip_match:
+        chip_gen = chip_match.group(1).upper()   # "M4"
+        tier_raw = chip_match.group(2)
+        if tier_raw:
+            chip_tier = tier_raw.capitalize()     # "Pro", "Max", "Ultra"
+    elif _INTEL_PATTERN.search(text_lower):
+        chip_gen = 'Intel'
+
+    # ── Экран ────────────────────────────────────────────────────────────────
+    # Mac mini и Mac Studio не имеют экрана
+    screen = None
+    if family not in ('Mac mini', 'Mac Studio', 'Mac Pro'):
+        screen_match = _SCREEN_PATTERN.search(text)
+        if screen_match:
+            screen = int(screen_match.group(1))
+        else:
+            screen = _infer_screen(family, chip_gen, chip_tier)
+
+    # ── Год ──────────────────────────────────────────────────────────────────
+    year = None
+    year_match = _YEAR_PATTERN.search(text)
+    if year_match:
+        year = int(year_match.group(1))
+    else:
+        year = _infer_year(family, chip_gen, chip_tier, screen)
+
+    # ── RAM / SSD ────────────────────────────────────────────────────────────
+    ram, ssd = _extract_specs_from_text(text)
+
+    # Если specs из deep_analyze — приоритет
+    if specs:
+        if specs.get('ram') and specs['ram'] in VALID_RAM:
+            ram = specs['ram']
+        if specs.get('ssd') and specs['ssd'] in VALID_SSD:
+            ssd = specs['ssd']
+
+    return AppleConfig(
+        family=family,
+        screen=screen,
+        chip_gen=chip_gen,
+        chip_tier=chip_tier,
+        ram=ram,
+        ssd=ssd,
+        year=year,
+    )
+
+
+
+def _rate(fn, titles, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(titles)
+        times.append(time.perf_counter() - t0)
+    return len(titles) / statistics.median(times)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("titles", nargs="?", help="файл с заголовками, по одному в строке")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    titles = (Path(args.titles).read_text(encoding="utf-8").splitlines() if args.titles else corpus())
+    diff = [t for t in titles if _classify(t) != classify_reference(t)]
+    print(f"Заголовков: {len(titles)}, расхождений с эталоном: {len(diff)}")
+    for t in diff[:10]:
+        print(f"  ≠ {t!r}: {classify_reference(t)} → {_classify(t)}")
+
+    warm = ClassifyCache(maxsize=len(titles) + 1, path=None)
+    warm.classify_many(titles)
+    rows = [
+        ("эталон (прежний classify)", lambda ts: [classify_reference(t) for t in ts]),
+        ("движок, без кэша", lambda ts: [_classify(t) for t in ts]),
+        ("classify_many, пустой кэш",
+         lambda ts: ClassifyCache(maxsize=len(ts) + 1, path=None).classify_many(ts)),
+        ("classify_many, прогретый кэш", warm.classify_many),
+    ]
+    base = None
+    for name, fn in rows:
+        rate = _rate(fn, titles, args.repeat)
+        base = base or rate
+        print(f"  {name:<30} {rate:>10,.0f} загол./с  ×{rate / base:.1f}")
+
+
+if __name__ == "__main__":
+    main()
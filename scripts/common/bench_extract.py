@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк извлечения карточек: common.extract (один проход lxml) против прежнего
+пути BeautifulSoup + select_one (как был _collect_listings в scanner_v2).
+
+Запуск:
+    python3 scripts/common/bench_extract.py  saved/*.html      # сохранённые страницы
+    python3 scripts/common/bench_extract.py                    # синтетическая ~1 МБ
+
+Сохранить страницу выдачи: в DevTools → Save as… (или page.content() в файл).
+Для страниц со встроенным состоянием (data-mfe-state / __initialData__) отдельно
+печатается время extract_state_listings — вырезка JSON регэкспом, без DOM.
+
+Печатает на каждую страницу: время разбора (медиана из --repeat), пик питоньих
+аллокаций (tracemalloc — дерево libxml2 живёт в C-куче и сюда не попадает; bs4
+строит дерево из питоньих объектов, поэтому разница и есть экономия) и
+совпадение результатов двух путей.
+"""
+import argparse
+import html
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urljoin
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.extract import extract_listings, extract_state_listings, parse_age  # noqa: E402
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def bs4_collect(html_text):
+    """Эталон: прежний bs4-разбор карточек (поля — как у extract_listings)."""
+    soup = BeautifulSoup(html_text, 'lxml')
+    items = soup.select('[data-marker="item"]')
+    out = []
+    for item in items:
+        link_tag = item.select_one('[data-marker="item-title"]')
+        if not link_tag:
+            continue
+        href = link_tag.get('href') or ''
+        title = link_tag.get('title', '') or link_tag.get_text(strip=True)
+        price = None
+        price_tag = item.select_one('[itemprop="price"]')
+        if price_tag and price_tag.get('content'):
+            try:
+                price = int(price_tag['content'])
+            except (TypeError, ValueError):
+                price = None
+        snippet_tag = item.select_one('[data-marker="item-description"]')
+        desc = snippet_tag.get_text(' ') if snippet_tag else ""
+        date_tag = (item.select_one('[data-marker="item-date"]') or
+                    item.select_one('p[class*="date"]') or
+                    item.select_one('[class*="dateInfo"]'))
+        date = date_tag.get_text(strip=True) if date_tag else ""
+        age_str, minutes_ago = parse_age(date)
+        item.get_text(' ').lower()        # прежний item_text (входит в стоимость)
+        out.append({
+            "href": href, "url": urljoin("https://www.avito.ru", href) if href else "",
+            "title": title, "price": price, "description": desc, "date": date,
+            "age_str": age_str, "minutes_ago": minutes_ago,
+            "seller_id": None, "published_ts": None,
+        })
+    return out, len(items)
+
+
+def synthetic_state(n_items=50, ts=1_700_000_000_000):
+    """Состояние выдачи в форме Авито (catalog.items) для тех же карточек."""
+    items = [{
+        "id": 4000000 + i, "title": f"MacBook Air 13 M2 8/256 #{i}",
+        "urlPath": f"/moskva/noutbuki/macbook_air_{i}",
+        "description": f"Отличное состояние, акб {80 + i % 20}%, {100 + i} циклов",
+        "priceDetailed": {"value": 60000 + i * 500, "string": f"{60000 + i * 500} ₽"},
+        "sortTimeStamp": ts - (i % 59 + 1) * 60_000, "sellerId": f"u{i % 7}",
+        "location": {"name": "Москва"}, "images": [{"636x476": "x" * 80}] * 5,
+    } for i in range(n_items)]
+    return {"data": {"catalog": {"items": items, "extraBlockItems": []}}}
+
+
+def synthetic_page(n_items=50, filler_kb=900, with_state=False):
+    """Страница выдачи, похожая по структуре на Авито: карточки + тяжёлая обвязка
+    (with_state — плюс <script data-mfe-state> с теми же карточками)."""
+    cards = []
+    for i in range(n_items):
+        cards.append(
+            f'<div data-marker="item" class="iva-item-root"><div class="iva-item-body">'
+            f'<a data-marker="item-title" href="/moskva/noutbuki/macbook_air_{i}?context=x" '
+            f'title="MacBook Air 13 M2 8/256 #{i}"><h3>MacBook Air 13 M2 8/256 #{i}</h3></a>'
+            f'<span class="price"><meta itemprop="price" content="{60000 + i * 500}">'
+            f'<span data-marker="item-price">{60000 + i * 500} ₽</span></span>'
+            f'<div data-marker="item-description"><p>Отличное состояние, '
+            f'<b>акб {80 + i % 20}%</b>, {100 + i} циклов</p></div>'
+            f'<div class="geo"><span>Москва</span></div>'
+            f'<p data-marker="item-date">{i % 59 + 1} минут назад</p>'
+            + '<div class="badge"><span>Доставка</span><svg><path d="M0 0"/></svg></div>' * 6
+            + '</div></div>')
+    filler = ('<div class="junk"><script>var x = "' + 'a' * 1000 + '";</script>'
+              '<span class="s">текст текст текст</span></div>') * filler_kb
+    state = ''
+    if with_state:
+        state = ('<script type="mime/invalid" data-mfe-state="true">'
+                 + html.escape(json.dumps(synthetic_state(n_items), ensure_ascii=False)) + '</script>')
+    return ('<html><head><title>Авито</title></head><body>' + state + filler[: len(filler) // 2]
+            + '<div class="items">' + ''.join(cards) + '</div>'
+            + filler[len(filler) // 2:] + '</body></html>')
+
+
+def _measure(fn, html_text, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html_text)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    result = fn(html_text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pages", nargs="*", help="сохранённые HTML-страницы выдачи")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    pages = [(p, Path(p).read_text(encoding="utf-8", errors="replace")) for p in args.pages]
+    if not pages:
+        pages = [("synthetic", synthetic_page(with_state=True))]
+
+    dom = lambda text: extract_listings(text, use_state=False)  # noqa: E731
+    print(f"{'страница':<28} {'КБ':>6} {'карт.':>5} | {'bs4 мс':>8} {'lxml мс':>8} {'×':>5} | "
+          f"{'bs4 МБ':>7} {'lxml МБ':>7} {'×':>5} | совпад. | state мс")
+    for name, text in pages:
+        t_new, m_new, r_new = _measure(dom, text, args.repeat)
+        t_st, _, r_st = _measure(extract_state_listings, text, args.repeat)
+        state = f"{t_st * 1000:.1f}" if r_st is not None else "нет"
+        if BeautifulSoup is None:
+            print(f"{name[-28:]:<28} {len(text) // 1024:>6} {r_new[1]:>5} | {'—':>8} "
+                  f"{t_new * 1000:>8.1f} {'':>5} | {'—':>7} {m_new / 2**20:>7.1f}        | bs4 нет | {state}")
+            continue
+        t_old, m_old, r_old = _measure(bs4_collect, text, args.repeat)
+        same = r_old == r_new
+        print(f"{name[-28:]:<28} {len(text) // 1024:>6} {r_new[1]:>5} | {t_old * 1000:>8.1f} "
+              f"{t_new * 1000:>8.1f} {t_old / max(t_new, 1e-9):>5.1f} | {m_old / 2**20:>7.1f} "
+              f"{m_new / 2**20:>7.1f} {m_old / max(m_new, 1):>5.1f} | {'да' if same else 'НЕТ':>7} | {state}")
+
+
+if __name__ == "__main__":
+    main()
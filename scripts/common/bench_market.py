@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк common.market.
+
+modal_center: прежняя реализация (для каждой цены — линейный проход до правой
+границы окна, O(n·k); оставлена здесь как эталон — modal_center_reference)
+против common.market.modal_center (бинпоиск, O(n log n)) и пакетного
+modal_centers по всем ключам накопителя — на чистом Python и на NumPy.
+
+robust_stats (--robust): живой рынок семейства в run() — на каждый лот копия
+корзины без его цены и robust_stats с сортировкой (как было; эталон —
+robust_stats_reference) против LiveMarket.stats(ключ, exclude=цена) и пакетного
+robust_stats_many по всем корзинам.
+
+Скетчи накопителя (--sketch): рынок конфига коллектора по сырому списку
+(нормализация записей, robust_stats и modal_center с сортировкой — как было)
+против common.price_sketch (слияние корзин времени за 30 дней + запросы) при
+истории в 400, 10 000 и 100 000 цен за полгода.
+
+Запуск:
+    python3 scripts/common/bench_market.py                         # 400 и 10 000 цен на ключ
+    python3 scripts/common/bench_market.py --sizes 400 --keys 500
+    python3 scripts/common/bench_market.py --robust                # 60 лотов × 40 корзин
+    python3 scripts/common/bench_market.py --sketch --sizes 400 10000 100000
+
+Выборки синтетические, похожие на накопитель коллектора: «горб» рынка + хвост
+перекупов и комплектов, цены кратны 500. Печатает мс на ключ и число
+расхождений с эталоном (должно быть 0). Эталон на больших выборках медленный —
+меряется на первых --ref-keys ключах.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import market  # noqa: E402
+from common.market import (  # noqa: E402
+    LiveMarket, MarketStats, modal_center, modal_centers, robust_stats, robust_stats_many,
+)
+from common.price_sketch import DAY, PriceSketchStore  # noqa: E402
+
+
+def modal_center_reference(prices, window=None):
+    """Прежний modal_center (scanner_v2 / parser) — без изменений."""
+    prices = sorted(prices)
+    n = len(prices)
+    if n < 4:
+        return int(statistics.median(prices)) if prices else 0
+    if window is None:
+        window = max(5000, int(statistics.median(prices) * 0.12))
+    best_cnt, best_i = -1, 0
+    for i in range(n):
+        hi = prices[i] + window
+        j = i
+        while j < n and prices[j] <= hi:
+            j += 1
+        if (j - i) > best_cnt:
+            best_cnt, best_i = j - i, i
+    hi = prices[best_i] + window
+    cluster = [p for p in prices if prices[best_i] <= p <= hi]
+    return int(statistics.median(cluster))
+
+
+def _percentile_reference(sorted_vals, q):
+    n = len(sorted_vals)
+    if n == 1:
+        return sorted_vals[0]
+    idx = q * (n - 1)
+    lo = int(idx)
+    frac = idx - lo
+    if lo + 1 >= n:
+        return sorted_vals[-1]
+    return int(round(sorted_vals[lo] + (sorted_vals[lo + 1] - sorted_vals[lo]) * frac))
+
+
+def robust_stats_reference(prices):
+    """Прежний robust_stats (common.market) — без изменений."""
+    vals = sorted(p for p in prices if p and p > 0)
+    if not vals:
+        return None
+    if len(vals) >= 8:
+        q1 = _percentile_reference(vals, 0.25)
+        q3 = _percentile_reference(vals, 0.75)
+        iqr = q3 - q1
+        lower = q1 - 1.5 * iqr
+        upper = q3 + 1.5 * iqr
+        clean = [p for p in vals if lower <= p <= upper]
+        if len(clean) >= 5:
+            vals = clean
+    return MarketStats(
+        n=len(vals),
+        median=int(statistics.median(vals)),
+        p20=_percentile_reference(vals, 0.20),
+        p10=_percentile_reference(vals, 0.10),
+        low=vals[0],
+        high=vals[-1],
+    )
+
+
+def synthetic_store(keys, size, seed=1):
+    """{ключ: цены} — горб рынка + правый хвост (~20%)."""
+    rng = random.Random(seed)
+    store = {}
+    for k in range(keys):
+        base = rng.choice([35000, 60000, 90000, 150000, 250000])
+        prices = [int(rng.gauss(base, base * 0.05)) for _ in range(size * 4 // 5)]
+        prices += [int(base * rng.uniform(1.1, 1.6)) for _ in range(size - len(prices))]
+        store[f"key{k}"] = [max(1000, p // 500 * 500) for p in prices]
+    return store
+
+
+def _ms_per_key(fn, store):
+    t0 = time.perf_counter()
+    out = fn(store)
+    return (time.perf_counter() - t0) * 1000 / max(len(store), 1), out
+
+
+def bench_robust(buckets, repeat):
+    """Как _assess_family: по лоту на каждую цену корзины, сравнение без себя."""
+    listings = [(key, p) for key, prices in buckets.items() for p in prices]
+
+    def old():
+        out = []
+        for key, price in listings:
+            comps = list(buckets.get(key, []))
+            if price in comps:
+                comps.remove(price)
+            out.append(robust_stats_reference(comps))
+        return out
+
+    def new():
+        book = LiveMarket(buckets)
+        return [book.stats(key, exclude=price) for key, price in listings]
+
+    rows = [('эталон (копия+сортировка на лот)', old), ('LiveMarket leave-one-out', new),
+            ('robust_stats_many, Python', lambda: robust_stats_many(buckets, use_numpy=False))]
+    if market.np is not None:
+        rows.append(('robust_stats_many, NumPy', lambda: robust_stats_many(buckets, use_numpy=True)))
+    ref = old()
+    print(f"{len(listings)} лотов в {len(buckets)} корзинах; "
+          f"расхождений LiveMarket с эталоном: {sum(a != b for a, b in zip(ref, new()))}")
+    whole = {k: robust_stats_reference(v) for k, v in buckets.items()}
+    for name, fn in rows[2:]:
+        print(f"  {name}: расхождений по корзинам {sum(fn()[k] != whole[k] for k in buckets)}")
+    print(f"{'':<34} {'мс':>8}")
+    for name, fn in rows:
+        t = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            t.append(time.perf_counter() - t0)
+        print(f"{name:<34} {statistics.median(t) * 1000:>8.3f}")
+
+
+def bench_sketch(sizes, repeat):
+    """Рынок одного конфига за 30 дней: сырой список против скетча."""
+    rng = random.Random(3)
+    now = int(time.time())
+    print(f"{'цен в истории':>14} {'список мс':>10} {'скетч мс':>9} {'корзин':>7} {'Δмедианы':>9}")
+    for size in sizes:
+        prices = synthetic_store(1, size, seed=size)['key0']
+        entries = [[p, now - rng.randrange(180 * DAY), rng.choice([0, 1, None])] for p in prices]
+        store = PriceSketchStore.from_raw({'k': entries}, now)
+        cutoff = now - 30 * DAY
+
+        def old():
+            fresh = [e[0] for e in ([int(e[0]), int(e[1]), e[2]] for e in entries) if e[1] >= cutoff]
+            return robust_stats(fresh), modal_center(fresh)
+
+        def new():
+            store._merged.clear()        # без кэша запроса: слияние корзин каждый раз
+            sk = store.query('k', 30)
+            return sk.robust_stats(), sk.modal_center()
+
+        times = []
+        for fn in (old, new):
+            t = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                t.append(time.perf_counter() - t0)
+            times.append(statistics.median(t) * 1000)
+        bins = len(store.query('k', 30).bins)
+        print(f"{size:>14} {times[0]:>10.3f} {times[1]:>9.3f} {bins:>7} "
+              f"{new()[0].median - old()[0].median:>9}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sizes', type=int, nargs='+', default=[400, 10_000])
+    ap.add_argument('--keys', type=int, help='ключей (корзин): 200, с --robust — 40')
+    ap.add_argument('--ref-keys', type=int, default=5)
+    ap.add_argument('--robust', action='store_true', help='бенчмарк robust_stats вместо modal_center')
+    ap.add_argument('--sketch', action='store_true', help='бенчмарк скетчей накопителя (common.price_sketch)')
+    ap.add_argument('--lots', type=int, default=60, help='--robust: лотов в корзине')
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    if args.sketch:
+        bench_sketch(args.sizes, args.repeat)
+        return
+
+    if args.robust:
+        print(f"NumPy: {'есть' if market.np is not None else 'нет'}")
+        bench_robust(synthetic_store(args.keys or 40, args.lots), args.repeat)
+        return
+
+    print(f"NumPy: {'есть' if market.np is not None else 'нет — только чистый Python'}")
+    print(f"{'цен/ключ':>9} {'ключей':>7} {'эталон мс':>10} {'новый мс':>9} {'пакет мс':>9} {'NumPy мс':>9} "
+          f"{'×':>7} {'расх.':>6}")
+    for size in args.sizes:
+        store = synthetic_store(args.keys or 200, size)
+        ref_store = dict(list(store.items())[:args.ref_keys])
+        t_ref, ref = _ms_per_key(lambda s: {k: modal_center_reference(v) for k, v in s.items()}, ref_store)
+        t_one, one = _ms_per_key(lambda s: {k: modal_center(v) for k, v in s.items()}, store)
+        t_pure, pure = _ms_per_key(lambda s: modal_centers(s, use_numpy=False), store)
+        t_np, fast = float('nan'), pure
+        if market.np is not None:
+            t_np, fast = _ms_per_key(lambda s: modal_centers(s, use_numpy=True), store)
+        diffs = sum(ref[k] != one[k] for k in ref) + sum(one[k] != pure[k] or one[k] != fast[k] for k in store)
+        best = min(t_one, t_pure, t_np) if market.np is not None else min(t_one, t_pure)
+        print(f"{size:>9} {len(store):>7} {t_ref:>10.3f} {t_one:>9.3f} {t_pure:>9.3f} {t_np:>9.3f} "
+              f"{t_ref / max(best, 1e-9):>7.0f} {diffs:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк старта потребителей базы цен: индекс по live_key без кэша (classify по
+каждой строке, как было) против сайдкара common.price_index.
+
+Запуск:
+    python3 scripts/common/bench_price_index.py                          # public/data/avito-prices.json
+    python3 scripts/common/bench_price_index.py path/to/avito-prices.json --repeat 20
+
+Потребители — все четыре места, строившие индекс на старте:
+  scanner   — AvitoScannerV2._load_prices (старт сканера и каждого прогона intake);
+  modal     — scanner_v2.modal_report (вывод глушится, накопитель — синтетический);
+  sync      — загрузка базы + индекс в price-sync (sync_stats, dry-run);
+  monitor   — tg-leads/monitor.load_prices_index.
+
+Печатает медиану из --repeat: без кэша, первый запуск (сборка + запись
+сайдкара) и из кэша. Сайдкары пишутся во временный каталог.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# кэш classify — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'hot-deals-scanner'))
+sys.path.insert(0, str(ROOT / 'price-sync'))
+sys.path.insert(0, str(ROOT / 'tg-leads'))
+
+from common import price_index  # noqa: E402
+import scanner_v2  # noqa: E402
+import sync_from_collector  # noqa: E402
+import monitor  # noqa: E402
+
+
+def consumers(path):
+    def scanner():
+        sc = scanner_v2.AvitoScannerV2.__new__(scanner_v2.AvitoScannerV2)
+        sc._load_prices()
+        return len(sc.prices_by_livekey)
+
+    def modal():
+        with contextlib.redirect_stdout(io.StringIO()):
+            scanner_v2.modal_report(min_n=1)
+
+    def sync():
+        idx = price_index.load_price_index(path)
+        return sync_from_collector.sync_stats(idx.stats, {}, keys=idx.live_keys)
+
+    def tg():
+        return len(monitor.load_prices_index(path))
+
+    return [('scanner', scanner), ('modal', modal), ('sync', sync), ('monitor', tg)]
+
+
+def _median_ms(fn, repeat, before=None):
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('prices', nargs='?', default=str(ROOT.parent / 'public/data/avito-prices.json'))
+    ap.add_argument('--repeat', type=int, default=10)
+    args = ap.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    path = Path(args.prices)
+    tmp = Path(tempfile.mkdtemp())
+    # накопитель для modal_report: по паре цен на каждый конфиг базы
+    idx = price_index.load_price_index(path, cache_dir=None)
+    raw = {str(k): [[int(s.get('median_price') or 0), 0, 1]] * 2
+           for k, s in idx.by_live_key.items()}
+    (tmp / 'raw.json').write_text(json.dumps(raw), encoding='utf-8')
+    scanner_v2.PRICES_FILE, scanner_v2.RAW_PRICES_FILE = path, tmp / 'raw.json'
+    scanner_v2.RAW_SKETCH_FILE = tmp / 'raw-sketch.json'   # нет файла — скетчи из raw.json
+    cache = tmp / 'cache'
+
+    def drop_cache():
+        for f in cache.glob('*'):
+            f.unlink()
+
+    print(f"{path} — строк {len(idx)}, по live_key {len(idx.by_live_key)}")
+    print(f"{'потребитель':<12} {'без кэша мс':>12} {'первый мс':>10} {'кэш мс':>8} {'×':>6}")
+    for name, fn in consumers(path):
+        price_index.PRICE_INDEX_CACHE_DIR = None
+        t_none = _median_ms(fn, args.repeat)
+        price_index.PRICE_INDEX_CACHE_DIR = cache
+        t_cold = _median_ms(fn, args.repeat, before=drop_cache)
+        t_warm = _median_ms(fn, args.repeat)
+        print(f"{name:<12} {t_none:>12.2f} {t_cold:>10.2f} {t_warm:>8.2f} {t_none / max(t_warm, 1e-6):>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи накопителя коллектора: прежний _accumulate_raw (чтение всего
+intake-raw-prices.json, нормализация каждой записи, обрезка RAW_CAP, перезапись
+файла — эталон accumulate_reference) против common.raw_prices.RawPriceLog
+(строка в журнал, свёртка раз в RAW_COMPACT_KB).
+
+Запуск:
+    python3 scripts/common/bench_raw_prices.py                       # 300 конфигов × 400 цен
+    python3 scripts/common/bench_raw_prices.py --keys 1000 --batch 50 --runs 500
+
+Накопитель заполнен до RAW_CAP по всем конфигам; прогон intake дописывает
+--batch цен в случайные конфиги. Печатает мс на прогон (для журнала — с учётом
+свёрток), время чтения слитого вида и совпадение итогов с эталоном.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.raw_prices import RAW_CAP, RAW_COMPACT_KB, RawPriceLog, norm_raw_entry  # noqa: E402
+
+NOW = 1_780_000_000
+
+
+def accumulate_reference(path, raw_batch, now_ts, cap=RAW_CAP):
+    """Прежний _accumulate_raw (только накопитель, без скетчей)."""
+    try:
+        store = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    except Exception:
+        store = {}
+    for key, entries in raw_batch.items():
+        cur = store.get(key) if isinstance(store.get(key), list) else []
+        cur = [norm_raw_entry(e, now_ts) for e in cur]
+        cur.extend(norm_raw_entry(e, now_ts) for e in entries)
+        store[key] = cur[-cap:]
+    tmp = path.parent / (path.name + '.tmp')
+    tmp.write_text(json.dumps(store, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--keys', type=int, default=300)
+    ap.add_argument('--batch', type=int, default=20, help='цен за прогон intake')
+    ap.add_argument('--runs', type=int, default=200)
+    ap.add_argument('--compact-kb', type=int, default=RAW_COMPACT_KB)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(1)
+    keys = [f"k{i}" for i in range(args.keys)]
+    seed = {k: [[rng.randrange(60, 200) * 500, NOW - rng.randrange(30 * 86400), rng.choice([0, 1, None])]
+                for _ in range(RAW_CAP)] for k in keys}
+    batches = [{} for _ in range(args.runs)]
+    for b in batches:
+        for _ in range(args.batch):
+            b.setdefault(rng.choice(keys), []).append([rng.randrange(60, 200) * 500, NOW, 1])
+
+    tmp = Path(tempfile.mkdtemp())
+    ref_path, log_path = tmp / 'ref.json', tmp / 'log.json'
+    for p in (ref_path, log_path):
+        p.write_text(json.dumps(seed), encoding='utf-8')
+    print(f"накопитель: {args.keys} конфигов × {RAW_CAP} цен, {ref_path.stat().st_size // 1024} КБ; "
+          f"прогонов {args.runs} по {args.batch} цен")
+
+    t0 = time.perf_counter()
+    for b in batches:
+        accumulate_reference(ref_path, b, NOW)
+    t_ref = (time.perf_counter() - t0) * 1000 / args.runs
+
+    log = RawPriceLog(log_path, compact_kb=args.compact_kb)
+    compactions = 0
+    t0 = time.perf_counter()
+    for b in batches:
+        log.append(b, NOW)
+        compactions += log.maybe_compact(NOW)
+    t_log = (time.perf_counter() - t0) * 1000 / args.runs
+
+    t0 = time.perf_counter()
+    view = log.read()
+    t_read = (time.perf_counter() - t0) * 1000
+    same = view == json.loads(ref_path.read_text(encoding='utf-8'))
+    print(f"{'прежний мс/прогон':>18} {'журнал мс/прогон':>17} {'×':>6} {'свёрток':>8} {'чтение мс':>10} {'совпало':>8}")
+    print(f"{t_ref:>18.2f} {t_log:>17.3f} {t_ref / max(t_log, 1e-6):>6.1f} {compactions:>8} {t_read:>10.1f} "
+          f"{'да' if same else 'НЕТ':>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Общая фабрика Playwright-браузера/контекста для скраперов Авито (scanner_v2,
+avito-parser, price-builder) + фильтр запросов.
+
+Страницы выдачи и объявлений тяжёлые: сотни картинок, шрифты, видео, CSS и
+счётчики аналитики. Мы читаем только текст/HTML, поэтому контекст по умолчанию
+перехватывает все запросы (context.route — действует и на страницы дозахода,
+открытые через context.new_page()) и пропускает только:
+  - document / script / xhr / fetch — без них не собирается страница и не
+    работает фаервол Авито (его капча — GeeTest v4, решается через RuCaptcha, но
+    скрипты фаервола и verify-запрос должны пройти);
+  - любые запросы к хостам капчи (geetest) — целиком, что бы они ни грузили.
+Скрипты и XHR счётчиков/рекламы режутся по хосту.
+
+Счётчики: сколько запросов отрезано по типам и оценка сэкономленных байт (у
+отменённого запроса размера нет — берём средний вес ресурса этого типа, см.
+AVG_BYTES). BLOCK_RESOURCES=0 — контекст без фильтра (для отладки вёрстки).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+from typing import Optional
+from urllib.parse import urlsplit
+
+from common.config import BLOCK_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-setuid-sandbox',
+               '--disable-blink-features=AutomationControlled']
+
+STEALTH_JS = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+    Object.defineProperty(navigator, 'plugins',   { get: () => [1, 2, 3] });
+    window.chrome = { runtime: {} };
+"""
+
+ALLOWED_TYPES = frozenset({"document", "script", "xhr", "fetch"})
+
+# Капча фаервола: пропускаем всё (виджет GeeTest тянет свои картинки/стили)
+CAPTCHA_HOSTS = ("geetest.com", "geevisit.com")
+
+# Аналитика/реклама: режем даже скрипты и XHR
+TRACKER_HOSTS = (
+    "mc.yandex.ru", "an.yandex.ru", "yandex.ru/ads", "adfox.ru", "adfox.yandex.ru",
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "top-fwz1.mail.ru", "top.mail.ru", "vk.com/rtrg", "ad.mail.ru", "criteo.com",
+    "tiktokw.us", "analytics.tiktok.com", "facebook.net",
+)
+
+# Средний вес отрезанного ресурса (байт) — для оценки экономии трафика
+AVG_BYTES = {
+    "image": 45_000,
+    "media": 400_000,
+    "font": 35_000,
+    "stylesheet": 30_000,
+    "script": 60_000,        # трекерные скрипты
+    "xhr": 2_000,
+    "fetch": 2_000,
+}
+_AVG_OTHER = 5_000
+
+
+def _host_matches(url: str, hosts) -> bool:
+    """Хост совпадает с записью или её поддомен; «хост/путь» — ещё и префикс пути."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    for h in hosts:
+        h_host, _, h_path = h.partition("/")
+        if host == h_host or host.endswith("." + h_host):
+            if not h_path or parts.path.lstrip("/").startswith(h_path):
+                return True
+    return False
+
+
+class ResourceFilter:
+    """Решение «пропустить/отрезать» для запроса + счётчики за прогон.
+
+    Один экземпляр можно повесить на несколько контекстов (пул сессий сканера):
+    счётчики под замком."""
+
+    def __init__(self, allowed_types=ALLOWED_TYPES):
+        self.allowed_types = frozenset(allowed_types)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.blocked = Counter()          # resource_type → запросов отрезано
+        self.saved_bytes = 0              # оценка
+
+    def allows(self, resource_type: str, url: str) -> bool:
+        if _host_matches(url, CAPTCHA_HOSTS):
+            return True
+        if _host_matches(url, TRACKER_HOSTS):
+            return False
+        return resource_type in self.allowed_types
+
+    def handle(self, route) -> None:
+        """Обработчик context.route("**/*", ...)."""
+        req = route.request
+        rtype = req.resource_type
+        if self.allows(rtype, req.url):
+            with self._lock:
+                self.allowed += 1
+            route.continue_()
+            return
+        with self._lock:
+            self.blocked[rtype] += 1
+            self.saved_bytes += AVG_BYTES.get(rtype, _AVG_OTHER)
+        route.abort()
+
+    def attach(self, context) -> None:
+        context.route("**/*", self.handle)
+
+    @property
+    def n_blocked(self) -> int:
+        return sum(self.blocked.values())
+
+    def summary(self) -> str:
+        kinds = ", ".join(f"{t} {n}" for t, n in self.blocked.most_common())
+        return (f"🧹 Фильтр запросов: пропущено {self.allowed}, отрезано {self.n_blocked}"
+                f" ({kinds or '—'}), сэкономлено ≈{self.saved_bytes / 2**20:.1f} МБ")
+
+    def log_summary(self, log: Optional[logging.Logger] = None) -> None:
+        """Пишет итог в лог (если фильтр что-то видел) и обнуляет счётчики."""
+        with self._lock:
+            seen = self.allowed or self.blocked
+            text = self.summary() if seen else ""
+            self.allowed, self.blocked, self.saved_bytes = 0, Counter(), 0
+        if text:
+            (log or logger).info(text)
+
+
+def launch_chromium(playwright, headless: bool = True):
+    return playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+
+
+def new_context(browser, user_agent: str,
+                resource_filter: Optional[ResourceFilter] = None, store=None):
+    """Контекст со stealth-настройками (как раньше в каждом скрапере) и фильтром
+    запросов (при BLOCK_RESOURCES и переданном resource_filter).
+
+    store (common.session_store.SessionStore) — контекст стартует с сохранённого
+    storage_state (куки фаервола), если оно есть и не протухло."""
+    state = store.load() if store is not None else None
+    kwargs = dict(
+        viewport={'width': 1440, 'height': 900},
+        user_agent=user_agent,
+        locale='ru-RU',
+        timezone_id='Europe/Moscow',
+        extra_http_headers={'Accept-Language': 'ru-RU,ru;q=0.9'},
+    )
+    if state:
+        kwargs['storage_state'] = state
+    context = browser.new_context(**kwargs)
+    context.add_init_script(STEALTH_JS)
+    if resource_filter is not None and BLOCK_RESOURCES:
+        resource_filter.attach(context)
+    if store is not None:
+        store.started(context, reused=bool(state))
+    return context
@@ -14,10 +14,18 @@
 
 from __future__ import annotations
 
+import atexit
+import hashlib
+import marshal
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Optional, Tuple, Dict
-from .config import VALID_RAM, VALID_SSD
+from .config import CLASSIFY_CACHE_SIZE, VALID_RAM, VALID_SSD
 
 
 @dataclass
@@ -55,107 +63,147 @@ class AppleConfig:
         return bool(self.family and self.chip_gen and self.ram > 0 and self.ssd > 0)
 
 
-# ─── Паттерны семейств (порядок важен — более специфичные сначала) ────────────
-_FAMILY_PATTERNS = [
-    (re.compile(r'mac\s*studio', re.I),                    'Mac Studio'),
-    (re.compile(r'mac\s*mini', re.I),                      'Mac mini'),
-    (re.compile(r'mac\s*pro\b(?!.*book)', re.I),           'Mac Pro'),
-    (re.compile(r'imac|аймак', re.I),                      'iMac'),
-    (re.compile(r'macbook\s*pro|mbp|макбук\s*про', re.I),  'MacBook Pro'),
-    (re.compile(r'macbook\s*air|mba|макбук\s*эйр', re.I),  'MacBook Air'),
-    (re.compile(r'macbook|макбук', re.I),                   'MacBook'),  # ambiguous
-]
-
-# ─── Паттерн чипа ────────────────────────────────────────────────────────────
-_CHIP_PATTERN = re.compile(
-    r'\b(m[1-9])\s*(pro|max|ultra)?\b',
-    re.I,
-)
-
-# ─── Паттерн Intel ───────────────────────────────────────────────────────────
-_INTEL_PATTERN = re.compile(
-    r'\b(i[3579]|intel|core)\b',
-    re.I,
-)
-
-# ─── Паттерн экрана ──────────────────────────────────────────────────────────
-# Исключаем совпадения с RAM/SSD: "16/512", "16gb", "16 gb"
-_SCREEN_PATTERN = re.compile(
-    r'\b(13|14|15|16|24|27)(?!\s*/\s*\d)(?!\s*(?:gb|гб))["\s\-]?\s*(?:inch|дюйм|"|\'\')?',
-    re.I,
-)
-
-# ─── Паттерн года ────────────────────────────────────────────────────────────
-_YEAR_PATTERN = re.compile(r'\b(20[12]\d)\b')
-
-# ─── Паттерн RAM/SSD из слешевой записи: "16/512", "24/1TB" ─────────────────
-_SLASH_SPEC = re.compile(
-    r'\b(\d{1,3})\s*/\s*(\d{1,4})\s*(gb|гб|tb|тб)?\b',
-    re.I,
-)
-
-# ─── Паттерн отдельных значений: "16GB", "512GB", "1TB" ─────────────────────
-_UNIT_SPEC = re.compile(
-    r'(\d{1,4})\s*(gb|гб|tb|тб)\b',
-    re.I,
-)
+# ─── Движок: один проход по заголовку ────────────────────────────────────────
+# Все поля ищутся одной альтернативой по заголовку в нижнем регистре: finditer
+# отдаёт токены (семейство, чип, Intel, число), а всё, что прежде искали
+# отдельными паттернами вокруг числа (слешевая запись 16/512, пробельная
+# «16 512», единицы 16GB, отсечка экрана перед «/» и «гб»), — необязательные
+# lookahead-группы при токене-числе: число поглощается целиком, соседние
+# токены не теряются. Результат совпадает с прежним поочерёдным поиском (эталон
+# и проверка — common/bench_classify.py, common/test_classifier.py):
+#   - семейство — по приоритету среди всех найденных (Studio > mini > Mac Pro >
+#     iMac > MacBook Pro > MacBook Air > MacBook); «imac pro» / «imac mini»
+#     разбираются одним токеном, чтобы не потерять вложенный «mac …»;
+#   - «mac pro» — только если дальше в строке нет «book»;
+#   - экран — первое число с \b, начинающееся на 13/14/15/16/24/27 (кроме «16/…»
+#     и «16 гб»); год — отдельное четырёхзначное 201x/202x;
+#   - RAM/SSD — первая слешевая запись, иначе первая пробельная, иначе числа с
+#     единицами по порядку (единицы без \b слева — последние 4 цифры числа,
+#     в том числе цифра чипа: «m2 tb» → 2 ТБ).
+_FAMILY_PRIORITY = ('Mac Studio', 'Mac mini', 'Mac Pro', 'iMac', 'MacBook Pro', 'MacBook Air', 'MacBook')
+_UNITS = r'gb|гб|tb|тб'
+# Ветки _TOKEN. Первый символ токена съедает общий класс [\dimcам] (по нему re
+# пропускает лишние позиции), каждая ветка смотрит на него lookbehind'ом;
+# (?<!\w.) — граница слова перед этим символом. Каждая ветка обёрнута в свою
+# именованную группу (_BRANCHES): _scan выбирает ветку по m.lastgroup и читает
+# её группы по имени — порядок групп в паттерне ни на что не влияет.
+# Число: цифры целиком; за ним lookahead'ами — «/N[единица]» (слешевая запись),
+# «/цифра» (отсечка экрана), « NNN» (пробельная), единица, «gb/гб» без \b
+# (отсечка экрана), следующий символ (\w — год не отдельный).
+_NUM = (r'(?<=\d)(?:(?<!\w.)(?P<wb>))?\d*'
+        r'(?:(?=\s*/\s*(?P<sl>\d{1,4})\s*(?P<slu>' + _UNITS + r')?\b))?'
+        r'(?:(?=\s*/\s*\d)(?P<sld>))?'
+        r'(?:(?=\s+(?P<sp>\d{3,4})\b))?'
+        r'(?:(?=\s*(?P<unit>' + _UNITS + r')\b))?'
+        r'(?:(?=\s*(?:gb|гб))(?P<gbx>))?'
+        r'(?=(?P<next>\w?))')
+# «imac …» / «mac …» с хвостом: studio, mini, book [pro|air], pro (без «book» дальше).
+_MAC = (r'(?:(?<=i)(?P<i>mac)|(?<=m)(?P<mac>ac))(?:\s*(?P<studio>studio)|\s*(?P<mini>mini)'
+        r'|(?P<book>book)(?:\s*(?P<bpro>pro)|\s*(?P<bair>air))?|\s*(?P<pro>pro)\b(?!.*book))?')
+# mbp / mba
+_MB = r'(?<=m)b(?:(?P<mbp>p)|(?P<mba>a))'
+# Чип «m2 [pro|max|ultra]». Цифра чипа числом не сканируется, поэтому единица
+# сразу за ней («m2 tb») — здесь же (cunit): прежний поиск единиц её видел.
+_CHIP = (r'(?<=m)(?<!\w.)(?P<chip>[1-9])(?:(?=\s*(?P<cunit>' + _UNITS + r')\b))?'
+         r'\s*(?P<tier>pro|max|ultra)?\b')
+# Intel: i3/i5/i7/i9, intel, core
+_INTEL = r'(?<!\w.)(?P<intel>(?<=i)[3579]|(?<=i)ntel|(?<=c)ore)\b'
+# Кириллица: аймак, макбук [про|эйр]
+_RU = r'(?<=а)(?P<aimac>ймак)|(?<=м)(?P<mk>акбук)(?:\s*(?P<mkpro>про)|\s*(?P<mkair>эйр))?'
+_BRANCHES = (('num', _NUM), ('family', _MAC), ('mb', _MB), ('chip_tok', _CHIP), ('intel_tok', _INTEL), ('ru', _RU))
+_TOKEN = re.compile(r'[\dimcам](?:' + '|'.join(f'(?P<{name}>{p})' for name, p in _BRANCHES) + ')')
+_SCREENS = {'13', '14', '15', '16', '24', '27'}
+_YEAR_PREFIXES = {'201', '202'}
 
 
 def _normalize_storage(val: int, unit: Optional[str]) -> int:
     """Конвертирует TB в GB."""
-    if unit and unit.lower() in ('tb', 'тб'):
+    if unit and unit in ('tb', 'тб'):
         return val * 1024
     return val
 
 
-def _extract_specs_from_text(text: str) -> tuple[int, int]:
-    """
-    Извлекает RAM и SSD из текста.
-    Приоритет: слешевая запись (16/512) > отдельные значения (16GB ... 512GB).
-    Возвращает (ram, ssd). Если не найдено, (0, 0).
-    """
-    text_clean = text.lower().replace('\xa0', ' ')
-
-    # Попытка 1: слешевая запись "16/512GB", "24/1TB"
-    slash_match = _SLASH_SPEC.search(text_clean)
-    if slash_match:
-        left = int(slash_match.group(1))
-        right = int(slash_match.group(2))
-        unit = slash_match.group(3)
-        right = _normalize_storage(right, unit)
-
+def _scan(text_lower: str):
+    """Один проход: (семейство, экран, чип, tier, intel, год, ram, ssd) как нашлись."""
+    kinds = set()
+    chip = tier = None
+    intel = False
+    screen = year = slash = space = None
+    units = []
+    for m in _TOKEN.finditer(text_lower):
+        branch = m.lastgroup
+        if branch == 'num':
+            wb, sl, slu, sld, sp, unit, gbx, nxt = m.group('wb', 'sl', 'slu', 'sld', 'sp', 'unit', 'gbx', 'next')
+            num = m.group()
+            if unit is not None:
+                units.append(_normalize_storage(int(num[-4:]), unit))
+            if wb is None:
+                continue
+            if screen is None and num[:2] in _SCREENS and (len(num) > 2 or (sld is None and gbx is None)):
+                screen = int(num[:2])
+            if year is None and len(num) == 4 and num[:3] in _YEAR_PREFIXES and not nxt:
+                year = int(num)
+            if len(num) <= 3:
+                if slash is None and sl is not None:
+                    slash = (int(num), _normalize_storage(int(sl), slu))
+                if space is None and sp is not None:
+                    space = (int(num), int(sp))
+        elif branch == 'chip_tok':
+            chip_d, cunit, tier_raw = m.group('chip', 'cunit', 'tier')
+            if cunit is not None:
+                units.append(_normalize_storage(int(chip_d), cunit))
+            if chip is None:
+                chip, tier = 'm' + chip_d, tier_raw
+        elif branch == 'intel_tok':
+            intel = True
+        elif branch == 'family':
+            i, studio, mini, book, bpro, bair, pro = m.group('i', 'studio', 'mini', 'book', 'bpro', 'bair', 'pro')
+            if i is not None:
+                kinds.add('iMac')
+            if studio:
+                kinds.add('Mac Studio')
+            elif mini:
+                kinds.add('Mac mini')
+            elif pro:
+                kinds.add('Mac Pro')
+            elif bpro:
+                kinds.add('MacBook Pro')
+            elif bair:
+                kinds.add('MacBook Air')
+            elif book:
+                kinds.add('MacBook')
+        elif branch == 'mb':
+            kinds.add('MacBook Pro' if m.group('mbp') else 'MacBook Air')
+        else:                                     # ru
+            aimac, mkpro, mkair = m.group('aimac', 'mkpro', 'mkair')
+            kinds.add('iMac' if aimac else 'MacBook Pro' if mkpro else 'MacBook Air' if mkair else 'MacBook')
+    family = next((f for f in _FAMILY_PRIORITY if f in kinds), None)
+    ram, ssd = _specs(slash, space, units)
+    return family, screen, chip, tier, intel, year, ram, ssd
+
+
+def _specs(slash, space, units) -> tuple[int, int]:
+    """RAM и SSD. Приоритет: слешевая запись (16/512) > пробельная (16 512) >
+    отдельные значения с единицами (16GB ... 512GB). Не нашли — (0, 0)."""
+    if slash:
+        left, right = slash
         if left in VALID_RAM and right in VALID_SSD:
             return left, right
         # Может быть наоборот? Маловероятно, но проверим
         if right in VALID_RAM and left in VALID_SSD:
             return right, left
-
-    # Попытка 2: пробельная запись без единиц: "16 256", "24 512", "8 1024"
-    space_match = re.search(r'\b(\d{1,3})\s+(\d{3,4})\b', text_clean)
-    if space_match:
-        left = int(space_match.group(1))
-        right = int(space_match.group(2))
+    if space:
+        left, right = space
         if left in VALID_RAM and right in VALID_SSD:
             return left, right
-
-    # Попытка 3: отдельные значения с единицами
-    found_values = []
-    for m in _UNIT_SPEC.finditer(text_clean):
-        val = int(m.group(1))
-        unit = m.group(2)
-        val = _normalize_storage(val, unit)
-        # Пропускаем годы
-        if 2015 <= val <= 2030:
-            continue
-        found_values.append(val)
-
     ram, ssd = 0, 0
-    for val in found_values:
+    for val in units:
+        if 2015 <= val <= 2030:       # годы
+            continue
         if val in VALID_RAM and ram == 0:
             ram = val
         elif val in VALID_SSD and ssd == 0:
             ssd = val
-
     return ram, ssd
 
 
@@ -222,70 +270,43 @@ def _infer_screen(family: Optional[str], chip_gen: Optional[str], chip_tier: str
     return None
 
 
-def classify(title: str, specs: Optional[dict] = None) -> AppleConfig:
+def _classify(title: str, specs: Optional[dict] = None) -> AppleConfig:
     """
-    Классифицирует Apple-продукт из текста объявления.
+    Классифицирует Apple-продукт из текста объявления (без кэша).
 
     Args:
         title: Заголовок объявления (h1 или title из превью)
         specs: Опциональные спецификации из deep_analyze
                {"ram": int, "ssd": int, "model": str, "diagonal": float}
     """
-    text = title.strip()
-    text_lower = text.lower()
-
-    # ── Семейство ────────────────────────────────────────────────────────────
-    family = None
-    for pattern, name in _FAMILY_PATTERNS:
-        if pattern.search(text_lower):
-            family = name
-            break
-
-    # "MacBook" без Air/Pro — попробуем определить по экрану
-    if family == 'MacBook':
-        # 13" после 2020 = Air, 14"/16" = Pro
-        screen_m = _SCREEN_PATTERN.search(text_lower)
-        if screen_m:
-            s = int(screen_m.group(1))
-            if s in (14, 16):
-                family = 'MacBook Pro'
-            elif s in (13, 15):
-                family = 'MacBook Air'
+    family, screen_found, chip, tier, intel, year, ram, ssd = _scan(title.strip().lower())
+
+    # "MacBook" без Air/Pro — определяем по экрану: 13"/15" = Air, 14"/16" = Pro
+    if family == 'MacBook' and screen_found:
+        if screen_found in (14, 16):
+            family = 'MacBook Pro'
+        elif screen_found in (13, 15):
+            family = 'MacBook Air'
 
     # ── Чип ──────────────────────────────────────────────────────────────────
     chip_gen = None
     chip_tier = 'base'
-
-    chip_match = _CHIP_PATTERN.search(text)
-    if chip_match:
-        chip_gen = chip_match.group(1).upper()   # "M4"
-        tier_raw = chip_match.group(2)
-        if tier_raw:
-            chip_tier = tier_raw.capitalize()     # "Pro", "Max", "Ultra"
-    elif _INTEL_PATTERN.search(text_lower):
+    if chip:
+        chip_gen = chip.upper()                   # "M4"
+        if tier:
+            chip_tier = tier.capitalize()         # "Pro", "Max", "Ultra"
+    elif intel:
         chip_gen = 'Intel'
 
-    # ── Экран ────────────────────────────────────────────────────────────────
-    # Mac mini и Mac Studio не имеют экрана
+    # ── Экран (у Mac mini / Studio / Pro его нет) ────────────────────────────
     screen = None
     if family not in ('Mac mini', 'Mac Studio', 'Mac Pro'):
-        screen_match = _SCREEN_PATTERN.search(text)
-        if screen_match:
-            screen = int(screen_match.group(1))
-        else:
-            screen = _infer_screen(family, chip_gen, chip_tier)
+        screen = screen_found if screen_found else _infer_screen(family, chip_gen, chip_tier)
 
     # ── Год ──────────────────────────────────────────────────────────────────
-    year = None
-    year_match = _YEAR_PATTERN.search(text)
-    if year_match:
-        year = int(year_match.group(1))
-    else:
+    if year is None:
         year = _infer_year(family, chip_gen, chip_tier, screen)
 
-    # ── RAM / SSD ────────────────────────────────────────────────────────────
-    ram, ssd = _extract_specs_from_text(text)
-
     # Если specs из deep_analyze — приоритет
     if specs:
         if specs.get('ram') and specs['ram'] in VALID_RAM:
@@ -322,3 +343,211 @@ def config_to_db_key(config: AppleConfig) -> Optional[Tuple[str, str, int, int]]
     if not config.is_valid:
         return None
     return (config.model_name.lower(), processor_label(config), config.ram, config.ssd)
+
+
+# ─── Кэш classify() ──────────────────────────────────────────────────────────
+# Один и тот же заголовок классифицируется многократно: префильтр и сборка
+# кандидата в сканере, повторная выдача на каждом прогоне, строки базы цен.
+# Результат зависит только от заголовка (все паттерны нечувствительны к регистру
+# и к числу пробелов) и от ram/ssd из specs — по ним и ключ. В кэше — поля
+# AppleConfig кортежем: на каждое попадание — новый объект (билдер правит
+# конфиг на месте). Файл кэша привязан к CLASSIFIER_SIG — хэшу исходников
+# классификатора и конфига, так что правка паттернов его обнуляет.
+
+def _source_sig() -> str:
+    h = hashlib.sha1(f"{sorted(VALID_RAM)}|{sorted(VALID_SSD)}".encode())
+    here = Path(__file__).resolve().parent
+    for name in ('classifier.py', 'config.py'):
+        try:
+            h.update((here / name).read_bytes())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+CLASSIFIER_SIG = _source_sig()
+
+_cache_env = os.environ.get('CLASSIFY_CACHE_PATH', str(Path.home() / '.cache' / 'bestmac' / 'classify-cache.marshal'))
+CLASSIFY_CACHE_PATH = Path(_cache_env) if _cache_env else None
+
+
+def _fields(c: AppleConfig) -> tuple:
+    """Поля AppleConfig в порядке конструктора (dataclasses.astuple — медленный deepcopy)."""
+    return (c.family, c.screen, c.chip_gen, c.chip_tier, c.ram, c.ssd, c.year)
+
+
+_WS = re.compile(r'[^\S\n]+')     # пробелы (кроме перевода строки: `.` в паттернах его не берёт)
+
+
+def _cache_key(title: str, specs: Optional[dict]):
+    """(заголовок без регистра и лишних пробелов, ram, ssd) или None — не кэшируем."""
+    if not isinstance(title, str):
+        return None
+    ram = ssd = 0
+    if specs:
+        ram, ssd = specs.get('ram') or 0, specs.get('ssd') or 0
+        if type(ram) is not int or type(ssd) is not int:
+            return None
+    return (_WS.sub(' ', title.strip().lower()), ram, ssd)
+
+
+class ClassifyCache:
+    """Ограниченный LRU перед _classify с необязательным файлом на диске.
+
+    Файл читается при первом обращении; сохраняется не чаще SAVE_EVERY_SEC (по
+    промаху) и при выходе процесса — сливаясь с тем, что записали другие
+    процессы, и отрезая старые записи сверх maxsize."""
+
+    SAVE_EVERY_SEC = 60.0
+
+    def __init__(self, maxsize: int = CLASSIFY_CACHE_SIZE, path: Optional[Path] = CLASSIFY_CACHE_PATH,
+                 clock=time.monotonic):
+        self.maxsize = max(0, int(maxsize))
+        self.path = Path(path) if path else None
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()        # ключ → поля AppleConfig
+        self._loaded = self.path is None
+        self._dirty = False
+        self._saved_at = clock()
+        self.hits = self.misses = self.disk_loaded = 0
+
+    def _read_file(self) -> list:
+        try:
+            rec = marshal.loads(self.path.read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            return []
+        if not isinstance(rec, dict) or rec.get('sig') != CLASSIFIER_SIG:
+            return []
+        return rec.get('entries') or []
+
+    def _load(self):
+        """Под замком: подтянуть файл в память (один раз)."""
+        self._loaded = True
+        entries = self._read_file()[-self.maxsize:]
+        for key, fields in entries:
+            self._data.setdefault(key, fields)
+        self.disk_loaded = len(entries)
+
+    def classify(self, title: str, specs: Optional[dict] = None) -> AppleConfig:
+        key = _cache_key(title, specs) if self.maxsize else None
+        if key is None:
+            return _classify(title, specs)
+        save = False
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            fields = self._data.get(key)
+            if fields is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return AppleConfig(*fields)
+        config = _classify(title, specs)
+        with self._lock:
+            self.misses += 1
+            self._data[key] = _fields(config)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+            save = self.path is not None and self.clock() - self._saved_at >= self.SAVE_EVERY_SEC
+        if save:
+            self.save()
+        return config
+
+    def classify_many(self, titles, specs=None) -> list:
+        """Пачка заголовков (specs — список той же длины или None): кэш
+        просматривается и пополняется под одним захватом замка на пачку."""
+        specs = specs or [None] * len(titles)
+        keys = [_cache_key(t, s) if self.maxsize else None for t, s in zip(titles, specs)]
+        out = [None] * len(titles)
+        with self._lock:
+            if not self._loaded and self.maxsize:
+                self._load()
+            for i, key in enumerate(keys):
+                fields = self._data.get(key) if key is not None else None
+                if fields is not None:
+                    self._data.move_to_end(key)
+                    out[i] = AppleConfig(*fields)
+            self.hits += sum(1 for c in out if c is not None)
+        fresh = {}
+        for i, (title, spec) in enumerate(zip(titles, specs)):
+            if out[i] is None:
+                out[i] = _classify(title, spec)
+                if keys[i] is not None:
+                    fresh[keys[i]] = _fields(out[i])
+        if not fresh:
+            return out
+        with self._lock:
+            self.misses += len(fresh)
+            for key, fields in fresh.items():
+                self._data[key] = fields
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._dirty = True
+            save = self.path is not None and self.clock() - self._saved_at >= self.SAVE_EVERY_SEC
+        if save:
+            self.save()
+        return out
+
+    def save(self) -> None:
+        """Слить память с файлом (память свежее) и записать атомарно."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            mine = list(self._data.items())
+            self._dirty = False
+            self._saved_at = self.clock()
+        merged = OrderedDict((k, f) for k, f in self._read_file())
+        for key, fields in mine:
+            merged.pop(key, None)
+            merged[key] = fields
+        entries = list(merged.items())[-self.maxsize:]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+            tmp.write_bytes(marshal.dumps({'sig': CLASSIFIER_SIG, 'entries': entries}))
+            os.replace(tmp, self.path)
+        except (OSError, ValueError):
+            pass
+
+    def summary(self) -> str:
+        with self._lock:
+            total = self.hits + self.misses
+            rate = f"{self.hits / total:.0%}" if total else "—"
+            return (f"🧠 Кэш classify: попаданий {rate} ({self.hits} из {total}), "
+                    f"в памяти {len(self._data)}, с диска {self.disk_loaded}")
+
+    def log_summary(self, log=None) -> None:
+        """Итог прогона в лог, сохранение на диск и обнуление счётчиков."""
+        with self._lock:
+            seen = bool(self.hits or self.misses)
+        if seen and log is not None:
+            log.info(self.summary())
+        self.save()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+CACHE = ClassifyCache()
+atexit.register(CACHE.save)
+
+
+def classify(title: str, specs: Optional[dict] = None) -> AppleConfig:
+    """
+    Классифицирует Apple-продукт из текста объявления (через кэш CACHE).
+
+    Args:
+        title: Заголовок объявления (h1 или title из превью)
+        specs: Опциональные спецификации из deep_analyze
+               {"ram": int, "ssd": int, "model": str, "diagonal": float}
+    """
+    return CACHE.classify(title, specs)
+
+
+def classify_many(titles, specs=None) -> list:
+    """classify() для пачки заголовков (выдача парсера/билдера): один проход
+    по кэшу на пачку, промахи — однопроходным движком."""
+    return CACHE.classify_many(list(titles), specs)
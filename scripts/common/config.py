@@ -76,6 +76,18 @@ URGENT_KEYWORDS = [
     'дисконт', 'возможен торг', 'отдам за', 'снижу', 'договоримся',
 ]
 
+# ─── Признаки продавца в заголовке/сниппете выдачи ───────────────────────────
+# Только для порядка дозахода (deep_prescore в сканере): кто частник, а кто
+# перекуп/магазин, окончательно решает карточка объявления.
+PRIVATE_HINTS = [
+    'частное лицо', 'собственник', 'от владельца', 'один владелец', 'для себя',
+    'сам пользовал', 'личный',
+]
+DEALER_HINTS = [
+    'магазин', 'в наличии', 'trade-in', 'трейд-ин', 'оптом',
+    'рассрочк', 'кредит', 'ассортимент', 'выкуп техники',
+]
+
 # ─── Маркеры Москвы (для определения доставки) ──────────────────────────────
 MOSCOW_MARKERS = ['москва', 'moscow', 'мск', 'московская обл', 'московская область']
 
@@ -108,6 +120,61 @@ def _envi(name, default):
 # Чем больше — тем надёжнее медиана, но дольше скан и выше риск капчи.
 SCAN_PAGES_PER_FAMILY = _envi("SCAN_PAGES_PER_FAMILY", 3)
 
+# Пул браузер-сессий для run(): N независимых контекстов (каждый со своим прогревом
+# и решённой капчей) грузят семейства/страницы параллельно. Темп на одну сессию
+# прежний (2–5 с между страницами) → Авито видит ту же частоту на сессию, а цикл
+# короче примерно в N раз. 1 = старое поведение (одна страница, последовательно).
+# Сессия — curl_cffi (HTTP-first) + свой Chromium, который поднимается только при
+# капче (~250–300 МБ RAM каждый); при HTTP_FIRST=0 Chromium стартует сразу.
+SCAN_CONTEXTS = _envi("SCAN_CONTEXTS", 3)
+
+# Конвейер дозахода в карточки (deep_analyze): кандидаты семейства, чья выдача уже
+# догрузилась, сразу уходят в ограниченную очередь, её разбирают DEEP_WORKERS
+# потоков, пока остальные страницы ещё грузятся. Карточки идут вне очереди к
+# страницам выдачи в пуле сессий. Переполненная очередь притормаживает оценку
+# (backpressure). Работает при SCAN_CONTEXTS > 1.
+DEEP_WORKERS = _envi("DEEP_WORKERS", 2)
+DEEP_QUEUE_MAX = _envi("DEEP_QUEUE_MAX", 32)
+
+# Бюджет дозахода на прогон (run() и пачка intake): кандидаты ждут в очереди по
+# ожидаемой выгоде (маржа, запас до выкупа, свежесть, признаки частника в сниппете)
+# и дозаходятся с лучших — не дольше DEEP_BUDGET_SEC с начала прогона и не больше
+# DEEP_BUDGET_MAX карточек; подряд отказы Авито (троттлинг) тоже закрывают бюджет.
+# Не влезшие не теряются: откладываются и идут в очередь следующего цикла. 0 = без
+# ограничения.
+DEEP_BUDGET_SEC = _envi("DEEP_BUDGET_SEC", 600)
+DEEP_BUDGET_MAX = _envi("DEEP_BUDGET_MAX", 60)
+
+# Источник карточек выдачи: 1 = встроенное состояние страницы (JSON, который Авито
+# кладёт в <script data-mfe-state> / window.__initialData__) — без построения DOM и
+# с seller_id/временем публикации; DOM-разбор — только если состояния нет. 0 = DOM.
+PAGE_STATE = _envi("PAGE_STATE", 1)
+
+# Фильтр запросов в Playwright-контекстах (common.browser): пропускаем только
+# document/script/xhr/fetch и капчу, режем картинки, шрифты, медиа, CSS и счётчики.
+# Меньше трафика через платный прокси и быстрее каждый navigate_with_captcha. 0 = всё.
+BLOCK_RESOURCES = _envi("BLOCK_RESOURCES", 1)
+
+# Сохранённая сессия Авито (common.session_store): storage_state после решённой
+# капчи/прогрева переживает рестарт и общий для сканера, парсера и билдера.
+# Старше этого — не используем (куки фаервола всё равно протухают). 0 = выкл.
+SESSION_TTL_HOURS = _envi("SESSION_TTL_HOURS", 12)
+
+# Темп запросов к Авито (common.pacing, AIMD по хосту): пауза перед страницей
+# сокращается на каждой удачной загрузке и умножается на PACE_BACKOFF при капче,
+# 429 или пустой 1-й странице. Состояние по хосту переживает рестарт.
+PACE_ADAPTIVE = _envi("PACE_ADAPTIVE", 1)        # 0 = фиксированная пауза PACE_START_SEC
+PACE_START_SEC = _envf("PACE_START_SEC", 3.5)    # стартовая пауза (как прежние 2–5 с)
+PACE_MIN_SEC = _envf("PACE_MIN_SEC", 1.0)        # быстрее не ходим никогда
+PACE_MAX_SEC = _envf("PACE_MAX_SEC", 30.0)       # медленнее тоже
+PACE_STEP = _envf("PACE_STEP", 0.02)             # +запросов/с за удачную страницу
+PACE_BACKOFF = _envf("PACE_BACKOFF", 2.0)        # ×паузы при сигнале троттлинга
+
+# Кэш classify() (common.classifier): LRU на столько заголовков в памяти процесса;
+# он же сливается в файл CLASSIFY_CACHE_PATH, общий для сканера, парсера, билдера
+# и tg-монитора, — повторные заголовки не классифицируются заново между запусками.
+CLASSIFY_CACHE_SIZE = _envi("CLASSIFY_CACHE_SIZE", 50_000)   # 0 = без кэша
+
 # Минимум живых сопоставимых лотов, чтобы доверять медиане для алерта в реалтайме.
 # При меньшем числе — максимум в дайджест (низкая уверенность).
 MIN_COMPS = _envi("MIN_COMPS", 6)
@@ -158,7 +225,11 @@ STALE_LISTING_DAYS = _envi("STALE_LISTING_DAYS", 14)
 STALE_MIN_DROP = _envf("STALE_MIN_DROP", 0.05)     # снижение цены >=5% = мотивирован
 STALE_SCAN_PAGES = _envi("STALE_SCAN_PAGES", 6)    # глубина обхода для возраста из выдачи
 STALE_MAX_LEADS = _envi("STALE_MAX_LEADS", 8)      # сколько лидов класть за проход
-REGISTRY_MAX = _envi("REGISTRY_MAX", 8000)         # размер реестра объявлений
+# Реестр объявлений — SQLite с индексами, поэтому история длинная: сверх
+# REGISTRY_MAX отрезаются давно не виденные. Кандидаты охотника — только лоты,
+# мелькавшие в выдаче за REGISTRY_ACTIVE_DAYS (остальные, скорее всего, проданы).
+REGISTRY_MAX = _envi("REGISTRY_MAX", 300_000)
+REGISTRY_ACTIVE_DAYS = _envi("REGISTRY_ACTIVE_DAYS", 14)
 
 # ─── URL для Price Builder v2 ────────────────────────────────────────────────
 # Каждый URL — отдельная категория с фильтрами Авито.
@@ -0,0 +1,378 @@
+"""
+Извлечение карточек со страницы выдачи Авито за один проход.
+
+Раньше каждый скрапер (scanner_v2, avito-parser, price-builder) строил полное
+BeautifulSoup-дерево ~1 МБ страницы и на каждую карточку делал 4–5 CSS-запросов
+select_one + item.get_text() по всему поддереву. Здесь:
+  - дерево строит lxml (C), без питоньей обвязки bs4;
+  - ОДИН скомпилированный XPath за один обход документа отдаёт все нужные узлы
+    (карточки и их поля) в порядке документа — поле относится к последней
+    открытой карточке-предку;
+  - текст берётся только у найденных узлов (заголовок/описание/дата), а не у
+    всей карточки.
+
+Поля и правила выбора — те же, что у прежнего bs4-кода: первый узел каждого
+вида внутри карточки, цена — из content у [itemprop="price"], заголовок — title
+ссылки или её текст. Отсечка блока «есть в других городах» — как в парсере.
+
+Быстрее DOM — встроенное состояние страницы: Авито кладёт в HTML данные выдачи
+JSON-ом (<script data-mfe-state> — HTML-экранированный JSON; window.__initialData__
+— URL-кодированная JSON-строка). Его вырезаем регэкспом из HTML (или читаем
+page.evaluate без page.content()), декодируем сразу в карточки — заодно есть
+seller_id и время публикации без дозахода. Нет состояния / формат поменялся →
+прежний DOM-разбор (PAGE_STATE=0 — всегда DOM).
+
+Чистые функции, без сети — тестируются офлайн (common/test_extract.py).
+Бенчмарк против bs4 на сохранённых страницах: common/bench_extract.py.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import re
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urljoin
+
+from lxml import etree, html as lxml_html
+
+from common.config import PAGE_STATE
+
+AVITO_BASE = "https://www.avito.ru"
+
+# Карточка и все её поля — одним выражением (один обход документа).
+_NODES = etree.XPath(
+    '//*[@data-marker="item" or @data-marker="item-title" or @data-marker="item-description"'
+    ' or @data-marker="item-date" or @itemprop="price"'
+    ' or (self::p and contains(@class, "date")) or contains(@class, "dateInfo")]'
+)
+# Текстовые узлы-кандидаты для маркера «есть в других городах»
+_OTHER_CITIES_TEXT = etree.XPath('//text()[contains(., "других городах")]')
+_OTHER_CITIES_RE = re.compile(r"объявлени\S* есть в других городах", re.I)
+_OTHER_CITIES_PARENTS = {"div", "section", "h2", "h3", "span"}
+
+# Приоритет источника даты (как item-date → p.date → .dateInfo в parse_item_age)
+_DATE_MARKER, _DATE_P, _DATE_INFO = 0, 1, 2
+
+
+def _text(el, sep: str = "") -> str:
+    return sep.join(el.itertext())
+
+
+def _stripped_text(el) -> str:
+    """Аналог bs4 get_text(strip=True)."""
+    return "".join(s.strip() for s in el.itertext())
+
+
+def parse_age(raw: str) -> Tuple[str, int]:
+    """Текст даты карточки («5 минут назад», «сегодня 12:30», «3 дня назад»)
+    → (метка, минут назад). Неизвестно → ("?", 999)."""
+    try:
+        raw = (raw or "").strip().lower()
+        if not raw:
+            return "?", 999
+
+        if 'минут' in raw or 'мин' in raw:
+            m = re.search(r'(\d+)', raw)
+            mins = int(m.group(1)) if m else 30
+            return f"{mins} мин", mins
+
+        if 'час' in raw:
+            m = re.search(r'(\d+)', raw)
+            hrs = int(m.group(1)) if m else 2
+            return f"{hrs} ч", hrs * 60
+
+        if 'сегодня' in raw:
+            m = re.search(r'(\d{1,2}):(\d{2})', raw)
+            if m:
+                h, mn = int(m.group(1)), int(m.group(2))
+                now = datetime.now()
+                pub = now.replace(hour=h, minute=mn, second=0)
+                diff = max(0, int((now - pub).total_seconds() / 60))
+                label = f"{diff} мин" if diff < 60 else f"{diff // 60} ч"
+                return label, diff
+            return "сегодня", 120
+
+        if 'вчера' in raw:
+            return "вчера", 60 * 24
+
+        m = re.search(r'(\d+)\s*д', raw)
+        if m:
+            days = int(m.group(1))
+            return f"{days} дн", days * 60 * 24
+    except Exception:
+        pass
+    return "?", 999
+
+
+def _drop_other_cities(doc) -> None:
+    """Удаляет блок «N объявлений есть в других городах» и всё после него на его
+    уровне (как decompose() в парсере/билдере)."""
+    for t in _OTHER_CITIES_TEXT(doc):
+        if not _OTHER_CITIES_RE.search(t):
+            continue
+        node = t.getparent()
+        if node is None:
+            return
+        if t.is_tail:                 # хвост элемента принадлежит его родителю
+            node = node.getparent()
+        while node is not None and node.tag not in _OTHER_CITIES_PARENTS:
+            node = node.getparent()
+        if node is None or node.getparent() is None:
+            return
+        parent = node.getparent()
+        for sib in list(node.itersiblings()):
+            parent.remove(sib)
+        parent.remove(node)
+        return
+
+
+# ─── Встроенное состояние страницы ───────────────────────────────────────────
+
+_MFE_STATE_RE = re.compile(r'<script\b[^>]*\bdata-mfe-state\b[^>]*>(.*?)</script>', re.S | re.I)
+_INITIAL_DATA_RE = re.compile(r'window\.__initialData__\s*=\s*"((?:[^"\\]|\\.)*)"', re.S)
+
+# То же для живой страницы: только текст скриптов состояния, без сериализации DOM
+STATE_JS = """() => {
+    const out = [];
+    document.querySelectorAll('script[data-mfe-state]').forEach(s => out.push(['mfe', s.textContent]));
+    if (typeof window.__initialData__ === 'string') out.push(['initial', window.__initialData__]);
+    return out;
+}"""
+
+# Где в карточке состояния может лежать продавец (поле менялось между версиями)
+_SELLER_KEYS = ("sellerId", "userId", "userHashId")
+
+
+def _decode_payload(kind: str, text: str):
+    """Сырой текст скрипта состояния → объект (None, если не JSON)."""
+    try:
+        if kind == "mfe":
+            return json.loads(html.unescape(text))
+        return json.loads(unquote(text))
+    except (ValueError, TypeError):
+        return None
+
+
+def _payloads_from_html(html_text: str) -> List[Tuple[str, str]]:
+    out = [("mfe", m.group(1)) for m in _MFE_STATE_RE.finditer(html_text)]
+    m = _INITIAL_DATA_RE.search(html_text)
+    if m:
+        try:
+            out.append(("initial", json.loads('"' + m.group(1) + '"')))   # JS-строка → str
+        except ValueError:
+            pass
+    return out
+
+
+def _is_listing(obj) -> bool:
+    return isinstance(obj, dict) and isinstance(obj.get("urlPath"), str) and (
+        "priceDetailed" in obj or "price" in obj)
+
+
+def _state_item_lists(obj) -> Iterable[list]:
+    """Списки карточек выдачи в порядке JSON: значения ключа "items", где есть
+    объявления (urlPath + цена). Прочие ключи (extraBlockItems — «есть в других
+    городах», рекомендации) не берём."""
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            items = cur.get("items")
+            if isinstance(items, list) and any(_is_listing(x) for x in items):
+                yield items
+                continue
+            stack.extend(reversed([v for v in cur.values() if isinstance(v, (dict, list))]))
+        elif isinstance(cur, list):
+            stack.extend(reversed([v for v in cur if isinstance(v, (dict, list))]))
+
+
+def _state_price(it) -> Optional[int]:
+    pd = it.get("priceDetailed")
+    val = pd.get("value") if isinstance(pd, dict) else it.get("price")
+    if isinstance(val, dict):
+        val = val.get("value")
+    try:
+        return int(val) if val not in (None, "", 0) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _age_label(minutes: int) -> str:
+    if minutes < 60:
+        return f"{minutes} мин"
+    if minutes < 60 * 24:
+        return f"{minutes // 60} ч"
+    return f"{minutes // (60 * 24)} дн"
+
+
+def _state_item(it: dict, base_url: str, now: float) -> dict:
+    href = it["urlPath"]
+    ts = it.get("sortTimeStamp")
+    published_ts = None
+    if isinstance(ts, (int, float)) and ts > 0:
+        published_ts = int(ts / 1000) if ts > 1e11 else int(ts)    # мс → с
+    if published_ts is not None:
+        minutes_ago = max(0, int((now - published_ts) // 60))
+        age_str = _age_label(minutes_ago)
+    else:
+        age_str, minutes_ago = "?", 999
+    seller_id = next((it[k] for k in _SELLER_KEYS if it.get(k) not in (None, "")), None)
+    return {
+        "href": href,
+        "url": urljoin(base_url, href),
+        "title": it.get("title") or "",
+        "price": _state_price(it),
+        "description": it.get("description") or "",
+        "date": "",
+        "age_str": age_str,
+        "minutes_ago": minutes_ago,
+        "seller_id": str(seller_id) if seller_id is not None else None,
+        "published_ts": published_ts,
+    }
+
+
+def listings_from_state(payloads: List[Tuple[str, str]], *, base_url: str = AVITO_BASE,
+                        now: Optional[float] = None) -> Optional[Tuple[List[dict], int]]:
+    """Сырые скрипты состояния [(kind, text)] → (items, n_items) или None, если
+    карточек выдачи в них нет (тогда разбирать DOM)."""
+    now = time.time() if now is None else now
+    for kind, text in payloads:
+        if not text:
+            continue
+        obj = _decode_payload(kind, text)
+        if obj is None:
+            continue
+        for items in _state_item_lists(obj):
+            ads = [x for x in items if _is_listing(x)]
+            return [_state_item(x, base_url, now) for x in ads], len(ads)
+    return None
+
+
+def extract_state_listings(html_text: str, *, base_url: str = AVITO_BASE,
+                           now: Optional[float] = None) -> Optional[Tuple[List[dict], int]]:
+    """Карточки из встроенного состояния HTML (регэксп по скриптам, без DOM).
+    None — состояния нет или оно не разобралось."""
+    if not html_text:
+        return None
+    return listings_from_state(_payloads_from_html(html_text), base_url=base_url, now=now)
+
+
+def listings_from_page(page, *, drop_other_cities: bool = False,
+                       base_url: str = AVITO_BASE) -> Tuple[List[dict], int]:
+    """Карточки открытой Playwright-страницы: состояние через page.evaluate (без
+    сериализации DOM), иначе page.content() + DOM-разбор."""
+    if PAGE_STATE:
+        try:
+            payloads = [tuple(p) for p in (page.evaluate(STATE_JS) or [])]
+        except Exception:
+            payloads = []
+        res = listings_from_state(payloads, base_url=base_url)
+        if res is not None:
+            return res
+    return extract_listings(page.content(), drop_other_cities=drop_other_cities,
+                            base_url=base_url, use_state=False)
+
+
+# ─── DOM ─────────────────────────────────────────────────────────────────────
+
+def _new_item(el) -> dict:
+    return {"_el": el, "title_el": None, "price_el": None, "desc_el": None,
+            "date_el": None, "date_rank": 9}
+
+
+def extract_listings(html_text: str, *, drop_other_cities: bool = False,
+                     base_url: str = AVITO_BASE,
+                     use_state: bool = PAGE_STATE) -> Tuple[List[dict], int]:
+    """Карточки страницы выдачи → (items, n_items).
+
+    items — только карточки со ссылкой-заголовком:
+      {href, url (абсолютный), title, price (int | None), description (текст
+       через пробел, как get_text(' ')), date (сырой текст даты), age_str,
+       minutes_ago, seller_id (str | None), published_ts (unix-с | None)}
+    n_items — сколько всего карточек на странице (для правила «< 10 карточек →
+    последняя страница»).
+
+    use_state — сперва встроенное состояние (seller_id/published_ts есть только
+    там; «других городов» в его списке выдачи нет), иначе DOM."""
+    if not html_text:
+        return [], 0
+    if use_state:
+        res = extract_state_listings(html_text, base_url=base_url)
+        if res is not None:
+            return res
+    try:
+        doc = lxml_html.fromstring(html_text)
+    except (etree.ParserError, ValueError):
+        return [], 0
+    if drop_other_cities:
+        _drop_other_cities(doc)
+
+    raw_items: List[dict] = []
+    cur: Optional[dict] = None
+    for el in _NODES(doc):
+        marker = el.get("data-marker")
+        if marker == "item":
+            cur = _new_item(el)
+            raw_items.append(cur)
+            continue
+        if cur is None:
+            continue
+        # поле вне текущей карточки (между карточками / после последней) — мимо
+        anc = el.getparent()
+        while anc is not None and anc is not cur["_el"]:
+            anc = anc.getparent()
+        if anc is None:
+            continue
+        if marker == "item-title":
+            if cur["title_el"] is None:
+                cur["title_el"] = el
+        elif marker == "item-description":
+            if cur["desc_el"] is None:
+                cur["desc_el"] = el
+        elif el.get("itemprop") == "price" and cur["price_el"] is None:
+            cur["price_el"] = el
+        # дата: item-date > p[class*=date] > [class*=dateInfo] (один узел может
+        # подходить под несколько — берём лучший ранг)
+        rank = 9
+        if marker == "item-date":
+            rank = _DATE_MARKER
+        elif el.tag == "p" and "date" in (el.get("class") or ""):
+            rank = _DATE_P
+        elif "dateInfo" in (el.get("class") or ""):
+            rank = _DATE_INFO
+        if rank < cur["date_rank"]:
+            cur["date_el"], cur["date_rank"] = el, rank
+
+    out: List[dict] = []
+    for it in raw_items:
+        a = it["title_el"]
+        if a is None:
+            continue
+        href = a.get("href") or ""
+        title = a.get("title") or _stripped_text(a)
+        price = None
+        p = it["price_el"]
+        if p is not None and p.get("content"):
+            try:
+                price = int(p.get("content"))
+            except (TypeError, ValueError):
+                price = None
+        desc = _text(it["desc_el"], " ") if it["desc_el"] is not None else ""
+        date = _stripped_text(it["date_el"]) if it["date_el"] is not None else ""
+        age_str, minutes_ago = parse_age(date)
+        out.append({
+            "href": href,
+            "url": urljoin(base_url, href) if href else "",
+            "title": title,
+            "price": price,
+            "description": desc,
+            "date": date,
+            "age_str": age_str,
+            "minutes_ago": minutes_ago,
+            "seller_id": None,
+            "published_ts": None,
+        })
+    return out, len(raw_items)
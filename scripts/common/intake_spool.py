@@ -0,0 +1,217 @@
+"""
+Спул intake-карточек: журнал JSONL вместо перезаписи incoming-cards.json.
+
+Раньше intake-сервер на каждый POST под глобальным замком читал весь
+incoming-cards.json (до MAX_CARDS карточек), собирал из него множество url,
+дописывал и переписывал файл целиком — всплеск от расширения выстраивался в
+очередь, а каждый запрос стоил O(3000). Теперь:
+
+  - сервер (CardSpool.add) дописывает карточки строками JSONL в активный сегмент
+    incoming-cards.jsonl одной записью на POST и сразу отдаёт их ОС (переживают
+    падение процесса); fsync — групповой, не чаще раза в flush_ms (и в flush());
+  - дедуп по url — множество в памяти (последние dedup_max url), собранное на
+    старте из всего, что лежит в спуле; файл ради него не читается;
+  - обработчик (drain_incoming сканера) забирает спул сегментами: seal() под
+    flock переименовывает активный сегмент в incoming-cards.seg-<ns>.jsonl, сервер
+    на следующей записи это видит (inode другой) и открывает новый. Запись сервера
+    идёт под тем же замком (разделяемым), так что строки не теряются между
+    переименованием и чтением.
+
+Только stdlib: модуль импортирует и intake-сервер.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+try:
+    import fcntl
+except ImportError:          # Windows — без межпроцессной блокировки
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FLUSH_MS = int(os.environ.get('INTAKE_FSYNC_MS', '200'))   # групповой fsync спула
+
+
+def active_path(path) -> Path:
+    """Активный сегмент спула для incoming-cards.json → incoming-cards.jsonl."""
+    return Path(path).with_suffix('.jsonl')
+
+
+def _lock_path(path) -> Path:
+    return Path(path).with_suffix('.lock')
+
+
+def segments(path) -> List[Path]:
+    """Запечатанные сегменты по порядку записи."""
+    p = Path(path)
+    return sorted(p.parent.glob(f'{p.stem}.seg-*.jsonl'))
+
+
+def read_segment(seg) -> list:
+    """Карточки сегмента; недописанная строка (упавший сервер) пропускается."""
+    cards = []
+    try:
+        with open(seg, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    c = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(c, dict):
+                    cards.append(c)
+    except FileNotFoundError:
+        pass
+    return cards
+
+
+def seal(path) -> List[Path]:
+    """Запечатывает активный сегмент (если в нём что-то есть) и возвращает все
+    запечатанные сегменты — их забирает обработчик и удаляет после фиксации."""
+    p = Path(path)
+    act = active_path(p)
+    if act.exists():
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(_lock_path(p), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if act.stat().st_size:
+                    os.replace(act, p.with_name(f'{p.stem}.seg-{time.time_ns()}.jsonl'))
+            except FileNotFoundError:
+                pass
+    return segments(p)
+
+
+class CardSpool:
+    """Писатель спула (один на процесс intake-сервера, потокобезопасный)."""
+
+    def __init__(self, path, flush_ms: int = FLUSH_MS, dedup_max: int = 3000, clock=time.monotonic):
+        self.path = Path(path)
+        self.active = active_path(self.path)
+        self.flush_sec = flush_ms / 1000
+        self.dedup_max = dedup_max
+        self.clock = clock
+        self._fd = None
+        self._lockf = None
+        self._pending = 0
+        self._synced_at = clock()
+        self._lock = threading.Lock()
+        self.seen = dict.fromkeys(self._pending_urls()[-dedup_max:])   # порядок вставки = возраст
+
+    def _pending_urls(self) -> list:
+        """url всего, что ждёт обработчика: остаток .processing.json, старый
+        incoming-cards.json, запечатанные и активный сегменты."""
+        cards = []
+        for legacy in (self.path.with_suffix('.processing.json'), self.path):
+            try:
+                data = json.loads(legacy.read_text(encoding='utf-8'))
+                cards += data if isinstance(data, list) else []
+            except (OSError, ValueError):
+                pass
+        for seg in segments(self.path) + [self.active]:
+            cards += read_segment(seg)
+        return [c['url'] for c in cards if isinstance(c, dict) and c.get('url')]
+
+    def add(self, cards: list) -> int:
+        """Дописывает карточки с новыми url (уже проверенные сервером). Возвращает
+        число добавленных."""
+        return self.add_many([cards])[0]
+
+    def add_many(self, batches: list, added: list = None) -> list:
+        """Несколько пачек (POST-ов) — одной записью; дубли между пачками отсекаются
+        по порядку. Возвращает число добавленных по каждой пачке; сами добавленные
+        карточки дописываются в added (если передан)."""
+        with self._lock:
+            fresh, counts, batch = [], [], set()
+            for cards in batches:
+                n = 0
+                for c in cards:
+                    u = c['url']
+                    if u not in self.seen and u not in batch:
+                        batch.add(u)
+                        fresh.append(c)
+                        n += 1
+                counts.append(n)
+            if not fresh:
+                return counts
+            if added is not None:
+                added.extend(fresh)
+            data = ''.join(json.dumps(c, ensure_ascii=False) + '\n' for c in fresh).encode('utf-8')
+            self._write(data)
+            for c in fresh:
+                self.seen[c['url']] = None
+            while len(self.seen) > self.dedup_max:
+                del self.seen[next(iter(self.seen))]
+            self._pending += 1
+            if self.clock() - self._synced_at >= self.flush_sec:
+                self._sync()
+            return counts
+
+    def _write(self, data: bytes) -> None:
+        """Под замком: одна запись в активный сегмент. Если обработчик его
+        запечатал (путь указывает на другой inode) — открываем новый."""
+        if self._lockf is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._lockf = open(_lock_path(self.path), 'a')
+        if fcntl is not None:
+            fcntl.flock(self._lockf, fcntl.LOCK_SH)
+        try:
+            if self._fd is not None:
+                try:
+                    same = os.stat(self.active).st_ino == os.fstat(self._fd).st_ino
+                except FileNotFoundError:
+                    same = False
+                if not same:
+                    self._sync()
+                    os.close(self._fd)
+                    self._fd = None
+            if self._fd is None:
+                self._fd = os.open(self.active, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, data)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._lockf, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Под замком: групповой fsync активного сегмента."""
+        if self._fd is not None and self._pending:
+            os.fsync(self._fd)
+        self._pending = 0
+        self._synced_at = self.clock()
+
+    def flush(self) -> None:
+        with self._lock:
+            try:
+                self._sync()
+            except OSError as e:
+                logger.warning(f"⚠️ intake-спул: fsync: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                try:
+                    self._sync()
+                finally:
+                    os.close(self._fd)
+                    self._fd = None
+            if self._lockf is not None:
+                self._lockf.close()
+                self._lockf = None
+
+
+def take(path) -> tuple:
+    """Для обработчика: (карточки всех запечатанных сегментов, сами сегменты).
+    Удалить сегменты — после того как карточки зафиксированы в .processing.json."""
+    segs = seal(path)
+    cards = []
+    for seg in segs:
+        cards += read_segment(seg)
+    return cards, segs
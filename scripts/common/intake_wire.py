@@ -0,0 +1,216 @@
+"""
+Формат intake-пачек на проводе: сжатие тела и компактная схема карточек.
+
+Пачка — JSON {"cards": [...]}: полные url Авито, русские заголовки, одни и те же
+имена полей в каждой карточке. Со старого Mac она идёт через релей по домашнему
+аплинку, поэтому:
+
+  - тело сжимается: Content-Encoding gzip (stdlib) или zstd (если стоит пакет
+    zstandard — и у релея, и у сервера). Сервер распаковывает с лимитом на размер
+    ПОСЛЕ распаковки (decompress → BodyTooLarge), gzip-бомба память не раздует;
+  - карточки упаковываются компактно (SCHEMA): имена полей — один раз на «форму»
+    карточки (набор ключей по порядку), общий префикс url (всё до последнего «/»,
+    у выдачи Авито это город и категория) — один раз на пачку:
+
+        {"schema": "cards/1",
+         "prefixes": ["https://www.avito.ru/moskva/noutbuki/"],
+         "shapes": [["url", "title", "price", "date"]],
+         "rows": [[0, [0, "macbook_air_13_m2_4291837465"], "MacBook Air 13", 60000, "2 часа назад"]]}
+
+    Распаковка без потерь: те же ключи в том же порядке. Не-словари (мусор)
+    в компактную пачку не попадают — сервер их всё равно отбрасывает.
+
+Что понимает сервер, он отдаёт в GET / ("wire": offer()); релей берёт лучшее общее
+(choose). Старый сервер без "wire" получает обычный JSON без сжатия.
+
+Замер (intake/bench_wire.py, пачка 100 карточек): JSON — ~190 байт на карточку,
+cards/1 — ~125, gzip — ~24, gzip + cards/1 — ~23. Поэтому по умолчанию схема
+включается только там, где сжатия нет.
+
+Только stdlib (+ необязательный zstandard): модуль импортирует и релей на старом
+Mac, поэтому — Python 3.6+.
+"""
+
+import gzip
+import io
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:          # без zstandard — только gzip
+    zstandard = None
+
+SCHEMA = 'cards/1'
+# по предпочтению (первое общее с сервером)
+ENCODINGS = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+class UnsupportedEncoding(ValueError):
+    """Content-Encoding, которого здесь нет (→ 415)."""
+
+
+class BodyTooLarge(ValueError):
+    """Тело больше лимита после распаковки (→ 413)."""
+
+
+def supported(encoding):
+    return (encoding or 'identity').strip().lower() in ('identity',) + ENCODINGS
+
+
+def offer():
+    """Что понимает эта сторона — для GET / сервера."""
+    return {'encodings': list(ENCODINGS), 'schemas': [SCHEMA]}
+
+
+def choose(server_offer, prefer='auto', compact='auto'):
+    """Лучшее общее с сервером → (encoding, compact). server_offer — его "wire"
+    (None — старый сервер: без сжатия, обычный JSON); prefer — 'auto' или
+    конкретное сжатие (если сервер его не понимает — без сжатия); compact — True,
+    False или 'auto': схема только без сжатия (поверх gzip она экономит единицы
+    процентов, а CPU на обеих сторонах добавляет ~30% — intake/bench_wire.py)."""
+    server_offer = server_offer or {}
+    theirs = server_offer.get('encodings') or ()
+    common = [e for e in ENCODINGS if e in theirs and prefer in ('auto', e)]
+    encoding = common[0] if common else 'identity'
+    if compact == 'auto':
+        compact = encoding == 'identity'
+    return encoding, bool(compact and SCHEMA in (server_offer.get('schemas') or ()))
+
+
+def compress(data, encoding):
+    if encoding in ('', 'identity'):
+        return data
+    if encoding == 'gzip':
+        return gzip.compress(data, GZIP_LEVEL)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise UnsupportedEncoding(encoding)
+
+
+def decompress(body, encoding, limit):
+    """Тело с Content-Encoding → байты не длиннее limit. BodyTooLarge — больше
+    лимита после распаковки, UnsupportedEncoding — незнакомое сжатие, ValueError —
+    битое или обрезанное тело."""
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        out = body
+    elif encoding == 'gzip':
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            out = d.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise ValueError('gzip: %s' % e)
+        if len(out) <= limit and not d.unconsumed_tail and not d.eof:
+            raise ValueError('gzip: truncated')
+        if d.unconsumed_tail:
+            raise BodyTooLarge(encoding)
+    elif encoding == 'zstd' and zstandard is not None:
+        chunks, n = [], 0
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as r:
+                while n <= limit:
+                    b = r.read(limit + 1 - n)
+                    if not b:
+                        break
+                    chunks.append(b)
+                    n += len(b)
+        except zstandard.ZstdError as e:
+            raise ValueError('zstd: %s' % e)
+        out = b''.join(chunks)
+    else:
+        raise UnsupportedEncoding(encoding)
+    if len(out) > limit:
+        raise BodyTooLarge(encoding)
+    return out
+
+
+def pack_cards(cards):
+    """Карточки → компактная пачка (SCHEMA)."""
+    prefixes, pidx, shapes, sidx, rows = [], {}, [], {}, []
+    for c in cards:
+        if not isinstance(c, dict):
+            continue
+        keys = tuple(c)
+        si = sidx.get(keys)
+        if si is None:
+            si = sidx[keys] = len(shapes)
+            shapes.append(list(keys))
+        row = [si]
+        for k in keys:
+            v = c[k]
+            if k == 'url' and isinstance(v, str):
+                cut = v.rfind('/') + 1
+                pi = pidx.get(v[:cut])
+                if pi is None:
+                    pi = pidx[v[:cut]] = len(prefixes)
+                    prefixes.append(v[:cut])
+                v = [pi, v[cut:]]
+            row.append(v)
+        rows.append(row)
+    return {'schema': SCHEMA, 'prefixes': prefixes, 'shapes': shapes, 'rows': rows}
+
+
+def _index(i, seq):
+    if type(i) is not int or not 0 <= i < len(seq):
+        raise ValueError('%s: индекс %r' % (SCHEMA, i))
+    return seq[i]
+
+
+def unpack_cards(obj):
+    """Компактная пачка → список карточек. Чужая схема или битая структура —
+    ValueError (→ 400)."""
+    if obj.get('schema') != SCHEMA:
+        raise ValueError('schema %r' % obj.get('schema'))
+    prefixes, shapes, rows = obj.get('prefixes'), obj.get('shapes'), obj.get('rows')
+    if not all(isinstance(x, list) for x in (prefixes, shapes, rows)):
+        raise ValueError('%s: prefixes/shapes/rows' % SCHEMA)
+    out = []
+    for row in rows:
+        if not isinstance(row, list) or not row:
+            raise ValueError('%s: строка' % SCHEMA)
+        keys = _index(row[0], shapes)
+        if not isinstance(keys, list) or len(row) != len(keys) + 1:
+            raise ValueError('%s: форма' % SCHEMA)
+        try:
+            c = dict(zip(keys, row[1:]))
+        except TypeError:
+            raise ValueError('%s: ключи' % SCHEMA)
+        u = c.get('url')
+        if isinstance(u, list):
+            if len(u) != 2 or not isinstance(u[1], str):
+                raise ValueError('%s: url' % SCHEMA)
+            c['url'] = str(_index(u[0], prefixes)) + u[1]
+        out.append(c)
+    return out
+
+
+def cards_of(data):
+    """Карточки из разобранного тела: обычного {"cards": [...]} или компактного.
+    Не список — пустой список (как раньше у сервера)."""
+    if isinstance(data, dict) and 'schema' in data:
+        return unpack_cards(data)
+    cards = data.get('cards') or []
+    return cards if isinstance(cards, list) else []
+
+
+def encode_batch(cards, encoding='identity', compact=False):
+    """Пачка для POST → (тело, заголовки)."""
+    obj = pack_cards(cards) if compact else {'cards': cards}
+    body = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    headers = {'content-type': 'application/json'}
+    if encoding not in ('', 'identity'):
+        body = compress(body, encoding)
+        headers['content-encoding'] = encoding
+    return body, headers
+
+
+def decode_batch(body, encoding, limit):
+    """Тело POST → карточки (ошибки — как у decompress / unpack_cards; не JSON —
+    ValueError)."""
+    data = json.loads(decompress(body, encoding, limit).decode('utf-8') or '{}')
+    if not isinstance(data, dict):
+        raise ValueError('json: не объект')
+    return cards_of(data)
@@ -7,14 +7,28 @@
 распределением цен сопоставимых аппаратов — и не зовёт «низом рынка» обычный лот,
 ниже которого на той же странице висит десяток дешевле.
 
+Здесь же modal_center — центр плотного кластера цен (общий для парсера, отчёта
+--modal-report и price-sync) и его пакетная версия modal_centers по всем ключам
+накопителя коллектора (с NumPy, если установлен).
+
 Чистые функции, без сети — тестируются офлайн.
 """
 
 from __future__ import annotations
 
 import statistics
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import List, Optional
+from itertools import chain
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:          # без NumPy — тот же результат на чистом Python
+    np = None
+
+# Меньше цен в пачке — NumPy не окупает накладные расходы на массивы.
+NUMPY_MIN_PRICES = 4096
 
 
 @dataclass
@@ -30,14 +44,59 @@ class MarketStats:
 def _percentile(sorted_vals: List[int], q: float) -> int:
     """Линейная интерполяция перцентиля q∈[0,1]."""
     n = len(sorted_vals)
+    return _view_percentile(sorted_vals, 0, n, None, q)
+
+
+# «Вид» на отсортированную выборку: отрезок vals[lo:lo+n(+1)] без индекса skip
+# (skip=None — без выкидывания). Так robust_stats без своей цены (leave-one-out)
+# и после отсечения выбросов считается по индексам — без копий и пересортировки.
+
+def _view_at(vals, lo, skip, t):
+    i = lo + t
+    return vals[i + 1] if skip is not None and i >= skip else vals[i]
+
+
+def _view_percentile(vals, lo, n, skip, q: float) -> int:
     if n == 1:
-        return sorted_vals[0]
+        return _view_at(vals, lo, skip, 0)
     idx = q * (n - 1)
-    lo = int(idx)
-    frac = idx - lo
-    if lo + 1 >= n:
-        return sorted_vals[-1]
-    return int(round(sorted_vals[lo] + (sorted_vals[lo + 1] - sorted_vals[lo]) * frac))
+    i = int(idx)
+    frac = idx - i
+    if i + 1 >= n:
+        return _view_at(vals, lo, skip, n - 1)
+    a, b = _view_at(vals, lo, skip, i), _view_at(vals, lo, skip, i + 1)
+    return int(round(a + (b - a) * frac))
+
+
+def _view_stats(vals: List[int], skip: Optional[int] = None) -> Optional[MarketStats]:
+    """robust_stats по отсортированным положительным ценам vals без vals[skip]."""
+    lo, n = 0, len(vals) - (skip is not None)
+    if n <= 0:
+        return None
+
+    if n >= 8:
+        q1 = _view_percentile(vals, 0, n, skip, 0.25)
+        q3 = _view_percentile(vals, 0, n, skip, 0.75)
+        iqr = q3 - q1
+        c_lo = bisect_left(vals, q1 - 1.5 * iqr)
+        c_hi = bisect_right(vals, q3 + 1.5 * iqr)
+        c_skip = skip if skip is not None and c_lo <= skip < c_hi else None
+        c_n = c_hi - c_lo - (c_skip is not None)
+        if c_n >= 5:
+            lo, n, skip = c_lo, c_n, c_skip
+
+    if n % 2:
+        median = _view_at(vals, lo, skip, n // 2)
+    else:
+        median = (_view_at(vals, lo, skip, n // 2 - 1) + _view_at(vals, lo, skip, n // 2)) / 2
+    return MarketStats(
+        n=n,
+        median=int(median),
+        p20=_view_percentile(vals, lo, n, skip, 0.20),
+        p10=_view_percentile(vals, lo, n, skip, 0.10),
+        low=_view_at(vals, lo, skip, 0),
+        high=_view_at(vals, lo, skip, n - 1),
+    )
 
 
 def robust_stats(prices: List[int]) -> Optional[MarketStats]:
@@ -46,28 +105,216 @@ def robust_stats(prices: List[int]) -> Optional[MarketStats]:
     При n>=8 отсекает выбросы по IQR (битые/скам-цены не должны портить медиану).
     Возвращает None, если выборка пуста.
     """
-    vals = sorted(p for p in prices if p and p > 0)
-    if not vals:
-        return None
+    return _view_stats(sorted(p for p in prices if p and p > 0))
+
+
+class LiveMarket:
+    """Живой рынок прогона: robust_stats по корзинам {ключ: цены} с кэшем.
+
+    Лоты одного конфига делят корзину — раньше на каждый лот корзина копировалась,
+    из копии убиралась его цена и всё сортировалось заново. Здесь корзина
+    сортируется один раз (при первом обращении), stats(ключ, exclude=цена лота)
+    считается по индексам без этой цены, а результат кэшируется по (ключ, цена).
+    Корзины после создания не меняются; MarketStats из кэша общие — не править."""
+
+    def __init__(self, buckets: Dict):
+        self._buckets = buckets
+        self._sorted: Dict = {}
+        self._stats: Dict = {}
+        self.hits = self.misses = 0
+
+    def _vals(self, key) -> List[int]:
+        vals = self._sorted.get(key)
+        if vals is None:
+            vals = self._sorted[key] = sorted(p for p in self._buckets.get(key, ()) if p and p > 0)
+        return vals
 
-    if len(vals) >= 8:
-        q1 = _percentile(vals, 0.25)
-        q3 = _percentile(vals, 0.75)
+    def stats(self, key, exclude: Optional[int] = None) -> Optional[MarketStats]:
+        """robust_stats(корзина ключа без одного вхождения exclude) —
+        как comps.remove(price) перед robust_stats(comps)."""
+        ck = (key, exclude)
+        if ck in self._stats:
+            self.hits += 1
+            return self._stats[ck]
+        self.misses += 1
+        vals = self._vals(key)
+        skip = None
+        if exclude is not None and exclude > 0:
+            i = bisect_left(vals, exclude)
+            if i < len(vals) and vals[i] == exclude:
+                skip = i
+        if skip is None and exclude is not None:
+            st = self.stats(key)          # своей цены в корзине нет — та же статистика
+        else:
+            st = _view_stats(vals, skip)
+        self._stats[ck] = st
+        return st
+
+    def all_stats(self, use_numpy: Optional[bool] = None) -> Dict:
+        """{ключ: robust_stats(корзина)} для всех корзин разом (robust_stats_many)
+        — заодно кладёт их в кэш stats(ключ)."""
+        out = robust_stats_many(self._buckets, use_numpy=use_numpy)
+        for key, st in out.items():
+            self._stats[(key, None)] = st
+        return out
+
+
+def _np_sorted_groups(groups: Dict, positive: bool = False):
+    """Все корзины одним отсортированным массивом: (keys, vals, gid, lo, n) —
+    корзина g занимает vals[lo[g]:lo[g] + n[g]]. Сортируется одним np.sort по
+    упакованному ключу gid·span + цена. positive — только цены > 0 (robust_stats)."""
+    keys = list(groups)
+    sizes = np.fromiter(map(len, groups.values()), dtype=np.int64, count=len(keys))
+    flat = np.array(list(chain.from_iterable(groups.values())), dtype=np.int64)
+    gid = np.repeat(np.arange(len(keys), dtype=np.int64), sizes)
+    if positive:
+        keep = flat > 0
+        flat, gid = flat[keep], gid[keep]
+    vals = flat
+    if flat.size:
+        base = int(flat.min())
+        span = int(flat.max()) - base + 1
+        packed = np.sort(gid * span + (flat - base))
+        gid = packed // span
+        vals = packed - gid * span + base
+    n = np.bincount(gid, minlength=len(keys))
+    lo = np.concatenate(([0], np.cumsum(n)[:-1])).astype(np.int64)
+    return keys, vals, gid, lo, n
+
+
+def _np_percentile(vals, lo, n, q: float):
+    """_view_percentile для отрезков vals[lo:lo+n] разом (n >= 1)."""
+    idx = q * (n - 1)
+    i = idx.astype(np.int64)
+    frac = idx - i
+    a = vals[lo + i]
+    b = vals[lo + np.minimum(i + 1, n - 1)]
+    inner = np.rint(a + (b - a) * frac).astype(np.int64)
+    return np.where(i + 1 >= n, vals[lo + n - 1], inner)
+
+
+def _robust_stats_numpy(groups: Dict) -> Dict:
+    keys, vals, gid, lo, n = _np_sorted_groups(groups, positive=True)
+    out = dict.fromkeys(keys)
+    if not vals.size:
+        return out
+    g = np.flatnonzero(n)
+    lo, n = lo[g], n[g]
+
+    big = n >= 8
+    if big.any():
+        q1 = _np_percentile(vals, lo[big], n[big], 0.25)
+        q3 = _np_percentile(vals, lo[big], n[big], 0.75)
         iqr = q3 - q1
-        lower = q1 - 1.5 * iqr
-        upper = q3 + 1.5 * iqr
-        clean = [p for p in vals if lower <= p <= upper]
-        if len(clean) >= 5:
-            vals = clean
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        # группы разводим сдвигом: границы одной группы не залезут в соседнюю
+        span = int(max(int(vals.max()), float(upper.max())) - min(0.0, float(lower.min()))) + 2
+        shifted = vals + gid * span
+        off = g[big] * span
+        c_lo = np.searchsorted(shifted, lower + off, side='left')
+        c_hi = np.searchsorted(shifted, upper + off, side='right')
+        use = c_hi - c_lo >= 5
+        b_lo, b_n = lo[big], n[big]
+        b_lo[use], b_n[use] = c_lo[use], (c_hi - c_lo)[use]
+        lo[big], n[big] = b_lo, b_n
 
-    return MarketStats(
-        n=len(vals),
-        median=int(statistics.median(vals)),
-        p20=_percentile(vals, 0.20),
-        p10=_percentile(vals, 0.10),
-        low=vals[0],
-        high=vals[-1],
-    )
+    half = lo + n // 2
+    median = np.where(n % 2 == 1, vals[half].astype(np.float64),
+                      (vals[np.maximum(half - 1, lo)] + vals[half]) / 2)
+    cols = zip(g.tolist(), n.tolist(), median.tolist(), _np_percentile(vals, lo, n, 0.20).tolist(),
+               _np_percentile(vals, lo, n, 0.10).tolist(), vals[lo].tolist(), vals[lo + n - 1].tolist())
+    for gi, cnt, med, p20, p10, low, high in cols:
+        out[keys[gi]] = MarketStats(n=cnt, median=int(med), p20=p20, p10=p10, low=low, high=high)
+    return out
+
+
+def robust_stats_many(groups: Dict, use_numpy: Optional[bool] = None) -> Dict:
+    """robust_stats для всех корзин разом: {ключ: цены} → {ключ: MarketStats|None}.
+    С NumPy (и пачкой от NUMPY_MIN_PRICES цен) — одной сортировкой и векторными
+    перцентилями/IQR на все корзины; без него — robust_stats по корзинам."""
+    if use_numpy is None:
+        use_numpy = np is not None and sum(len(v) for v in groups.values()) >= NUMPY_MIN_PRICES
+    if use_numpy and np is not None:
+        return _robust_stats_numpy(groups)
+    return {k: robust_stats(v) for k, v in groups.items()}
+
+
+def modal_center(prices, window=None) -> int:
+    """Центр самого ПЛОТНОГО ценового кластера (где предложений больше всего в
+    коридоре шириной `window`). Для скошенных вправо распределений (хвост перекупов
+    и комплектов «+SSD/клавиатура») даёт цифру у «горба», а не серединную медиану,
+    задранную хвостом. По умолчанию окно = 12% от медианы (~5–10тр в нашем сегменте).
+
+    Сортировка + правая граница окна бинпоиском от предыдущей: O(n log n).
+    При равной плотности берётся самое левое окно; кластер — цены от его начала
+    до prices[i] + window включительно."""
+    prices = sorted(prices)
+    n = len(prices)
+    if n < 4:
+        return int(statistics.median(prices)) if prices else 0
+    if window is None:
+        window = max(5000, int(statistics.median(prices) * 0.12))
+    best_cnt, best_i, best_j = -1, 0, 0
+    j = 0
+    for i, p in enumerate(prices):
+        j = bisect_right(prices, p + window, j if j > i else i)
+        if j - i > best_cnt:
+            best_cnt, best_i, best_j = j - i, i, j
+    return int(statistics.median(prices[best_i:best_j]))
+
+
+def _sorted_medians(vals, starts, ends):
+    """Медианы отрезков [starts, ends) отсортированного массива (как statistics.median:
+    у чётной длины — среднее двух средних, float)."""
+    length = ends - starts
+    mid = starts + length // 2
+    upper = vals[mid].astype(np.float64)
+    lower = vals[np.maximum(mid - 1, starts)].astype(np.float64)
+    return np.where(length % 2 == 1, upper, (lower + upper) / 2)
+
+
+def _modal_centers_numpy(groups: Dict, window) -> Dict:
+    keys, vals, gid, starts, sizes = _np_sorted_groups(groups)
+    out = dict.fromkeys(keys, 0)
+    if not vals.size:
+        return out
+    ends = starts + sizes
+    nonempty = sizes > 0
+    medians = np.zeros(len(keys))
+    medians[nonempty] = _sorted_medians(vals, starts[nonempty], ends[nonempty])
+    if window is None:
+        win = np.maximum(5000, (medians * 0.12).astype(np.int64))
+    else:
+        win = np.full(len(keys), window, dtype=np.int64)
+    # группы разводим сдвигом: окно одной группы не дотянется до следующей
+    span = int(vals.max() - min(int(vals.min()), 0) + max(int(win.max()), 0)) + 1
+    shifted = vals + gid * span
+    j = np.searchsorted(shifted, shifted + win[gid], side='right')
+    cnt = j - np.arange(len(vals))
+    best_cnt = np.full(len(keys), -1, dtype=np.int64)
+    np.maximum.at(best_cnt, gid, cnt)
+    first = np.flatnonzero(cnt == best_cnt[gid])
+    gids, idx = np.unique(gid[first], return_index=True)
+    best_i = first[idx]
+    centers = _sorted_medians(vals, best_i, j[best_i])
+    for g in range(len(keys)):
+        if sizes[g] and sizes[g] < 4:
+            out[keys[g]] = int(medians[g])
+    for g, c in zip(gids.tolist(), centers.tolist()):
+        if sizes[g] >= 4:
+            out[keys[g]] = int(c)
+    return out
+
+
+def modal_centers(groups: Dict, window=None, use_numpy: Optional[bool] = None) -> Dict:
+    """modal_center для всех ключей разом: {ключ: цены} → {ключ: центр}.
+    С NumPy (и пачкой от NUMPY_MIN_PRICES цен) — одной сортировкой и одним
+    searchsorted на все ключи; без него — modal_center по ключам. Результат тот же."""
+    if use_numpy is None:
+        use_numpy = np is not None and sum(len(v) for v in groups.values()) >= NUMPY_MIN_PRICES
+    if use_numpy and np is not None:
+        return _modal_centers_numpy(groups, window)
+    return {k: modal_center(v, window) for k, v in groups.items()}
 
 
 @dataclass
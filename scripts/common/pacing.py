@@ -0,0 +1,219 @@
+"""
+Адаптивный темп запросов к Авито (AIMD по хосту) — общий для scanner_v2,
+avito-parser и price-builder.
+
+Раньше паузы были зашиты: random.uniform(2, 5) перед страницей сканера, 4–7 с в
+парсере, 0.8–1.8 с после дозахода в карточку — всегда с запасом на худший случай.
+Теперь пауза перед запросом к хосту живёт в Pacer и подстраивается под то, что
+Авито терпит сейчас:
+
+  - удачная загрузка (без капчи) → частота +PACE_STEP запросов/с (аддитивно);
+  - капча, 429/403 или пустая 1-я страница выдачи → пауза ×PACE_BACKOFF
+    (мультипликативно), повторные сигналы в пределах BACKOFF_HOLD_SEC — одно
+    событие;
+  - пауза всегда в [PACE_MIN_SEC, PACE_MAX_SEC], перед каждым запросом — с
+    разбросом ±JITTER, чтобы шаг не был механическим.
+
+Разные места ходят с разным шагом относительно базовой паузы «перед страницей
+выдачи» — множитель scale у wait() (SCALE_ITEM для карточек, SCALE_AFTER_DEEP —
+короткая пауза после дозахода). Состояние по хостам пишется в PACE_STATE_PATH
+(не чаще раза в SAVE_EVERY_SEC и в flush()); записи старше FORGET_HOURS забываются —
+через сутки начинаем со стартовой паузы. Несколько процессов пишут один файл: по
+каждому хосту остаётся более свежая запись.
+
+PACE_ADAPTIVE=0 — фиксированная пауза PACE_START_SEC (со scale и разбросом).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from common.config import (
+    PACE_ADAPTIVE, PACE_BACKOFF, PACE_MAX_SEC, PACE_MIN_SEC, PACE_START_SEC, PACE_STEP,
+)
+
+logger = logging.getLogger(__name__)
+
+PACE_STATE_PATH = Path(os.environ.get('PACE_STATE_PATH', 'public/data/pace-state.json'))
+
+SCALE_PAGE = 1.0           # страница выдачи (прежние 2–5 с)
+SCALE_ITEM = 0.7           # карточка объявления (прежние 1.5–3.5 с)
+SCALE_AFTER_DEEP = 0.4     # после дозахода в карточку (прежние 0.8–1.8 с)
+
+JITTER = 0.3
+BACKOFF_HOLD_SEC = 10.0
+SAVE_EVERY_SEC = 30.0
+FORGET_HOURS = 24
+
+
+def host_of(url: str) -> str:
+    """Хост из URL (или строка как есть, если это уже хост)."""
+    if '://' not in url:
+        return url
+    return urlsplit(url).hostname or url
+
+
+class Pacer:
+    """AIMD-регулятор паузы перед запросом, по хосту. Потокобезопасен (пул
+    сессий сканера делит один экземпляр)."""
+
+    def __init__(self, path: Optional[Path] = PACE_STATE_PATH, start: float = PACE_START_SEC,
+                 min_delay: float = PACE_MIN_SEC, max_delay: float = PACE_MAX_SEC,
+                 step: float = PACE_STEP, backoff: float = PACE_BACKOFF,
+                 adaptive: bool = bool(PACE_ADAPTIVE), sleep=None, clock=time.time, rng=None):
+        self.path = Path(path) if path else None
+        self.min_delay, self.max_delay = float(min_delay), float(max_delay)
+        self.start = min(max(float(start), self.min_delay), self.max_delay)
+        self.step, self.backoff_factor = float(step), float(backoff)
+        self.adaptive = adaptive
+        self._sleep = sleep
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._hosts = {}                  # host → {'delay', 'updated'}
+        self._last_backoff = {}           # host → время последнего отката
+        self._dirty = False
+        self._saved_at = clock()
+        self.ok = Counter()               # host → удачных загрузок за прогон
+        self.backoffs = Counter()         # (host, причина) → откатов за прогон
+        self._load()
+
+    # ── состояние ────────────────────────────────────────────────────────────
+
+    def _read_file(self) -> dict:
+        if self.path is None:
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _load(self):
+        now = self.clock()
+        for host, rec in self._read_file().items():
+            try:
+                delay, updated = float(rec['delay']), float(rec['updated'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if now - updated <= FORGET_HOURS * 3600:
+                self._hosts[host] = {'delay': min(max(delay, self.min_delay), self.max_delay),
+                                     'updated': updated}
+
+    def flush(self) -> None:
+        """Пишет состояние (сливаясь с записями других процессов)."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            mine = {h: dict(r) for h, r in self._hosts.items()}
+            self._dirty = False
+            self._saved_at = self.clock()
+        data = self._read_file()
+        for host, rec in mine.items():
+            other = data.get(host)
+            if not isinstance(other, dict) or float(other.get('updated', 0) or 0) <= rec['updated']:
+                data[host] = {'delay': round(rec['delay'], 3), 'updated': rec['updated']}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps(data, ensure_ascii=False, sort_keys=True), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Темп не сохранён: {e}")
+
+    def _touch(self, host, delay):
+        """Под замком: новая пауза хоста. Возвращает True, если пора сохранить."""
+        self._hosts[host] = {'delay': delay, 'updated': self.clock()}
+        self._dirty = True
+        return self.clock() - self._saved_at >= SAVE_EVERY_SEC
+
+    # ── регулятор ────────────────────────────────────────────────────────────
+
+    def delay(self, url: str) -> float:
+        """Текущая базовая пауза перед запросом к хосту (без scale и разброса)."""
+        if not self.adaptive:
+            return self.start
+        with self._lock:
+            rec = self._hosts.get(host_of(url))
+            return rec['delay'] if rec else self.start
+
+    def wait(self, url: str, scale: float = SCALE_PAGE) -> float:
+        """Пауза перед запросом к хосту url. Возвращает, сколько проспали."""
+        d = self.delay(url) * scale * self.rng.uniform(1 - JITTER, 1 + JITTER)
+        (self._sleep or time.sleep)(d)
+        return d
+
+    def success(self, url: str) -> None:
+        """Страница загрузилась без капчи/отказа → чуть быстрее."""
+        host = host_of(url)
+        with self._lock:
+            self.ok[host] += 1
+            if not self.adaptive:
+                return
+            cur = self._hosts.get(host, {}).get('delay', self.start)
+            new = max(self.min_delay, 1.0 / (1.0 / cur + self.step))
+            save = self._touch(host, new)
+        if save:
+            self.flush()
+
+    def backoff(self, url: str, reason: str) -> None:
+        """Сигнал троттлинга (капча / 429 / пустая выдача) → пауза ×backoff."""
+        host = host_of(url)
+        now = self.clock()
+        with self._lock:
+            if now - self._last_backoff.get(host, -BACKOFF_HOLD_SEC) < BACKOFF_HOLD_SEC:
+                return
+            self._last_backoff[host] = now
+            self.backoffs[(host, reason)] += 1
+            if not self.adaptive:
+                return
+            cur = self._hosts.get(host, {}).get('delay', self.start)
+            new = min(self.max_delay, cur * self.backoff_factor)
+            self._touch(host, new)
+        logger.info(f"🐢 {host}: {reason} → пауза {cur:.1f} → {new:.1f} с")
+        self.flush()
+
+    # ── итог ─────────────────────────────────────────────────────────────────
+
+    def summary(self) -> str:
+        parts = []
+        with self._lock:
+            hosts = sorted(set(self.ok) | {h for h, _ in self.backoffs})
+            for host in hosts:
+                why = ", ".join(f"{r} {n}" for (h, r), n in self.backoffs.items() if h == host)
+                d = self._hosts.get(host, {}).get('delay', self.start) if self.adaptive else self.start
+                parts.append(f"{host}: пауза {d:.1f} с, удачных {self.ok[host]}"
+                             + (f", откатов: {why}" if why else ""))
+        return "🐇 Темп запросов — " + ("; ".join(parts) if parts else "запросов не было")
+
+    def log_summary(self, log: Optional[logging.Logger] = None) -> None:
+        """Итог прогона в лог, сохранение состояния и обнуление счётчиков."""
+        with self._lock:
+            seen = bool(self.ok or self.backoffs)
+        if seen:
+            (log or logger).info(self.summary())
+        self.flush()
+        with self._lock:
+            self.ok, self.backoffs = Counter(), Counter()
+
+
+_DEFAULT = None
+
+
+def default_pacer() -> Pacer:
+    """Общий экземпляр процесса (настройки — из env)."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = Pacer()
+    return _DEFAULT
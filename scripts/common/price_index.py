@@ -0,0 +1,175 @@
+"""
+Индекс базы цен (avito-prices.json) по live_key и по ключу config_to_db_key —
+общий для scanner_v2 (старт и --modal-report), price-sync и tg-leads.
+
+Раньше каждый из них на старте заново гонял classify() по всем строкам базы,
+чтобы сопоставить строку с живым конфигом, — и каждый минутный прогон intake
+платил за это снова. Теперь классификация строк считается один раз и ложится в
+бинарный сайдкар (marshal) рядом с кэшами процесса:
+
+  - ключ сайдкара — mtime_ns + размер файла базы; не совпали → sha1 содержимого
+    (база переписана без изменений — берём кэш и обновляем ключ); не совпал и
+    он → пересобираем;
+  - в сайдкаре — сам разобранный JSON базы и live_key каждой строки, так что
+    при попадании не нужен ни json.loads, ни classify;
+  - правка классификатора (или VALID_RAM/VALID_SSD) меняет CLASSIFIER_SIG —
+    старые сайдкары не подходят.
+
+Сайдкар — в PRICE_INDEX_CACHE_DIR (по умолчанию ~/.cache/bestmac); пустое
+значение — без кэша, только в памяти. Битый или чужой сайдкар молча
+пересобирается.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from common import classifier
+from common.classifier import classify
+
+logger = logging.getLogger(__name__)
+
+_cache_env = os.environ.get('PRICE_INDEX_CACHE_DIR', str(Path.home() / '.cache' / 'bestmac'))
+PRICE_INDEX_CACHE_DIR = Path(_cache_env) if _cache_env else None
+
+FORMAT = 1
+_ENV = object()          # cache_dir по умолчанию — PRICE_INDEX_CACHE_DIR на момент вызова
+
+
+# правка классификатора (common.classifier.CLASSIFIER_SIG) или формата — другой ключ
+CLASSIFIER_SIG = f"{FORMAT}|{sys.version_info[:2]}|{classifier.CLASSIFIER_SIG}"
+
+
+def live_key(config):
+    """Каноничный ключ для группировки сопоставимых лотов в живой выборке.
+    Группируем по семейству+чипу+экрану+RAM+SSD — это и есть «такой же аппарат»."""
+    return (
+        config.family,
+        config.chip_gen,
+        config.chip_tier,
+        config.screen,
+        config.ram,
+        config.ssd,
+    )
+
+
+def row_live_key(s: dict):
+    """live_key строки базы (через тот же классификатор, что и для объявлений)
+    или None, если строка не классифицируется."""
+    try:
+        c = classify(f"{s['model_name']} {s.get('processor', '')}",
+                     {'ram': int(s.get('ram', 0)), 'ssd': int(s.get('ssd', 0))})
+    except Exception:
+        return None
+    return live_key(c) if c.is_valid else None
+
+
+def row_db_key(s: dict):
+    """Ключ строки базы в формате config_to_db_key."""
+    return (s['model_name'].lower(), s.get('processor', 'Apple'),
+            int(s.get('ram', 0)), int(s.get('ssd', 0)))
+
+
+class PriceIndex:
+    """Разобранная база цен. data — весь JSON базы (свежая копия на каждый
+    load: её можно мутировать и писать обратно), stats — data['stats'],
+    live_keys[i] — live_key строки stats[i] или None."""
+
+    def __init__(self, data: dict, live_keys: list, mtime: Optional[float] = None,
+                 from_cache: bool = False):
+        self.data = data
+        self.stats = data.get('stats', [])
+        self.live_keys = live_keys
+        self.generated_at = data.get('generated_at')
+        self.mtime = mtime
+        self.from_cache = from_cache
+        # дубликаты конфига: выигрывает последняя строка (как было у всех потребителей)
+        self.by_live_key, self.by_db_key = {}, {}
+        for s, k in zip(self.stats, live_keys):
+            if k is not None:
+                self.by_live_key[k] = s
+            try:
+                self.by_db_key[row_db_key(s)] = s
+            except (KeyError, AttributeError, TypeError, ValueError):
+                pass
+
+    def __len__(self):
+        return len(self.stats)
+
+    def groups(self) -> dict:
+        """{str(live_key): [строки]} — все дубликаты конфига списком."""
+        out = {}
+        for s, k in zip(self.stats, self.live_keys):
+            if k is not None:
+                out.setdefault(str(k), []).append(s)
+        return out
+
+
+def _sidecar_path(path: Path, cache_dir: Optional[Path]) -> Optional[Path]:
+    if cache_dir is None:
+        return None
+    tag = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:12]
+    return Path(cache_dir) / f'price-index-{path.stem}-{tag}.marshal'
+
+
+def _read_sidecar(side: Optional[Path]):
+    if side is None:
+        return None
+    try:
+        rec = marshal.loads(side.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(rec, dict) or rec.get('sig') != CLASSIFIER_SIG:
+        return None
+    return rec
+
+
+def _write_sidecar(side: Optional[Path], rec: dict) -> None:
+    if side is None:
+        return
+    try:
+        side.parent.mkdir(parents=True, exist_ok=True)
+        tmp = side.with_name(side.name + f'.{os.getpid()}.tmp')
+        tmp.write_bytes(marshal.dumps(rec))
+        os.replace(tmp, side)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Кэш индекса цен не сохранён: {e}")
+
+
+def load_price_index(path, cache_dir=_ENV) -> Optional[PriceIndex]:
+    """Индекс базы цен из path (None — файла нет). Ошибки чтения JSON
+    пробрасываются — как раньше при json.load. cache_dir=None — без сайдкара."""
+    path = Path(path)
+    if cache_dir is _ENV:
+        cache_dir = PRICE_INDEX_CACHE_DIR
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    side = _sidecar_path(path, cache_dir)
+    rec = _read_sidecar(side)
+    if rec and rec.get('mtime_ns') == st.st_mtime_ns and rec.get('size') == st.st_size:
+        return PriceIndex(rec['data'], rec['keys'], st.st_mtime, from_cache=True)
+
+    raw = path.read_bytes()
+    digest = hashlib.sha1(raw).hexdigest()
+    if rec and rec.get('sha1') == digest:
+        rec.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+        _write_sidecar(side, rec)
+        return PriceIndex(rec['data'], rec['keys'], st.st_mtime, from_cache=True)
+
+    data = json.loads(raw.decode('utf-8'))
+    if not isinstance(data, dict):
+        data = {}
+    stats = data.get('stats', [])
+    keys = [row_live_key(s) if isinstance(s, dict) else None for s in stats]
+    _write_sidecar(side, {'sig': CLASSIFIER_SIG, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                          'sha1': digest, 'data': data, 'keys': keys})
+    return PriceIndex(data, keys, st.st_mtime)
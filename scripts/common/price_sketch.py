@@ -0,0 +1,379 @@
+"""
+Потоковые квантильные скетчи накопителя коллектора (intake-raw-prices.json).
+
+Накопитель хранит сырые [цена, время, москва] по live_key, но только последние
+RAW_CAP цен, а каждый читатель (рынок intake, --modal-report, price-sync) заново
+перечитывает, нормализует и сортирует эти списки. Здесь же — по скетчу на конфиг:
+
+  - QuantileSketch — лог-корзины цен с относительной точностью ALPHA (схема
+    DDSketch): цена x попадает в корзину ceil(log_γ x), γ = (1+α)/(1−α), и любой
+    квантиль восстанавливается с ошибкой не больше α от значения. Корзина хранит
+    число и сумму цен, значение корзины — их среднее: при α=0.2% (≈160₽ на 80к)
+    цены с шагом Авито в 500₽ почти всегда лежат по одной в корзине и
+    восстанавливаются точно. Скетчи сливаются сложением, размер — число занятых
+    корзин (сотни на весь ценовой диапазон), а не число цен;
+  - корзины времени: свежие SKETCH_DAILY_DAYS дней — по дню, старше — сворачиваются
+    в недели, старше SKETCH_DAYS — выбрасываются. Окно «за N дней» — слияние
+    нескольких десятков скетчей, сколько бы цен ни накопилось;
+  - Москва отдельно: на каждую корзину — скетч всех цен и скетч московских.
+
+Медиана, P10/P20 (robust_stats), модальный центр (плотность) — по корзинам
+скетча, без сортировки цен. Файл скетчей (intake-raw-sketch.json) ведёт
+_accumulate_raw сканера; нет файла — скетчи строятся из накопителя на лету.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Optional
+
+from common.market import MarketStats
+from common.raw_prices import RawPriceLog
+
+ALPHA = 0.002                     # относительная точность квантилей
+_GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(_GAMMA)
+FORMAT = 1
+DAY = 86400
+
+# Сколько дней истории держим и сколько последних — с точностью до дня
+# (окно синка MAX_AGE_DAYS=30 и рынка intake должно попадать в дневные корзины).
+SKETCH_DAYS = int(os.environ.get('RAW_SKETCH_DAYS', '180'))
+SKETCH_DAILY_DAYS = int(os.environ.get('RAW_SKETCH_DAILY_DAYS', '35'))
+
+
+def _bin(price) -> int:
+    return math.ceil(math.log(price) / _LOG_GAMMA)
+
+
+class QuantileSketch:
+    """Скетч цен: {корзина: [сколько цен, их сумма]}."""
+
+    __slots__ = ('bins', 'n', '_cols')
+
+    def __init__(self, bins: Optional[dict] = None):
+        self.bins = bins if bins is not None else {}
+        self.n = sum(c for c, _ in self.bins.values())
+        self._cols = None
+
+    def __len__(self):
+        return self.n
+
+    def add(self, price, count: int = 1) -> None:
+        if not price or price <= 0:
+            return
+        i = _bin(price)
+        b = self.bins.get(i)
+        if b is None:
+            self.bins[i] = [count, price * count]
+        else:
+            b[0] += count
+            b[1] += price * count
+        self.n += count
+        self._cols = None
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        for i, (c, total) in other.bins.items():
+            b = self.bins.get(i)
+            if b is None:
+                self.bins[i] = [c, total]
+            else:
+                b[0] += c
+                b[1] += total
+        self.n += other.n
+        self._cols = None
+        return self
+
+    def without(self, price) -> 'QuantileSketch':
+        """Копия без одной цены price (лот не сравниваем сам с собой); цены нет — self."""
+        if not price or price <= 0:
+            return self
+        i = _bin(price)
+        if i not in self.bins:
+            return self
+        bins = dict(self.bins)
+        c, total = bins[i]
+        if c > 1:
+            bins[i] = [c - 1, total - price]
+        else:
+            del bins[i]
+        return QuantileSketch(bins)
+
+    # ── сериализация: [корзина, счётчик, сумма, корзина, счётчик, сумма, …] ──
+    def to_list(self) -> list:
+        out = []
+        for i, (c, total) in self.bins.items():
+            out += (i, c, total)
+        return out
+
+    @classmethod
+    def from_list(cls, data: list) -> 'QuantileSketch':
+        it = iter(data)
+        return cls({i: [c, total] for i, c, total in zip(it, it, it)})
+
+    # ── запросы ──────────────────────────────────────────────────────────────
+    def _columns(self):
+        """(значения корзин по возрастанию, накопленные счётчики)."""
+        if self._cols is None:
+            vals, cum, total = [], [], 0
+            for i in sorted(self.bins):
+                c, s = self.bins[i]
+                total += c
+                vals.append(int(round(s / c)))
+                cum.append(total)
+            self._cols = (vals, cum)
+        return self._cols
+
+    def _at(self, rank: int) -> int:
+        """Цена с порядковым номером rank (0 — самая дешёвая)."""
+        vals, cum = self._columns()
+        return vals[bisect_right(cum, rank)]
+
+    def _below(self, k: int) -> int:
+        """Сколько цен в корзинах до k-й (по возрастанию)."""
+        return self._columns()[1][k - 1] if k else 0
+
+    def _percentile(self, r0: int, m: int, q: float) -> int:
+        """Как common.market._percentile по ценам с номерами [r0, r0 + m)."""
+        if m == 1:
+            return self._at(r0)
+        idx = q * (m - 1)
+        i = int(idx)
+        frac = idx - i
+        if i + 1 >= m:
+            return self._at(r0 + m - 1)
+        a, b = self._at(r0 + i), self._at(r0 + i + 1)
+        return int(round(a + (b - a) * frac))
+
+    def _median(self, r0: int, m: int) -> int:
+        if m % 2:
+            return self._at(r0 + m // 2)
+        return int((self._at(r0 + m // 2 - 1) + self._at(r0 + m // 2)) / 2)
+
+    def quantile(self, q: float) -> int:
+        return self._percentile(0, self.n, q) if self.n else 0
+
+    def median(self) -> int:
+        return self._median(0, self.n) if self.n else 0
+
+    def robust_stats(self, exclude=None) -> Optional[MarketStats]:
+        """common.market.robust_stats по скетчу (IQR-отсечение при n>=8);
+        exclude — цена лота, одно её вхождение не учитывается."""
+        sk = self.without(exclude) if exclude is not None else self
+        n = sk.n
+        if n <= 0:
+            return None
+        r0, m = 0, n
+        if n >= 8:
+            q1 = sk._percentile(0, n, 0.25)
+            q3 = sk._percentile(0, n, 0.75)
+            iqr = q3 - q1
+            vals, _ = sk._columns()
+            c_lo = sk._below(bisect_left(vals, q1 - 1.5 * iqr))
+            c_hi = sk._below(bisect_right(vals, q3 + 1.5 * iqr))
+            if c_hi - c_lo >= 5:
+                r0, m = c_lo, c_hi - c_lo
+        return MarketStats(
+            n=m,
+            median=sk._median(r0, m),
+            p20=sk._percentile(r0, m, 0.20),
+            p10=sk._percentile(r0, m, 0.10),
+            low=sk._at(r0),
+            high=sk._at(r0 + m - 1),
+        )
+
+    def median_bound(self) -> int:
+        """Верхняя граница медианы robust_stats(exclude=x) по ЛЮБОЙ одной цене x
+        (своя цена лота неизвестна заранее) — для потолка цены алерта. Выкидывание
+        одной цены сдвигает каждый ранг не больше чем на один: квартили выборки без
+        x лежат между квартилями рангов [0, n-1) и [1, n), границы IQR-отсечения —
+        не выше L/H по ним; медиана отрезка растёт с его границами и от выкидывания
+        самой дешёвой цены. Без отсечения (мало цен между границами) — медиана без
+        самой дешёвой. Запас 4α — среднее корзины без x сдвигается в пределах
+        её ширины. 0 — пустой скетч."""
+        n = self.n
+        if n <= 2:
+            return int(self._at(n - 1) * (1 + 4 * ALPHA)) + 1 if n else 0
+        best = self._median(1, n - 1)                     # без отсечения: минус самая дешёвая
+        m = n - 1
+        if m >= 8:
+            q1_hi, q3_hi = self._percentile(1, m, 0.25), self._percentile(1, m, 0.75)
+            q1_lo, q3_lo = self._percentile(0, m, 0.25), self._percentile(0, m, 0.75)
+            vals, _ = self._columns()
+            c_lo = self._below(bisect_left(vals, 2.5 * q1_hi - 1.5 * q3_lo))
+            c_hi = self._below(bisect_right(vals, 2.5 * q3_hi - 1.5 * q1_lo))
+            # при любом x между границами остаётся >= 5 цен → отсечение есть всегда,
+            # медиана без отсечения не нужна
+            core = self._below(bisect_right(vals, 2.5 * q3_lo - 1.5 * q1_hi)) - c_lo
+            if c_hi - c_lo >= 2:
+                trimmed = self._median(c_lo + 1, c_hi - c_lo - 1)
+                best = trimmed if core - 1 >= 5 else max(best, trimmed)
+        best = max(best, self.robust_stats().median)      # x нет в скетче — рынок как есть
+        return int(best * (1 + 4 * ALPHA)) + 1
+
+    def modal_center(self, window=None) -> int:
+        """common.market.modal_center по скетчу: самое плотное окно шириной window
+        (по умолчанию 12% медианы, не меньше 5000) — по корзинам, а не по ценам."""
+        n = self.n
+        if n < 4:
+            return self.median()
+        if window is None:
+            window = max(5000, int(self.median() * 0.12))
+        vals, cum = self._columns()
+        best_cnt, best = -1, (0, 0)
+        j = 0
+        for k, v in enumerate(vals):
+            j = bisect_right(vals, v + window, j if j > k else k)
+            start = self._below(k)
+            if cum[j - 1] - start > best_cnt:
+                best_cnt, best = cum[j - 1] - start, (start, cum[j - 1])
+        return self._median(best[0], best[1] - best[0])
+
+
+class PriceSketchStore:
+    """Скетчи накопителя: {live_key: {'all'|'msk': {первый день корзины: скетч}}}.
+    Корзина k — один день, а после сворачивания (k+7 <= граница дневных) — неделя
+    [k, k+7). now_ts — «сегодня» для сворачивания и окон (по умолчанию — сейчас)."""
+
+    def __init__(self, now_ts: Optional[int] = None):
+        self._data: Dict[str, Dict[str, Dict[int, QuantileSketch]]] = {}
+        self._merged: Dict = {}
+        self._set_today(now_ts)
+
+    def _set_today(self, now_ts):
+        self.today = int(now_ts if now_ts is not None else time.time()) // DAY
+        self._daily_from = self.today - SKETCH_DAILY_DAYS
+
+    def _bucket(self, day: int) -> int:
+        week = day - day % 7
+        return week if week + 7 <= self._daily_from else day
+
+    def _span(self, start: int) -> int:
+        return 7 if start % 7 == 0 and start + 7 <= self._daily_from else 1
+
+    def keys(self):
+        return self._data.keys()
+
+    def __len__(self):
+        return len(self._data)
+
+    def add(self, key: str, price, ts, msk=None) -> None:
+        """Цена накопителя [price, ts, msk] в скетчи конфига key."""
+        if not price or price <= 0:
+            return
+        b = self._bucket(int(ts) // DAY)
+        series = self._data.setdefault(key, {'all': {}, 'msk': {}})
+        parts = ('all', 'msk') if msk == 1 else ('all',)
+        for part in parts:
+            sk = series[part].get(b)
+            if sk is None:
+                sk = series[part][b] = QuantileSketch()
+            sk.add(int(price))
+        self._merged.clear()
+
+    def prune(self, now_ts: Optional[int] = None) -> None:
+        """Сдвигает «сегодня»: сворачивает дни старше SKETCH_DAILY_DAYS в недели,
+        выбрасывает корзины старше SKETCH_DAYS."""
+        self._set_today(now_ts)
+        keep_from = self.today - SKETCH_DAYS
+        for key in list(self._data):
+            series = self._data[key]
+            for part, buckets in series.items():
+                rolled = {}
+                for start, sk in buckets.items():
+                    b = self._bucket(start)
+                    if b + self._span(b) <= keep_from:
+                        continue
+                    if b in rolled:
+                        rolled[b].merge(sk)
+                    else:
+                        rolled[b] = sk
+                series[part] = rolled
+            if not series['all'] and not series['msk']:
+                del self._data[key]
+        self._merged.clear()
+
+    def query(self, key: str, max_age_days: Optional[int] = None, msk: bool = False) -> QuantileSketch:
+        """Слитый скетч конфига за последние max_age_days дней (None — вся история;
+        недельная корзина входит целиком, если пересекает окно). Только московские
+        — msk=True. Результат кэшируется до следующего add/prune — не мутировать."""
+        ck = (key, max_age_days, msk)
+        sk = self._merged.get(ck)
+        if sk is None:
+            sk = QuantileSketch()
+            cutoff = None if max_age_days is None else self.today - max_age_days
+            for start, part in self._data.get(key, {}).get('msk' if msk else 'all', {}).items():
+                if cutoff is None or start + self._span(start) > cutoff:
+                    sk.merge(part)
+            self._merged[ck] = sk
+        return sk
+
+    # ── файл ─────────────────────────────────────────────────────────────────
+    def to_json(self) -> dict:
+        return {'format': FORMAT, 'alpha': ALPHA, 'today': self.today,
+                'keys': {key: {part: {str(b): sk.to_list() for b, sk in buckets.items()}
+                               for part, buckets in series.items()}
+                         for key, series in self._data.items()}}
+
+    @classmethod
+    def from_json(cls, data: dict, now_ts: Optional[int] = None) -> Optional['PriceSketchStore']:
+        """None — чужой формат/точность (скетчи придётся строить из накопителя)."""
+        if not isinstance(data, dict) or data.get('format') != FORMAT or data.get('alpha') != ALPHA:
+            return None
+        store = cls(int(data.get('today', 0)) * DAY)
+        for key, series in (data.get('keys') or {}).items():
+            store._data[key] = {part: {int(b): QuantileSketch.from_list(v)
+                                       for b, v in (series.get(part) or {}).items()}
+                                for part in ('all', 'msk')}
+        store.prune(now_ts)
+        return store
+
+    @classmethod
+    def from_raw(cls, raw_store: dict, now_ts: Optional[int] = None) -> 'PriceSketchStore':
+        """Скетчи из накопителя {live_key: [[цена, ts, москва] | цена, …]}
+        (легаси-числа — как «сейчас», регион неизвестен)."""
+        store = cls(now_ts)
+        now = int(now_ts if now_ts is not None else time.time())
+        for key, entries in raw_store.items():
+            if not isinstance(entries, list):
+                continue
+            for e in entries:
+                if isinstance(e, list) and len(e) >= 3:
+                    store.add(key, int(e[0]), int(e[1]), e[2])
+                else:
+                    store.add(key, int(e[0] if isinstance(e, list) else e), now)
+        store.prune(now_ts)
+        return store
+
+    @classmethod
+    def load(cls, path, now_ts: Optional[int] = None) -> Optional['PriceSketchStore']:
+        """Скетчи из файла; None — файла нет, он битый или другого формата."""
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        try:
+            return cls.from_json(data, now_ts)
+        except (TypeError, ValueError, AttributeError, IndexError):
+            return None
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / (path.name + '.tmp')
+        tmp.write_text(json.dumps(self.to_json(), separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+def load_raw_sketches(sketch_path, raw_path, now_ts: Optional[int] = None) -> PriceSketchStore:
+    """Скетчи для чтения: файл скетчей, а если его нет (или он не подходит) —
+    построенные из накопителя raw_path со всем журналом (пустые, если нет и его)."""
+    store = PriceSketchStore.load(sketch_path, now_ts)
+    if store is not None:
+        return store
+    return PriceSketchStore.from_raw(RawPriceLog(raw_path).read(), now_ts)
@@ -0,0 +1,190 @@
+"""
+Накопитель цен коллектора (intake-raw-prices.json): снимок + журнал добавлений.
+
+Раньше каждый прогон intake читал весь накопитель, прогонял каждую запись через
+миграцию легаси-чисел, дописывал партию, обрезал до RAW_CAP и переписывал файл
+целиком — стоимость росла с числом конфигов × RAW_CAP, хотя новых цен — десяток.
+Теперь (как у SeenStore сканера):
+
+  - append() — партия прогона одной JSONL-строкой {live_key: [[цена, ts, москва], …]}
+    дописывается в журнал intake-raw-prices.json.log; запись — O(новых цен);
+  - compact() — снимок + журнал → снимок (атомарно, окно RAW_CAP на конфиг,
+    легаси-числа нормализуются), журнал обнуляется. Под flock на .lock; append
+    держит тот же замок разделяемым, так что свёртка не теряет строк прогона,
+    пишущего в этот момент. maybe_compact() сворачивает, когда журнал вырос до
+    RAW_COMPACT_KB;
+  - locked() — тот же замок эксклюзивно на весь блок: под ним intake читает,
+    дополняет и переписывает скетчи (intake-raw-sketch.json), чтобы демон и
+    --intake не затирали обновления друг друга; append/compact внутри блока
+    замок повторно не берут;
+  - read() — слитый вид для читателей (рынок intake, --modal-report, price-sync,
+    засев скетчей): снимок, поверх — строки журнала, окно RAW_CAP. Формат тот же,
+    что у прежнего файла, так что читатели не знают о журнале.
+
+Формат снимка не менялся: старый intake-raw-prices.json читается как есть.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:          # Windows — свёртка без межпроцессной блокировки
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RAW_CAP = 400   # максимум цен на конфиг (скользящее окно)
+RAW_COMPACT_KB = int(os.environ.get('RAW_COMPACT_KB', '512'))   # журнал больше — свёртка в снимок
+
+
+def norm_raw_entry(e, now_ts=None):
+    """Запись накопителя → [цена, unix_ts, москва(1/0/None)].
+    Легаси-формат (голое число) получает текущее время и неизвестный регион."""
+    if isinstance(e, list) and len(e) >= 3:
+        return [int(e[0]), int(e[1]), e[2]]
+    return [int(e[0] if isinstance(e, list) else e), int(now_ts or time.time()), None]
+
+
+class RawPriceLog:
+    """Накопитель цен по str(live_key): снимок path + журнал path.log."""
+
+    def __init__(self, path, cap: int = RAW_CAP, compact_kb: int = RAW_COMPACT_KB):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + '.log')
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.cap = cap
+        self.compact_bytes = compact_kb * 1024
+        self._held = False
+
+    def signature(self):
+        """Меняется при каждой записи (append/compact) — ключ кэша читателей."""
+        sig = []
+        for p in (self.path, self.log_path):
+            try:
+                st = p.stat()
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _read_snapshot(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ raw-prices: снимок не прочитан: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _read_log(self) -> list:
+        batches = []
+        try:
+            with open(self.log_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except ValueError:
+                        continue         # недописанная строка упавшего прогона
+                    if isinstance(batch, dict):
+                        batches.append(batch)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"⚠️ raw-prices: журнал не прочитан: {e}")
+        return batches
+
+    def read(self) -> dict:
+        """Слитый вид {str(live_key): [[цена, ts, москва] | легаси-число, …]},
+        не больше cap последних цен на конфиг."""
+        for _ in range(3):
+            sig = self.signature()
+            store, batches = self._read_snapshot(), self._read_log()
+            if self.signature() == sig:
+                break            # свёртка другого процесса не вклинилась между чтениями
+        touched = set()
+        for batch in batches:
+            for key, entries in batch.items():
+                if not isinstance(entries, list):
+                    continue
+                cur = store.get(key)
+                store[key] = (cur if isinstance(cur, list) else []) + entries
+                touched.add(key)
+        for key in touched:
+            store[key] = store[key][-self.cap:]
+        return store
+
+    @contextmanager
+    def _lock(self, mode):
+        """flock на .lock (mode — LOCK_SH/LOCK_EX); внутри locked() — уже держим."""
+        if self._held:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, getattr(fcntl, mode))
+            yield
+
+    @contextmanager
+    def locked(self):
+        """Эксклюзивный замок накопителя на весь блок (между процессами)."""
+        with self._lock('LOCK_EX'):
+            held, self._held = self._held, True
+            try:
+                yield self
+            finally:
+                self._held = held
+
+    def append(self, batch: dict, now_ts: Optional[int] = None) -> dict:
+        """Дописывает партию {str(live_key): [записи]} одной строкой журнала.
+        Возвращает её нормализованной ([цена, ts, москва])."""
+        now_ts = int(now_ts or time.time())
+        norm = {key: [norm_raw_entry(e, now_ts) for e in entries]
+                for key, entries in batch.items() if entries}
+        if not norm:
+            return norm
+        line = (json.dumps(norm, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock('LOCK_SH'):
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)       # одна запись — строка не перемешается с чужой
+            finally:
+                os.close(fd)
+        return norm
+
+    def log_size(self) -> int:
+        try:
+            return self.log_path.stat().st_size
+        except OSError:
+            return 0
+
+    def compact(self, now_ts: Optional[int] = None) -> dict:
+        """Снимок + журнал → снимок (атомарно), журнал обнуляется. Возвращает снимок."""
+        now_ts = int(now_ts or time.time())
+        with self._lock('LOCK_EX'):
+            store = {key: [norm_raw_entry(e, now_ts) for e in entries]   # миграция легаси-чисел
+                     for key, entries in self.read().items() if isinstance(entries, list)}
+            tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(store, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            open(self.log_path, 'w').close()
+        return store
+
+    def maybe_compact(self, now_ts: Optional[int] = None) -> bool:
+        """Свёртка, если журнал дорос до compact_kb. True — свернули."""
+        if self.log_size() < self.compact_bytes:
+            return False
+        self.compact(now_ts)
+        return True
@@ -0,0 +1,280 @@
+"""
+Общее хранилище сессии Авито (Playwright storage_state) для scanner_v2, avito-parser
+и price-builder.
+
+Каждый процесс раньше начинал с пустого контекста и заново решал капчу фаервола
+(деньги RuCaptcha + 30–120 с). Теперь куки/localStorage после удачного решения
+капчи или чистого прогрева сохраняются в файл, и новый контекст (или curl-сессия
+сканера) стартует с последнего рабочего состояния:
+
+  - load() — состояние, если оно не старше SESSION_TTL_HOURS и не сброшено;
+  - капча на сессии, стартовавшей из сохранённого состояния → состояние «сгорело»,
+    файл удаляется (invalidate), следующий контекст начнёт с чистого;
+  - решили капчу → сохраняем свежее состояние; чистый проход пустой сессии
+    (прогрев) → тоже сохраняем; чистый проход сохранённой → продлеваем, если
+    оно старше половины TTL.
+
+Сессия — любой объект с методом storage_state() (контекст Playwright или
+HttpFetcher сканера); её судьба отслеживается через started/captcha/passed.
+
+Метрики по часам (SESSION_STATS_PATH, 30 дней): fresh / reused — сессий начато с
+пустого / сохранённого состояния; fresh_captcha / reused_captcha — из них упёрлись в
+капчу; solves — капч решено; avoided — сохранённых сессий, прошедших без капчи
+(каждая — несостоявшееся решение); invalidated — сбросов состояния.
+
+Файл состояния содержит куки — он лежит вне public/ (по умолчанию в $HOME).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from common.config import SESSION_TTL_HOURS
+
+try:
+    import fcntl
+except ImportError:          # Windows — без межпроцессной блокировки
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SESSION_STATE_PATH = Path(os.environ.get(
+    'SESSION_STATE_PATH', str(Path.home() / '.bestmac_avito_session.json')))
+SESSION_STATS_PATH = Path(os.environ.get('SESSION_STATS_PATH', 'public/data/session-stats.json'))
+STATS_KEEP_HOURS = 30 * 24
+
+COUNTERS = ('fresh', 'reused', 'fresh_captcha', 'reused_captcha', 'solves', 'avoided', 'invalidated')
+
+
+def _atomic_write(path: Path, obj) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def normalize_cookies(cookies) -> list:
+    """Куки в формате storage_state Playwright (все обязательные поля)."""
+    out = []
+    for c in cookies or []:
+        if not c.get('name'):
+            continue
+        out.append({
+            'name': c['name'], 'value': c.get('value', ''),
+            'domain': c.get('domain') or '.avito.ru', 'path': c.get('path') or '/',
+            'expires': c.get('expires', -1), 'httpOnly': bool(c.get('httpOnly', False)),
+            'secure': bool(c.get('secure', False)), 'sameSite': c.get('sameSite') or 'Lax',
+        })
+    return out
+
+
+class _Session:
+    """Что уже случилось с одной сессией (контекстом / curl-сессией)."""
+    __slots__ = ('reused', 'captcha', 'credited', 'saved')
+
+    def __init__(self, reused):
+        self.reused, self.captcha, self.credited, self.saved = reused, False, False, False
+
+
+class SessionStore:
+    def __init__(self, path: Path = SESSION_STATE_PATH, ttl_hours: float = SESSION_TTL_HOURS,
+                 stats_path: Optional[Path] = SESSION_STATS_PATH, clock=time.time):
+        self.path = Path(path)
+        self.ttl = float(ttl_hours) * 3600
+        self.stats_path = Path(stats_path) if stats_path else None
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._sessions = weakref.WeakKeyDictionary()
+
+    # ── состояние ────────────────────────────────────────────────────────────
+
+    def _read(self) -> Optional[dict]:
+        try:
+            rec = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(rec, dict) or not isinstance(rec.get('state'), dict):
+            return None
+        return rec
+
+    def load(self) -> Optional[dict]:
+        """storage_state для нового контекста или None (нет / протухло)."""
+        if self.ttl <= 0:
+            return None
+        rec = self._read()
+        if rec is None or self.clock() - float(rec.get('saved_at', 0)) > self.ttl:
+            return None
+        return rec['state']
+
+    def cookies(self) -> list:
+        """Куки сохранённого состояния (для curl-сессии сканера)."""
+        state = self.load()
+        return list(state.get('cookies') or []) if state else []
+
+    def age(self) -> Optional[float]:
+        rec = self._read()
+        return self.clock() - float(rec.get('saved_at', 0)) if rec else None
+
+    def save(self, state: dict, source: str) -> None:
+        if self.ttl <= 0 or not isinstance(state, dict) or not state.get('cookies'):
+            return
+        state = {'cookies': normalize_cookies(state.get('cookies')),
+                 'origins': state.get('origins') or []}
+        try:
+            with self._lock:
+                _atomic_write(self.path, {'saved_at': self.clock(), 'source': source, 'state': state})
+            try:
+                os.chmod(self.path, 0o600)
+            except OSError:
+                pass
+            logger.info(f"🔑 Сессия сохранена ({source}, кук: {len(state['cookies'])})")
+        except OSError as e:
+            logger.warning(f"⚠️ Сессия не сохранена: {e}")
+
+    def invalidate(self, reason: str) -> None:
+        with self._lock:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                logger.warning(f"⚠️ Сессию не сбросить: {e}")
+                return
+        logger.info(f"🔑 Сохранённая сессия сброшена: {reason}")
+        self.count('invalidated')
+
+    # ── судьба одной сессии ──────────────────────────────────────────────────
+
+    def started(self, session, reused: bool) -> None:
+        with self._lock:
+            self._sessions[session] = _Session(reused)
+        self.count('reused' if reused else 'fresh')
+
+    def captcha(self, session) -> None:
+        """На странице сессии — капча фаервола."""
+        with self._lock:
+            s = self._sessions.get(session)
+            if s is None or s.captcha:
+                return
+            s.captcha = True
+        if s.reused:
+            self.count('reused_captcha')
+            self.invalidate("капча на сессии из сохранённого состояния")
+        else:
+            self.count('fresh_captcha')
+
+    def passed(self, session, solved: bool = False) -> None:
+        """Навигация прошла без капчи (solved — после решения). Дёшево на
+        повторных вызовах: сохраняет/учитывает только первый значимый проход."""
+        with self._lock:
+            s = self._sessions.get(session)
+            if s is None or (not solved and (s.credited or s.captcha)):
+                return
+            s.credited = True
+            first_save = not s.saved
+            s.saved = True
+        if solved:
+            self.count('solves')
+            self._save_from(session, 'solve')
+        elif s.reused:
+            self.count('avoided')
+            age = self.age()
+            if age is not None and age > self.ttl / 2:
+                self._save_from(session, 'refresh')
+        elif first_save:
+            self._save_from(session, 'warmup')
+
+    def _save_from(self, session, source):
+        try:
+            state = session.storage_state()
+        except Exception as e:
+            logger.warning(f"⚠️ storage_state: {e}")
+            return
+        self.save(state, source)
+
+    # ── метрики ──────────────────────────────────────────────────────────────
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.stats_path is None:
+            return
+        hour = datetime.fromtimestamp(self.clock()).strftime('%Y-%m-%dT%H')
+        try:
+            self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock, open(self.stats_path, 'a+', encoding='utf-8') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    data = json.loads(f.read() or '{}')
+                except ValueError:
+                    data = {}
+                bucket = data.setdefault(hour, {})
+                bucket[name] = bucket.get(name, 0) + n
+                for old in sorted(data)[:-STATS_KEEP_HOURS]:
+                    del data[old]
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(data, ensure_ascii=False, sort_keys=True))
+        except OSError:
+            pass
+
+    def totals(self, hours: int = 24) -> dict:
+        """Сумма счётчиков за последние hours часов."""
+        out = dict.fromkeys(COUNTERS, 0)
+        if self.stats_path is None:
+            return out
+        try:
+            data = json.loads(self.stats_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return out
+        since = (datetime.fromtimestamp(self.clock()) - timedelta(hours=hours - 1)).strftime('%Y-%m-%dT%H')
+        for hour, bucket in data.items():
+            if hour >= since and isinstance(bucket, dict):
+                for k, v in bucket.items():
+                    out[k] = out.get(k, 0) + int(v)
+        return out
+
+    def per_day(self, days: int = 7) -> dict:
+        """{дата: счётчики} за последние days дней."""
+        out = {}
+        if self.stats_path is None:
+            return out
+        try:
+            data = json.loads(self.stats_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return out
+        first = (datetime.fromtimestamp(self.clock()) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        for hour, bucket in sorted(data.items()):
+            day = hour[:10]
+            if day >= first and isinstance(bucket, dict):
+                acc = out.setdefault(day, dict.fromkeys(COUNTERS, 0))
+                for k, v in bucket.items():
+                    acc[k] = acc.get(k, 0) + int(v)
+        return out
+
+
+_DEFAULT = None
+
+
+def default_store() -> SessionStore:
+    """Общий экземпляр процесса (пути и TTL — из env)."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = SessionStore()
+    return _DEFAULT
+
+
+if __name__ == '__main__':
+    # Сводка по дням: cd scripts && python3 -m common.session_store
+    for day, c in default_store().per_day(14).items():
+        print(f"{day}  капч решено {c['solves']:>3}  сэкономлено {c['avoided']:>3}  "
+              f"сессий: из сохранённой {c['reused']:>3} (капча {c['reused_captcha']}), "
+              f"с нуля {c['fresh']:>3} (капча {c['fresh_captcha']}), сбросов {c['invalidated']}")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты фильтра запросов Playwright (common.browser) — без браузера.
+
+Запуск:  python3 scripts/common/test_browser.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import browser  # noqa: E402
+from common.browser import AVG_BYTES, ResourceFilter, new_context  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+class FakeRequest:
+    def __init__(self, rtype, url):
+        self.resource_type, self.url = rtype, url
+
+
+class FakeRoute:
+    def __init__(self, rtype, url):
+        self.request = FakeRequest(rtype, url)
+        self.result = None
+
+    def continue_(self):
+        self.result = "continue"
+
+    def abort(self):
+        self.result = "abort"
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes, self.scripts, self.kwargs = [], [], None
+
+    def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    def add_init_script(self, js):
+        self.scripts.append(js)
+
+
+class FakeBrowser:
+    def new_context(self, **kw):
+        ctx = FakeContext()
+        ctx.kwargs = kw
+        return ctx
+
+
+print("[1] Решение пропустить/отрезать")
+f = ResourceFilter()
+AV = "https://www.avito.ru/moskva/noutbuki?q=macbook"
+check("документ Авито", f.allows("document", AV))
+check("скрипт и XHR Авито", f.allows("script", "https://www.avito.st/s/app.js")
+      and f.allows("xhr", "https://www.avito.ru/web/1/firewallCaptcha/verify"))
+check("картинка/шрифт/CSS/видео — мимо", not any(
+    f.allows(t, "https://00.img.avito.st/image/1/x.jpg") for t in ("image", "font", "stylesheet", "media")))
+check("капча GeeTest — целиком, даже картинки",
+      f.allows("image", "https://static.geetest.com/captcha_v4/bg.png")
+      and f.allows("stylesheet", "https://gcaptcha4.geetest.com/load"))
+check("скрипт счётчика — мимо", not f.allows("script", "https://mc.yandex.ru/metrika/tag.js"))
+check("трекер по пути хоста", not f.allows("xhr", "https://vk.com/rtrg?p=VK-RTRG-1"))
+check("vk.com без rtrg не трекер", f.allows("script", "https://vk.com/js/api/openapi.js"))
+check("хост, похожий на капчу, не пропускается",
+      not f.allows("image", "https://notgeetest.com/x.png")
+      and not f.allows("image", "https://geetest.com.evil.ru/x.png"))
+
+print("\n[2] Обработчик route и счётчики")
+f = ResourceFilter()
+routes = [FakeRoute("document", AV), FakeRoute("image", "https://img.avito.st/a.jpg"),
+          FakeRoute("image", "https://img.avito.st/b.jpg"), FakeRoute("font", "https://avito.st/f.woff2"),
+          FakeRoute("script", "https://www.googletagmanager.com/gtm.js")]
+for r in routes:
+    f.handle(r)
+check("continue/abort", [r.result for r in routes] == ["continue", "abort", "abort", "abort", "abort"])
+check("счётчики по типам", f.allowed == 1 and f.blocked == {"image": 2, "font": 1, "script": 1})
+check("оценка сэкономленных байт",
+      f.saved_bytes == 2 * AVG_BYTES["image"] + AVG_BYTES["font"] + AVG_BYTES["script"])
+check("итог в строке", "отрезано 4" in f.summary() and "image 2" in f.summary())
+
+
+class ListLog:
+    def __init__(self):
+        self.lines = []
+
+    def info(self, msg):
+        self.lines.append(msg)
+
+
+log = ListLog()
+f.log_summary(log)
+check("log_summary пишет и обнуляет", len(log.lines) == 1 and f.n_blocked == 0 and f.saved_bytes == 0)
+f.log_summary(log)
+check("пустой фильтр — без строки в логе", len(log.lines) == 1)
+
+print("\n[3] Фабрика контекста")
+ctx = new_context(FakeBrowser(), "UA/1", ResourceFilter())
+check("stealth-настройки", ctx.kwargs["user_agent"] == "UA/1" and ctx.kwargs["locale"] == "ru-RU"
+      and ctx.scripts == [browser.STEALTH_JS])
+check("route на все запросы", [p for p, _ in ctx.routes] == ["**/*"])
+check("без фильтра — без route", new_context(FakeBrowser(), "UA/1").routes == [])
+browser.BLOCK_RESOURCES = 0
+check("BLOCK_RESOURCES=0 — без route", new_context(FakeBrowser(), "UA/1", ResourceFilter()).routes == [])
+browser.BLOCK_RESOURCES = 1
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
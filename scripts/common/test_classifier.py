@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты классификатора: однопроходный движок против прежней реализации
+и кэш classify() (common.classifier.ClassifyCache).
+
+Запуск:  python3 scripts/common/test_classifier.py
+"""
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# кэш classify — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import classifier  # noqa: E402
+from common.bench_classify import classify_reference, corpus  # noqa: E402
+from common.classifier import ClassifyCache, _classify  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+tmp = Path(tempfile.mkdtemp())
+TITLES_ALL = corpus()
+
+print(f"[0] Движок = прежний classify ({len(TITLES_ALL)} заголовков)")
+bad = [t for t in TITLES_ALL if _classify(t) != classify_reference(t)]
+check("корпус: без расхождений", not bad)
+SPECS = {'ram': 32, 'ssd': 1024}
+bad = [t for t in TITLES_ALL if _classify(t, SPECS) != classify_reference(t, SPECS)]
+check("со specs", not bad)
+VOCAB = ['mac', 'imac', 'pro', 'book', 'macbook', 'mini', 'studio', 'air', 'mbp', 'mba', 'аймак', 'макбук',
+         'про', 'эйр', 'm1', 'm2 pro', 'M3 Max', 'm4ultra', 'i5', 'i7', 'intel', 'Core', '13', '14', '15', '16',
+         '24', '27', '2019', '2023', '2020г', '16/512', '8/256gb', '16 512', '1tb', '512gb', '16gb', '1600',
+         '13.3', '"', '/', '-', '\xa0', 'x16gb', '5/512gb', '12345gb', '1512gb', 'm12', '16 гб', '16гб',
+         '24/1тб', '2tb', 'inch', 'дюйм', 'MacBook Pro', 'Mac Pro', '\n', '8', '256', '32 1000', '64/2048',
+         'a2338', '_16', 'tb', 'gb', 'гб', 'm8', 'm1 tb', 'm8gb', 'i3', 'i9', 'm16']
+rng = random.Random(7)
+fuzz = [''.join(rng.choice(VOCAB) + rng.choice(['', ' ', ' ', '  ', ',', '/']) for _ in range(rng.randint(1, 7)))
+        for _ in range(20000)]
+fuzz += [t.upper() for t in fuzz[:2000]]
+bad = [t for t in fuzz if _classify(t) != classify_reference(t)]
+check(f"случайные склейки токенов ({len(fuzz)}): без расхождений", not bad)
+for t in bad[:5]:
+    print(f"     {t!r}: {classify_reference(t)} → {_classify(t)}")
+check("«MacBook Air 13 M2 tb» — цифра чипа с единицей: SSD 2 ТБ, как прежде",
+      _classify("MacBook Air 13 M2 tb").ssd == 2048 and (_classify("Mac mini M8gb 512gb").ram, _classify("Mac mini M8gb 512gb").ssd) == (8, 512))
+# по строке на ветку _TOKEN (classifier._BRANCHES): ветка токена → поля
+BRANCH_CASES = [
+    ("16/512", 'num', dict(ram=16, ssd=512, screen=None)),
+    ("16 512", 'num', dict(ram=16, ssd=512, screen=16)),
+    ("16gb 1tb", 'num', dict(ram=16, ssd=1024)),
+    ("2023", 'num', dict(year=2023)),
+    ("imac 24", 'family', dict(family='iMac', screen=24)),
+    ("mac studio", 'family', dict(family='Mac Studio')),
+    ("mac mini", 'family', dict(family='Mac mini')),
+    ("mac pro", 'family', dict(family='Mac Pro')),
+    ("macbook pro 14", 'family', dict(family='MacBook Pro', screen=14)),
+    ("macbook air", 'family', dict(family='MacBook Air')),
+    ("mbp 16", 'mb', dict(family='MacBook Pro', screen=16)),
+    ("mba", 'mb', dict(family='MacBook Air')),
+    ("m2 tb", 'chip_tok', dict(chip_gen='M2', chip_tier='base', ssd=2048)),
+    ("m3 max", 'chip_tok', dict(chip_gen='M3', chip_tier='Max')),
+    ("i7", 'intel_tok', dict(chip_gen='Intel')),
+    ("intel core", 'intel_tok', dict(chip_gen='Intel')),
+    ("макбук эйр", 'ru', dict(family='MacBook Air')),
+    ("макбук про", 'ru', dict(family='MacBook Pro')),
+    ("макбук", 'ru', dict(family='MacBook')),
+    ("аймак", 'ru', dict(family='iMac')),
+]
+for title, branch, want in BRANCH_CASES:
+    got = _classify(title)
+    check(f"ветка {branch}: {title!r} → {want}",
+          classifier._TOKEN.match(title).lastgroup == branch
+          and all(getattr(got, k) == v for k, v in want.items()))
+check("каждая ветка _TOKEN покрыта строкой",
+      {b for _, b, _ in BRANCH_CASES} == {name for name, _ in classifier._BRANCHES})
+check("«imac pro» — как прежде Mac Pro, «mac pro book» — без семейства",
+      _classify("iMac Pro 27").family == 'Mac Pro' and _classify("mac pro book").family is None)
+
+print(f"\n[1] Кэш не меняет результат ({len(TITLES_ALL)} заголовков)")
+cache = ClassifyCache(maxsize=100_000, path=None)
+variants = []
+for t in TITLES_ALL:
+    variants += [t, t.upper(), f"  {t.replace(' ', '   ')} "]
+bad = [t for t in variants if cache.classify(t) != _classify(t)]
+check("промах = как без кэша (регистр и пробелы не важны)", not bad)
+bad = [t for t in variants if cache.classify(t) != _classify(t)]
+check("попадание = как без кэша", not bad)
+check("счётчики попаданий", cache.hits >= len(variants) and cache.misses <= len(TITLES_ALL))
+spec = cache.classify("MacBook Air 13 M2", {'ram': 16, 'ssd': 512})
+check("specs входят в ключ", spec.ram == 16 and cache.classify("MacBook Air 13 M2").ram == 0)
+check("нецелые specs — мимо кэша, но как раньше",
+      cache.classify("MacBook Air 13 M2", {'ram': '16'}) == _classify("MacBook Air 13 M2", {'ram': '16'}))
+c1 = cache.classify("MacBook Air 13 M3 16/256")
+c1.ram = 99
+check("каждое попадание — новый объект (билдер правит конфиг)",
+      cache.classify("MacBook Air 13 M3 16/256").ram == 16)
+
+batch = ClassifyCache(maxsize=1000, path=None)
+titles = TITLES_ALL[:300]
+many = batch.classify_many(titles + titles[:50], [None] * 300 + [{'ram': 16, 'ssd': 512}] * 50)
+check("classify_many = classify по одному",
+      many[:300] == [_classify(t) for t in titles]
+      and many[300:] == [_classify(t, {'ram': 16, 'ssd': 512}) for t in titles[:50]])
+check("classify_many: повторная пачка — из кэша", batch.classify_many(titles) == many[:300]
+      and batch.hits >= 300)
+
+print("\n[2] LRU")
+small = ClassifyCache(maxsize=2, path=None)
+for t in ("MacBook Air 13 M1 8/256", "MacBook Air 13 M2 8/256", "MacBook Air 13 M1 8/256",
+          "MacBook Air 13 M3 8/256"):
+    small.classify(t)
+check("не больше maxsize", len(small._data) == 2)
+small.classify("MacBook Air 13 M1 8/256")
+check("недавний заголовок выжил", small.hits == 2)
+off = ClassifyCache(maxsize=0, path=None)
+off.classify("MacBook Air 13 M1 8/256")
+check("CLASSIFY_CACHE_SIZE=0 — без кэша", not off._data and not off.hits and not off.misses)
+
+print("\n[3] Файл между процессами")
+path = tmp / 'classify.marshal'
+a = ClassifyCache(maxsize=100, path=path)
+a.classify("MacBook Pro 14 M3 Pro 18/512")
+a.log_summary()
+check("сохранён", path.exists())
+b = ClassifyCache(maxsize=100, path=path)
+b.classify("mac book pro 14 m3 pro 18/512")
+b.classify("MacBook Pro 14 M3 Pro 18/512")
+check("новый процесс попадает в кэш с диска", b.hits == 1 and b.disk_loaded == 1)
+check("итог с долей попаданий", "50%" in b.summary())
+b.log_summary()
+other = ClassifyCache(maxsize=100, path=path)
+other.classify("iMac 24 M4 16/256")
+other.save()
+b.classify("Mac mini M4 16/256")
+b.save()
+c = ClassifyCache(maxsize=100, path=path)
+c.classify("iMac 24 M4 16/256")
+check("запись сливается с чужой", c.hits == 1 and c.disk_loaded == 4)
+classifier.CLASSIFIER_SIG, sig = 'другой', classifier.CLASSIFIER_SIG
+check("правка классификатора — файл не подходит", ClassifyCache(path=path)._read_file() == [])
+classifier.CLASSIFIER_SIG = sig
+path.write_bytes(b'\x00oops')
+d = ClassifyCache(path=path)
+check("битый файл — пустой кэш", d.classify("iMac 24 M4 16/256").is_valid and d.misses == 1)
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты извлечения карточек выдачи (common.extract).
+
+Запуск:  python3 scripts/common/test_extract.py
+Сверка с прежним bs4-разбором — если установлен beautifulsoup4.
+"""
+import html
+import json
+import sys
+from pathlib import Path
+from urllib.parse import quote
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.extract import (  # noqa: E402
+    extract_listings, extract_state_listings, listings_from_page, parse_age)
+from common import bench_extract  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+PAGE = """<html><body>
+<a data-marker="item-title" href="/outside" title="вне карточки">x</a>
+<div class="items">
+ <div data-marker="item">
+   <a data-marker="item-title" href="/moskva/noutbuki/air_1?context=abc" title="MacBook Air 13 M2 8/256">
+     <h3>ignored</h3></a>
+   <meta itemprop="price" content="65000">
+   <div data-marker="item-description"><p>Отличное <b>состояние</b></p>, акб 90%</div>
+   <p data-marker="item-date">15 минут назад</p>
+ </div>
+ <div data-marker="item">
+   <a data-marker="item-title" href="/moskva/noutbuki/pro_2"><h3>MacBook Pro 14</h3> <span>M3 18/512</span></a>
+   <meta itemprop="price" content="">
+   <p class="styles-date">вчера</p>
+ </div>
+ <div data-marker="item">
+   <span>без ссылки-заголовка</span><meta itemprop="price" content="70000">
+ </div>
+ <div data-marker="item">
+   <a data-marker="item-title" href="/moskva/noutbuki/mini_4" title="Mac mini M4 16/256"></a>
+   <meta itemprop="price" content="55000"><meta itemprop="price" content="1">
+   <div class="x-dateInfo">3 дня назад</div>
+ </div>
+ <h2>12 объявлений есть в других городах</h2>
+ <div data-marker="item">
+   <a data-marker="item-title" href="/kazan/noutbuki/air_9" title="MacBook Air M1 в Казани"></a>
+   <meta itemprop="price" content="40000">
+ </div>
+</div>
+</body></html>"""
+
+
+print("[1] Поля карточек")
+items, n = extract_listings(PAGE)
+by = {i["href"].split("?")[0].rsplit("/", 1)[-1]: i for i in items}
+check("n_items считает все карточки (с отсечкой — без хвоста)", n == 5)
+check("карточка без заголовка пропущена", len(items) == 4)
+check("заголовок из title=", by["air_1"]["title"] == "MacBook Air 13 M2 8/256")
+check("заголовок из текста ссылки (strip)", by["pro_2"]["title"] == "MacBook Pro 14M3 18/512")
+check("абсолютный url", by["air_1"]["url"] == "https://www.avito.ru/moskva/noutbuki/air_1?context=abc")
+check("цена из content", by["air_1"]["price"] == 65000)
+check("пустой content → price None", by["pro_2"]["price"] is None)
+check("первый itemprop=price", by["mini_4"]["price"] == 55000)
+check("описание через пробел", " ".join(by["air_1"]["description"].split()) == "Отличное состояние , акб 90%")
+check("дата item-date", (by["air_1"]["age_str"], by["air_1"]["minutes_ago"]) == ("15 мин", 15))
+check("дата p[class*=date]", by["pro_2"]["minutes_ago"] == 60 * 24)
+check("дата [class*=dateInfo]", by["mini_4"]["minutes_ago"] == 3 * 1440)
+check("ссылка вне карточки не прилипает", all(i["href"] != "/outside" for i in items))
+
+print("\n[2] Блок «есть в других городах»")
+items2, n2 = extract_listings(PAGE, drop_other_cities=True)
+check("карточки после блока отсечены", "air_9" not in {i["href"].rsplit("/", 1)[-1] for i in items2})
+check("n_items без отсечённых", n2 == 4)
+check("пустой/битый HTML", extract_listings("") == ([], 0))
+
+print("\n[3] parse_age")
+check("часы", parse_age("2 часа назад") == ("2 ч", 120))
+check("дни", parse_age("5 дней назад") == ("5 дн", 5 * 1440))
+check("непонятное → 999", parse_age("12 июля") == ("?", 999))
+
+print("\n[4] Сверка с прежним bs4-разбором")
+if bench_extract.BeautifulSoup is None:
+    print("  ⏭ beautifulsoup4 не установлен — пропуск")
+else:
+    check("фикстура: результат как у bs4", bench_extract.bs4_collect(PAGE) == extract_listings(PAGE))
+    syn = bench_extract.synthetic_page(n_items=30, filler_kb=20)
+    check("синтетическая страница: как у bs4", bench_extract.bs4_collect(syn) == extract_listings(syn))
+
+print("\n[5] Встроенное состояние страницы")
+NOW = 1_700_000_000
+STATE = {"data": {"catalog": {
+    "items": [
+        {"id": 1, "title": "MacBook Air 13 M2 8/256", "urlPath": "/moskva/noutbuki/air_1",
+         "description": "акб 90% & коробка", "priceDetailed": {"value": 65000},
+         "sortTimeStamp": (NOW - 15 * 60) * 1000, "sellerId": 777},
+        {"type": "banner", "id": "ad-slot"},
+        {"id": 2, "title": "MacBook Pro 14", "urlPath": "/moskva/noutbuki/pro_2",
+         "priceDetailed": {"value": ""}, "sortTimeStamp": (NOW - 3 * 86400) * 1000},
+    ],
+    "extraBlockItems": [{"title": "в Казани", "urlPath": "/kazan/noutbuki/air_9",
+                         "priceDetailed": {"value": 40000}}],
+}}}
+mfe = ('<html><body><script type="mime/invalid" data-mfe-state="true">'
+       + html.escape(json.dumps(STATE, ensure_ascii=False)) + '</script>' + PAGE)
+st = extract_state_listings(mfe, now=NOW)
+check("data-mfe-state разобран", st is not None and st[1] == 2)
+s1 = st[0][0] if st else {}
+check("поля из состояния", (s1.get("title"), s1.get("price"), s1.get("url")) ==
+      ("MacBook Air 13 M2 8/256", 65000, "https://www.avito.ru/moskva/noutbuki/air_1"))
+check("HTML-экранирование снято", s1.get("description") == "акб 90% & коробка")
+check("seller_id и published_ts", (s1.get("seller_id"), s1.get("published_ts")) == ("777", NOW - 900))
+check("возраст из времени публикации", (s1.get("age_str"), s1.get("minutes_ago")) == ("15 мин", 15))
+check("пустая цена → None, возраст в днях",
+      st is not None and (st[0][1]["price"], st[0][1]["age_str"]) == (None, "3 дн"))
+check("extraBlockItems («другие города») не берутся",
+      st is not None and all("kazan" not in i["href"] for i in st[0]))
+check("extract_listings берёт состояние", extract_listings(mfe)[1] == 2)
+check("use_state=False → DOM", extract_listings(mfe, use_state=False)[1] == 5)
+
+init = ('<script>window.__initialData__ = "' + quote(json.dumps(STATE)).replace('"', '\\"')
+        + '";</script>' + PAGE)
+st2 = extract_state_listings(init, now=NOW)
+check("window.__initialData__ (URL-кодирован)", st2 is not None and st2[0][0]["seller_id"] == "777")
+check("нет состояния → None", extract_state_listings(PAGE) is None)
+broken = '<script data-mfe-state="true">{"data": [не json</script>' + PAGE
+check("битое состояние → DOM", extract_listings(broken)[1] == 5)
+check("состояние без выдачи → DOM", extract_listings(
+    '<script data-mfe-state>' + html.escape(json.dumps({"user": {"id": 1}})) + '</script>' + PAGE)[1] == 5)
+
+
+class FakePage:
+    def __init__(self, payloads, content, fail=False):
+        self.payloads, self._content, self.fail, self.content_calls = payloads, content, fail, 0
+
+    def evaluate(self, js):
+        if self.fail:
+            raise RuntimeError("page closed")
+        return self.payloads
+
+    def content(self):
+        self.content_calls += 1
+        return self._content
+
+
+fp = FakePage([["mfe", html.escape(json.dumps(STATE))]], PAGE)
+items_p, n_p = listings_from_page(fp)
+check("page.evaluate: без page.content()", n_p == 2 and fp.content_calls == 0)
+fp2 = FakePage([], PAGE)
+check("нет состояния → page.content() + DOM (с отсечкой)",
+      listings_from_page(fp2, drop_other_cities=True)[1] == 4 and fp2.content_calls == 1)
+check("evaluate упал → DOM", listings_from_page(FakePage(None, PAGE, fail=True))[1] == 5)
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
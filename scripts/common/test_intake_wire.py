@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты формата intake-пачек (common.intake_wire).
+
+Запуск:  python3 scripts/common/test_intake_wire.py
+"""
+import gzip
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import intake_wire as iw  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+def raises(exc, fn, *a):
+    try:
+        fn(*a)
+    except exc:
+        return True
+    except Exception:
+        return False
+    return False
+
+
+P = 'https://www.avito.ru/moskva/noutbuki/'
+CARDS = [{'url': P + 'macbook_air_13_m2_%d' % i, 'title': 'MacBook Air 13 M2 16/512', 'price': 60000 + i,
+          'date': '%d минут назад' % i} for i in range(50)]
+CARDS += [{'url': 'https://www.avito.ru/sankt-peterburg/noutbuki/mbp_1', 'price': 99000, 'title': 'MBP'},
+          {'url': 'без-слэша', 'price': 1}, {'url': None, 'price': 2}]
+
+print("\n[1] компактная схема")
+packed = iw.pack_cards(CARDS + ['junk'])
+check("без потерь: те же карточки, те же ключи по порядку",
+      [list(c.items()) for c in iw.unpack_cards(packed)] == [list(c.items()) for c in CARDS])
+check("префикс url и форма — один раз на пачку",
+      packed['prefixes'][0] == P and len(packed['shapes']) == 3 and len(packed['rows']) == len(CARDS))
+check("прошла через JSON", iw.unpack_cards(json.loads(json.dumps(packed))) == CARDS)
+check("cards_of: обычная пачка", iw.cards_of({'cards': CARDS[:2]}) == CARDS[:2])
+check("cards_of: cards не список → пусто", iw.cards_of({'cards': 'x'}) == [])
+check("cards_of: компактная", iw.cards_of(packed) == CARDS)
+for name, bad in (('чужая схема', {'schema': 'cards/9', 'prefixes': [], 'shapes': [], 'rows': []}),
+                  ('индекс формы за краем', {'schema': iw.SCHEMA, 'prefixes': [], 'shapes': [['a']], 'rows': [[1, 5]]}),
+                  ('отрицательный индекс', {'schema': iw.SCHEMA, 'prefixes': [], 'shapes': [['a']], 'rows': [[-1, 5]]}),
+                  ('длина строки ≠ форме', {'schema': iw.SCHEMA, 'prefixes': [], 'shapes': [['a']], 'rows': [[0]]}),
+                  ('префикс url за краем', {'schema': iw.SCHEMA, 'prefixes': [], 'shapes': [['url']],
+                                            'rows': [[0, [0, 'x']]]}),
+                  ('rows не список', {'schema': iw.SCHEMA, 'prefixes': [], 'shapes': [], 'rows': 'x'})):
+    check(f"битая пачка: {name} → ValueError", raises(ValueError, iw.unpack_cards, bad))
+
+print("\n[2] сжатие и лимит после распаковки")
+raw = json.dumps({'cards': CARDS}).encode()
+for enc in ('identity',) + iw.ENCODINGS:
+    check(f"{enc}: туда-обратно", iw.decompress(iw.compress(raw, enc), enc, len(raw)) == raw)
+    check(f"{enc}: больше лимита после распаковки → BodyTooLarge",
+          raises(iw.BodyTooLarge, iw.decompress, iw.compress(raw, enc), enc, len(raw) - 1))
+bomb = gzip.compress(b' ' * (4 << 20))
+check("gzip-бомба 4 МБ (сжата в ~4 КБ) → BodyTooLarge при лимите 2 МБ",
+      len(bomb) < 10000 and raises(iw.BodyTooLarge, iw.decompress, bomb, 'gzip', 2 << 20))
+check("обрезанный gzip → ValueError (не BodyTooLarge)",
+      raises(ValueError, iw.decompress, gzip.compress(raw)[:-20], 'gzip', 1 << 20)
+      and not raises(iw.BodyTooLarge, iw.decompress, gzip.compress(raw)[:-20], 'gzip', 1 << 20))
+check("мусор вместо gzip → ValueError", raises(ValueError, iw.decompress, b'nope', 'gzip', 100))
+check("незнакомое сжатие → UnsupportedEncoding", raises(iw.UnsupportedEncoding, iw.decompress, raw, 'br', 1 << 20)
+      and not iw.supported('br') and iw.supported('GZIP') and iw.supported(None))
+if iw.zstandard is None:
+    check("без zstandard: zstd не предлагается", 'zstd' not in iw.offer()['encodings']
+          and raises(iw.UnsupportedEncoding, iw.decompress, b'', 'zstd', 1))
+else:
+    check("zstd-бомба → BodyTooLarge",
+          raises(iw.BodyTooLarge, iw.decompress, iw.compress(b' ' * (4 << 20), 'zstd'), 'zstd', 2 << 20))
+
+print("\n[3] согласование и пачка целиком")
+best = iw.ENCODINGS[0]
+check("сервер с тем же набором → лучшее общее сжатие, схема не нужна", iw.choose(iw.offer()) == (best, False))
+check("старый сервер без wire → как есть", iw.choose(None) == ('identity', False))
+check("сервер только с gzip", iw.choose({'encodings': ['gzip'], 'schemas': []}) == ('gzip', False))
+check("prefer=gzip, compact=True", iw.choose(iw.offer(), prefer='gzip', compact=True) == ('gzip', True))
+check("без сжатия (prefer=identity) → компактная схема", iw.choose(iw.offer(), prefer='identity') == ('identity', True))
+check("сервер без схемы, без сжатия → обычный JSON",
+      iw.choose({'encodings': [], 'schemas': []}, compact=True) == ('identity', False))
+check("компактная выключена у клиента", iw.choose(iw.offer(), prefer='identity', compact=False) == ('identity', False))
+for enc, compact in (('identity', False), ('gzip', False), ('gzip', True), (best, True)):
+    body, headers = iw.encode_batch(CARDS, enc, compact)
+    check(f"encode/decode_batch {enc}{' compact' if compact else ''}",
+          iw.decode_batch(body, headers.get('content-encoding'), 1 << 20) == CARDS)
+check("компактная меньше обычной (без сжатия)",
+      len(iw.encode_batch(CARDS, 'identity', True)[0]) < 0.8 * len(iw.encode_batch(CARDS)[0]))
+check("decode_batch: не объект → ValueError", raises(ValueError, iw.decode_batch, b'[1]', None, 100))
+check("decode_batch: пустое тело → пусто", iw.decode_batch(b'', None, 100) == [])
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты common.market: modal_center / modal_centers, robust_stats /
+LiveMarket / robust_stats_many против прежних реализаций
+(common.bench_market.modal_center_reference, robust_stats_reference).
+
+Запуск:  python3 scripts/common/test_market.py
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import market  # noqa: E402
+from common.bench_market import modal_center_reference, robust_stats_reference, synthetic_store  # noqa: E402
+from common.market import LiveMarket, modal_center, modal_centers, robust_stats, robust_stats_many  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+rng = random.Random(3)
+STORE = {}
+for k in range(2000):
+    n = rng.choice([0, 1, 2, 3, 4, 5, 8, 9, 30, 120])
+    base = rng.choice([30000, 60000, 150000])
+    step = rng.choice([1, 500, 5000])       # крупный шаг — много равных цен и ничьих
+    STORE[f"k{k}"] = [max(1, int(rng.gauss(base, base * 0.1)) // step * step) for _ in range(n)]
+STORE.update(synthetic_store(5, 400, seed=9))
+
+print(f"[1] modal_center = прежний ({len(STORE)} выборок)")
+bad = [k for k, v in STORE.items() if modal_center(v) != modal_center_reference(v)]
+check("окно по умолчанию", not bad)
+bad = [(k, w) for k, v in STORE.items() for w in (0, 3000, 20000)
+       if modal_center(v, w) != modal_center_reference(v, w)]
+check("явное окно (0, 3000, 20000)", not bad)
+skew = [48000, 49000, 50000, 50000, 51000, 52000, 75000, 80000, 85000]
+check("скошенная выборка: центр у горба", 48000 <= modal_center(skew) <= 52000)
+check("n<4 → обычная медиана, пусто → 0", modal_center([40000, 60000, 90000]) == 60000 and modal_center([]) == 0)
+rev = skew[::-1]
+modal_center(rev)
+check("вход не сортируется на месте", rev[0] == 85000)
+
+print("\n[2] modal_centers — пакет по всем ключам")
+ref = {k: modal_center(v) for k, v in STORE.items()}
+check("чистый Python = по одному", modal_centers(STORE, use_numpy=False) == ref)
+if market.np is not None:
+    check("NumPy = по одному", modal_centers(STORE, use_numpy=True) == ref)
+    check("NumPy, явное окно",
+          modal_centers(STORE, 3000, use_numpy=True) == {k: modal_center(v, 3000) for k, v in STORE.items()})
+    check("NumPy: пустой пакет и только пустые выборки",
+          modal_centers({}, use_numpy=True) == {} and modal_centers({'a': []}, use_numpy=True) == {'a': 0})
+else:
+    print("  (NumPy нет — векторный путь не проверяется)")
+check("авто-выбор пути — тот же результат", modal_centers(STORE) == ref)
+check("ключи сохраняются", list(modal_centers({'b': [1], 'a': [2, 3]})) == ['b', 'a'])
+
+print(f"\n[3] robust_stats = прежний ({len(STORE)} выборок)")
+DIRTY = {k: v + rng.choice([[], [], [0], [-500, 1000], [900000]]) for k, v in STORE.items()}
+bad = [k for k, v in DIRTY.items() if robust_stats(v) != robust_stats_reference(v)]
+check("с нулями, отрицательными и выбросами", not bad)
+
+print("\n[4] LiveMarket — leave-one-out без пересортировки")
+before = {k: list(v) for k, v in DIRTY.items()}
+book = LiveMarket(DIRTY)
+bad = []
+for k, v in DIRTY.items():
+    for price in {*v[:5], 12345, 0, -500}:
+        comps = list(v)
+        if price in comps:
+            comps.remove(price)
+        if book.stats(k, exclude=price) != robust_stats_reference(comps):
+            bad.append((k, price))
+check("stats(ключ, exclude) = remove + robust_stats", not bad)
+misses = book.misses
+check("повторный запрос — из кэша", book.stats('k0', exclude=12345) is book.stats('k0', exclude=12345)
+      and book.misses == misses and book.hits > 0)
+check("нет корзины → None", book.stats('нет такого', exclude=75000) is None)
+check("корзины не мутируются", DIRTY == before)
+whole = {k: robust_stats_reference(v) for k, v in DIRTY.items()}
+check("robust_stats_many, чистый Python", robust_stats_many(DIRTY, use_numpy=False) == whole)
+if market.np is not None:
+    check("robust_stats_many, NumPy", robust_stats_many(DIRTY, use_numpy=True) == whole)
+    check("NumPy: пусто и только неположительные",
+          robust_stats_many({}, use_numpy=True) == {}
+          and robust_stats_many({'a': [0, -1], 'b': []}, use_numpy=True) == {'a': None, 'b': None})
+book2 = LiveMarket(DIRTY)
+check("all_stats заполняет кэш", book2.all_stats() == whole and book2.stats('k1') == whole['k1']
+      and book2.misses == 0)
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты адаптивного темпа запросов (common.pacing) — без сети и без сна.
+
+Запуск:  python3 scripts/common/test_pacing.py
+"""
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import pacing  # noqa: E402
+from common.pacing import SCALE_ITEM, Pacer, host_of  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+class Clock:
+    def __init__(self, t=1_760_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+tmp = Path(tempfile.mkdtemp())
+clock = Clock()
+slept = []
+AV = "https://www.avito.ru/moskva/noutbuki?q=macbook&p=2"
+
+
+def make(**kw):
+    args = dict(path=tmp / 'pace.json', start=3.5, min_delay=1.0, max_delay=30.0,
+                step=0.02, backoff=2.0, adaptive=True, sleep=slept.append, clock=clock,
+                rng=random.Random(1))
+    args.update(kw)
+    return Pacer(**args)
+
+
+print("[1] Пауза и разброс")
+p = make()
+check("хост из URL", host_of(AV) == "www.avito.ru" and host_of("www.avito.ru") == "www.avito.ru")
+check("старт — PACE_START_SEC", p.delay(AV) == 3.5)
+d = p.wait(AV)
+check("wait спит через переданный sleep", slept == [d])
+check("разброс ±30%", 3.5 * 0.7 <= d <= 3.5 * 1.3)
+d = p.wait(AV, SCALE_ITEM)
+check("scale для карточек", 3.5 * SCALE_ITEM * 0.7 <= d <= 3.5 * SCALE_ITEM * 1.3)
+
+print("\n[2] AIMD")
+for _ in range(10):
+    p.success(AV)
+expect = 1 / (1 / 3.5 + 10 * 0.02)
+check("удачи: частота растёт аддитивно", abs(p.delay(AV) - expect) < 1e-9)
+for _ in range(500):
+    p.success(AV)
+check("не быстрее PACE_MIN_SEC", p.delay(AV) == 1.0)
+p.backoff(AV, 'captcha')
+check("капча: пауза ×2", p.delay(AV) == 2.0)
+p.backoff(AV, 'empty')
+check("второй сигнал в окне удержания — то же событие", p.delay(AV) == 2.0)
+clock.t += pacing.BACKOFF_HOLD_SEC + 1
+p.backoff(AV, 'http429')
+check("после окна — снова ×2", p.delay(AV) == 4.0)
+for _ in range(10):
+    clock.t += pacing.BACKOFF_HOLD_SEC + 1
+    p.backoff(AV, 'captcha')
+check("не медленнее PACE_MAX_SEC", p.delay(AV) == 30.0)
+check("другой хост не затронут", p.delay("https://m.avito.ru/x") == 3.5)
+check("итог с причинами", "captcha" in p.summary() and "http429" in p.summary()
+      and "удачных 510" in p.summary())
+
+print("\n[3] Состояние между запусками")
+p.log_summary()
+data = json.loads((tmp / 'pace.json').read_text())
+check("сохранено по хосту", data["www.avito.ru"]["delay"] == 30.0)
+check("счётчики прогона обнулены", not p.ok and not p.backoffs)
+check("новый процесс стартует с сохранённой паузы", make().delay(AV) == 30.0)
+other = make()
+clock.t += 5
+other.success(AV)
+other.flush()
+p._dirty = True
+p.flush()
+check("при слиянии побеждает более свежая запись",
+      json.loads((tmp / 'pace.json').read_text())["www.avito.ru"]["delay"] < 30.0)
+clock.t += (pacing.FORGET_HOURS + 1) * 3600
+check("запись старше суток забыта", make().delay(AV) == 3.5)
+(tmp / 'pace.json').write_text('{oops')
+check("битый файл — старт", make().delay(AV) == 3.5)
+
+print("\n[4] PACE_ADAPTIVE=0")
+fixed = make(adaptive=False, path=tmp / 'fixed.json')
+fixed.success(AV)
+fixed.backoff(AV, 'captcha')
+check("пауза фиксирована", fixed.delay(AV) == 3.5)
+fixed.flush()
+check("и не сохраняется", not (tmp / 'fixed.json').exists())
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты индекса базы цен с бинарным сайдкаром (common.price_index).
+
+Запуск:  python3 scripts/common/test_price_index.py
+"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# кэш classify — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import price_index  # noqa: E402
+from common.classifier import classify, config_to_db_key  # noqa: E402
+from common.price_index import live_key, load_price_index, row_live_key  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+def row(model, proc, ram, ssd, median):
+    return {"model_name": model, "processor": proc, "ram": ram, "ssd": ssd, "median_price": median}
+
+
+tmp = Path(tempfile.mkdtemp())
+cache = tmp / 'cache'
+db = tmp / 'avito-prices.json'
+STATS = [
+    row("MacBook Air 13 M2", "Apple M2", 16, 512, 80000),
+    row("MacBook Pro 14 (2023, M3 Pro)", "Apple M3 Pro", 18, 512, 150000),
+    row("MacBook Air 13 M2", "Apple M2", 16, 512, 82000),        # дубликат конфига
+    row("Непонятная строка", "", 0, 0, 1000),
+]
+db.write_text(json.dumps({"generated_at": "2026-07-01 10:00", "stats": STATS}), encoding='utf-8')
+AIR = live_key(classify("MacBook Air 13 M2 16/512"))
+
+print("[1] Сборка индекса")
+idx = load_price_index(db, cache_dir=cache)
+check("файла нет → None", load_price_index(tmp / 'nope.json', cache_dir=cache) is None)
+check("первый раз — сборка", not idx.from_cache and len(idx) == 4)
+check("live_key строки — как у объявления", idx.live_keys[0] == AIR == row_live_key(STATS[0]))
+check("мусорная строка без ключа", idx.live_keys[3] is None)
+check("дубликат: выигрывает последняя строка", idx.by_live_key[AIR]["median_price"] == 82000)
+check("groups: дубликаты списком", [s["median_price"] for s in idx.groups()[str(AIR)]] == [80000, 82000])
+pro = classify("MacBook Pro 14 M3 Pro 18/512")
+check("by_db_key совпадает с config_to_db_key объявления",
+      idx.by_db_key.get(config_to_db_key(pro), {}).get("median_price") == 150000)
+check("generated_at", idx.generated_at == "2026-07-01 10:00")
+check("сайдкар записан", len(list(cache.glob('*.marshal'))) == 1)
+
+print("\n[2] Кэш")
+idx2 = load_price_index(db, cache_dir=cache)
+check("повторно — из кэша", idx2.from_cache)
+check("тот же индекс", idx2.by_live_key == idx.by_live_key and idx2.live_keys == idx.live_keys)
+idx2.stats[0]["median_price"] = 1
+check("каждый load — своя копия данных", load_price_index(db, cache_dir=cache).stats[0]["median_price"] == 80000)
+st = db.stat()
+os.utime(db, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+check("mtime сменился, содержимое то же → кэш по sha1", load_price_index(db, cache_dir=cache).from_cache)
+db.write_text(json.dumps({"stats": STATS[:2]}), encoding='utf-8')
+idx3 = load_price_index(db, cache_dir=cache)
+check("содержимое сменилось → пересборка", not idx3.from_cache and len(idx3) == 2)
+price_index.CLASSIFIER_SIG = 'другой классификатор'
+check("сменился классификатор → пересборка", not load_price_index(db, cache_dir=cache).from_cache)
+next(cache.glob('*.marshal')).write_bytes(b'\x00oops')
+check("битый сайдкар → пересборка", not load_price_index(db, cache_dir=cache).from_cache)
+nocache = tmp / 'off'
+check("cache_dir=None — без сайдкара",
+      not load_price_index(db, cache_dir=None).from_cache and not nocache.exists())
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
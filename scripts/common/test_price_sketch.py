@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты квантильных скетчей накопителя (common.price_sketch).
+
+Запуск:  python3 scripts/common/test_price_sketch.py
+"""
+import json
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common import price_sketch  # noqa: E402
+from common.market import modal_center, robust_stats  # noqa: E402
+from common.price_sketch import DAY, PriceSketchStore, QuantileSketch, load_raw_sketches  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+def sketch(prices):
+    sk = QuantileSketch()
+    for p in prices:
+        sk.add(p)
+    return sk
+
+
+def rel(a, b):
+    return abs(a - b) / max(abs(b), 1)
+
+
+rng = random.Random(4)
+SAMPLES = []
+for _ in range(400):
+    base = rng.choice([35000, 80000, 250000])
+    n = rng.choice([1, 3, 5, 8, 20, 100, 400])
+    step = rng.choice([500, 1000])
+    prices = [max(1000, int(rng.gauss(base, base * 0.07)) // step * step) for _ in range(n)]
+    SAMPLES.append(prices + [int(base * rng.uniform(1.1, 1.6)) // 1000 * 1000 for _ in range(n // 5)])
+
+print(f"[1] Квантили и robust_stats против точных ({len(SAMPLES)} выборок)")
+worst = 0.0
+same = 0
+for prices in SAMPLES:
+    a, b = robust_stats(prices), sketch(prices).robust_stats()
+    same += a == b
+    worst = max(worst, rel(b.median, a.median), rel(b.p20, a.p20), rel(b.p10, a.p10))
+check(f"медиана/P20/P10 — в пределах 2α (худшее {worst:.2%})", worst <= 2 * price_sketch.ALPHA)
+check(f"цены с шагом 500₽ чаще всего восстанавливаются точно ({same} из {len(SAMPLES)})",
+      same >= len(SAMPLES) * 0.7)
+worst = max(rel(sketch(p).modal_center(), modal_center(p)) for p in SAMPLES)
+check(f"модальный центр — в пределах 3% (худшее {worst:.2%})", worst <= 0.03)
+sk = sketch([80000, 81000, 82000, 83000, 84000, 85000, 86000, 87000, 150000])
+check("exclude: одна цена лота не учитывается",
+      sk.robust_stats(exclude=150000) == robust_stats([80000, 81000, 82000, 83000, 84000, 85000, 86000, 87000])
+      and sk.n == 9)
+check("exclude цены, которой нет, — как без exclude", sk.robust_stats(exclude=99999) == sk.robust_stats())
+check("пустой скетч", QuantileSketch().robust_stats() is None and QuantileSketch().modal_center() == 0)
+check("неположительные цены не копятся", sketch([0, -100, None]).n == 0)
+a, b = sketch(SAMPLES[5]), sketch(SAMPLES[6])
+check("слияние = скетч объединения", a.merge(b).robust_stats() == sketch(SAMPLES[5] + SAMPLES[6]).robust_stats())
+big = sketch(p for prices in SAMPLES for p in prices)
+check(f"размер — корзины, а не цены ({len(big.bins)} корзин на {big.n} цен)", len(big.bins) < big.n / 10)
+check("сериализация без потерь", QuantileSketch.from_list(big.to_list()).robust_stats() == big.robust_stats())
+over, slack = 0, 0.0
+for prices in SAMPLES:
+    sk = sketch(prices)
+    bound = sk.median_bound()
+    for x in set(prices) | {rng.randrange(20000, 400000) for _ in range(3)}:
+        st = sk.robust_stats(exclude=x)
+        over += bool(st and st.median > bound)
+    slack = max(slack, rel(bound, sk.robust_stats().median) if len(prices) >= 20 else 0)
+check("median_bound ≥ медианы без любой одной цены (потолок алерта)", over == 0)
+check(f"median_bound на 20+ ценах близко к медиане (худшее +{slack:.1%})", slack <= 0.03)
+check("median_bound пустого скетча — 0", QuantileSketch().median_bound() == 0)
+
+print("\n[2] Корзины времени и Москва")
+NOW = 1_780_000_000
+K = "('MacBook Air', 'M2', 'base', 13, 16, 512)"
+store = PriceSketchStore(NOW)
+for age, price, msk in [(0, 80000, 1), (1, 81000, 0), (5, 82000, None), (20, 83000, 1),
+                        (60, 70000, 1), (61, 71000, 0), (170, 60000, 1), (200, 50000, 1)]:
+    store.add(K, price, NOW - age * DAY, msk)
+store.prune(NOW)
+check("всё, кроме старше SKETCH_DAYS", store.query(K).n == 7)
+check("окно 30 дней", store.query(K, 30).n == 4 and store.query(K, 30).median() == 81500)
+check("Москва отдельно", store.query(K, 30, msk=True).n == 2 and store.query(K, msk=True).n == 4)
+buckets = store._data[K]['all']
+old_buckets = [b for b in buckets if b + 7 <= store.today - price_sketch.SKETCH_DAILY_DAYS]
+check("старше SKETCH_DAILY_DAYS — недели", old_buckets and all(b % 7 == 0 for b in old_buckets)
+      and len(buckets) <= 4 + len(old_buckets))
+check("запрос кэшируется до add", store.query(K, 30) is store.query(K, 30))
+store.add(K, 84000, NOW, 1)
+check("add сбрасывает кэш запросов", store.query(K, 30).n == 5)
+store.prune(NOW + 200 * DAY)
+check("со временем история выбрасывается целиком", len(store) == 0 and store.query(K).n == 0)
+
+print("\n[3] Файл и засев из накопителя")
+tmp = Path(tempfile.mkdtemp())
+raw = {K: [[80000, NOW, 1], [81000, NOW - DAY, 0], 82000], 'мусор': 'не список'}
+seeded = PriceSketchStore.from_raw(raw, NOW)
+check("из накопителя: легаси-число — сейчас, регион неизвестен",
+      seeded.query(K, 1).n == 3 and seeded.query(K, msk=True).n == 1 and list(seeded.keys()) == [K])
+seeded.save(tmp / 'sketch.json')
+loaded = PriceSketchStore.load(tmp / 'sketch.json', NOW)
+check("сохранён и прочитан", loaded.query(K).robust_stats() == seeded.query(K).robust_stats())
+check("нет файла → None", PriceSketchStore.load(tmp / 'nope.json') is None)
+(tmp / 'bad.json').write_text('{"format": 1, "alpha": 0.1}')
+check("другая точность → None", PriceSketchStore.load(tmp / 'bad.json') is None)
+(tmp / 'raw.json').write_text(json.dumps(raw))
+check("load_raw_sketches: файл скетчей главнее",
+      load_raw_sketches(tmp / 'sketch.json', tmp / 'raw.json', NOW).query(K).n == 3)
+check("load_raw_sketches: нет скетчей — из накопителя",
+      load_raw_sketches(tmp / 'nope.json', tmp / 'raw.json', NOW).query(K).n == 3)
+check("load_raw_sketches: нет ничего — пусто", len(load_raw_sketches(tmp / 'a', tmp / 'b')) == 0)
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
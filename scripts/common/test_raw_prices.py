@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты накопителя коллектора: снимок + журнал (common.raw_prices).
+
+Запуск:  python3 scripts/common/test_raw_prices.py
+"""
+import fcntl
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.raw_prices import RawPriceLog, norm_raw_entry  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+tmp = Path(tempfile.mkdtemp())
+NOW = 1_780_000_000
+
+print("[1] Журнал и слитый вид")
+path = tmp / 'raw.json'
+path.write_text(json.dumps({"k1": [40000, [41000, NOW - 10, 1]], "k2": [[50000, NOW - 5, 0]]}))
+log = RawPriceLog(path, cap=4)
+before = path.read_bytes()
+sig = log.signature()
+new = log.append({"k1": [[42000, NOW, 0], 43000], "k3": [[60000, NOW, None]], "k4": []}, now_ts=NOW)
+check("партия нормализована", new == {"k1": [[42000, NOW, 0], [43000, NOW, None]], "k3": [[60000, NOW, None]]})
+check("снимок не тронут", path.read_bytes() == before)
+check("журнал — одна строка на партию", len(log.log_path.read_text().splitlines()) == 1)
+check("подпись сменилась", log.signature() != sig)
+log.append({"k1": [[44000, NOW, 1]]}, now_ts=NOW)
+view = log.read()
+check("слитый вид: снимок + журнал, окно cap",
+      [e if isinstance(e, int) else e[0] for e in view["k1"]] == [41000, 42000, 43000, 44000])
+check("легаси-числа снимка — как есть (нормализует свёртка)", view["k2"] == [[50000, NOW - 5, 0]]
+      and "k3" in view and "k4" not in view)
+with open(log.log_path, 'a') as f:
+    f.write('{"k1": [[45000')           # недописанная строка упавшего прогона
+check("битая строка журнала пропускается", log.read() == view)
+
+print("\n[2] Свёртка")
+check("маленький журнал не сворачивается", not RawPriceLog(path, cap=4, compact_kb=64).maybe_compact(NOW))
+check("журнал дорос — сворачивается", RawPriceLog(path, cap=4, compact_kb=0).maybe_compact(NOW))
+snap = json.loads(path.read_text())
+check("снимок = слитый вид", snap["k1"] == view["k1"] and snap["k3"] == view["k3"])
+check("журнал обнулён", log.log_size() == 0 and log.read() == snap)
+check("записи снимка нормализованы", all(isinstance(e, list) and len(e) == 3
+                                         for v in snap.values() for e in v))
+log.append({"k2": [[51000, NOW, 1]]}, now_ts=NOW)
+check("после свёртки журнал снова копится", [e[0] for e in log.read()["k2"]] == [50000, 51000])
+
+print("\n[3] Пустой и битый накопитель")
+empty = RawPriceLog(tmp / 'none.json')
+check("нет файлов → {}", empty.read() == {} and empty.log_size() == 0)
+check("пустая партия — без записи", empty.append({"k": []}) == {} and not empty.log_path.exists())
+bad = tmp / 'bad.json'
+bad.write_text('[1, 2')
+blog = RawPriceLog(bad)
+blog.append({"k": [70000]}, now_ts=NOW)
+check("битый снимок — только журнал", blog.read() == {"k": [[70000, NOW, None]]})
+check("norm_raw_entry: легаси-число", norm_raw_entry(5, NOW) == [5, NOW, None]
+      and norm_raw_entry([5, 1, 1]) == [5, 1, 1])
+
+print("\n[4] locked(): замок на весь блок")
+lk = RawPriceLog(tmp / 'locked.json', compact_kb=0)
+
+
+def _try_lock():
+    with open(lk.lock_path, 'a') as other:
+        try:
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+
+with lk.locked():
+    check("append и свёртка внутри блока — без самоблокировки",
+          lk.append({"k": [[1000, NOW, 1]]}, now_ts=NOW) and lk.maybe_compact(NOW))
+    check("чужой дескриптор замок не получает", not _try_lock())
+check("после блока замок свободен", _try_lock() and lk.read() == {"k": [[1000, NOW, 1]]})
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
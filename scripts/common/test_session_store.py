@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Офлайн-тесты сохранённой сессии Авито (common.session_store) — без браузера.
+
+Запуск:  python3 scripts/common/test_session_store.py
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from common.browser import new_context  # noqa: E402
+from common.session_store import SessionStore, normalize_cookies  # noqa: E402
+
+_fails = []
+
+
+def check(name, cond):
+    print(("  ✅ " if cond else "  ❌ ") + name)
+    if not cond:
+        _fails.append(name)
+
+
+class Clock:
+    def __init__(self, t=1_760_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class FakeContext:
+    """Контекст Playwright: storage_state() + что передали в new_context."""
+    def __init__(self, cookies=None):
+        self.cookies = cookies if cookies is not None else [{'name': 'ft', 'value': '1', 'domain': '.avito.ru'}]
+        self.kwargs = None
+
+    def storage_state(self):
+        return {'cookies': self.cookies, 'origins': [{'origin': 'https://www.avito.ru', 'localStorage': []}]}
+
+    def add_init_script(self, js):
+        pass
+
+
+class FakeBrowser:
+    def new_context(self, **kw):
+        ctx = FakeContext()
+        ctx.kwargs = kw
+        return ctx
+
+
+tmp = Path(tempfile.mkdtemp())
+clock = Clock()
+
+
+def make_store(**kw):
+    return SessionStore(path=tmp / 'session.json', ttl_hours=12, stats_path=tmp / 'stats.json',
+                        clock=clock, **kw)
+
+
+print("[1] Сохранение и загрузка")
+st = make_store()
+check("пусто — None", st.load() is None and st.cookies() == [])
+st.save({'cookies': [{'name': 'ft', 'value': 'abc'}]}, 'solve')
+state = st.load()
+check("куки нормализованы для Playwright", state['cookies'][0] == {
+    'name': 'ft', 'value': 'abc', 'domain': '.avito.ru', 'path': '/', 'expires': -1,
+    'httpOnly': False, 'secure': False, 'sameSite': 'Lax'})
+check("без кук не сохраняем", (st.save({'cookies': []}, 'x'), st.load() is not None)[1])
+check("источник в файле", json.loads((tmp / 'session.json').read_text())['source'] == 'solve')
+clock.t += 13 * 3600
+check("старше TTL — None", st.load() is None and st.cookies() == [])
+clock.t -= 13 * 3600
+check("битый файл — None", ((tmp / 'session.json').write_text('{oops'), make_store().load() is None)[1])
+check("TTL 0 — выключено", (SessionStore(path=tmp / 'off.json', ttl_hours=0, stats_path=None)
+                            .save({'cookies': [{'name': 'a'}]}, 'x'), not (tmp / 'off.json').exists())[1])
+check("normalize_cookies отбрасывает безымянные", normalize_cookies([{'value': 'x'}, {'name': 'a'}])[0]['name'] == 'a')
+
+print("\n[2] Судьба сессии")
+(tmp / 'session.json').unlink()
+st = make_store()
+fresh = FakeContext()
+st.started(fresh, reused=False)
+st.passed(fresh)
+check("чистый прогрев пустой сессии → сохранено", st.load() is not None
+      and json.loads((tmp / 'session.json').read_text())['source'] == 'warmup')
+
+reused = FakeContext()
+st.started(reused, reused=True)
+st.passed(reused)
+st.passed(reused)
+check("сохранённая прошла без капчи → avoided один раз", st.totals()['avoided'] == 1)
+
+burnt = FakeContext()
+st.started(burnt, reused=True)
+st.captcha(burnt)
+check("капча на сохранённой → файл сброшен", st.load() is None and st.totals()['invalidated'] == 1
+      and st.totals()['reused_captcha'] == 1)
+st.captcha(burnt)
+check("повторная капча той же сессии не считается", st.totals()['reused_captcha'] == 1)
+burnt.cookies = [{'name': 'ft', 'value': 'new'}]
+st.passed(burnt, solved=True)
+check("решили → сохранено свежее состояние", st.cookies()[0]['value'] == 'new' and st.totals()['solves'] == 1)
+st.passed(burnt)
+check("после капчи чистый проход не считается сэкономленным", st.totals()['avoided'] == 1)
+
+stranger = FakeContext()
+st.passed(stranger)
+st.captcha(stranger)
+check("незнакомая сессия — без эффекта", st.cookies()[0]['value'] == 'new')
+
+old = FakeContext(cookies=[{'name': 'ft', 'value': 'refreshed'}])
+clock.t += 7 * 3600
+st.started(old, reused=True)
+st.passed(old)
+check("сохранённая старше TTL/2 продлевается", st.cookies()[0]['value'] == 'refreshed'
+      and st.age() == 0)
+
+print("\n[3] Метрики")
+t = st.totals()
+check("счётчики стартов", t['fresh'] == 1 and t['reused'] == 3)
+clock.t += 25 * 3600
+check("окно 24 ч — старые часы не входят", st.totals(24)['reused'] == 0)
+days = st.per_day(7)
+check("сводка по дням", sum(d['reused'] for d in days.values()) == 3)
+(tmp / 'stats.json').write_text('не json')
+st.count('solves')
+check("битый файл метрик пересоздаётся", st.totals()['solves'] == 1)
+
+print("\n[4] Фабрика контекста со store")
+(tmp / 'session.json').unlink()
+st = make_store()
+ctx = new_context(FakeBrowser(), "UA/1", store=st)
+check("без сохранённой — контекст с нуля", 'storage_state' not in ctx.kwargs)
+st.passed(ctx)
+ctx2 = new_context(FakeBrowser(), "UA/1", store=st)
+check("следующий контекст стартует с сохранённой",
+      ctx2.kwargs['storage_state']['cookies'][0]['name'] == 'ft')
+st.passed(ctx2)
+check("и засчитан как сэкономленный", st.totals()['avoided'] == 1)
+
+
+print()
+if _fails:
+    print(f"❌ ПРОВАЛЕНО {len(_fails)}: " + "; ".join(_fails))
+    sys.exit(1)
+print("✅ Все тесты прошли")
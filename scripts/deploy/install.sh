@@ -226,6 +226,28 @@ else
   echo "    Установите Python 3.11+ (или Node 18+) и перезапустите install.sh."
 fi
 
+# ── Резидентный сканер (--daemon): scan/intake/watch/stale в одном процессе с
+#    прогретым браузером. Юнит пишется, но НЕ включается — это замена таймеров
+#    scanner и intake-proc (включать вместо них, см. hot-deals-scanner/README.md).
+write_unit bestmac-scanner-daemon.service <<EOF
+[Unit]
+Description=BestMac resident scanner (scanner_v2 --daemon, warm browser)
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+Type=simple
+User=$RUN_USER
+WorkingDirectory=$REPO_DIR
+EnvironmentFile=$REPO_DIR/.env
+ExecStart=$PYTHON scripts/hot-deals-scanner/scanner_v2.py --daemon
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 echo
 echo "🔄 Перезагружаю systemd и включаю сервисы..."
 $SUDO systemctl daemon-reload
@@ -266,6 +288,8 @@ echo "Полезные команды:"
 echo "  журнал бота:        journalctl -u bestmac-bot.service -f"
 echo "  журнал сканера:     journalctl -u bestmac-scanner.service -f"
 echo "  когда след. сканы:  systemctl list-timers 'bestmac-*'"
+echo "  резидентный режим:  systemctl disable --now bestmac-scanner.timer bestmac-intake-proc.timer"
+echo "                      systemctl enable --now bestmac-scanner-daemon.service"
 echo
 echo "👉 Последний шаг: напишите своему боту в Telegram /start (один раз),"
 echo "   чтобы он запомнил ваш chat_id."
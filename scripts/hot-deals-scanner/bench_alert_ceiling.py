@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Отсев intake-карточек: прежний путь (префильтр → _raw_market без цены лота →
+_market_for → assess_deal на каждую карточку) против потолка цены алерта
+(_alert_ceiling — одно сравнение; полный расчёт — только ниже потолка).
+
+База (avito-prices.json) и скетчи коллектора — синтетические: половина конфигов со
+свежей базой, четверть с протухшей, четверть только с ценами коллектора. Карточки —
+цены вокруг рынка (большинство не дотягивает до MIN_MARGIN, как в жизни).
+
+Запуск:
+    python3 scripts/hot-deals-scanner/bench_alert_ceiling.py
+    python3 scripts/hot-deals-scanner/bench_alert_ceiling.py --cards 50000 --comps 400
+
+Печатает мкс на карточку, долю отсеянных потолком и расхождения решений (должно
+быть 0: выше потолка полный путь тоже не находит сделки).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# кэш classify и сайдкар индекса цен — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent))          # hot-deals-scanner/
+import scanner_v2 as sv  # noqa: E402
+from common.price_index import live_key  # noqa: E402
+from common.price_sketch import PriceSketchStore  # noqa: E402
+
+TITLES = [f"{m} {ram}/{ssd}" for m in ('MacBook Air 13 M1', 'MacBook Air 13 M2', 'MacBook Air 15 M2',
+                                         'MacBook Air 13 M3', 'MacBook Air 15 M3', 'MacBook Pro 14 M1 Pro',
+                                         'MacBook Pro 14 M2 Pro', 'MacBook Pro 14 M3', 'MacBook Pro 16 M1 Pro',
+                                         'MacBook Pro 14 M3 Pro', 'MacBook Pro 16 M3 Max', 'Mac mini M2')
+          for ram in (8, 16, 18, 24, 32, 36) for ssd in (256, 512, 1024)]
+
+
+def _listing(title, price):
+    return {'url': '', 'raw_url': '', 'title': title, 'snippet': '', 'price': price,
+            'minutes_ago': 0, 'age_str': '', 'item_text': title.lower()}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--cards', type=int, default=20000)
+    ap.add_argument('--comps', type=int, default=300, help='цен коллектора на конфиг')
+    args = ap.parse_args(argv)
+    sv.logger.disabled = True
+
+    rng = random.Random(7)
+    s = sv.AvitoScannerV2(None)
+    now = int(time.time())
+    fresh = datetime.now().strftime("%Y-%m-%d %H:%M")
+    cfgs, market, raw = {}, {}, {}
+    for t in TITLES:
+        cfg = s._passes_prefilter(_listing(t, 90000))
+        if cfg is None or live_key(cfg) in cfgs:
+            continue
+        cfgs[live_key(cfg)] = t
+    s.prices_by_livekey = {}
+    for i, (lk, t) in enumerate(cfgs.items()):
+        med = rng.randrange(60, 250) * 1000
+        market[t] = med
+        if i % 4 < 3:
+            s.prices_by_livekey[lk] = {'median_price': med, 'samples_count': 20,
+                                       'updated_at': fresh if i % 4 < 2 else "2026-01-01 10:00"}
+        if i % 4 >= 2:
+            raw[str(lk)] = [[int(rng.gauss(med, med * 0.07)) // 500 * 500, now - rng.randrange(25 * 86400), 1]
+                            for _ in range(args.comps)]
+    s._raw_sketches = PriceSketchStore.from_raw(raw, now)
+    titles = list(market)
+    cards = []
+    for _ in range(args.cards):
+        t = rng.choice(titles)
+        cards.append((t, int(market[t] * rng.uniform(0.75, 1.35)) // 500 * 500))
+    print(f"конфигов {len(titles)} (свежая база / протухшая / только коллектор), "
+          f"карточек {len(cards)}, цен коллектора на конфиг {args.comps}")
+
+    def full(cfg, price):
+        m, _ = s._market_for(cfg, s._raw_market(cfg, exclude=price))
+        return m is not None and sv.assess_deal(price, m, min_margin=sv.MIN_MARGIN,
+                                                scam_floor=sv.SCAM_FLOOR).margin >= sv.MIN_MARGIN
+
+    for t, price in cards[:200]:                      # прогрев кэшей классификатора/скетчей
+        full(s._passes_prefilter(_listing(t, price)), price)
+
+    t0 = time.perf_counter()
+    ref = [full(s._passes_prefilter(_listing(t, price)), price) for t, price in cards]
+    t_full = (time.perf_counter() - t0) * 1e6 / len(cards)
+
+    s._ceilings.clear()
+    cut, got = 0, []
+    t0 = time.perf_counter()
+    for t, price in cards:
+        cfg = s._passes_prefilter(_listing(t, price))
+        ceiling = s._alert_ceiling(cfg)
+        if ceiling is not None and price > ceiling:
+            cut += 1
+            got.append(False)
+        else:
+            got.append(full(cfg, price))
+    t_ceil = (time.perf_counter() - t0) * 1e6 / len(cards)
+    wrong = sum(a != b for a, b in zip(ref, got))
+
+    print(f"{'прежний мкс/карт.':>18} {'потолок мкс/карт.':>18} {'×':>5} {'отсеяно потолком':>17} "
+          f"{'сделок':>7} {'расхождений':>12}")
+    print(f"{t_full:>18.1f} {t_ceil:>18.1f} {t_full / max(t_ceil, 1e-9):>5.1f} "
+          f"{cut / len(cards):>16.1%} {sum(ref):>7} {wrong:>12}")
+
+
+if __name__ == '__main__':
+    main()
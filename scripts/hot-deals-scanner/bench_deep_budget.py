@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Порядок дозахода при обрыве прогона: прежний (семейство за семейством по мере
+догрузки выдачи, внутри — по марже) против общей очереди по ожидаемой выгоде
+(deep_prescore → DeepStage) с бюджетом DeepBudget.
+
+Прогон синтетический и без сети: семейства с кандидатами выше MIN_MARGIN, у
+каждого лота скрытая «настоящая» выгода — запас до выкупа × шанс его забрать
+(свежесть, частник; в сниппете частника видно не всегда). Авито «обрывает»
+прогон после --budget долей кандидатов: сколько настоящей выгоды успели
+дозайти и сколько лотов из лучших 10% потеряно (прежде — навсегда, теперь —
+отложено в следующий цикл).
+
+Запуск:
+    python3 scripts/hot-deals-scanner/bench_deep_budget.py
+    python3 scripts/hot-deals-scanner/bench_deep_budget.py --runs 500 --families 5 --per-family 12
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from pathlib import Path
+
+# кэш classify и сайдкар индекса цен — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent))          # hot-deals-scanner/
+import scanner_v2 as sv  # noqa: E402
+
+
+def _family(rng, n):
+    lots = []
+    median = rng.randrange(60, 250) * 1000
+    for _ in range(n):
+        margin = rng.uniform(sv.MIN_MARGIN, 0.45)
+        price = int(median * (1 - margin)) // 500 * 500
+        minutes = rng.choice([rng.randrange(0, 60), rng.randrange(60, 24 * 60)])
+        private = rng.random() < 0.6
+        hint = private and rng.random() < 0.6
+        dealer = not private and rng.random() < 0.5
+        text = ('собственник, ' if hint else '') + ('магазин, в наличии' if dealer else '')
+        buyout = int(median * sv.BUYOUT_FACTOR)
+        real = max(0, buyout - price) * math.exp(-minutes / 240) * (1.0 if private else 0.4)
+        prio = sv.deep_prescore(price, median, (median - price) / median, buyout, minutes, text,
+                                suspicious=price < median * sv.SCAM_FLOOR)
+        lots.append({'margin': (median - price) / median, 'prio': prio, 'real': real})
+    return lots
+
+
+def _one_run(rng, args):
+    families = [_family(rng, args.per_family) for _ in range(args.families)]
+    lots = [L for f in families for L in f]
+    k = max(1, int(len(lots) * args.budget))
+    top = set(map(id, sorted(lots, key=lambda L: L['real'], reverse=True)[:max(1, len(lots) // 10)]))
+
+    old = [L for f in families for L in sorted(f, key=lambda L: L['margin'], reverse=True)][:k]
+
+    new, budget = [], sv.DeepBudget(seconds=0, visits=k, fail_streak=0)
+    deferred = []
+    stage = sv.DeepStage(lambda L: (new if budget.take() else deferred).append(L), 0, 1)
+    for f in families:
+        for L in f:
+            stage.put(L, L['prio'])
+    stage.close()
+
+    total = sum(L['real'] for L in lots) or 1.0
+    return (sum(L['real'] for L in old) / total, sum(L['real'] for L in new) / total,
+            len(top - set(map(id, old))), len(top - set(map(id, new))), len(deferred))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--runs', type=int, default=300)
+    ap.add_argument('--families', type=int, default=5)
+    ap.add_argument('--per-family', type=int, default=10, help='кандидатов выше MIN_MARGIN на семейство')
+    ap.add_argument('--budget', type=float, nargs='+', default=[0.2, 0.4, 0.6],
+                    help='доля кандидатов, которую успели дозайти до обрыва')
+    args = ap.parse_args(argv)
+    sv.logger.disabled = True
+
+    print(f"прогонов {args.runs}, семейств {args.families} × {args.per_family} кандидатов")
+    print(f"{'бюджет':>7} {'выгода: прежний':>16} {'по очереди':>11} "
+          f"{'потеряно из топ-10%: прежний':>29} {'по очереди':>11} {'отложено':>9}")
+    for frac in args.budget:
+        rng = random.Random(23)
+        rows = [_one_run(rng, argparse.Namespace(**{**vars(args), 'budget': frac})) for _ in range(args.runs)]
+        avg = [sum(r[i] for r in rows) / len(rows) for i in range(5)]
+        print(f"{frac:>7.0%} {avg[0]:>16.1%} {avg[1]:>11.1%} {avg[2]:>29.2f} {avg[3]:>11.2f} {avg[4]:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
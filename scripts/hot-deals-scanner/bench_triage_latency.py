@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Задержка «карточка принята intake-сервером → алерт» у резидентного демона
+(run_daemon) на фоне длинного скана. Два режима одного и того же демона:
+
+  trigger — как раньше: сервер пишет карточку в спул и будит /trigger/intake,
+            карточки разбирает только задание intake — после текущего скана;
+  push    — сервер толкает карточку в POST /cards, демон разбирает её в точке
+            _triage_checkpoint (между семействами скана) и рассылает сразу.
+
+Сеть не трогается: семейство скана — пауза --family-sec, дозаход в карточку —
+пауза --deep-ms, рынок — заглушка (каждая карточка — сделка). Так видно именно
+планирование заданий, а не скорость Авито.
+
+Запуск:
+    python3 scripts/hot-deals-scanner/bench_triage_latency.py
+    python3 scripts/hot-deals-scanner/bench_triage_latency.py --seconds 60 --families 10 --family-sec 3
+
+Печатает p50/p95 задержки до алерта (GET /status демона, окно latency) по режимам.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+# кэш classify и сайдкар индекса цен — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent))          # hot-deals-scanner/
+import scanner_v2 as sv  # noqa: E402
+from common.intake_spool import CardSpool  # noqa: E402
+from common.market import robust_stats  # noqa: E402
+
+DEAL = {'is_private': True, 'seller_type': 'Частное лицо', 'seller_reviews': 3, 'location': 'Москва',
+        'desc_text': 'идеальное состояние, акб 100%', 'cycles': None, 'is_urgent': False,
+        'specs': {}, 'price_reduced': False}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _post(port, path, obj=None):
+    body = json.dumps(obj).encode('utf-8') if obj is not None else b''
+    req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=body, method='POST')
+    urllib.request.urlopen(req, timeout=2).close()
+
+
+def _scanner(args, tmp):
+    """Демон со всем, кроме планировщика, заглушённым (как в test_logic [12])."""
+    sv.DAEMON_STATE_FILE = tmp / 'daemon.json'
+    sv.INCOMING_FILE = tmp / 'incoming-cards.json'
+    sv.PACER.wait = lambda *a, **k: 0.0
+    s = sv.AvitoScannerV2(None)
+    s.seen = set()
+    market = robust_stats([100000] * 12)
+    s._market_for = lambda cfg, comps: (market, 'db')
+    s._raw_market = lambda cfg, exclude=None: None
+    s._alert_ceiling = lambda cfg: None
+    s._db_stat = lambda cfg: None
+    for name in ('_start_browser', '_warmup', '_close', '_save_seen', '_open_resident',
+                 '_refresh_from_disk', '_send_copilot'):
+        setattr(s, name, lambda *a, **k: None)
+    s._write_proc_stats = lambda *a: None
+    s._accumulate_raw = lambda batch: None
+    s._enqueue_lead = lambda c, **kw: None
+    s.notify = lambda c: None
+    s.deep_analyze = lambda url: (time.sleep(args.deep_ms / 1000), dict(DEAL))[1]
+    jobs = s._daemon_jobs()
+
+    def _scan():
+        for _ in range(args.families):
+            s._triage_checkpoint()
+            time.sleep(args.family_sec)
+    s._daemon_jobs = lambda: [jobs[0], ('scan', args.scan_every, _scan)]
+    return s
+
+
+def run_mode(mode, args):
+    tmp = Path(tempfile.mkdtemp())
+    s = _scanner(args, tmp)
+    if mode == 'trigger':
+        s._triage_checkpoint = lambda: None
+    spool = CardSpool(sv.INCOMING_FILE)
+    port = _free_port()
+    stop = threading.Event()
+    th = threading.Thread(target=s.run_daemon, kwargs={'stop': stop, 'port': port}, daemon=True)
+    th.start()
+    time.sleep(0.3)
+    rng = random.Random(1)
+    t_end, n = time.time() + args.seconds, 0
+    while time.time() < t_end:
+        time.sleep(rng.expovariate(1 / args.gap))
+        card = {'url': f'https://www.avito.ru/moskva/noutbuki/{mode}_{n}', 'title': 'MacBook Air 13 M2 16/512',
+                'price': 70000, 'date': 'сегодня', 'received_at': time.time()}
+        n += 1
+        spool.add([card])                     # спул пишется в обоих режимах, как у сервера
+        if mode == 'push':
+            _post(port, '/cards', {'cards': [card]})
+        else:
+            _post(port, '/trigger/intake')
+    deadline = time.time() + args.families * args.family_sec + 30
+    while len(s._alert_lat) < n and time.time() < deadline:
+        time.sleep(0.1)
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/status', timeout=2) as r:
+        status = json.loads(r.read())
+    stop.set()
+    th.join(timeout=args.families * args.family_sec + 10)
+    spool.close()
+    return n, status['latency']['alert_sec']
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--seconds', type=float, default=20, help='сколько секунд приходят карточки')
+    ap.add_argument('--gap', type=float, default=1.0, help='средний интервал между карточками, с')
+    ap.add_argument('--families', type=int, default=6, help='семейств в скане')
+    ap.add_argument('--family-sec', type=float, default=2.0, help='секунд на семейство')
+    ap.add_argument('--scan-every', type=float, default=15.0, help='интервал скана, с')
+    ap.add_argument('--deep-ms', type=float, default=300, help='дозаход в карточку, мс')
+    ap.add_argument('--mode', choices=('trigger', 'push'), nargs='+', default=['trigger', 'push'])
+    args = ap.parse_args(argv)
+    sv.logger.disabled = True
+
+    print(f"скан: {args.families} семейств × {args.family_sec:g} с каждые {args.scan_every:g} с; "
+          f"карточка раз в ~{args.gap:g} с, дозаход {args.deep_ms:g} мс")
+    print(f"{'режим':>8} {'карточек':>9} {'алертов':>8} {'p50, с':>7} {'p95, с':>7}")
+    for mode in args.mode:
+        n, lat = run_mode(mode, args)
+        print(f"{mode:>8} {n:>9} {lat['n']:>8} {lat.get('p50', float('nan')):>7.2f} "
+              f"{lat.get('p95', float('nan')):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -21,31 +21,48 @@ import sys
 import time
 import random
 import logging
-import statistics
 import argparse
 import html
 import hashlib
+import heapq
+import itertools
+import queue
+import sqlite3
+import threading
 import urllib3
+from collections import deque
+from dataclasses import asdict
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
 from pathlib import Path
-from urllib.parse import urljoin
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # Добавляем scripts/ в path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.classifier import classify, config_to_db_key, processor_label
+from common.classifier import CACHE as CLASSIFY_CACHE, classify, config_to_db_key, processor_label
+from common.price_index import live_key, load_price_index
+from common.price_sketch import PriceSketchStore, load_raw_sketches
+from common import intake_spool
+from common.raw_prices import RAW_CAP, RawPriceLog
 from common.condition import analyze_condition
-from common.market import robust_stats, assess_deal, MarketStats
+from common.market import robust_stats, assess_deal, LiveMarket, MarketStats
 from common.negotiator import motivation_score, MotivationReport
+from common.extract import extract_listings
+from common.browser import ResourceFilter, launch_chromium, new_context
+from common.session_store import default_store
+from common.pacing import SCALE_ITEM, default_pacer
 from common.config import (
     SCAN_FAMILIES, JUNK_KEYWORDS, NEW_SEALED_KEYWORDS, URGENT_KEYWORDS, MOSCOW_MARKERS,
     MIN_PRICE, MAX_PRICE, PRICE_THRESHOLD_FACTOR, MIN_YEARS,
-    SCAN_PAGES_PER_FAMILY, MIN_COMPS, MIN_MARGIN, SCAM_FLOOR, BUYOUT_FACTOR,
+    SCAN_PAGES_PER_FAMILY, SCAN_CONTEXTS, DEEP_WORKERS, DEEP_QUEUE_MAX, DEEP_BUDGET_SEC, DEEP_BUDGET_MAX,
+    PRIVATE_HINTS, DEALER_HINTS, MIN_COMPS, MIN_MARGIN, SCAM_FLOOR, BUYOUT_FACTOR,
     BATTERY_HARD, BATTERY_SOFT, CYCLES_HARD, CYCLES_SOFT,
     STALE_PRICES_HOURS, STALE_ALERT_COOLDOWN_HOURS, EXCLUDE_INTEL_FAMILIES,
     STALE_LISTING_DAYS, STALE_MIN_DROP, STALE_SCAN_PAGES, STALE_MAX_LEADS, REGISTRY_MAX,
+    REGISTRY_ACTIVE_DAYS,
     RESELLER_REVIEWS, DELIVERY_MAX_PRICE, WATCH_DROP, WATCH_DAYS,
 )
 
@@ -67,6 +84,11 @@ try:
 except ImportError:
     sync_playwright = None
 
+try:
+    import fcntl
+except ImportError:          # Windows — свёртка журнала seen без межпроцессной блокировки
+    fcntl = None
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("ScannerV2")
 
@@ -108,39 +130,35 @@ DIGEST_FILE  = Path(os.environ.get('DIGEST_FILE_PATH', 'public/data/pending-dige
 HEALTH_FILE  = Path(os.environ.get('PARSER_HEALTH_PATH', 'public/data/parser-health.json'))
 # Очередь лидов для бота переговоров (scripts/negotiation-bot/bot.py)
 QUEUE_FILE   = Path(os.environ.get('NEGOTIATION_QUEUE_PATH', 'public/data/negotiation-queue.json'))
-# Реестр объявлений (для охотника за залежавшимися): когда впервые увидели, история цены
+# Реестр объявлений (для охотника за залежавшимися): когда впервые увидели, история цены.
+# SQLite (ListingRegistry); прежний JSON импортируется в пустую базу один раз.
 REGISTRY_FILE = Path(os.environ.get('LISTING_REGISTRY_PATH', 'public/data/listing-registry.json'))
+REGISTRY_DB   = Path(os.environ.get('LISTING_REGISTRY_DB', 'public/data/listing-registry.sqlite3'))
 # Вотчлист: лоты, помеченные «⭐ Слежу» в боте (бот пишет, --watch проверяет)
 WATCHLIST_FILE = Path(os.environ.get('WATCHLIST_PATH', 'public/data/watchlist.json'))
-# Входящие карточки от домашнего расширения (intake-сервер пишет, --intake читает)
+# Входящие карточки от домашнего расширения: intake-сервер пишет спул сегментами
+# (incoming-cards.jsonl, common.intake_spool), --intake забирает; старый цельный
+# incoming-cards.json тоже подхватывается
 INCOMING_FILE = Path(os.environ.get('INTAKE_CARDS_PATH', 'public/data/incoming-cards.json'))
+INTAKE_MAX_CARDS = 3000   # больше за прогон — берём последние (как прежний cap сервера)
 # Пульс обработчика intake (для кнопки «Статус» в боте)
 PROC_STATS_FILE = Path(os.environ.get('INTAKE_PROC_STATS_PATH', 'public/data/intake-proc-stats.json'))
-# Сырые цены по конфигам из потока коллектора (без троттлинга) → для --modal-report
+# Сырые цены по конфигам из потока коллектора (без троттлинга): снимок + журнал
+# добавлений .log (common.raw_prices), окно RAW_CAP цен на конфиг
 RAW_PRICES_FILE = Path(os.environ.get('INTAKE_RAW_PRICES_PATH', 'public/data/intake-raw-prices.json'))
-RAW_CAP = 400   # максимум цен на конфиг (скользящее окно)
-
-
-def modal_center(prices, window=None):
-    """Центр самого плотного ценового кластера (устойчив к перекуп-хвосту).
-    То же, что в парсере; используется для отчёта по данным коллектора."""
-    prices = sorted(prices)
-    n = len(prices)
-    if n < 4:
-        return int(statistics.median(prices)) if prices else 0
-    if window is None:
-        window = max(5000, int(statistics.median(prices) * 0.12))
-    best_cnt, best_i = -1, 0
-    for i in range(n):
-        hi = prices[i] + window
-        j = i
-        while j < n and prices[j] <= hi:
-            j += 1
-        if (j - i) > best_cnt:
-            best_cnt, best_i = j - i, i
-    hi = prices[best_i] + window
-    cluster = [p for p in prices if prices[best_i] <= p <= hi]
-    return int(statistics.median(cluster))
+# Квантильные скетчи тех же цен за месяцы (common.price_sketch) — рынок intake,
+# --modal-report и price-sync читают их, а не сырые списки
+RAW_SKETCH_FILE = Path(os.environ.get('INTAKE_RAW_SKETCH_PATH', 'public/data/intake-raw-sketch.json'))
+RAW_MARKET_DAYS = int(os.environ.get('RAW_MARKET_DAYS', '30'))   # окно рынка коллектора, дней
+# Когда --daemon последний раз гонял каждое задание (переживает перезапуск демона)
+DAEMON_STATE_FILE = Path(os.environ.get('DAEMON_STATE_PATH', 'public/data/scanner-daemon.json'))
+# Кандидаты, на которых кончился бюджет дозахода (DeepBudget): общий для run() и
+# intake файл, следующий цикл ставит их в очередь первыми по ожидаемой выгоде
+DEFERRED_FILE = Path(os.environ.get('DEEP_DEFERRED_PATH', 'public/data/deep-deferred.json'))
+DEFERRED_MAX = 300          # больше — отрезаем с наименьшей выгодой
+DEFERRED_MAX_HOURS = 24     # дольше лежит — скорее всего уже продан
+DEEP_FAIL_STREAK = 3        # столько карточек подряд не загрузились — троттлинг, стоп
+
 
 # Точечные алерты: в реальном времени шлём только score >= MIN_NOTIFY_SCORE,
 # лоты 40..74 копим в дайджест (одно сообщение вечером — крон с флагом --digest).
@@ -161,6 +179,34 @@ SCAN_URL = os.environ.get('SCAN_URL')  # legacy: одиночный URL
 # Прокси
 PROXY_URL     = os.environ.get('PROXY_URL', '').strip().strip('"').strip("'")
 CHANGE_IP_URL = os.environ.get('CHANGE_IP_URL', '').strip().strip('"').strip("'")
+# HTTP-first: страницы грузятся curl_cffi (TLS-отпечаток Chrome), Chromium поднимается
+# только при капче/фаерволе. 0 — всё через Playwright, как раньше. Без curl_cffi — тоже.
+HTTP_FIRST = os.environ.get('HTTP_FIRST', '1').strip() not in ('0', 'false', 'no', '')
+
+# --daemon: один резидентный процесс вместо холодного старта на каждый крон. Интервалы
+# заданий; порог памяти (процесс + дочерний Chromium), после которого браузер и пул
+# пересоздаются; как часто перепрогревать основную сессию; порт локального триггера
+# (только 127.0.0.1, 0 — без триггера).
+DAEMON_SCAN_MIN   = int(os.environ.get('DAEMON_SCAN_MIN', '15'))
+DAEMON_INTAKE_SEC = int(os.environ.get('DAEMON_INTAKE_SEC', '60'))
+DAEMON_WATCH_MIN  = int(os.environ.get('DAEMON_WATCH_MIN', '360'))
+DAEMON_STALE_MIN  = int(os.environ.get('DAEMON_STALE_MIN', '1440'))
+DAEMON_RSS_MB     = int(os.environ.get('DAEMON_RSS_MB', '1500'))
+DAEMON_REWARM_MIN = int(os.environ.get('DAEMON_REWARM_MIN', '30'))
+DAEMON_PORT       = int(os.environ.get('DAEMON_PORT', '8788'))
+# Карточки, которые intake-сервер толкает в демон (POST /cards), разбираются и между
+# шагами длинных заданий (семейство скана, лот вотчлиста/охотника) — не ждут конца
+# скана. Задержка «приём → разбор / → алерт» — окно последних DAEMON_LATENCY_WINDOW.
+DAEMON_LATENCY_WINDOW = int(os.environ.get('DAEMON_LATENCY_WINDOW', '500'))
+PUSH_MAX_BODY = 2 * 1024 * 1024   # тело POST /cards (как MAX_BODY intake-сервера)
+
+# Просмотренные лоты (SeenStore): журнал дописывается по строке на лот, fsync — не
+# чаще раза в SEEN_FLUSH_SEC; в конце прогона журнал сворачивается в SEEN_FILE.
+# Лоты старше SEEN_RETENTION_DAYS забываются; SEEN_MAX — предохранитель по размеру
+# снимка (его коммитит CI), отрезаются самые старые.
+SEEN_FLUSH_SEC      = float(os.environ.get('SEEN_FLUSH_SEC', '2'))
+SEEN_RETENTION_DAYS = int(os.environ.get('SEEN_RETENTION_DAYS', '21'))
+SEEN_MAX            = int(os.environ.get('SEEN_MAX', '20000'))
 
 AVITO_CAPTCHA_ID = '2d9c743cf7d63dbc9db578a608196bcd'
 AVITO_VERIFY_URL = 'https://www.avito.ru/web/1/firewallCaptcha/verify'
@@ -263,7 +309,9 @@ def drain_incoming(path):
     упавшего прошлого прогона (.processing.json, который не успели удалить). Дедупит
     по url и перезаписывает объединённую пачку в proc — чтобы при падении обработки
     карточки не потерялись (следующий прогон их подхватит). Возвращает (uniq, proc_path);
-    proc_path=None если ничего нет. Вызывающий удаляет proc_path ТОЛЬКО после успеха."""
+    proc_path=None если ничего нет. Вызывающий удаляет proc_path ТОЛЬКО после успеха.
+    Карточки — из сегментов спула сервера (intake_spool.take) и старого цельного файла;
+    сегменты удаляются, как только пачка зафиксирована в proc."""
     proc = path.with_suffix('.processing.json')
     raw = []
     # 1) остаток от упавшего прогона — читаем ДО перезатирания
@@ -276,7 +324,11 @@ def drain_incoming(path):
         except Exception:
             proc = path
         raw += _read_cards(proc)
+    # 3) спул сервера: активный сегмент запечатывается, все сегменты — в пачку
+    spooled, segs = intake_spool.take(path)
+    raw += spooled
     if not raw:
+        _drop_segments(segs)
         return [], (proc if proc.exists() else None)
     seen_u, uniq = set(), []
     for c in raw:
@@ -284,14 +336,24 @@ def drain_incoming(path):
         if u and u not in seen_u:
             seen_u.add(u)
             uniq.append(c)
+    uniq = uniq[-INTAKE_MAX_CARDS:]
     # объединённую пачку фиксируем в proc → переживёт падение process_cards
     try:
         proc.write_text(json.dumps(uniq, ensure_ascii=False), encoding='utf-8')
     except Exception:
-        pass
+        return uniq, (proc if proc.exists() else None)   # сегменты — до следующего прогона
+    _drop_segments(segs)
     return uniq, proc
 
 
+def _drop_segments(segs):
+    for seg in segs:
+        try:
+            seg.unlink()
+        except FileNotFoundError:
+            pass
+
+
 def run_intake(incoming_path, process_fn):
     """Оркестрация --intake: забрать пачку (с восстановлением), обработать через
     process_fn(uniq) и удалить proc ТОЛЬКО при успехе (при падении — оставить для
@@ -384,86 +446,215 @@ def solve_captcha(page) -> bool:
         return False
 
 
+# Сохранённая сессия Авито (общая с парсером и билдером): контексты стартуют с неё,
+# решённая капча / чистый прогрев её обновляют, капча на ней — сбрасывает
+SESSIONS = default_store()
+
+# Темп запросов к Авито (AIMD по хосту, common.pacing): паузы перед страницами
+# сокращаются, пока всё грузится, и растут на капче / 429 / пустой выдаче
+PACER = default_pacer()
+
+
 def navigate_with_captcha(page, url: str) -> bool:
     try:
-        page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        resp = page.goto(url, wait_until='domcontentloaded', timeout=30000)
         page.wait_for_timeout(random.randint(1500, 3000))
     except Exception as e:
         logger.warning(f"⚠️ Ошибка goto: {e}")
         return False
+    if resp is not None and getattr(resp, 'status', 200) == 429:
+        PACER.backoff(url, 'http429')
 
+    solved = False
     for attempt in range(1, 4):
         if not is_captcha_page(page):
+            SESSIONS.passed(page.context, solved=solved)
+            if not solved:
+                PACER.success(url)
             return True
         logger.warning(f"🛡 Капча (попытка {attempt}/3)")
+        SESSIONS.captcha(page.context)
+        PACER.backoff(url, 'captcha')
         if not solve_captcha(page):
             return False
+        solved = True
         page.wait_for_timeout(3000)
 
-    return not is_captcha_page(page)
+    if is_captcha_page(page):
+        return False
+    SESSIONS.passed(page.context, solved=solved)
+    return True
 
 
-# ─── Парсинг времени публикации ──────────────────────────────────────────────
-def parse_item_age(item):
-    try:
-        date_tag = (
-            item.select_one('[data-marker="item-date"]') or
-            item.select_one('p[class*="date"]') or
-            item.select_one('[class*="dateInfo"]')
-        )
-        if not date_tag:
-            return "?", 999
-
-        raw = date_tag.get_text(strip=True).lower()
-
-        if 'минут' in raw or 'мин' in raw:
-            m = re.search(r'(\d+)', raw)
-            mins = int(m.group(1)) if m else 30
-            return f"{mins} мин", mins
-
-        if 'час' in raw:
-            m = re.search(r'(\d+)', raw)
-            hrs = int(m.group(1)) if m else 2
-            return f"{hrs} ч", hrs * 60
-
-        if 'сегодня' in raw:
-            m = re.search(r'(\d{1,2}):(\d{2})', raw)
-            if m:
-                h, mn = int(m.group(1)), int(m.group(2))
-                now = datetime.now()
-                pub = now.replace(hour=h, minute=mn, second=0)
-                diff = max(0, int((now - pub).total_seconds() / 60))
-                label = f"{diff} мин" if diff < 60 else f"{diff // 60} ч"
-                return label, diff
-            return "сегодня", 120
-
-        if 'вчера' in raw:
-            return "вчера", 60 * 24
-
-        m = re.search(r'(\d+)\s*д', raw)
-        if m:
-            days = int(m.group(1))
-            return f"{days} дн", days * 60 * 24
+def is_captcha_html(html_text) -> bool:
+    """Тот же маркер фаервола, что is_captcha_page, но по сырому HTML."""
+    return 'firewall-container' in (html_text or '')
+
+
+class HttpFetcher:
+    """HTTP-first загрузка страниц Авито (как AvitoScanner.get() в scanner.py).
+
+    Сначала curl_cffi-сессия с имперсонацией Chrome (прокси, смена IP на 403/429);
+    Chromium нужен только когда в ответе маркер фаервола/капчи: тогда страница
+    открывается в Playwright (get_page() поднимает браузер лениво), капча решается
+    там, а куки фаервола переносятся обратно в curl-сессию — следующие запросы
+    снова идут по HTTP. Куки curl → браузер переносятся перед эскалацией.
+    store (SessionStore) — curl-сессия стартует с кук сохранённой сессии; капча по
+    HTTP на них сбрасывает сохранённое состояние.
+    Один экземпляр — на один поток (curl-сессия и sync-Playwright не потокобезопасны)."""
+
+    HEADERS = {
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8",
+    }
+
+    def __init__(self, get_page, proxy_url=PROXY_URL, session_factory=None, store=None):
+        self.get_page = get_page
+        self.store = store
+        p_str = proxy_url
+        if p_str and not p_str.startswith('http'):
+            p_str = f"http://{p_str}"
+        self.proxy_str = p_str
+        self._session_factory = session_factory or (
+            lambda: curl_requests.Session(impersonate=random.choice(CURL_BROWSERS)))
+        self.session = None
+        self.stats = {'http': 0, 'browser': 0, 'rotations': 0}
+        self._used = True
+        self.restart_session()
+
+    def restart_session(self):
+        """Свежая curl-сессия с куками сохранённого состояния (store). Сессия, по
+        которой ещё не ходили, не пересоздаётся — иначе прогрев сразу после
+        создания выбросил бы импортированные куки. reused — только если куки
+        действительно легли в сессию."""
+        if not self._used:
+            return
+        self._new_session()
+        self._used = False
+        if self.store is not None:
+            imported = self._import_cookies(self.store.cookies())
+            self.store.started(self, reused=imported > 0)
+
+    def _new_session(self):
+        self.session = self._session_factory()
+        if self.proxy_str:
+            self.session.proxies = {"http": self.proxy_str, "https": self.proxy_str}
+
+    def rotate_ip(self):
+        """Смена IP мобильного прокси + новая curl-сессия. False — ротация не настроена."""
+        if not CHANGE_IP_URL:
+            return False
+        try:
+            # Всегда через std_requests — curl_cffi таймаутит на change_ip URL
+            std_requests.get(CHANGE_IP_URL, timeout=15, verify=False)
+            time.sleep(15)  # mobileproxy.space требует ~15 сек для применения
+            logger.info("🔄 IP сменён")
+            self.stats['rotations'] += 1
+        except Exception as e:
+            logger.warning(f"⚠️ rotate_ip: {e}")
+            return False
+        cookies = self._export_cookies()
+        self._new_session()
+        self._import_cookies(cookies)
+        return True
 
-    except Exception:
-        pass
-    return "?", 999
+    def fetch(self, url):
+        """HTML страницы или None. HTTP → (403/429: смена IP, повтор) → браузер."""
+        self._used = True
+        for attempt in range(2):
+            try:
+                resp = self.session.get(url, headers=self.HEADERS, timeout=30,
+                                        verify=False, allow_redirects=True)
+            except Exception as e:
+                logger.warning(f"⚠️ HTTP {url[:60]}: {e}")
+                break
+            if resp.status_code == 200 and not is_captcha_html(resp.text):
+                self.stats['http'] += 1
+                if self.store is not None:
+                    self.store.passed(self)
+                PACER.success(url)
+                return resp.text
+            if is_captcha_html(resp.text):
+                PACER.backoff(url, 'captcha')
+                if self.store is not None:
+                    self.store.captcha(self)
+            if resp.status_code in (403, 429) and not is_captcha_html(resp.text):
+                PACER.backoff(url, f'http{resp.status_code}')
+                logger.warning(f"⚠️ HTTP {resp.status_code} (попытка {attempt + 1}/2)")
+                if attempt == 0 and self.rotate_ip():
+                    continue
+            break
+        return self._escalate(url)
 
+    def _escalate(self, url):
+        """Капча/фаервол/отказ по HTTP → та же страница в браузере с решением капчи."""
+        logger.info(f"🛡 Эскалация в браузер: {url[:60]}")
+        try:
+            page = self.get_page()
+        except Exception as e:
+            logger.error(f"❌ Браузер недоступен: {e}")
+            return None
+        self._cookies_to_browser(page)
+        if not navigate_with_captcha(page, url):
+            return None
+        self.stats['browser'] += 1
+        self._cookies_from_browser(page)
+        return page.content()
 
-# ─── Ключ живой выборки рынка ────────────────────────────────────────────────
-def live_key(config):
-    """Каноничный ключ для группировки сопоставимых лотов в живой выборке.
-    Группируем по семейству+чипу+экрану+RAM+SSD — это и есть «такой же аппарат»."""
-    return (
-        config.family,
-        config.chip_gen,
-        config.chip_tier,
-        config.screen,
-        config.ram,
-        config.ssd,
-    )
+    def _export_cookies(self):
+        out = []
+        try:
+            for c in self.session.cookies.jar:
+                out.append({'name': c.name, 'value': c.value,
+                            'domain': c.domain or '.avito.ru', 'path': c.path or '/'})
+        except Exception:
+            pass
+        return out
+
+    def storage_state(self):
+        """Куки curl-сессии в формате storage_state (для SessionStore)."""
+        return {'cookies': self._export_cookies(), 'origins': []}
 
+    def _import_cookies(self, cookies):
+        """Куки → curl-сессия. Возвращает, сколько легло."""
+        n = 0
+        for c in cookies:
+            try:
+                self.session.cookies.set(c['name'], c['value'],
+                                         domain=c.get('domain') or '.avito.ru',
+                                         path=c.get('path') or '/')
+                n += 1
+            except Exception:
+                pass
+        return n
 
+    def _cookies_to_browser(self, page):
+        cookies = self._export_cookies()
+        if cookies:
+            try:
+                page.context.add_cookies(cookies)
+            except Exception as e:
+                logger.warning(f"⚠️ куки → браузер: {e}")
+
+    def _cookies_from_browser(self, page):
+        try:
+            cookies = page.context.cookies()
+        except Exception as e:
+            logger.warning(f"⚠️ куки ← браузер: {e}")
+            return
+        self._import_cookies([c for c in cookies if 'avito' in (c.get('domain') or '')])
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception:
+            pass
+        if self.stats['http'] or self.stats['browser']:
+            logger.info(f"🌐 HTTP-first: по HTTP {self.stats['http']}, через браузер "
+                        f"{self.stats['browser']}, смен IP {self.stats['rotations']}")
+
+
+# ─── Ключ живой выборки рынка ────────────────────────────────────────────────
 # ─── Скоринг сделки (перекуп: якорь — выкуп + чистота состояния) ──────────────
 def is_reseller(seller_reviews, seller_type):
     """Перекупщик: «Магазин» или частник с большим числом отзывов (торг бесполезен)."""
@@ -526,6 +717,29 @@ def score_deal(price, stats, buyout, condition, is_private, is_moscow,
     return max(0, min(score, 100))
 
 
+def deep_prescore(price, median, margin, buyout, minutes_ago, text, suspicious=False):
+    """Ожидаемая выгода лота до дозахода, ₽ — порядок очереди дозахода (DeepStage,
+    intake) и что отложить, когда бюджет прогона кончился.
+
+    Выгода — скидка к медиане плюс запас до выкуп-цели; множители — шанс её
+    забрать: свежий лот ещё не ушёл, признаки частника/срочности в заголовке и
+    сниппете, у перекупа/магазина торг бесполезен, «подозрительно дёшево» —
+    чаще скрытый дефект. Только выдача, без сети: точный скоринг — score_deal.
+    """
+    gain = max(0.0, median * margin) + max(0, buyout - price)
+    odds = 1.0 / (1.0 + max(0, minutes_ago or 0) / 180)     # 3 ч → ×0.5
+    t = (text or '').lower()
+    if any(w in t for w in PRIVATE_HINTS):
+        odds *= 1.25
+    if any(w in t for w in DEALER_HINTS):
+        odds *= 0.6
+    if any(w in t for w in URGENT_KEYWORDS):
+        odds *= 1.15
+    if suspicious:
+        odds *= 0.5
+    return round(gain * odds, 1)
+
+
 # ─── Co-pilot: готовое первое сообщение продавцу ─────────────────────────────
 def _fmt_rub(n):
     return f"{int(n):,}".replace(",", " ")
@@ -588,12 +802,9 @@ def title_city(title):
     return m.group(1) if m else ''
 
 
-def _norm_raw_entry(e, now_ts=None):
-    """Запись накопителя → [цена, unix_ts, москва(1/0/None)].
-    Легаси-формат (голое число) получает текущее время и неизвестный регион."""
-    if isinstance(e, list) and len(e) >= 3:
-        return [int(e[0]), int(e[1]), e[2]]
-    return [int(e[0] if isinstance(e, list) else e), int(now_ts or time.time()), None]
+def raw_price_log():
+    """Накопитель коллектора (снимок RAW_PRICES_FILE + журнал) с окном RAW_CAP."""
+    return RawPriceLog(RAW_PRICES_FILE, cap=RAW_CAP)
 
 
 def extract_location(soup):
@@ -610,6 +821,702 @@ def extract_location(soup):
     return ""
 
 
+# ─── Пул браузер-сессий ─────────────────────────────────────────────────────
+class ContextPool:
+    """N независимых браузер-сессий для параллельного обхода выдачи.
+
+    Sync-API Playwright привязан к потоку, поэтому каждая сессия живёт в своём
+    потоке со своим playwright/браузером/контекстом: прогрев и капча — свои,
+    куки не пересекаются. Задачи (fn, args) берутся из общей очереди; темп
+    (PACER.wait перед загрузкой) задача держит сама → частота запросов на одну сессию
+    та же, что у одиночного сканера. size <= 1 — задачи выполняются сразу в
+    вызывающем потоке на основной сессии сканера (старое поведение).
+    Очередь приоритетная: карточки (PRIO_ITEM) идут раньше страниц выдачи
+    (PRIO_PAGE), чтобы дозаход лучшего лота не ждал хвост обхода."""
+
+    PRIO_ITEM = 0
+    PRIO_PAGE = 1
+    _PRIO_STOP = 9
+
+    def __init__(self, scanner, size):
+        self.scanner = scanner
+        self.size = max(1, int(size or 1))
+        self._tasks = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+        self._alive = 0
+        self._lock = threading.Lock()
+
+    @property
+    def parallel(self):
+        return self.size > 1
+
+    @property
+    def alive(self):
+        """Есть живые сессии (для size <= 1 — всегда)."""
+        return not self.parallel or self._alive > 0
+
+    def start(self):
+        if not self.parallel:
+            return self
+        self._alive = self.size
+        for i in range(self.size):
+            t = threading.Thread(target=self._worker, args=(i,), name=f"ctx{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"🧵 Пул сессий: контекстов {self.size}")
+        return self
+
+    def submit(self, fn, *args, prio=PRIO_PAGE):
+        fut = Future()
+        if not self.parallel:
+            try:
+                fut.set_result(fn(*args))
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        with self._lock:
+            if self._alive <= 0:
+                fut.set_exception(RuntimeError("пул сессий: нет живых контекстов"))
+                return fut
+            self._tasks.put((prio, next(self._seq), (fut, fn, args)))
+        return fut
+
+    def _worker(self, idx):
+        closer = None
+        self.scanner._tls.pooled = True
+        try:
+            closer = self.scanner._open_worker_session()
+            while True:
+                item = self._tasks.get()[2]
+                if item is None:
+                    break
+                fut, fn, args = item
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    fut.set_result(fn(*args))
+                except Exception as e:
+                    fut.set_exception(e)
+        except Exception as e:
+            logger.error(f"❌ Сессия ctx{idx} упала: {e}")
+        finally:
+            if closer:
+                try:
+                    closer()
+                except Exception:
+                    pass
+            self._worker_exit()
+
+    def _worker_exit(self):
+        # Последняя живая сессия умерла — отдаём ошибку всем ждущим задачам,
+        # иначе run() повиснет на future, которую некому выполнить.
+        with self._lock:
+            self._alive -= 1
+            if self._alive > 0:
+                return
+            while True:
+                try:
+                    item = self._tasks.get_nowait()[2]
+                except queue.Empty:
+                    break
+                if item is not None and item[0].set_running_or_notify_cancel():
+                    item[0].set_exception(RuntimeError("пул сессий: нет живых контекстов"))
+
+    def close(self):
+        for _ in self._threads:
+            self._tasks.put((self._PRIO_STOP, next(self._seq), None))
+        for t in self._threads:
+            t.join(timeout=60)
+        self._threads = []
+
+
+class DeepStage:
+    """Ступень конвейера «дозаход в карточку»: очередь по приоритету + потоки.
+
+    Производитель (оценка семейства в run()) кладёт кандидатов через put(item, prio),
+    воркеры берут из ждущих лучший по prio (deep_prescore — ожидаемая выгода) и
+    вызывают handler(item) — deep_analyze → скоринг → рассылка — параллельно с
+    догрузкой остальных страниц выдачи; при равном prio — по порядку put().
+    Полная очередь блокирует put() (backpressure), кроме block=False (отложенные
+    прошлым циклом — их немного, ставятся до выдачи). workers <= 0 — одна сессия на
+    страницы и карточки: кандидаты копятся и разбираются в close() по убыванию prio
+    общей очередью всех семейств."""
+
+    def __init__(self, handler, workers, maxsize):
+        self.handler = handler
+        self.workers = max(0, int(workers or 0))
+        self.maxsize = max(1, int(maxsize or 1))
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._closing = False
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"deep{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def put(self, item, prio=0.0, block=True):
+        with self._cv:
+            while block and self._threads and len(self._heap) >= self.maxsize:
+                self._cv.wait()
+            heapq.heappush(self._heap, (-prio, next(self._seq), item))
+            self._cv.notify_all()
+
+    def _pop(self):
+        """Следующий кандидат (лучший по prio); None — закрыто и пусто."""
+        with self._cv:
+            while not self._heap and not self._closing:
+                self._cv.wait()
+            if not self._heap:
+                return None
+            item = heapq.heappop(self._heap)[2]
+            self._cv.notify_all()
+            return item
+
+    def _loop(self):
+        while True:
+            item = self._pop()
+            if item is None:
+                break
+            self._run(item)
+
+    def _run(self, item):
+        try:
+            self.handler(item)
+        except Exception as e:
+            logger.error(f"Ошибка дозахода: {e}")
+
+    def close(self):
+        """Дожидается разбора очереди и останавливает воркеры."""
+        with self._cv:
+            self._closing = True
+            self._cv.notify_all()
+        if not self._threads:
+            while self._heap:
+                self._run(heapq.heappop(self._heap)[2])
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+
+class DeepBudget:
+    """Бюджет дозахода на один прогон (run() или пачка intake): не дольше seconds с
+    начала прогона, не больше visits карточек (0 — без ограничения) и стоп, если
+    fail_streak карточек подряд не загрузились (Авито троттлит). Очередь идёт по
+    убыванию выгоды, так что за бортом остаётся хвост — его откладывают в
+    следующий цикл (take() == False), а не теряют."""
+
+    def __init__(self, seconds=DEEP_BUDGET_SEC, visits=DEEP_BUDGET_MAX,
+                 fail_streak=DEEP_FAIL_STREAK, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = clock() + seconds if seconds > 0 else None
+        self.visits = visits
+        self.fail_streak = fail_streak
+        self.used = 0
+        self.fails = 0
+        self.deferred = 0
+        self._lock = threading.Lock()
+
+    def reason(self):
+        """Чем исчерпан бюджет ('' — не исчерпан)."""
+        if self.visits > 0 and self.used >= self.visits:
+            return f"{self.used} дозаходов"
+        if self.deadline is not None and self.clock() >= self.deadline:
+            return "время"
+        if self.fail_streak > 0 and self.fails >= self.fail_streak:
+            return f"{self.fails} отказов подряд"
+        return ''
+
+    def take(self):
+        """Можно ли дозайти в очередной лот (и списать его с бюджета)."""
+        with self._lock:
+            if self.reason():
+                self.deferred += 1
+                return False
+            self.used += 1
+            return True
+
+    def record(self, loaded):
+        """Итог загрузки карточки: подряд идущие отказы закрывают бюджет."""
+        with self._lock:
+            self.fails = 0 if loaded else self.fails + 1
+
+
+DEFER_FIELDS = ('url', 'raw_url', 'title', 'snippet', 'price', 'minutes_ago', 'age_str',
+                'item_text', 'seller_id', 'source_kind')
+
+
+def _deferred_lock(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = open(path.with_name(path.name + '.lock'), 'a')
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+
+def _read_deferred(path):
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return []
+    return [e for e in data if isinstance(e, dict) and isinstance(e.get('listing'), dict)] \
+        if isinstance(data, list) else []
+
+
+def _write_deferred(path, entries):
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def take_deferred(path, now=None, max_hours=DEFERRED_MAX_HOURS):
+    """Забирает отложенные дозаходы (файл очищается). Под flock: файл общий у
+    сканера и обработчика intake. Пролежавшие дольше max_hours — выбрасываются."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    now = time.time() if now is None else now
+    with _deferred_lock(path):
+        entries = _read_deferred(path)
+        if entries:
+            _write_deferred(path, [])
+    return [e for e in entries if now - e.get('deferred_at', 0) <= max_hours * 3600]
+
+
+def defer_deep(path, entries, max_items=DEFERRED_MAX):
+    """Дописывает отложенные дозаходы к уже лежащим: дубль по url — последняя
+    запись, сверх max_items — отрезаются с наименьшей выгодой (prio)."""
+    path = Path(path)
+    with _deferred_lock(path):
+        merged = {e['listing'].get('url'): e for e in _read_deferred(path) + list(entries)}
+        keep = sorted(merged.values(), key=lambda e: e.get('prio', 0), reverse=True)[:max_items]
+        _write_deferred(path, keep)
+
+
+# ─── Просмотренные объявления: журнал seen и реестр лотов ───────────────────
+class SeenStore:
+    """Множество просмотренных URL с временем первой встречи.
+
+    Раньше каждый кандидат переписывал весь seen-hot-deals.json (сотни КБ) перед
+    дозаходом, а обрезка list(set)[-5000:] выкидывала случайные лоты. Теперь:
+      - add() — O(1): строка «ts<TAB>url» дописывается в журнал (SEEN_FILE.log) и
+        сразу уходит в ОС (переживает падение процесса) — под разделяемым flock на
+        SEEN_FILE.lock, чтобы чужая свёртка не обнулила журнал между чтением и нашей
+        строкой; fsync — групповой, не чаще раза в flush_sec (и в flush()/compact());
+      - compact() — конец прогона: снимок + журнал (свой и других процессов) →
+        SEEN_FILE атомарно, журнал обнуляется. Формат снимка совместим со
+        scanner.py v1: seen_urls (от старых к новым) + параллельный seen_ts;
+      - старше retention_days — забываем; больше max_items — отрезаем самые старые.
+    Лоты из снимка без seen_ts (старый формат) датируются временем файла."""
+
+    def __init__(self, path=SEEN_FILE, flush_sec=SEEN_FLUSH_SEC,
+                 retention_days=SEEN_RETENTION_DAYS, max_items=SEEN_MAX, clock=time.time):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + '.log')
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.flush_sec = flush_sec
+        self.retention = retention_days * 86400
+        self.max_items = max_items
+        self.clock = clock
+        self._log = self._log_lock = None
+        self._synced_at = clock()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._ts = self._read_disk()
+
+    def _read_disk(self):
+        out = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            urls = data.get('seen_urls', [])
+            stamps = data.get('seen_ts') or []
+            fallback = int(self.path.stat().st_mtime)
+            for i, u in enumerate(urls):
+                ts = stamps[i] if i < len(stamps) and isinstance(stamps[i], (int, float)) else fallback
+                out[clean_url(u)] = int(ts)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ seen: снимок не прочитан: {e}")
+        try:
+            with open(self.log_path, encoding='utf-8') as f:
+                for line in f:
+                    ts, _, url = line.rstrip('\n').partition('\t')
+                    if url and ts.isdigit():
+                        out.setdefault(url, int(ts))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ seen: журнал не прочитан: {e}")
+        cutoff = self.clock() - self.retention
+        return {u: ts for u, ts in out.items() if ts >= cutoff}
+
+    def __contains__(self, url):
+        return url in self._ts
+
+    def __len__(self):
+        return len(self._ts)
+
+    def __iter__(self):
+        return iter(list(self._ts))
+
+    def add(self, url):
+        with self._lock:
+            if url in self._ts:
+                return
+            ts = int(self.clock())
+            self._ts[url] = ts
+            try:
+                if self._log is None:
+                    self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                    self._log_lock = open(self.lock_path, 'a')
+                    self._log = open(self.log_path, 'a', encoding='utf-8')
+                if fcntl is not None:
+                    fcntl.flock(self._log_lock, fcntl.LOCK_SH)
+                try:
+                    self._log.write(f"{ts}\t{url}\n")
+                    self._log.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(self._log_lock, fcntl.LOCK_UN)
+                self._pending += 1
+                if self.clock() - self._synced_at >= self.flush_sec:
+                    self._sync()
+            except OSError as e:
+                logger.warning(f"⚠️ seen: запись в журнал: {e}")
+
+    def _sync(self):
+        """Под замком: групповой fsync журнала."""
+        if self._log is not None and self._pending:
+            os.fsync(self._log.fileno())
+        self._pending = 0
+        self._synced_at = self.clock()
+
+    def flush(self):
+        with self._lock:
+            try:
+                self._sync()
+            except OSError as e:
+                logger.warning(f"⚠️ seen: fsync: {e}")
+
+    def compact(self):
+        """Журнал → снимок SEEN_FILE (атомарно), журнал обнуляется. Под эксклюзивным
+        flock (add() держит его разделяемым): свёртка другого процесса не потеряет
+        наши строки, мы — его."""
+        with self._lock:
+            try:
+                if self._log is not None:
+                    self._sync()
+                    self._log.close()
+                    self._log_lock.close()
+                    self._log = self._log_lock = None
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.lock_path, 'a') as lock:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_EX)
+                    merged = self._read_disk()
+                    for u, ts in self._ts.items():
+                        if ts >= self.clock() - self.retention:
+                            merged[u] = min(ts, merged.get(u, ts))
+                    items = sorted(merged.items(), key=lambda kv: kv[1])[-self.max_items:]
+                    self._ts = dict(items)
+                    tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+                    with open(tmp, 'w', encoding='utf-8') as f:
+                        json.dump({"updated_at": datetime.now().isoformat(),
+                                   "seen_urls": [u for u, _ in items],
+                                   "seen_ts": [ts for _, ts in items]}, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp, self.path)
+                    open(self.log_path, 'w').close()
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось сохранить seen: {e}")
+
+
+class ListingRegistry:
+    """Реестр объявлений в SQLite: когда впервые/последний раз видели в выдаче,
+    первая/последняя/минимальная цена, возраст из выдачи, сколько раз видели.
+
+    touch() — upsert (одна строка, без перезаписи всего реестра); транзакция
+    фиксируется группой — раз в COMMIT_SEC (не держим блокировку записи весь прогон:
+    охотник и сканер по крону пишут ту же базу). commit() — в конце прогона, плюс
+    обрезка сверх max_items по last_seen. stale() — кандидаты охотника индексным запросом: возраст по
+    first_seen / по выдаче или снижение цены (drop_frac пересчитывается в upsert),
+    только среди виденных за active_days. Записи — dict того же вида, что раньше
+    лежал в listing-registry.json (_entry_days/_entry_drop работают как были)."""
+
+    COMMIT_SEC = 5.0
+
+    COLUMNS = ('url', 'first_seen', 'last_seen', 'first_price', 'last_price', 'min_price',
+               'times_seen', 'title', 'max_age_days')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS listings (
+            url          TEXT PRIMARY KEY,
+            first_seen   TEXT NOT NULL,
+            last_seen    TEXT NOT NULL,
+            first_price  INTEGER NOT NULL,
+            last_price   INTEGER NOT NULL,
+            min_price    INTEGER NOT NULL,
+            times_seen   INTEGER NOT NULL DEFAULT 1,
+            title        TEXT NOT NULL DEFAULT '',
+            max_age_days INTEGER NOT NULL DEFAULT 0,
+            drop_frac    REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS listings_first_seen ON listings(first_seen);
+        CREATE INDEX IF NOT EXISTS listings_last_seen  ON listings(last_seen);
+        CREATE INDEX IF NOT EXISTS listings_drop       ON listings(drop_frac);
+        CREATE INDEX IF NOT EXISTS listings_age        ON listings(max_age_days);
+    """
+
+    UPSERT = """
+        INSERT INTO listings (url, first_seen, last_seen, first_price, last_price, min_price,
+                              times_seen, title, max_age_days, drop_frac)
+        VALUES (:url, :now, :now, :price, :price, :price, 1, :title, :days, 0)
+        ON CONFLICT(url) DO UPDATE SET
+            last_seen    = excluded.last_seen,
+            last_price   = excluded.last_price,
+            min_price    = MIN(min_price, excluded.last_price),
+            times_seen   = times_seen + 1,
+            title        = excluded.title,
+            max_age_days = MAX(max_age_days, excluded.max_age_days),
+            drop_frac    = CASE WHEN first_price > 0
+                                THEN MAX(0.0, (first_price - excluded.last_price) * 1.0 / first_price)
+                                ELSE 0.0 END
+    """
+
+    def __init__(self, path=None, legacy_json=REGISTRY_FILE, max_items=REGISTRY_MAX):
+        self.path = Path(path or REGISTRY_DB)    # None — REGISTRY_DB на момент вызова
+        self.max_items = max_items
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # пул сессий/дозахода трогает реестр из разных потоков — одно соединение под замком
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._committed_at = time.monotonic()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(self.SCHEMA)
+        if legacy_json is not None and len(self) == 0:
+            self._import_json(Path(legacy_json))
+
+    def _import_json(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f) or {}
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Реестр: JSON не прочитан: {e}")
+            return
+        rows = []
+        for url, e in data.items():
+            try:
+                fp = int(e.get('first_price') or 0)
+                lp = int(e.get('last_price') or fp)
+                rows.append((url, e['first_seen'], e.get('last_seen') or e['first_seen'], fp, lp,
+                             int(e.get('min_price') or min(fp, lp)), int(e.get('times_seen') or 1),
+                             e.get('title') or '', int(e.get('max_age_days') or 0),
+                             max(0.0, (fp - lp) / fp) if fp > 0 else 0.0))
+            except (KeyError, TypeError, ValueError):
+                continue
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        logger.info(f"🗃 Реестр: импортировано из {path.name}: {len(rows)}")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM listings WHERE url = ?", (url,)).fetchone()
+        return self._entry(row) if row else None
+
+    def _entry(self, row):
+        return {k: row[k] for k in self.COLUMNS}
+
+    def touch(self, url, price, title, disp_days, now_iso):
+        with self._lock:
+            self._db.execute(self.UPSERT, {'url': url, 'price': int(price), 'title': title or '',
+                                           'days': int(disp_days), 'now': now_iso})
+            if time.monotonic() - self._committed_at >= self.COMMIT_SEC:
+                self._db.commit()
+                self._committed_at = time.monotonic()
+
+    def commit(self):
+        """Конец прогона: зафиксировать touch'и и отрезать давно не виденные сверх max_items."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM listings WHERE url IN (SELECT url FROM listings "
+                "ORDER BY last_seen DESC LIMIT -1 OFFSET ?)", (self.max_items,))
+            self._committed_at = time.monotonic()
+
+    def stale(self, now, min_days, min_drop, active_days=REGISTRY_ACTIVE_DAYS):
+        """[(url, entry)] — висят >= min_days (по first_seen или по выдаче) или снизили
+        цену на >= min_drop; только виденные в выдаче за active_days."""
+        cut_first = (now - timedelta(days=min_days)).isoformat(timespec='seconds')
+        since = (now - timedelta(days=active_days)).isoformat(timespec='seconds')
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM listings WHERE last_seen >= :since AND "
+                "(first_seen <= :cut OR max_age_days >= :days OR drop_frac >= :drop)",
+                {'since': since, 'cut': cut_first, 'days': int(min_days), 'drop': float(min_drop)},
+            ).fetchall()
+        return [(r['url'], self._entry(r)) for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ─── Резидентный режим (--daemon) ───────────────────────────────────────────
+class DaemonSchedule:
+    """Расписание заданий демона: у каждого свой интервал, trigger() ставит задание
+    в очередь немедленно. При одновременной готовности — порядок jobs (intake первым:
+    его карточки ждёт человек). Время последних запусков переживает перезапуск
+    (state()/load_state() → DAEMON_STATE_FILE): суточный stale не гоняется на каждом
+    рестарте."""
+
+    def __init__(self, jobs, now):
+        self.jobs = dict(jobs)                      # имя → интервал, с
+        self.last = {}
+        self.next_at = {name: now for name in self.jobs}
+
+    def load_state(self, state, now):
+        for name, ts in (state or {}).items():
+            if name in self.jobs and isinstance(ts, (int, float)):
+                self.last[name] = ts
+                self.next_at[name] = min(ts + self.jobs[name], now + self.jobs[name])
+
+    def state(self):
+        return dict(self.last)
+
+    def trigger(self, name):
+        if name not in self.jobs:
+            return False
+        self.next_at[name] = 0
+        return True
+
+    def due(self, now):
+        for name in self.jobs:
+            if self.next_at[name] <= now:
+                return name
+        return None
+
+    def done(self, name, now):
+        self.last[name] = now
+        self.next_at[name] = now + self.jobs[name]
+
+    def wait_for(self, now):
+        return max(0.0, min(self.next_at.values()) - now) if self.next_at else 60.0
+
+
+def latency_percentiles(values):
+    """{'n', 'p50', 'p95'} окна задержек в секундах (пустое — только n=0)."""
+    v = sorted(values)
+    if not v:
+        return {'n': 0}
+    pick = lambda q: round(v[min(len(v) - 1, int(len(v) * q))], 2)
+    return {'n': len(v), 'p50': pick(0.5), 'p95': pick(0.95)}
+
+
+def process_tree_rss_mb(pid=None):
+    """RSS процесса и всех его потомков (Chromium — дочерние процессы), МБ.
+    Читается из /proc; где его нет — 0 (водяной знак не срабатывает)."""
+    pid = pid or os.getpid()
+    page = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+    children = {}
+    try:
+        for d in os.listdir('/proc'):
+            if not d.isdigit():
+                continue
+            try:
+                with open(f'/proc/{d}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(d))
+    except OSError:
+        return 0.0
+    total, stack = 0, [pid]
+    while stack:
+        cur = stack.pop()
+        try:
+            with open(f'/proc/{cur}/statm') as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, ValueError, IndexError):
+            pass
+        stack.extend(children.get(cur, ()))
+    return total / 2**20
+
+
+class _TriggerHandler(BaseHTTPRequestHandler):
+    """Локальный триггер демона: POST /trigger/<job> — задание вне расписания,
+    POST /cards ({"cards": [...]}) — карточки, только что принятые intake-сервером,
+    в очередь триажа демона, GET /status — когда что запускалось и задержка триажа."""
+    timeout = 5
+
+    def _send(self, code, obj):
+        b = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def do_POST(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'trigger' and parts[1] in self.server.jobs:
+            self.server.triggers.put(parts[1])
+            return self._send(202, {'ok': True, 'job': parts[1]})
+        if parts == ['cards'] and self.server.push is not None:
+            try:
+                n = int(self.headers.get('content-length') or 0)
+                if not 0 < n <= PUSH_MAX_BODY:
+                    return self._send(413 if n else 400, {'ok': False})
+                cards = json.loads(self.rfile.read(n)).get('cards')
+            except (ValueError, AttributeError):
+                return self._send(400, {'ok': False})
+            if not isinstance(cards, list):
+                return self._send(400, {'ok': False})
+            cards = [c for c in cards if isinstance(c, dict) and c.get('url')]
+            self.server.push(cards)
+            return self._send(202, {'ok': True, 'queued': len(cards)})
+        self._send(404, {'ok': False})
+
+    def do_GET(self):
+        self._send(200, {'ok': True, **self.server.status()})
+
+    def log_message(self, *a):
+        pass
+
+
+def start_trigger_server(port, jobs, triggers, status, push=None):
+    """Поднимает триггер на 127.0.0.1:port в фоновом потоке. push(cards) — приём
+    POST /cards (None — эндпоинта нет). Возвращает сервер (None — порт 0 или занят)."""
+    if not port:
+        return None
+    try:
+        srv = ThreadingHTTPServer(('127.0.0.1', port), _TriggerHandler)
+    except OSError as e:
+        logger.warning(f"⚠️ Триггер демона не поднят (порт {port}): {e}")
+        return None
+    srv.daemon_threads = True
+    srv.jobs, srv.triggers, srv.status, srv.push = set(jobs), triggers, status, push
+    threading.Thread(target=srv.serve_forever, name="daemon-trigger", daemon=True).start()
+    logger.info(f"🛎 Триггер демона: http://127.0.0.1:{srv.server_address[1]}/trigger/<задание>")
+    return srv
+
+
 class AvitoScannerV2:
     def __init__(self, playwright_instance):
         self.pw = playwright_instance
@@ -618,45 +1525,19 @@ class AvitoScannerV2:
         self.page = None
 
         # База цен — фолбэк рыночной медианы и выкупа, когда живых сопоставимых мало.
-        # Индексируем по live_key через тот же классификатор: надёжнее точной сверки
-        # строки model_name (в базе и у классификатора она форматируется по-разному).
         self.prices: dict = {}
         self.prices_by_livekey: dict = {}
         self.prices_generated_at = None
-        if PRICES_FILE.exists():
-            with open(PRICES_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.prices_generated_at = data.get('generated_at')
-                for s in data.get('stats', []):
-                    key = (
-                        s['model_name'].lower(),
-                        s.get('processor', 'Apple'),
-                        int(s.get('ram', 0)),
-                        int(s.get('ssd', 0)),
-                    )
-                    self.prices[key] = s
-                    try:
-                        c = classify(f"{s['model_name']} {s.get('processor', '')}",
-                                     {'ram': int(s.get('ram', 0)), 'ssd': int(s.get('ssd', 0))})
-                        if c.is_valid:
-                            self.prices_by_livekey[live_key(c)] = s
-                    except Exception:
-                        pass
-            logger.info(f"📊 База-фолбэк: {len(self.prices)} конфигов, "
-                        f"{len(self.prices_by_livekey)} по live-ключу")
-        else:
-            logger.warning("⚠️ База цен не найдена — рынок только из живой выдачи")
+        self._prices_mtime = None
+        # Потолки цены алерта по конфигу (_alert_ceiling): строятся лениво из базы и
+        # скетчей коллектора, сбрасываются при их обновлении
+        self._ceilings = {}
+        self._load_prices()
 
-        # История просмотренных
-        self.seen = set()
-        if SEEN_FILE.exists():
-            try:
-                with open(SEEN_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.seen = set(clean_url(u) for u in data.get('seen_urls', []))
-                logger.info(f"👁 История: {len(self.seen)} объявлений")
-            except Exception:
-                pass
+        # История просмотренных (снимок + журнал дописанных, см. SeenStore)
+        self.seen = SeenStore()
+        if len(self.seen):
+            logger.info(f"👁 История: {len(self.seen)} объявлений")
 
         # История цен
         self.price_history = {}
@@ -667,62 +1548,222 @@ class AvitoScannerV2:
             except Exception:
                 pass
 
-        # Реестр объявлений (для охотника за залежавшимися)
-        self.registry = {}
-        if REGISTRY_FILE.exists():
-            try:
-                with open(REGISTRY_FILE, 'r', encoding='utf-8') as f:
-                    self.registry = json.load(f)
-                logger.info(f"🗃 Реестр объявлений: {len(self.registry)}")
-            except Exception:
-                pass
+        # Реестр объявлений (для охотника за залежавшимися), SQLite
+        self.registry = ListingRegistry()
+        n_reg = len(self.registry)
+        if n_reg:
+            logger.info(f"🗃 Реестр объявлений: {n_reg}")
 
         # Кэш накопителя цен коллектора (живые компы для intake); грузится лениво
         self._raw_prices_cache = None
+        self._raw_prices_mtime = None
+        self._raw_sketches = None
+        self._raw_sketch_mtime = None
+
+        # Пул сессий run() (ContextPool) и страница потока пула
+        self._pool = None
+        self._tls = threading.local()
+        self._main_fetcher = None     # HttpFetcher основного потока (HTTP-first)
+        # Запись файлов состояния/рассылка из воркеров конвейера — по одному
+        self._io_lock = threading.RLock()
+        self._alerts_sent = 0
+        # Бюджет дозахода текущего run() (DeepBudget) и не влезшие в него кандидаты —
+        # в конце прогона уходят в DEFERRED_FILE
+        self._deep_budget = None
+        self._deferred = []
+        # Фильтр картинок/шрифтов/счётчиков — общий на все контексты (и пул)
+        self._rfilter = ResourceFilter()
+        # --daemon: браузер, HTTP-сессии и пул живут между заданиями (см. run_daemon)
+        self._resident = False
+        # Триаж карточек, толкнутых intake-сервером (POST /cards): очередь из потока
+        # триггера; разобранные url (спул их тоже отдаст — второй раз не считаем цены);
+        # задержка от приёма сервером до разбора и до алерта, с
+        self._pushed = queue.Queue()
+        self._triaged = {}
+        self._in_triage = False
+        self._triage_lat = deque(maxlen=DAEMON_LATENCY_WINDOW)
+        self._alert_lat = deque(maxlen=DAEMON_LATENCY_WINDOW)
+
+    def _load_prices(self):
+        """Читает базу цен. Индексируем по live_key через тот же классификатор:
+        надёжнее точной сверки строки model_name (в базе и у классификатора она
+        форматируется по-разному). Классификация строк кэшируется по содержимому
+        файла (common.price_index) — повторный старт её не пересчитывает."""
+        idx = load_price_index(PRICES_FILE)
+        if idx is None:
+            self.prices, self.prices_by_livekey = {}, {}
+            self._prices_mtime = None
+            self._ceilings.clear()
+            logger.warning("⚠️ База цен не найдена — рынок только из живой выдачи")
+            return
+        self.prices, self.prices_by_livekey = idx.by_db_key, idx.by_live_key
+        self._prices_mtime = idx.mtime
+        self._ceilings.clear()
+        self.prices_generated_at = idx.generated_at
+        logger.info(f"📊 База-фолбэк: {len(self.prices)} конфигов, "
+                    f"{len(self.prices_by_livekey)} по live-ключу"
+                    + (" (из кэша)" if idx.from_cache else ""))
+
+    def _refresh_from_disk(self):
+        """Резидентный режим: перечитать базу цен, если парсер её обновил, и
+        сбросить кэш накопителя коллектора, если файл менялся."""
+        mtime = PRICES_FILE.stat().st_mtime if PRICES_FILE.exists() else None
+        if mtime != self._prices_mtime:
+            logger.info("📊 База цен обновилась — перечитываю")
+            self._load_prices()
+        raw_sig = raw_price_log().signature()
+        if raw_sig != self._raw_prices_mtime:
+            self._raw_prices_cache = None
+            self._raw_prices_mtime = raw_sig
+        sketch_mtime = RAW_SKETCH_FILE.stat().st_mtime if RAW_SKETCH_FILE.exists() else None
+        if sketch_mtime != self._raw_sketch_mtime:
+            self._raw_sketches = None
+            self._raw_sketch_mtime = sketch_mtime
+            self._ceilings.clear()
+
+    def _open_session(self, pw):
+        """Браузер + контекст + страница (stealth-настройки и фильтр запросов
+        common.browser). Возвращает (browser, context, page)."""
+        browser = launch_chromium(pw)
+        context = new_context(browser, USER_AGENT, self._rfilter, store=SESSIONS)
+        return browser, context, context.new_page()
+
+    def _http_first(self):
+        return HTTP_FIRST and CURL_AVAILABLE
 
     def _start_browser(self):
-        """Запускает Playwright-браузер."""
-        self.browser = self.pw.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox',
-                  '--disable-blink-features=AutomationControlled'],
-        )
-        self.context = self.browser.new_context(
-            viewport={'width': 1440, 'height': 900},
-            user_agent=USER_AGENT,
-            locale='ru-RU',
-            timezone_id='Europe/Moscow',
-            extra_http_headers={'Accept-Language': 'ru-RU,ru;q=0.9'},
-        )
-        self.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            Object.defineProperty(navigator, 'plugins',   { get: () => [1, 2, 3] });
-            window.chrome = { runtime: {} };
-        """)
-        self.page = self.context.new_page()
+        """Запускает Playwright-браузер. В режиме HTTP-first — лениво, при первой капче.
+        Уже запущенный (резидентный режим) не трогает."""
+        if self._http_first() or self.page is not None:
+            return
+        self.browser, self.context, self.page = self._open_session(self.pw)
+
+    def _main_page(self):
+        """Страница основного потока; браузер поднимается при первом обращении."""
+        if self.page is None:
+            self.browser, self.context, self.page = self._open_session(self.pw)
+        return self.page
+
+    def _open_worker_session(self):
+        """Сессия для потока пула: свой playwright, браузер и прогрев (капча решается
+        в этой сессии). Страница и HTTP-сессия — в thread-local. В режиме HTTP-first
+        браузер поднимается только при эскалации. Возвращает функцию закрытия."""
+        held = {}
+
+        def _page():
+            if 'page' not in held:
+                pw = sync_playwright().start()
+                try:
+                    held['browser'], held['context'], held['page'] = self._open_session(pw)
+                except Exception:
+                    pw.stop()
+                    raise
+                held['pw'] = pw
+                self._tls.page = held['page']
+            return held['page']
+
+        def _closer():
+            fetcher = getattr(self._tls, 'fetcher', None)
+            if fetcher:
+                fetcher.close()
+            self._tls.page = self._tls.fetcher = None
+            for k in ('context', 'browser'):
+                try:
+                    held[k].close()
+                except Exception:
+                    pass
+            if 'pw' in held:
+                held['pw'].stop()
+
+        try:
+            if self._http_first():
+                self._tls.fetcher = HttpFetcher(_page, store=SESSIONS)
+            else:
+                _page()
+            self._warmup()
+        except Exception:
+            _closer()
+            raise
+        return _closer
+
+    def _session_page(self):
+        """Страница текущего потока: своя у потока пула, иначе основная."""
+        return getattr(self._tls, 'page', None) or self.page
+
+    def _fetcher(self):
+        """HTTP-сессия текущего потока (None — режим только-браузер)."""
+        if not self._http_first():
+            return None
+        f = getattr(self._tls, 'fetcher', None)
+        if f is None and not getattr(self._tls, 'pooled', False):
+            if self._main_fetcher is None:
+                self._main_fetcher = HttpFetcher(self._main_page, store=SESSIONS)
+            f = self._main_fetcher
+        return f
 
     def _warmup(self):
-        """Прогрев: заходим на avito.ru, решаем капчу один раз."""
+        """Прогрев: заходим на avito.ru, решаем капчу один раз.
+        HTTP-first: свежая curl-сессия с куками сохранённого состояния + главная
+        (куки фаервола, при капче — браузер)."""
+        fetcher = self._fetcher()
         logger.info("🌐 Прогрев: avito.ru...")
-        ok = navigate_with_captcha(self.page, "https://www.avito.ru")
+        if fetcher is not None:
+            fetcher.restart_session()
+            ok = fetcher.fetch("https://www.avito.ru") is not None
+        else:
+            ok = navigate_with_captcha(self._session_page(), "https://www.avito.ru")
         if ok:
             logger.info("✅ Прогрев пройден")
+            self._tls.warmed_at = time.time()
         else:
             logger.warning("⚠️ Прогрев не удался, продолжаем...")
-        self.page.wait_for_timeout(random.randint(2000, 4000))
+        PACER.wait("https://www.avito.ru")
+
+    def _ensure_warm(self):
+        """Прогрев в начале задания. Резидентный режим: сессия уже прогрета (не
+        старше DAEMON_REWARM_MIN) — без захода на главную и без капчи; при
+        параллельном пуле страницы грузят его сессии, прогретые при открытии."""
+        if self._resident:
+            if self._pool is not None and self._pool.parallel:
+                return
+            if time.time() - getattr(self._tls, 'warmed_at', 0) < DAEMON_REWARM_MIN * 60:
+                return
+        self._warmup()
 
     def _load_page(self, url):
-        """Загружает страницу через Playwright с обходом капчи. Возвращает HTML или None."""
-        ok = navigate_with_captcha(self.page, url)
+        """Загружает страницу (HTTP-first или Playwright) с обходом капчи. Возвращает
+        HTML или None. Из основного потока при работающем пуле — через пул."""
+        if (self._pool is not None and self._pool.parallel
+                and not getattr(self._tls, 'pooled', False)):
+            return self._pool.submit(self._load_page, url, prio=ContextPool.PRIO_ITEM).result()
+        fetcher = self._fetcher()
+        if fetcher is not None:
+            return fetcher.fetch(url)
+        page = self._session_page()
+        ok = navigate_with_captcha(page, url)
         if not ok:
             return None
-        return self.page.content()
-
-    def _close(self):
+        return page.content()
+
+    def _close(self, force=False):
+        """Конец задания: закрыть HTTP-сессию и браузер. В резидентном режиме они
+        живут между заданиями — закрываются только с force (пересоздание/выход)."""
+        if self._resident and not force:
+            self._rfilter.log_summary(logger)
+            PACER.log_summary(logger)
+            CLASSIFY_CACHE.log_summary(logger)
+            return
+        if self._main_fetcher:
+            self._main_fetcher.close()
+            self._main_fetcher = None
         if self.context:
             self.context.close()
         if self.browser:
             self.browser.close()
+        self.browser = self.context = self.page = None
+        self._rfilter.log_summary(logger)
+        PACER.log_summary(logger)
+        CLASSIFY_CACHE.log_summary(logger)
 
     def deep_analyze(self, url):
         """Заходит в объявление, собирает детали (включая полное описание для анализа состояния)."""
@@ -736,10 +1777,12 @@ class AvitoScannerV2:
             "seller_type": "?",
             "location": "",
             "desc_text": "",   # полный текст описания продавца (для анализа состояния)
+            "loaded": False,   # карточка загрузилась (иначе — троттлинг/капча, см. DeepBudget)
         }
         html_content = self._load_page(url)
         if not html_content:
             return result
+        result["loaded"] = True
 
         try:
             soup = BeautifulSoup(html_content, 'lxml')
@@ -833,15 +1876,9 @@ class AvitoScannerV2:
         return self.prices.get(key)
 
     def _save_seen(self):
-        try:
-            SEEN_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(SEEN_FILE, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "updated_at": datetime.now().isoformat(),
-                    "seen_urls": list(self.seen)[-5000:],
-                }, f)
-        except Exception as e:
-            logger.warning(f"⚠️ Не удалось сохранить seen: {e}")
+        """Конец прогона: журнал seen → снимок SEEN_FILE (его коммитит CI, читает v1).
+        По ходу прогона каждый add() уже дописан в журнал."""
+        self.seen.compact()
 
     # ─── Telegram уведомления ─────────────────────────────────────────────────
 
@@ -1034,34 +2071,18 @@ class AvitoScannerV2:
     # ─── Реестр объявлений (охотник за залежавшимися) ─────────────────────────
 
     def _registry_touch(self, L):
-        """Обновляет реестр: первая дата, история цены, сколько раз видели."""
-        url, price = L['url'], L['price']
-        now_iso = datetime.now().isoformat(timespec='seconds')
-        disp_days = int(L.get('minutes_ago', 0) // 1440)
-        e = self.registry.get(url)
-        if not e:
-            self.registry[url] = {
-                'first_seen': now_iso, 'last_seen': now_iso,
-                'first_price': price, 'last_price': price, 'min_price': price,
-                'times_seen': 1, 'title': L['title'], 'max_age_days': disp_days,
-            }
-        else:
-            e['last_seen'] = now_iso
-            e['last_price'] = price
-            e['min_price'] = min(int(e.get('min_price', price)), price)
-            e['times_seen'] = int(e.get('times_seen', 1)) + 1
-            e['max_age_days'] = max(int(e.get('max_age_days', 0)), disp_days)
-            e['title'] = L['title']
+        """Обновляет реестр (upsert): первая дата, история цены, сколько раз видели."""
+        try:
+            self.registry.touch(L['url'], L['price'], L['title'],
+                                int(L.get('minutes_ago', 0) // 1440),
+                                datetime.now().isoformat(timespec='seconds'))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Реестр: {e}")
 
     def _save_registry(self):
         try:
-            items = sorted(self.registry.items(),
-                           key=lambda kv: kv[1].get('last_seen', ''), reverse=True)[:REGISTRY_MAX]
-            self.registry = dict(items)
-            REGISTRY_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(REGISTRY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.registry, f, ensure_ascii=False)
-        except Exception as e:
+            self.registry.commit()
+        except sqlite3.Error as e:
             logger.warning(f"⚠️ Реестр не сохранён: {e}")
 
     @staticmethod
@@ -1082,7 +2103,7 @@ class AvitoScannerV2:
     def run_stale_sweep(self):
         """Проход «охотника»: залежавшихся/снизивших цену продавцов → в очередь торга."""
         self._start_browser()
-        self._warmup()
+        self._ensure_warm()
         now = datetime.now()
         logger.info(f"🕰 Охота за залежавшимися (>= {STALE_LISTING_DAYS} дн или снижение цены)...")
 
@@ -1091,12 +2112,14 @@ class AvitoScannerV2:
         for scan_info in self._get_scan_urls():
             label, base_url = scan_info['label'], scan_info['url']
             for page_num in range(1, STALE_SCAN_PAGES + 1):
-                time.sleep(random.uniform(2, 5))
+                self._triage_checkpoint()
+                PACER.wait(base_url)
                 page_html = self._load_page(self._page_url(base_url, page_num))
                 page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
                 if page_num == 1 and n_items == 0:
+                    PACER.backoff(base_url, 'empty')
                     self._warmup()
-                    time.sleep(random.uniform(2, 4))
+                    PACER.wait(base_url)
                     page_html = self._load_page(self._page_url(base_url, page_num))
                     page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
                 for L in page_listings:
@@ -1107,13 +2130,14 @@ class AvitoScannerV2:
                 if n_items < 10:
                     break
 
-        # 2) Кандидаты: возраст или снижение цены (в seen_now — приоритет, точно живые)
+        # 2) Кандидаты: возраст или снижение цены — индексный запрос к реестру
+        #    (в seen_now — приоритет, точно живые)
+        self._save_registry()
         cands = []
-        for url, e in self.registry.items():
+        for url, e in self.registry.stale(now, STALE_LISTING_DAYS, STALE_MIN_DROP):
             days = self._entry_days(e, now)
             drop = self._entry_drop(e)
-            if days >= STALE_LISTING_DAYS or drop >= STALE_MIN_DROP:
-                cands.append((url, e, days, drop, url in seen_now))
+            cands.append((url, e, days, drop, url in seen_now))
         cands.sort(key=lambda x: (x[4], x[2] + x[3] * 50), reverse=True)
 
         existing = set()
@@ -1130,8 +2154,9 @@ class AvitoScannerV2:
             lid = hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]
             if lid in existing:
                 continue
+            self._triage_checkpoint()
             L = seen_now.get(url)
-            time.sleep(random.uniform(1.5, 3.5))
+            PACER.wait(url, SCALE_ITEM)
             analysis = self.deep_analyze(url)
             # лот снят/недоступен → пустой разбор, пропускаем
             if not (analysis.get('desc_text') or analysis.get('specs') or analysis.get('location') or L):
@@ -1191,44 +2216,29 @@ class AvitoScannerV2:
     # ─── Сбор объявлений со страницы выдачи ───────────────────────────────────
 
     def _collect_listings(self, html_content):
-        """Парсит карточки на странице выдачи в список словарей."""
-        soup = BeautifulSoup(html_content, 'lxml')
-        items = soup.select('[data-marker="item"]')
+        """Парсит карточки на странице выдачи в список словарей (common.extract —
+        встроенное состояние страницы, иначе один проход lxml по DOM)."""
+        items, n_items = extract_listings(html_content)
         out = []
-        for item in items:
-            try:
-                link_tag = item.select_one('[data-marker="item-title"]')
-                if not link_tag or not link_tag.get('href'):
-                    continue
-                raw_url = urljoin("https://www.avito.ru", link_tag['href'])
-                url_clean = clean_url(raw_url)
-                raw_title = link_tag.get('title', '') or link_tag.get_text(strip=True)
-
-                price_tag = item.select_one('[itemprop="price"]')
-                if not price_tag or not price_tag.get('content'):
-                    continue
-                try:
-                    price = int(price_tag['content'])
-                except (ValueError, TypeError):
-                    continue
-
-                snippet_tag = item.select_one('[data-marker="item-description"]')
-                snippet = snippet_tag.get_text(' ').lower() if snippet_tag else ""
-                age_str, minutes_ago = parse_item_age(item)
-
-                out.append({
-                    'raw_url': raw_url,
-                    'url': url_clean,
-                    'title': raw_title,
-                    'snippet': snippet,
-                    'price': price,
-                    'age_str': age_str,
-                    'minutes_ago': minutes_ago,
-                    'item_text': item.get_text(' ').lower(),
-                })
-            except Exception:
+        for it in items:
+            if not it['href'] or it['price'] is None:
                 continue
-        return out, len(items)
+            snippet = it['description'].lower()
+            out.append({
+                'raw_url': it['url'],
+                'url': clean_url(it['url']),
+                'title': it['title'],
+                'snippet': snippet,
+                'price': it['price'],
+                'age_str': it['age_str'],
+                'minutes_ago': it['minutes_ago'],
+                # текст карточки целиком больше не собираем: хватает извлечённых полей
+                'item_text': ' '.join((it['title'], snippet, it['date'])).lower(),
+                # есть только во встроенном состоянии страницы (иначе None)
+                'seller_id': it['seller_id'],
+                'published_ts': it['published_ts'],
+            })
+        return out, n_items
 
     # ─── Основной цикл ───────────────────────────────────────────────────────
 
@@ -1314,14 +2324,15 @@ class AvitoScannerV2:
             return
 
         self._start_browser()
-        self._warmup()
+        self._ensure_warm()
         now = datetime.now()
         changed, refired, dropped = False, 0, 0
         dropped_urls = set()   # снятые/проданные — для слияния в конце
 
         for url, e in list(wl.items()):
+            self._triage_checkpoint()
             try:
-                time.sleep(random.uniform(1.5, 3.5))
+                PACER.wait(url, SCALE_ITEM)
                 status, price = self._listing_status(url)
                 if status == 'removed':
                     dropped_urls.add(url); del wl[url]; dropped += 1; changed = True
@@ -1438,13 +2449,14 @@ class AvitoScannerV2:
         return self.prices_by_livekey.get(live_key(cfg)) or self.match_to_db(cfg)
 
     def _raw_comps(self, cfg):
-        """Живые компы из накопителя коллектора (intake-raw-prices.json) — цены,
+        """Живые компы из накопителя коллектора (intake-raw-prices.json + журнал) — цены,
         собранные домашним браузером без троттлинга. Используются в intake, где
         страниц выдачи нет: закрывают конфиги без базы (новые M5) и протухшую базу."""
         if self._raw_prices_cache is None:
+            log = raw_price_log()
+            self._raw_prices_mtime = log.signature()
             try:
-                data = json.loads(RAW_PRICES_FILE.read_text(encoding='utf-8')) if RAW_PRICES_FILE.exists() else {}
-                self._raw_prices_cache = data if isinstance(data, dict) else {}
+                self._raw_prices_cache = log.read()
             except Exception:
                 self._raw_prices_cache = {}
         entries = self._raw_prices_cache.get(str(live_key(cfg)))
@@ -1452,6 +2464,53 @@ class AvitoScannerV2:
             return []
         return [int(e[0]) if isinstance(e, list) else int(e) for e in entries]
 
+    def _raw_sketch(self, cfg):
+        """Слитый скетч цен накопителя (common.price_sketch) по конфигу за
+        RAW_MARKET_DAYS дней. Скетчи грузятся лениво; нет файла — строятся из
+        intake-raw-prices.json."""
+        if self._raw_sketches is None:
+            self._raw_sketch_mtime = RAW_SKETCH_FILE.stat().st_mtime if RAW_SKETCH_FILE.exists() else None
+            self._raw_sketches = load_raw_sketches(RAW_SKETCH_FILE, RAW_PRICES_FILE)
+            self._ceilings.clear()
+        return self._raw_sketches.query(str(live_key(cfg)), RAW_MARKET_DAYS)
+
+    def _raw_market(self, cfg, exclude=None):
+        """Живой рынок конфига из скетчей накопителя — MarketStats или None;
+        exclude — цена самого лота."""
+        return self._raw_sketch(cfg).robust_stats(exclude=exclude)
+
+    def _alert_ceiling(self, cfg):
+        """Потолок цены алерта конфига для intake: карточка дороже заведомо не
+        пройдёт MIN_MARGIN при любом рынке, который выберет _market_for (своя цена
+        лота в скетче учтена верхней границей median_bound; SCAM_FLOOR потолок не
+        поднимает). None — рынка может не оказаться (нет базы, в скетче меньше 4
+        цен): такую карточку судит полный путь. Таблица по live_key (и ключу базы,
+        если конфиг нашёлся не по live_key); запись свежей базы живёт, пока запись
+        не протухла, остальное сбрасывают перечитка базы и новые цены в скетчах."""
+        lk = live_key(cfg)
+        ck = (lk, None if lk in self.prices_by_livekey else config_to_db_key(cfg))
+        hit = self._ceilings.get(ck)
+        if hit is not None and (hit[1] is None or datetime.now() < hit[1]):
+            return hit[0]
+        db = self._db_stat(cfg)
+        med, until = 0, None
+        if db and db.get('median_price'):
+            med = int(db['median_price'])
+            if not db.get('manual_override'):
+                dt = parse_generated_at(db.get('updated_at'))
+                if dt is not None and not db_entry_is_stale(db.get('updated_at')):
+                    until = dt + timedelta(days=STALE_DB_DAYS)   # до протухания рынок — только база
+        if until is None and not (db and db.get('manual_override')):
+            # протухшая база или её нет — рынок может оказаться живым (скетч без цены лота)
+            sk = self._raw_sketch(cfg)
+            if not med and sk.n < 4:
+                self._ceilings[ck] = (None, None)
+                return None
+            med = max(med, sk.median_bound())
+        ceiling = int(med * (1 - MIN_MARGIN)) + 1 if med > 0 else None
+        self._ceilings[ck] = (ceiling, until)
+        return ceiling
+
     def _market_for(self, cfg, comps):
         """Эталон рынка = МОСКВА (база цен), т.к. перепродажа в Москве. Поиск идёт по
         всей России, но цену лота сравниваем с московской медианой из базы.
@@ -1459,9 +2518,11 @@ class AvitoScannerV2:
         фолбэк для конфигов без базы И замена ПРОТУХШЕЙ базы: CI-парсер троттлится
         и неделями не обновляет горячие конфиги, а старая медиана на падающем рынке
         завышена → ложно-выгодные алерты. Живая медиана всероссийская (ниже
-        московской) — для перекупа это консервативно: ложных срабатываний не даёт."""
+        московской) — для перекупа это консервативно: ложных срабатываний не даёт.
+        comps — цены живой выборки или уже посчитанная по ней статистика
+        (MarketStats/None из LiveMarket.stats)."""
         db = self._db_stat(cfg)
-        live = robust_stats(comps)
+        live = comps if comps is None or isinstance(comps, MarketStats) else robust_stats(comps)
         if db and db.get('median_price'):
             # ручной оверрайд не протухает: курируемая цифра главнее живого рынка
             db_fresh = db.get('manual_override') or not db_entry_is_stale(db.get('updated_at'))
@@ -1479,108 +2540,275 @@ class AvitoScannerV2:
             return live, 'live-thin'
         return None, None
 
-    def run(self):
-        # Дохлый-выключатель: проверяем свежесть базы цен ДО скана
-        # (не требует браузера; алерт уйдёт, даже если потом скан упадёт)
-        self._check_prices_freshness()
-
-        self._start_browser()
-        self._warmup()
-
-        scan_urls = self._get_scan_urls()
-        logger.info(f"🎬 Запуск сканера v2 ({len(scan_urls)} семейств, "
-                    f"{SCAN_PAGES_PER_FAMILY} стр/семейство, живой рынок)...")
-
-        total_notifications = 0
+    def _fetch_search_page(self, label, base_url, page_num):
+        """Одна страница выдачи (выполняется в сессии пула): пауза, загрузка, разбор.
+        Возвращает (listings, n_items)."""
+        PACER.wait(base_url)
+        page_html = self._load_page(self._page_url(base_url, page_num))
+        page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
+
+        # Пустая 1-я страница = мягкий бан Авито (троттлинг) → пере-прогрев
+        # (заново решаем капчу, сбрасываем сессию) и одна повторная попытка.
+        if page_num == 1 and n_items == 0:
+            logger.warning(f"   ⚠️ {label}: 0 объявл. — похоже на троттлинг, пере-прогрев и повтор")
+            PACER.backoff(base_url, 'empty')
+            self._warmup()
+            PACER.wait(base_url)
+            page_html = self._load_page(self._page_url(base_url, page_num))
+            page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
+        return page_listings, n_items
+
+    def _scan_search_pages(self, scan_urls, on_family=None):
+        """Раздаёт страницы выдачи по пулу: сначала 1-е страницы всех семейств, после
+        удачной 1-й — остальные страницы семейства разом. Склейка — как при
+        последовательном обходе: по порядку страниц до первой пустой/неполной.
+        on_family(label, listings) зовётся, как только догрузилось семейство (не
+        дожидаясь остальных) — отсюда кандидаты уходят в конвейер дозахода.
+        Возвращает {label: [listings]}."""
+        max_pages = SCAN_PAGES_PER_FAMILY
+        got = {s['label']: {} for s in scan_urls}
+        left = {s['label']: 0 for s in scan_urls}     # страниц семейства в работе
+        out = {}
+        pending = {}
+
+        def _submit(s, page_num):
+            left[s['label']] += 1
+            pending[self._pool.submit(self._fetch_search_page,
+                                      s['label'], s['url'], page_num)] = (s, page_num)
+
+        for s in scan_urls:
+            logger.info(f"🔍 {s['label']}: {s['url'][:60]}...")
+            _submit(s, 1)
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                s, page_num = pending.pop(fut)
+                label = s['label']
+                left[label] -= 1
+                try:
+                    page_listings, n_items = fut.result()
+                    got[label][page_num] = (page_listings, n_items)
+                    if page_num == 1 and n_items >= 10:
+                        for p in range(2, max_pages + 1):
+                            _submit(s, p)
+                except Exception as e:
+                    logger.error(f"❌ {label}: стр. {page_num}: {e}")
+                if left[label] == 0:
+                    out[label] = self._stitch_pages(label, got[label], max_pages)
+                    if on_family:
+                        try:
+                            on_family(label, out[label])
+                        except Exception as e:
+                            logger.error(f"Ошибка: {e}")
+        return out
 
-        for scan_info in scan_urls:
-            label = scan_info['label']
-            base_url = scan_info['url']
-            logger.info(f"\n{'─'*40}")
-            logger.info(f"🔍 {label}: {base_url[:60]}...")
+    @staticmethod
+    def _stitch_pages(label, pages, max_pages):
+        """Склейка страниц семейства {page_num: (listings, n_items)} по порядку."""
+        listings = []
+        for page_num in range(1, max_pages + 1):
+            if page_num not in pages:
+                break
+            page_listings, n_items = pages[page_num]
+            if n_items == 0 and not page_listings:
+                logger.error(f"❌ {label}: стр. {page_num} пуста даже после повтора")
+                break
+            listings.extend(page_listings)
+            logger.info(f"   📄 {label} стр.{page_num}: {n_items} объявл.")
+            if n_items < 10:
+                break
+        return listings
+
+    def _assess_family(self, label, listings, deep):
+        """Живой рынок семейства + отбор кандидатов; прошедшие assess_deal уходят
+        в конвейер дозахода (deep.put) с ожидаемой выгодой (_prescore) — очередь
+        общая для всех семейств прогона."""
+        self._triage_checkpoint()
+        if not listings:
+            return
+        logger.info(f"\n{'─'*40}")
+
+        # ── 2) Строим ЖИВОЙ рынок: цены сопоставимых лотов прямо сейчас ──
+        buckets = {}              # live_key -> [prices]
+        cfg_cache = {}            # url -> config
+        for L in listings:
+            cfg = self._passes_prefilter(L)
+            cfg_cache[L['url']] = cfg
+            if cfg is not None:
+                buckets.setdefault(live_key(cfg), []).append(L['price'])
+                self._registry_touch(L)   # копим историю для охотника за залежавшимися
+        logger.info(f"   📊 {label}: {len(listings)} лотов → {len(buckets)} живых конфигов")
+        book = LiveMarket(buckets)   # корзина сортируется один раз, статистика — в кэше
+
+        # ── 3) Детектим сделки против живого рынка ──────────────────────
+        passed = []
+        for L in listings:
+            try:
+                url_clean = L['url']
+                if url_clean in self.seen:
+                    continue
 
-            # ── 1) Грузим N страниц выдачи, собираем все объявления ──────────
-            listings = []
-            for page_num in range(1, SCAN_PAGES_PER_FAMILY + 1):
-                time.sleep(random.uniform(2, 5))
-                page_html = self._load_page(self._page_url(base_url, page_num))
-                page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
+                cfg = cfg_cache.get(url_clean)
+                if cfg is None:
+                    # не прошёл префильтр (мусор / не та цена / невалидный конфиг)
+                    self.seen.add(url_clean)
+                    continue
 
-                # Пустая 1-я страница = мягкий бан Авито (троттлинг) → пере-прогрев
-                # (заново решаем капчу, сбрасываем сессию) и одна повторная попытка.
-                if page_num == 1 and n_items == 0:
-                    logger.warning(f"   ⚠️ {label}: 0 объявл. — похоже на троттлинг, пере-прогрев и повтор")
-                    self._warmup()
-                    time.sleep(random.uniform(2, 4))
-                    page_html = self._load_page(self._page_url(base_url, page_num))
-                    page_listings, n_items = self._collect_listings(page_html) if page_html else ([], 0)
+                price = L['price']
+                # не сравниваем лот сам с собой: корзина без его цены
+                market, source = self._market_for(cfg, book.stats(live_key(cfg), exclude=price))
+                if not market:
+                    # ни живого рынка, ни базы — судить не можем, пропускаем тихо
+                    continue
 
-                if n_items == 0 and not page_listings:
-                    logger.error(f"❌ {label}: стр. {page_num} пуста даже после повтора")
-                    break
-                listings.extend(page_listings)
-                logger.info(f"   📄 стр.{page_num}: {n_items} объявл.")
-                if n_items < 10:
-                    break
+                assess = assess_deal(price, market, min_margin=MIN_MARGIN, scam_floor=SCAM_FLOOR)
 
-            if not listings:
+                # Углублённый анализ только если есть запас ниже рынка
+                if assess.margin < MIN_MARGIN:
+                    self.seen.add(url_clean)
+                    continue
+                passed.append((L, cfg, market, source, assess))
+            except Exception as e:
+                logger.error(f"Ошибка: {e}")
                 continue
 
-            # ── 2) Строим ЖИВОЙ рынок: цены сопоставимых лотов прямо сейчас ──
-            buckets = {}              # live_key -> [prices]
-            cfg_cache = {}            # url -> config
-            for L in listings:
-                cfg = self._passes_prefilter(L)
-                cfg_cache[L['url']] = cfg
-                if cfg is not None:
-                    buckets.setdefault(live_key(cfg), []).append(L['price'])
-                    self._registry_touch(L)   # копим историю для охотника за залежавшимися
-            logger.info(f"   📊 {label}: {len(listings)} лотов → {len(buckets)} живых конфигов")
-
-            # ── 3) Детектим сделки против живого рынка ──────────────────────
-            candidates = []
-            for L in listings:
-                try:
-                    url_clean = L['url']
-                    if url_clean in self.seen:
-                        continue
-
-                    cfg = cfg_cache.get(url_clean)
-                    if cfg is None:
-                        # не прошёл префильтр (мусор / не та цена / невалидный конфиг)
-                        self.seen.add(url_clean)
-                        continue
-
-                    price = L['price']
-                    comps = list(buckets.get(live_key(cfg), []))
-                    if price in comps:
-                        comps.remove(price)   # не сравниваем лот сам с собой
-                    market, source = self._market_for(cfg, comps)
-                    if not market:
-                        # ни живого рынка, ни базы — судить не можем, пропускаем тихо
-                        continue
+        # ── 4) В конвейер дозахода: по ожидаемой выгоде ─────────────────
+        comps_for = lambda c: list(buckets.get(live_key(c), []))
+        for L, cfg, market, source, assess in passed:
+            deep.put((L, cfg, market, source, assess, comps_for),
+                     self._prescore(L, cfg, market, assess))
+
+    def _deep_job(self, item):
+        """Воркер конвейера: дозаход + скоринг одного кандидата и сразу рассылка
+        (не ждём остальных кандидатов семейства)."""
+        cand = self._deep_one(item, self._deep_budget)
+        if cand:
+            with self._io_lock:
+                self._alerts_sent += self._dispatch_candidates([cand])
+
+    def _deep_one(self, item, budget):
+        """Кандидат из очереди дозахода → _build_candidate в счёт бюджета прогона.
+        Бюджет кончился — кандидат откладывается в следующий цикл (seen не
+        помечается); уже просмотренный (отложенный лот снова пришёл в выдаче) —
+        пропускается."""
+        L = item[0]
+        if L['url'] in self.seen:
+            return None
+        if budget is not None and not budget.take():
+            self._defer(item)
+            return None
+        cand = self._build_candidate(*item, budget=budget)
+        if cand and L.get('source_kind'):
+            cand['source_kind'] = L['source_kind']
+        return cand
 
-                    assess = assess_deal(price, market, min_margin=MIN_MARGIN, scam_floor=SCAM_FLOOR)
+    def _buyout(self, cfg, market):
+        """Выкуп-цель: курируемая из базы, иначе доля медианы рынка."""
+        stat_db = self._db_stat(cfg)
+        if stat_db and stat_db.get('buyout_price'):
+            return int(stat_db['buyout_price'])
+        return int(market.median * BUYOUT_FACTOR)
+
+    def _prescore(self, L, cfg, market, assess):
+        """Приоритет кандидата в очереди дозахода (deep_prescore) — по выдаче,
+        без сети."""
+        return deep_prescore(L['price'], market.median, assess.margin, self._buyout(cfg, market),
+                             L.get('minutes_ago'), L['title'] + ' ' + L.get('snippet', ''),
+                             suspicious=assess.is_suspicious)
+
+    def _defer(self, item):
+        """Кандидат не влез в бюджет — в отложенные (пишутся в конце прогона)."""
+        L, cfg, market, source, assess = item[:5]
+        entry = {'listing': {k: L[k] for k in DEFER_FIELDS if k in L},
+                 'market': asdict(market), 'source': source,
+                 'prio': self._prescore(L, cfg, market, assess), 'deferred_at': int(time.time())}
+        with self._io_lock:
+            self._deferred.append(entry)
+
+    def _take_deferred(self):
+        """Отложенные прошлым циклом дозаходы → [(prio, item)]. Рынок — как при
+        отборе, компы для уточнения конфига — из накопителя коллектора (живой
+        выдачи того прогона уже нет); свежесть — с поправкой на время в очереди."""
+        now = time.time()
+        out = []
+        for e in take_deferred(DEFERRED_FILE, now):
+            try:
+                L = dict(e['listing'])
+                if L['url'] in self.seen:
+                    continue
+                L['minutes_ago'] = (L.get('minutes_ago') or 0) + int(now - e.get('deferred_at', now)) // 60
+                cfg = self._passes_prefilter(L)
+                if cfg is None:
+                    continue
+                market = MarketStats(**e['market'])
+                assess = assess_deal(L['price'], market, min_margin=MIN_MARGIN, scam_floor=SCAM_FLOOR)
+                if assess.margin < MIN_MARGIN:
+                    continue
+                item = (L, cfg, market, e.get('source', 'db'), assess,
+                        lambda c, p=L['price']: self._raw_market(c, exclude=p))
+                out.append((self._prescore(L, cfg, market, assess), item))
+            except Exception as ex:
+                logger.error(f"отложенный дозаход: {ex}")
+        if out:
+            logger.info(f"⏳ Отложенных дозаходов с прошлого цикла: {len(out)}")
+        return out
+
+    def _save_deferred(self, budget):
+        """Конец прогона: не влезшие в бюджет — в DEFERRED_FILE."""
+        with self._io_lock:
+            entries, self._deferred = self._deferred, []
+        if not entries:
+            return
+        try:
+            defer_deep(DEFERRED_FILE, entries)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось отложить дозаходы: {e}")
+            return
+        logger.info(f"⏳ Бюджет дозахода исчерпан ({budget.reason() or 'прогон'}): "
+                    f"дозаходов {budget.used}, отложено {len(entries)} — в следующий цикл")
 
-                    # Углублённый анализ только если есть запас ниже рынка
-                    if assess.margin < MIN_MARGIN:
-                        self.seen.add(url_clean)
-                        continue
+    def run(self):
+        # Дохлый-выключатель: проверяем свежесть базы цен ДО скана
+        # (не требует браузера; алерт уйдёт, даже если потом скан упадёт)
+        self._check_prices_freshness()
 
-                    cand = self._build_candidate(
-                        L, cfg, market, source, assess,
-                        comps_for=lambda c: list(buckets.get(live_key(c), [])))
-                    if cand:
-                        candidates.append(cand)
+        # Пул сессий: при SCAN_CONTEXTS > 1 страницы грузят потоки пула (каждый со
+        # своим браузером), основной поток своего браузера не держит
+        # (в резидентном режиме пул с прогретыми сессиями уже поднят run_daemon)
+        resident_pool = self._resident and self._pool is not None
+        pool = self._pool if resident_pool else ContextPool(self, SCAN_CONTEXTS)
+        if not pool.parallel:
+            self._start_browser()
+            self._ensure_warm()
+        self._pool = pool if resident_pool else pool.start()
+        # Конвейер дозахода: параллельно с выдачей только когда есть пул сессий
+        deep = DeepStage(self._deep_job, DEEP_WORKERS if pool.parallel else 0,
+                         DEEP_QUEUE_MAX).start()
+        self._alerts_sent = 0
+        # Бюджет дозахода на прогон; отложенные прошлым циклом — в ту же очередь
+        self._deep_budget = budget = DeepBudget()
+        for prio, item in self._take_deferred():
+            deep.put(item, prio, block=False)
 
-                except Exception as e:
-                    logger.error(f"Ошибка: {e}")
-                    continue
+        scan_urls = self._get_scan_urls()
+        logger.info(f"🎬 Запуск сканера v2 ({len(scan_urls)} семейств, "
+                    f"{SCAN_PAGES_PER_FAMILY} стр/семейство, сессий: {pool.size}, живой рынок)...")
 
-            # ── 4) Рассылка ─────────────────────────────────────────────────
-            total_notifications += self._dispatch_candidates(candidates)
+        try:
+            # ── 1) Выдача по всем семействам (пул); догруженное семейство сразу
+            #       оценивается, кандидаты уходят в конвейер дозахода ──────────
+            self._scan_search_pages(
+                scan_urls, on_family=lambda label, listings: self._assess_family(label, listings, deep))
+        finally:
+            deep.close()
+            self._deep_budget = None
+            if not resident_pool:
+                pool.close()
+                self._pool = None
 
         # Финальное сохранение
+        self._save_deferred(budget)
         self._save_seen()
         self._save_registry()
 
@@ -1590,29 +2818,33 @@ class AvitoScannerV2:
 
         self._close()
 
-        logger.info(f"\n🏁 Готово. Уведомлений: {total_notifications}")
+        logger.info(f"\n🏁 Готово. Уведомлений: {self._alerts_sent}")
 
-    def _build_candidate(self, L, cfg, market, source, assess, comps_for):
+    def _build_candidate(self, L, cfg, market, source, assess, comps_for, budget=None):
         """Общий хвост оценки кандидата для run() и process_cards: помечает seen,
         дозаходит в карточку (deep_analyze), уточняет конфиг спеками и пересчитывает
-        рынок (comps_for(cfg) — живые компы: из buckets в run(), [] в intake), гейт
-        состояния, регион/доставка, выкуп, перекуп, скоринг.
+        рынок (comps_for(cfg) — живые компы: список цен из buckets в run(), готовая
+        статистика скетчей коллектора без цены лота в intake), гейт
+        состояния, регион/доставка, выкуп, перекуп, скоринг. Загрузилась ли
+        карточка — в budget (DeepBudget прогона), если передан.
         Возвращает dict кандидата или None (отсев)."""
         url_clean = L['url']
         price = L['price']
-        # Помечаем seen до сетевого вызова (защита от повторов при сбое)
+        # Помечаем seen до сетевого вызова (защита от повторов при сбое): строка
+        # журнала уходит в ОС сразу, без переписывания всего файла
         self.seen.add(url_clean)
-        self._save_seen()
 
-        time.sleep(random.uniform(2, 5))
+        PACER.wait(L['raw_url'])
         analysis = self.deep_analyze(L['raw_url'])
+        if budget is not None:
+            budget.record(analysis.get('loaded', True))
 
         # Уточняем конфиг спеками из карточки и пересчитываем рынок
         if analysis['specs']:
             cfg2 = classify(L['title'], analysis['specs'])
             if cfg2.is_valid:
                 comps2 = comps_for(cfg2)
-                if price in comps2:
+                if isinstance(comps2, list) and price in comps2:
                     comps2.remove(price)
                 market2, source2 = self._market_for(cfg2, comps2)
                 if market2:
@@ -1642,11 +2874,7 @@ class AvitoScannerV2:
             return None
 
         # Выкуп: курируемый из базы, иначе от медианы рынка
-        stat_db = self._db_stat(cfg)
-        if stat_db and stat_db.get('buyout_price'):
-            buyout = int(stat_db['buyout_price'])
-        else:
-            buyout = int(market.median * BUYOUT_FACTOR)
+        buyout = self._buyout(cfg, market)
 
         full_preview = (L['title'] + ' ' + L['snippet']).lower()
         urgent = (analysis['is_urgent'] or analysis['price_reduced']
@@ -1679,6 +2907,7 @@ class AvitoScannerV2:
             'location': location,
             'seller_type': analysis['seller_type'],
             'seller_reviews': analysis['seller_reviews'],
+            'seller_id': L.get('seller_id'),
             'is_private': analysis['is_private'],
             'reseller': reseller,
             'condition': condition,
@@ -1704,88 +2933,195 @@ class AvitoScannerV2:
             self._save_digest(digest_items)
         return sent
 
-    def process_cards(self, cards):
+    def process_cards(self, cards, deferred=True):
         """Обрабатывает карточки от домашнего расширения (intake): без сканирования
         поиска — классификация → рынок (база, Москва) → маржа → deep_analyze →
         состояние/перекуп → скоринг → рассылка. Поиск делает домашний браузер, а
-        VPS только оценивает кандидатов (мало → троттлинг не страшен)."""
+        VPS только оценивает кандидатов (мало → троттлинг не страшен).
+        Дозаход — по убыванию ожидаемой выгоды (_prescore) в пределах бюджета
+        прогона (DeepBudget), вместе с отложенными прошлым циклом (deferred=False —
+        без них: толкнутые в демон карточки разбираются сразу); не влезшие
+        откладываются. Кандидат рассылается сразу, не дожидаясь остальных карточек
+        пачки; карточка с received_at (время приёма intake-сервером) пополняет окна
+        задержки."""
         self._start_browser()
-        self._warmup()
-        candidates = []
+        self._ensure_warm()
+        budget = DeepBudget()
+        candidates, queued, sent = [], [], 0
         raw_batch = {}   # live_key -> [цены] для накопителя (--modal-report)
         for card in cards:
             try:
                 raw_url = card.get('url') or ''
                 url = clean_url(raw_url)
-                if not url or not card.get('price') or url in self.seen:
-                    continue
-                L = {'url': url, 'raw_url': raw_url, 'title': card.get('title', ''),
-                     'snippet': '', 'price': int(card['price']),
-                     'minutes_ago': 0, 'age_str': card.get('date', 'недавно'),
-                     'item_text': str(card.get('title', '')).lower()}
-                cfg = self._passes_prefilter(L)
-                if cfg is None:
-                    self.seen.add(url); continue
-                # Копим цену по конфигу (все валидные б/у лоты, без троттлинга):
-                # [цена, время, москва] — для модальной и автосинка базы
-                loc = title_city(L['title'])
-                msk = 1 if (loc and is_moscow(loc)) else (0 if loc else None)
-                raw_batch.setdefault(str(live_key(cfg)), []).append(
-                    [L['price'], int(time.time()), msk])
-                # Рынок: база (Москва) → при её отсутствии/протухании — накопитель
-                # коллектора (живые всероссийские цены). Если рынка нет совсем —
-                # НЕ помечаем seen: резервный VPS-сканер построит живой рынок из
-                # выдачи и поймает лот отдельно (расширение дедупит карточки само).
-                price = L['price']
-                comps = self._raw_comps(cfg)
-                if price in comps:
-                    comps.remove(price)   # не сравниваем лот сам с собой
-                market, source = self._market_for(cfg, comps)
-                if not market:
-                    logger.info(f"   ∅ нет рынка (база пуста, компов коллектора {len(comps)}): "
-                                f"{live_key(cfg)} | {L['title'][:45]}")
+                if not url or not card.get('price') or url in self.seen or url in self._triaged:
                     continue
-                assess = assess_deal(price, market, min_margin=MIN_MARGIN, scam_floor=SCAM_FLOOR)
-                if assess.margin < MIN_MARGIN:
-                    self.seen.add(url); continue
-                # Тот же хвост оценки, что и в run(); компы — из накопителя коллектора
-                cand = self._build_candidate(L, cfg, market, source, assess,
-                                             comps_for=lambda c: self._raw_comps(c))
+                self._triaged[url] = None
+                while len(self._triaged) > INTAKE_MAX_CARDS:
+                    del self._triaged[next(iter(self._triaged))]
+                item = self._triage_card(card, raw_url, url, raw_batch)
+                if item is None:
+                    self._record_latency(card.get('received_at'), 0)
+                else:
+                    L, cfg, market, _, assess, _ = item
+                    queued.append((self._prescore(L, cfg, market, assess), item, card.get('received_at')))
+            except Exception as e:
+                logger.error(f"intake card: {e}")
+        if deferred:
+            queued += [(prio, item, None) for prio, item in self._take_deferred()]
+        queued.sort(key=lambda q: q[0], reverse=True)
+        for _, item, received_at in queued:
+            try:
+                n_sent = 0
+                cand = self._deep_one(item, budget)
                 if cand:
-                    cand['source_kind'] = 'browser'   # лот от домашнего расширения → тег в уведомлении
                     candidates.append(cand)
+                    with self._io_lock:
+                        n_sent = self._dispatch_candidates([cand])
+                sent += n_sent
+                self._record_latency(received_at, n_sent)
             except Exception as e:
                 logger.error(f"intake card: {e}")
-        sent = self._dispatch_candidates(candidates)
         self._save_seen()
         self._close()
         self._write_proc_stats(len(cards), len(candidates), sent)
         self._accumulate_raw(raw_batch)
+        self._save_deferred(budget)
         logger.info(f"🏁 Intake: карточек {len(cards)}, кандидатов {len(candidates)}, алертов {sent}")
 
-    def _accumulate_raw(self, raw_batch):
-        """Дописывает цены партии в intake-raw-prices.json (скользящее окно RAW_CAP на конфиг)."""
-        if not raw_batch:
+    def _triage_card(self, card, raw_url, url, raw_batch):
+        """Одна карточка process_cards без сети: префильтр → цена в накопитель →
+        потолок → рынок → маржа. Возвращает элемент очереди дозахода
+        (L, cfg, market, source, assess, comps_for) или None (отсев)."""
+        L = {'url': url, 'raw_url': raw_url, 'title': card.get('title', ''),
+             'snippet': '', 'price': int(card['price']),
+             'minutes_ago': 0, 'age_str': card.get('date', 'недавно'),
+             'item_text': str(card.get('title', '')).lower(),
+             'source_kind': 'browser'}   # лот от домашнего расширения → тег в уведомлении
+        cfg = self._passes_prefilter(L)
+        if cfg is None:
+            self.seen.add(url); return None
+        # Копим цену по конфигу (все валидные б/у лоты, без троттлинга):
+        # [цена, время, москва] — для модальной и автосинка базы
+        loc = title_city(L['title'])
+        msk = 1 if (loc and is_moscow(loc)) else (0 if loc else None)
+        raw_batch.setdefault(str(live_key(cfg)), []).append(
+            [L['price'], int(time.time()), msk])
+        # Потолок конфига: дороже — отсев одним сравнением, без расчёта рынка
+        ceiling = self._alert_ceiling(cfg)
+        if ceiling is not None and L['price'] > ceiling:
+            self.seen.add(url); return None
+        # Рынок: база (Москва) → при её отсутствии/протухании — накопитель
+        # коллектора (живые всероссийские цены). Если рынка нет совсем —
+        # НЕ помечаем seen: резервный VPS-сканер построит живой рынок из
+        # выдачи и поймает лот отдельно (расширение дедупит карточки само).
+        price = L['price']
+        live = self._raw_market(cfg, exclude=price)   # не сравниваем лот сам с собой
+        market, source = self._market_for(cfg, live)
+        if not market:
+            logger.info(f"   ∅ нет рынка (база пуста, компов коллектора {live.n if live else 0}): "
+                        f"{live_key(cfg)} | {L['title'][:45]}")
+            return None
+        assess = assess_deal(price, market, min_margin=MIN_MARGIN, scam_floor=SCAM_FLOOR)
+        if assess.margin < MIN_MARGIN:
+            self.seen.add(url); return None
+        # Тот же хвост оценки, что и в run(); компы — из накопителя коллектора
+        return (L, cfg, market, source, assess, lambda c, p=price: self._raw_market(c, exclude=p))
+
+    def _record_latency(self, received_at, n_sent):
+        """Задержка карточки от приёма intake-сервером до разбора (и до алерта)."""
+        if not isinstance(received_at, (int, float)):
             return
+        lat = max(0.0, time.time() - received_at)
+        self._triage_lat.append(lat)
+        if n_sent:
+            self._alert_lat.append(lat)
+
+    def latency_summary(self):
+        """p50/p95 задержки триажа и алерта (с) по последним карточкам — для /status."""
+        return {'triage_sec': latency_percentiles(self._triage_lat),
+                'alert_sec': latency_percentiles(self._alert_lat)}
+
+    def triage_pushed(self):
+        """Разбирает карточки, которые intake-сервер толкнул в демон (POST /cards),
+        через process_cards. Возвращает число карточек."""
+        cards = []
+        while True:
+            try:
+                cards += self._pushed.get_nowait()
+            except queue.Empty:
+                break
+        if not cards:
+            return 0
+        self._in_triage = True
         try:
-            store = json.loads(RAW_PRICES_FILE.read_text(encoding='utf-8')) if RAW_PRICES_FILE.exists() else {}
-            if not isinstance(store, dict):
-                store = {}
-        except Exception:
-            store = {}
-        now_ts = int(time.time())
-        for key, entries in raw_batch.items():
-            cur = store.get(key) if isinstance(store.get(key), list) else []
-            cur = [_norm_raw_entry(e, now_ts) for e in cur]   # миграция легаси-чисел
-            cur.extend(_norm_raw_entry(e, now_ts) for e in entries)
-            store[key] = cur[-RAW_CAP:]
+            self.process_cards(cards, deferred=False)
+        finally:
+            self._in_triage = False
+        return len(cards)
+
+    def _triage_checkpoint(self):
+        """Точка внутри длинного задания демона (между семействами скана, лотами
+        вотчлиста/охотника): толкнутые карточки разбираются сразу, а не после
+        задания. Вне демона и внутри самого триажа — ничего."""
+        if not self._resident or self._in_triage or self._pushed.empty():
+            return
         try:
-            RAW_PRICES_FILE.parent.mkdir(parents=True, exist_ok=True)
-            tmp = RAW_PRICES_FILE.parent / (RAW_PRICES_FILE.name + '.tmp')
-            tmp.write_text(json.dumps(store, ensure_ascii=False), encoding='utf-8')
-            os.replace(tmp, RAW_PRICES_FILE)
+            self.triage_pushed()
         except Exception as e:
-            logger.warning(f"raw-prices save: {e}")
+            logger.error(f"intake push: {e}")
+
+    def _accumulate_raw(self, raw_batch):
+        """Дописывает цены партии в журнал накопителя (common.raw_prices — запись
+        O(партии), свёртка в intake-raw-prices.json раз в RAW_COMPACT_KB журнала)
+        и в квантильные скетчи intake-raw-sketch.json (история за RAW_SKETCH_DAYS)."""
+        if not raw_batch:
+            return
+        log = raw_price_log()
+        # скетчи переписываются целиком — load → add → save под замком накопителя,
+        # иначе параллельные демон и --intake затирают обновления друг друга
+        with log.locked():
+            now_ts = int(time.time())
+            sketch_mtime = RAW_SKETCH_FILE.stat().st_mtime if RAW_SKETCH_FILE.exists() else None
+            sketches = self._raw_sketches if sketch_mtime == self._raw_sketch_mtime else None
+            same_today = sketches is not None and sketches.today == now_ts // 86400
+            if sketches is None:
+                sketches = PriceSketchStore.load(RAW_SKETCH_FILE, now_ts)
+            if sketches is None:
+                # скетчей ещё нет (или другой формат) — засеваем из накопителя до партии
+                sketches = PriceSketchStore.from_raw(log.read(), now_ts)
+            fresh = self._raw_prices_cache is not None and log.signature() == self._raw_prices_mtime
+            try:
+                new = log.append(raw_batch, now_ts)
+            except Exception as e:
+                logger.warning(f"raw-prices save: {e}")
+                new, fresh = {}, False
+            for key, entries in new.items():
+                for price, ts, msk in entries:
+                    sketches.add(key, price, ts, msk)
+            # потолки: новые цены — только у конфигов партии; другие скетчи/день — у всех
+            if same_today:
+                for ck in [ck for ck in self._ceilings if str(ck[0]) in new]:
+                    del self._ceilings[ck]
+            else:
+                self._ceilings.clear()
+            try:
+                log.maybe_compact(now_ts)
+            except Exception as e:
+                logger.warning(f"raw-prices compact: {e}")
+            if fresh:
+                # кэш _raw_comps был актуален — дописываем партию, не перечитывая файл
+                for key, entries in new.items():
+                    cur = self._raw_prices_cache.get(key)
+                    self._raw_prices_cache[key] = ((cur if isinstance(cur, list) else []) + entries)[-RAW_CAP:]
+                self._raw_prices_mtime = log.signature()
+            else:
+                self._raw_prices_cache = None
+            try:
+                sketches.prune(now_ts)
+                sketches.save(RAW_SKETCH_FILE)
+                self._raw_sketches, self._raw_sketch_mtime = sketches, RAW_SKETCH_FILE.stat().st_mtime
+            except Exception as e:
+                logger.warning(f"raw-sketch save: {e}")
 
     def _write_proc_stats(self, n_cards, n_cand, n_alerts):
         """Пульс обработчика для кнопки «Статус» в боте."""
@@ -1807,47 +3143,156 @@ class AvitoScannerV2:
         except Exception:
             pass
 
+    # ─── Резидентный режим (--daemon) ─────────────────────────────────────────
+
+    def _daemon_jobs(self):
+        """Задания демона в порядке приоритета: (имя, интервал в секундах, функция)."""
+        def _intake():
+            self.triage_pushed()
+            run_intake(INCOMING_FILE, self.process_cards)   # остальное (и без пуша) — из спула
+        return [
+            ('intake', DAEMON_INTAKE_SEC, _intake),
+            ('scan', DAEMON_SCAN_MIN * 60, self.run),
+            ('watch', DAEMON_WATCH_MIN * 60, self.run_watch_check),
+            ('stale', DAEMON_STALE_MIN * 60, self.run_stale_sweep),
+        ]
+
+    def _open_resident(self):
+        """Пул сессий на всё время жизни демона (при SCAN_CONTEXTS > 1): прогрев и
+        капча — один раз, дальше их переиспользуют все задания."""
+        pool = ContextPool(self, SCAN_CONTEXTS)
+        self._pool = pool.start() if pool.parallel else None
+
+    def _recycle(self, reason):
+        """Пересоздать браузер, HTTP-сессии и пул (утечки Chromium, умершие сессии)."""
+        logger.info(f"♻️ Пересоздаю браузер и сессии: {reason}")
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        self._close(force=True)
+        self._tls.warmed_at = 0
+        self._open_resident()
+
+    def _daemon_step(self, name, fn, sched, info, clock):
+        """Одно задание демона: свежие файлы с диска → задание (ошибка не роняет
+        демон) → отметка в расписании → проверка памяти и живости пула."""
+        t0 = clock()
+        info['current'] = name
+        try:
+            self._refresh_from_disk()
+            fn()
+        except Exception as e:
+            logger.error(f"❌ Демон: задание {name} упало: {e}")
+        finally:
+            info['current'] = None
+        now = clock()
+        sched.done(name, now)
+        info['runs'][name] = {'at': t0, 'sec': round(now - t0, 1)}
+        try:
+            DAEMON_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            DAEMON_STATE_FILE.write_text(json.dumps(sched.state()), encoding='utf-8')
+        except Exception:
+            pass
+        rss = process_tree_rss_mb()
+        if DAEMON_RSS_MB and rss > DAEMON_RSS_MB:
+            info['recycles'] += 1
+            self._recycle(f"память {rss:.0f} МБ > {DAEMON_RSS_MB} МБ")
+        elif self._pool is not None and not self._pool.alive:
+            info['recycles'] += 1
+            self._recycle("в пуле не осталось живых сессий")
+
+    def run_daemon(self, stop=None, port=DAEMON_PORT, clock=time.time):
+        """--daemon: один процесс держит прогретый браузер/HTTP-сессии, пул, базу цен
+        и историю в памяти и сам гоняет scan / intake / watch / stale по расписанию
+        (DAEMON_*). Внеочередной запуск — POST 127.0.0.1:DAEMON_PORT/trigger/<имя>.
+        Intake-сервер толкает принятые карточки в POST /cards → триаж за секунды без
+        холодного старта Chromium и капчи, а во время скана/вотчлиста/охотника — в
+        их точках _triage_checkpoint. Память процесса с Chromium выше
+        DAEMON_RSS_MB → браузер и сессии пересоздаются. stop — threading.Event
+        (SIGTERM/SIGINT в CLI)."""
+        stop = stop or threading.Event()
+        jobs = self._daemon_jobs()
+        fns = {name: fn for name, _, fn in jobs}
+        sched = DaemonSchedule([(name, every) for name, every, _ in jobs], clock())
+        try:
+            sched.load_state(json.loads(DAEMON_STATE_FILE.read_text(encoding='utf-8')), clock())
+        except Exception:
+            pass
+        triggers = queue.Queue()
+        info = {'started_at': clock(), 'runs': {}, 'recycles': 0, 'current': None}
+
+        def _push(cards):
+            self._pushed.put(cards)
+            triggers.put('intake')
+        srv = start_trigger_server(
+            port, fns, triggers,
+            lambda: {**info, 'last': sched.state(), 'rss_mb': round(process_tree_rss_mb()),
+                     'pushed': self._pushed.qsize(), 'latency': self.latency_summary()},
+            push=_push if 'intake' in fns else None)
+
+        self._resident = True
+        self._open_resident()
+        logger.info(f"😈 Демон сканера: intake каждые {DAEMON_INTAKE_SEC} с, скан {DAEMON_SCAN_MIN} мин, "
+                    f"вотчлист {DAEMON_WATCH_MIN} мин, stale {DAEMON_STALE_MIN} мин, "
+                    f"потолок памяти {DAEMON_RSS_MB} МБ")
+        try:
+            while not stop.is_set():
+                while True:
+                    try:
+                        sched.trigger(triggers.get_nowait())
+                    except queue.Empty:
+                        break
+                name = sched.due(clock())
+                if name is None:
+                    try:
+                        sched.trigger(triggers.get(timeout=min(sched.wait_for(clock()), 5.0)))
+                    except queue.Empty:
+                        pass
+                    continue
+                self._daemon_step(name, fns[name], sched, info, clock)
+        finally:
+            if srv is not None:
+                srv.shutdown()
+                srv.server_close()
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+            self._resident = False
+            self._close()
+            logger.info("🛑 Демон остановлен")
+
 
 def modal_report(min_n=None):
     """Печатает модальную медиану по данным коллектора (без троттлинга) против базы.
-    Помогает вручную выставить оверрайды, не завися от парсера с капчей."""
+    Помогает вручную выставить оверрайды, не завися от парсера с капчей.
+    Считается по скетчам накопителя за RAW_MARKET_DAYS дней (common.price_sketch)."""
     min_n = min_n if min_n is not None else MIN_COMPS
-    if not RAW_PRICES_FILE.exists():
+    sketches = load_raw_sketches(RAW_SKETCH_FILE, RAW_PRICES_FILE)
+    if not len(sketches):
         print("Накопитель пуст — коллектор ещё не собрал цены (нужно ~час сбора).")
         return
-    try:
-        raw = json.loads(RAW_PRICES_FILE.read_text(encoding='utf-8')) or {}
-    except Exception:
-        print("Не прочитать intake-raw-prices.json")
-        return
     # индекс медиан базы по str(live_key)
     dbidx = {}
-    if PRICES_FILE.exists():
-        try:
-            d = json.load(open(PRICES_FILE, encoding='utf-8'))
-            for s in d.get('stats', []):
-                c = classify(f"{s['model_name']} {s.get('processor', '')}",
-                             {'ram': int(s.get('ram', 0)), 'ssd': int(s.get('ssd', 0))})
-                if c.is_valid:
-                    dbidx[str(live_key(c))] = s
-        except Exception:
-            pass
+    try:
+        idx = load_price_index(PRICES_FILE)
+        if idx is not None:
+            dbidx = {str(k): s for k, s in idx.by_live_key.items()}
+    except Exception:
+        pass
     rows = []
-    for key, entries in raw.items():
-        if not isinstance(entries, list) or len(entries) < min_n:
+    for key in sketches.keys():
+        sk = sketches.query(key, RAW_MARKET_DAYS)
+        if sk.n < min_n:
             continue
-        prices = [int(e[0]) if isinstance(e, list) else int(e) for e in entries]
-        n_msk = sum(1 for e in entries if isinstance(e, list) and len(e) >= 3 and e[2] == 1)
-        med = int(statistics.median(sorted(prices)))
-        mod = modal_center(prices)
+        n_msk = sketches.query(key, RAW_MARKET_DAYS, msk=True).n
         db_med = dbidx.get(key, {}).get('median_price')
-        rows.append((len(prices), n_msk, key, med, mod, db_med))
+        rows.append((sk.n, n_msk, key, sk.median(), sk.modal_center(), db_med))
     rows.sort(key=lambda r: -r[0])
     print(f"{'n':>4} {'мск':>4}  {'конфиг (live_key)':46} {'медиана':>8} {'модальн.':>9} {'база':>8}")
     for n, n_msk, key, med, mod, db_med in rows:
         dbs = str(db_med) if db_med else "—"
         print(f"{n:>4} {n_msk:>4}  {key:46} {med:>8} {mod:>9} {dbs:>8}")
-    print(f"\nКонфигов с ≥{min_n} ценами: {len(rows)}  (окно кластера ~12% медианы)")
+    print(f"\nКонфигов с ≥{min_n} ценами за {RAW_MARKET_DAYS} дн.: {len(rows)}  (окно кластера ~12% медианы)")
     print("Чтобы закрепить: добавь в price-overrides.json 'model|ram|ssd': {\"median\": N}")
 
 
@@ -1960,13 +3405,6 @@ def send_health():
         os.environ.get('STALE_LOG_PATH', '/var/log/bestmac-stale.log'))
         for m in [re.search(r"Новых лидов:\s*(\d+)", l)] if m)
 
-    def _len(path):
-        try:
-            with open(path, encoding='utf-8') as f:
-                return len(json.load(f))
-        except Exception:
-            return 0
-
     # Лиды: показываем НЕ показанные ботом (pending), а не всю накопленную очередь
     try:
         with open(QUEUE_FILE, encoding='utf-8') as f:
@@ -1981,8 +3419,12 @@ def send_health():
         posted = set()
     leads_total = len(queue_list)
     leads_pending = sum(1 for x in queue_list if x.get('id') not in posted)
-    reg = _len(REGISTRY_FILE)
+    try:
+        reg = len(ListingRegistry(legacy_json=None))
+    except sqlite3.Error:
+        reg = 0
     bal = _rucaptcha_balance()
+    ss = SESSIONS.totals(24)
     fams = ", ".join(f"{k.split()[-1]}:{v}" for k, v in sorted(h["fam"].items())) or "—"
 
     text = (
@@ -1996,6 +3438,8 @@ def send_health():
         f"🛡 Троттлинг (пере-прогревов): {h['throttle']}\n"
         f"🧩 Капча решена: {h['captcha']}"
         + (f" • баланс RuCaptcha: {bal:.0f} ₽" if bal is not None else "") + "\n"
+        f"🔑 Сохранённая сессия: стартов {ss['reused']} (сгорело {ss['reused_captcha']})"
+        f" • капч сэкономлено: {ss['avoided']}\n"
         f"🧲 Лиды боту: {leads_pending} ждут ответа • {leads_total} всего за период • 🗃 реестр: {reg}"
     )
     if h['runs'] == 0:
@@ -2028,6 +3472,8 @@ if __name__ == "__main__":
                     help="Проверить вотчлист (⭐): снижение цены / 2 недели → снова в очередь")
     ap.add_argument("--intake", action="store_true",
                     help="Обработать карточки от домашнего расширения (incoming-cards.json)")
+    ap.add_argument("--daemon", action="store_true",
+                    help="Резидентный режим: прогретый браузер, scan/intake/watch/stale по расписанию")
     ap.add_argument("--modal-report", action="store_true", dest="modal_report",
                     help="Модальная медиана по данным коллектора (intake-raw-prices.json) vs база")
     cli_args = ap.parse_args()
@@ -2044,6 +3490,14 @@ if __name__ == "__main__":
         n, _ok = run_intake(INCOMING_FILE, _process)
         if n == 0:
             logger.info("intake: входящих карточек нет")
+    elif cli_args.daemon:
+        import signal
+        from playwright.sync_api import sync_playwright
+        _stop = threading.Event()
+        for _sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(_sig, lambda *_: _stop.set())
+        with sync_playwright() as pw:
+            AvitoScannerV2(pw).run_daemon(stop=_stop)
     elif cli_args.health:
         send_health()
     elif cli_args.watch:
@@ -5,14 +5,25 @@
 
 Запуск:  python3 scripts/hot-deals-scanner/test_logic.py
 """
+import os
 import sys
+import tempfile
 from pathlib import Path
 
+# рабочие файлы сканера — во временном каталоге, не в public/data рабочего дерева
+_DATA = Path(tempfile.mkdtemp())
+os.environ['LISTING_REGISTRY_DB'] = str(_DATA / 'listing-registry.sqlite3')
+os.environ['INTAKE_RAW_PRICES_PATH'] = str(_DATA / 'intake-raw-prices.json')
+os.environ['INTAKE_RAW_SKETCH_PATH'] = str(_DATA / 'intake-raw-sketch.json')
+os.environ['PACE_STATE_PATH'] = str(_DATA / 'pace-state.json')
+os.environ['CLASSIFY_CACHE_PATH'] = ''     # и не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/
 sys.path.insert(0, str(Path(__file__).resolve().parent))          # hot-deals-scanner/
 
 from common.condition import analyze_condition
-from common.market import robust_stats, assess_deal
+from common.market import robust_stats, assess_deal, LiveMarket
 # scanner_v2 импортирует playwright только в __main__, score_deal — модульная функция
 from scanner_v2 import (score_deal, live_key, parse_generated_at, should_alert_stale,
                         MIN_MARGIN, SCAM_FLOOR)
@@ -334,6 +345,7 @@ _stats = robust_stats([100000] * 12)    # медиана 100k (заглушка)
 # конфиг с 8 ГБ имитирует «нет в базе цен» (рынок None)
 s._market_for = lambda cfg, comps: ((None, 'none') if cfg.ram == 8 else (_stats, 'db'))
 s._db_stat = lambda cfg: None           # → выкуп = медиана×BUYOUT_FACTOR
+s._alert_ceiling = lambda cfg: None     # рынок заглушён — потолки проверяет [30]
 s._start_browser = lambda: None
 s._warmup = lambda: None
 s._close = lambda: None
@@ -451,6 +463,23 @@ _inc3 = _d3 / "incoming.json"
 _u3, _p3 = drain_incoming(_inc3)
 check("только остаток → восстановлен", [c["url"] for c in _u3] == ["z"])
 
+# спул intake-сервера: сегменты забираются вместе с цельным файлом и остатком
+from common.intake_spool import CardSpool, active_path, segments
+_d5 = Path(_tmp.mkdtemp())
+_inc5 = _d5 / "incoming.json"
+_sp5 = CardSpool(_inc5)
+_sp5.add([{"url": "s1", "price": 1}, {"url": "s2", "price": 2}])
+_inc5.write_text(_json.dumps([{"url": "s1", "price": 9}, {"url": "f1", "price": 3}]), encoding="utf-8")
+_u5, _p5 = drain_incoming(_inc5)
+check("спул + цельный файл → одна пачка без дублей", sorted(c["url"] for c in _u5) == ["f1", "s1", "s2"])
+check("сегменты удалены после фиксации в proc", not segments(_inc5) and _p5.exists()
+      and sorted(c["url"] for c in _json.loads(_p5.read_text())) == ["f1", "s1", "s2"])
+_p5.unlink()
+_sp5.add([{"url": "s3", "price": 4}])
+check("сервер пишет в новый сегмент после забора", active_path(_inc5).exists()
+      and [c["url"] for c in drain_incoming(_inc5)[0]] == ["s3"])
+_sp5.close()
+
 
 # ─── 15. _build_candidate: run-путь с живыми компами ─────────────────────────
 print("\n[15] _build_candidate: ветка живых компов (run-путь)")
@@ -595,7 +624,7 @@ check("лот от VPS-сканера → без тега", 'из браузер
 # ─── 20. modal_center (scanner) + накопитель цен коллектора ───────────────────
 print("\n[20] modal_center + накопитель (коллектор)")
 import statistics as _stt
-from scanner_v2 import modal_center as _mc
+from common.market import modal_center as _mc
 import scanner_v2 as _svR
 _skew20 = sorted([44000, 45000, 46000, 47000, 48000, 48000, 49000, 50000, 50000, 51000]
                  + [60000, 62000, 64000, 66000, 68000, 70000, 72000, 74000, 76000, 78000])
@@ -603,16 +632,22 @@ check("scanner modal_center ниже обычной медианы", _mc(_skew20
 check("scanner modal_center пусто → 0", _mc([]) == 0)
 _rawf = Path(_tmp.mkdtemp()) / "raw.json"
 _svR.RAW_PRICES_FILE = _rawf
+_svR.RAW_SKETCH_FILE = _rawf.with_name("sketch.json")   # скетчи — рядом, не в public/data
 _svR.RAW_CAP = 5
 _sA = AvitoScannerV2(None)
 _sA._accumulate_raw({"k1": [40000, 41000], "k2": [50000]})            # легаси-числа
 _sA._accumulate_raw({"k1": [[42000, 1000, 1], [43000, 1000, 0], [44000, 1000, None], [45000, 1000, 1]]})
-_store20 = _json.loads(_rawf.read_text())
+check("накопитель: партии — в журнал, снимок не переписывается", not _rawf.exists()
+      and len(_rawf.with_name("raw.json.log").read_text().splitlines()) == 2)
+_store20 = _svR.raw_price_log().read()
 _p20 = [e[0] for e in _store20["k1"]]
 check("накопитель: cap отрезает старые (последние 5)", _p20 == [41000, 42000, 43000, 44000, 45000])
 check("накопитель: записи нормализованы [цена,ts,мск]", all(isinstance(e, list) and len(e) == 3 for e in _store20["k1"]))
 check("накопитель: москва-флаг сохранён", _store20["k1"][1][2] == 1 and _store20["k1"][2][2] == 0)
 check("накопитель: другой ключ сохранён", [e[0] for e in _store20["k2"]] == [50000])
+_svR.raw_price_log().compact()
+check("накопитель: свёртка журнала → тот же снимок", _json.loads(_rawf.read_text()) == _store20
+      and _svR.raw_price_log().read() == _store20)
 
 from scanner_v2 import title_city
 check("город из хвоста заголовка", title_city("Macbook air m1 8/256 в Казани") == "Казани")
@@ -651,6 +686,10 @@ check("свежая база побеждает живые компы", _src ==
 s21.prices_by_livekey[live_key(_cfg21)]['updated_at'] = "2026-01-01 10:00"
 _m2, _src2 = s21._market_for(_cfg21, list(_comps21))
 check("протухшая база → живой рынок", _src2 == 'live' and _m2.median < 100000)
+_book21 = LiveMarket({live_key(_cfg21): _comps21 + [84500]})
+check("готовая статистика LiveMarket (без своей цены) = список компов",
+      s21._market_for(_cfg21, _book21.stats(live_key(_cfg21), exclude=84500)) == (_m2, _src2)
+      and s21._market_for(_cfg21, None) == (s21._market_for(_cfg21, [])))
 
 # протухшая база + мало компов → всё же 'db' (лучше старая Москва, чем ничего)
 _m3, _src3 = s21._market_for(_cfg21, [80000, 81000])
@@ -671,6 +710,761 @@ check("_raw_comps отдаёт цены конфига", s21._raw_comps(_cfg21)
 _cfg21b = classify("Mac mini M4", {'ram': 16, 'ssd': 256})
 check("_raw_comps: нет данных → []", s21._raw_comps(_cfg21b) == [])
 
+# _raw_market: скетчи накопителя (нет файла скетчей → строятся из накопителя)
+_svR.RAW_SKETCH_FILE = _rawf21.with_name("sketch21.json")
+s21._raw_sketches = None
+_st21 = s21._raw_market(_cfg21)
+check("_raw_market без файла скетчей — из накопителя", _st21.n == 3 and _st21.median == 71000)
+check("_raw_market: exclude — без цены лота", s21._raw_market(_cfg21, exclude=72000).n == 2)
+check("_raw_market: нет данных → None", s21._raw_market(_cfg21b) is None)
+_ts21 = int(_svR.time.time())
+s21._accumulate_raw({str(live_key(_cfg21)): [[73000, _ts21, 1], [74000, _ts21, 0]]})
+check("_accumulate_raw засеял скетчи накопителем и дописал партию",
+      _svR.RAW_SKETCH_FILE.exists() and s21._raw_market(_cfg21).n == 5)
+s21._raw_sketches = None
+check("скетчи с диска", s21._raw_market(_cfg21).n == 5 and s21._raw_market(_cfg21).high == 74000)
+s21._accumulate_raw({str(live_key(_cfg21)): [[75000, _ts21 - 40 * 86400, 1]]})
+check("_raw_comps видит партии из журнала", s21._raw_comps(_cfg21)[-3:] == [73000, 74000, 75000])
+check("рынок — за RAW_MARKET_DAYS, старая цена только в истории",
+      s21._raw_market(_cfg21).n == 5
+      and s21._raw_sketches.query(str(live_key(_cfg21))).n == 6)
+# скетчи — load → add → save под замком накопителя: демон и --intake не теряют партии друг друга
+import threading as _thr21
+_k21 = str(live_key(_cfg21))
+_held21 = _svR.raw_price_log()
+with _held21.locked():
+    _t21 = _thr21.Thread(target=s21._accumulate_raw, args=({_k21: [[76000, _ts21, 1]]},))
+    _t21.start()
+    _t21.join(0.3)
+    check("_accumulate_raw ждёт чужой замок накопителя", _t21.is_alive())
+_t21.join(5)
+s21b = AvitoScannerV2(None)
+s21b._raw_sketches = None
+_ws21 = [_thr21.Thread(target=lambda sc=sc: [sc._accumulate_raw({_k21: [[77000, _ts21, 1]]}) for _ in range(15)])
+         for sc in (s21, s21b)]
+for _w in _ws21:
+    _w.start()
+for _w in _ws21:
+    _w.join(30)
+s21._raw_sketches = None
+check("параллельные прогоны: скетчи на диске — все 31 партия",
+      s21._raw_sketches is None and s21._raw_market(_cfg21) is not None
+      and s21._raw_sketches.query(_k21).n == 6 + 31)
+
+
+# ─── 22. Пул сессий: раздача страниц выдачи ───────────────────────────────────
+print("\n[22] ContextPool + _scan_search_pages")
+import threading as _thr
+from scanner_v2 import ContextPool
+
+s22 = AvitoScannerV2(None)
+_threads22, _calls22 = set(), []
+
+def _fake_session22():
+    s22._tls.page = object()
+    return lambda: None
+s22._open_worker_session = _fake_session22
+
+# семейство A: 3 полные страницы; B: 1-я неполная (7); C: 1-я пустая; D: 2-я пустая
+_pages22 = {('A', 1): 12, ('A', 2): 12, ('A', 3): 12, ('B', 1): 7, ('B', 2): 12,
+            ('C', 1): 0, ('D', 1): 12, ('D', 2): 0, ('D', 3): 12}
+
+def _fake_fetch22(label, url, page_num):
+    _threads22.add(_thr.current_thread().name)
+    _thr.Event().wait(0.01)   # time.sleep заглушён выше — «грузим» страницу так
+    _calls22.append((label, page_num))
+    n = _pages22.get((label, page_num), 0)
+    return [{'url': f"{label}{page_num}_{i}"} for i in range(n)], n
+s22._fetch_search_page = _fake_fetch22
+
+_urls22 = [{'label': x, 'url': f"https://x/{x}"} for x in "ABCD"]
+s22._pool = ContextPool(s22, 3).start()
+_out22 = s22._scan_search_pages(_urls22)
+s22._pool.close()
+check("полное семейство → все 3 страницы по порядку",
+      [L['url'] for L in _out22['A']][::12] == ['A1_0', 'A2_0', 'A3_0'])
+check("неполная 1-я → дальше не идём", len(_out22['B']) == 7 and ('B', 2) not in _calls22)
+check("пустая 1-я → семейство пусто", _out22['C'] == [])
+check("пустая 2-я → 3-ю отбрасываем (как при последовательном обходе)", len(_out22['D']) == 12)
+check("работа распределена по нескольким сессиям", len(_threads22) > 1)
+
+# size=1 → выполняется в вызывающем потоке, без потоков пула
+_p1 = ContextPool(s22, 1).start()
+check("size=1 → inline", _p1.submit(lambda: _thr.current_thread().name).result()
+      == _thr.current_thread().name)
+
+# все сессии упали → задачи получают ошибку, а не висят
+s22._open_worker_session = lambda: (_ for _ in ()).throw(RuntimeError("no browser"))
+_pd = ContextPool(s22, 2).start()
+for _t in _pd._threads:
+    _t.join(timeout=5)
+_fd = _pd.submit(lambda: 1)
+check("нет живых сессий → ошибка задачи", _fd.exception(timeout=5) is not None)
+_pd.close()
+
+
+# ─── 23. Конвейер дозахода (DeepStage) ────────────────────────────────────────
+print("\n[23] DeepStage + _assess_family + приоритет карточек в пуле")
+from scanner_v2 import DeepStage
+
+s23 = AvitoScannerV2(None)
+s23.prices, s23.prices_by_livekey = {}, {}   # выкуп и приоритет — без живой базы из public/data
+s23.seen = set()
+s23._registry_touch = lambda L: None
+_st23 = robust_stats([100000] * 12)
+s23._market_for = lambda cfg, comps: (_st23, 'db')
+_L23 = [{'url': f"https://www.avito.ru/u{p}", 'raw_url': f"https://www.avito.ru/u{p}",
+         'title': 'MacBook Air 13 M2 16/256', 'snippet': '', 'price': p,
+         'minutes_ago': 5, 'age_str': '', 'item_text': ''}
+        for p in (78000, 60000, 95000, 70000)]
+_got23 = []
+_ds0 = DeepStage(_got23.append, 0, 4)
+s23._assess_family('MacBook Air', _L23, _ds0)
+check("без воркеров дозаход ждёт конца выдачи", _got23 == [])
+_ds0.close()
+check("в конвейер — только ниже рынка, выгодные первыми (подозрительно дешёвый — после)",
+      [x[0]['price'] for x in _got23] == [70000, 60000, 78000])
+check("не сделка → seen без дозахода", 'https://www.avito.ru/u95000' in s23.seen)
+
+_done23 = []
+def _h23(x):
+    if x == 'boom':
+        raise ValueError(x)
+    _thr.Event().wait(0.005)
+    _done23.append(x)
+_ds = DeepStage(_h23, 2, 2).start()
+for _x in ['a', 'boom', 'b', 'c', 'd']:
+    _ds.put(_x)
+_ds.close()
+check("воркеры разобрали всё (ошибка одного не роняет)", sorted(_done23) == ['a', 'b', 'c', 'd'])
+
+# Карточка обгоняет страницы выдачи, уже стоящие в очереди пула
+s23._open_worker_session = lambda: (setattr(s23._tls, 'page', object()), (lambda: None))[1]
+_gate, _order23 = _thr.Event(), []
+_p23 = ContextPool(s23, 2).start()
+_blk = [_p23.submit(_gate.wait) for _ in range(2)]   # обе сессии заняты
+_thr.Event().wait(0.05)
+_f_page = _p23.submit(lambda: _order23.append('page'))
+_f_item = _p23.submit(lambda: _order23.append('item'), prio=ContextPool.PRIO_ITEM)
+_gate.set()
+_f_page.result(timeout=5); _f_item.result(timeout=5)
+_p23.close()
+check("карточка (PRIO_ITEM) раньше страницы выдачи", _order23[0] == 'item')
+
+# Догруженное семейство уходит в оценку, не дожидаясь медленного
+_slow, _fam_order = _thr.Event(), []
+def _fetch23(label, url, page_num):
+    if label == 'SLOW':
+        _slow.wait(5)
+    return [{'url': f"{label}{page_num}"}], 1
+s23._fetch_search_page = _fetch23
+s23._pool = ContextPool(s23, 2).start()
+def _on_fam(label, listings):
+    _fam_order.append(label)
+    if label == 'FAST':
+        _slow.set()
+s23._scan_search_pages([{'label': 'SLOW', 'url': 'x'}, {'label': 'FAST', 'url': 'y'}],
+                       on_family=_on_fam)
+s23._pool.close()
+check("быстрое семейство оценено раньше медленного", _fam_order == ['FAST', 'SLOW'])
+
+
+# ─── 24. HTTP-first загрузка (HttpFetcher) ────────────────────────────────────
+print("\n[24] HttpFetcher: HTTP → капча → браузер, общие куки")
+from scanner_v2 import HttpFetcher, is_captcha_html
+
+
+class _Cookie24:
+    def __init__(self, name, value, domain, path):
+        self.name, self.value, self.domain, self.path = name, value, domain, path
+
+
+class _Jar24:
+    def __init__(self):
+        self.jar = []
+
+    def set(self, name, value, domain=None, path=None):
+        self.jar = [c for c in self.jar if c.name != name] + [_Cookie24(name, value, domain, path)]
+
+
+class _Resp24:
+    def __init__(self, code, text):
+        self.status_code, self.text = code, text
+
+
+class _Sess24:
+    def __init__(self, script):
+        self.script, self.cookies, self.calls = script, _Jar24(), []
+
+    def get(self, url, **kw):
+        self.calls.append(url)
+        return self.script(url, self)
+
+    def close(self):
+        pass
+
+
+class _Ctx24:
+    def __init__(self):
+        self.added = []
+
+    def add_cookies(self, cookies):
+        self.added.extend(cookies)
+
+    def cookies(self):
+        return [{'name': 'ft', 'value': 'solved', 'domain': '.avito.ru', 'path': '/'}]
+
+
+class _Page24:
+    def __init__(self):
+        self.context, self.url, self.opened = _Ctx24(), '', 0
+
+    def goto(self, url, **kw):
+        self.url = url
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def query_selector(self, sel):
+        return None                       # капча уже решена (куки)
+
+    def content(self):
+        return "<html>browser</html>"
+
+
+def _script24(url, sess):
+    solved = any(c.name == 'ft' for c in sess.cookies.jar)
+    if 'captcha' in url and not solved:
+        return _Resp24(200, '<div class="firewall-container"></div>')
+    return _Resp24(200, f"<html>http {url}</html>")
+
+
+_pg24, _opened24 = _Page24(), []
+def _get_page24():
+    _opened24.append(1)
+    return _pg24
+_sess24 = _Sess24(_script24)
+_sess24.cookies.set('u', 'x', domain='.avito.ru', path='/')
+_f24 = HttpFetcher(_get_page24, proxy_url='', session_factory=lambda: _sess24)
+check("маркер фаервола в HTML", is_captcha_html('<div class="firewall-container">') and not is_captcha_html('<html>'))
+check("обычная страница → по HTTP, без браузера", _f24.fetch("https://a/ok") == "<html>http https://a/ok</html>"
+      and not _opened24)
+check("капча → эскалация в браузер", _f24.fetch("https://a/captcha") == "<html>browser</html>" and _opened24)
+check("куки curl → браузер перед эскалацией", any(c['name'] == 'u' for c in _pg24.context.added))
+check("куки браузера (решённый фаервол) → в curl", any(c.name == 'ft' for c in _sess24.cookies.jar))
+_n24 = len(_opened24)
+check("после решения снова по HTTP", _f24.fetch("https://a/captcha2") == "<html>http https://a/captcha2</html>"
+      and len(_opened24) == _n24)
+check("счётчики", _f24.stats['http'] == 2 and _f24.stats['browser'] == 1)
+
+# 403 без ротации IP → сразу браузер
+_f24b = HttpFetcher(_get_page24, proxy_url='',
+                    session_factory=lambda: _Sess24(lambda u, s: _Resp24(403, 'forbidden')))
+check("403 без CHANGE_IP_URL → браузер", _f24b.fetch("https://a/x") == "<html>browser</html>")
+
+# _load_page сканера в режиме HTTP-first идёт через HttpFetcher потока
+s24 = AvitoScannerV2(None)
+s24._http_first = lambda: True
+s24._main_fetcher = _f24
+check("_load_page → HttpFetcher", s24._load_page("https://a/p") == "<html>http https://a/p</html>")
+
+# Сохранённая сессия: curl стартует с её кук; капча по HTTP на них — сброс
+from common.session_store import SessionStore
+_d24 = Path(_tmp.mkdtemp())
+_st24 = SessionStore(path=_d24 / 's.json', stats_path=_d24 / 'stats.json')
+_st24.save({'cookies': [{'name': 'ft', 'value': 'saved'}]}, 'solve')
+_sess24c = _Sess24(_script24)
+_f24c = HttpFetcher(_get_page24, proxy_url='', session_factory=lambda: _sess24c, store=_st24)
+check("куки сохранённой сессии → curl", any(c.name == 'ft' for c in _sess24c.cookies.jar))
+_f24c.fetch("https://a/captcha")
+check("с ними капчи нет — сэкономлено", _st24.totals()['avoided'] == 1 and _st24.totals()['reused'] == 1)
+_sess24d = _Sess24(lambda u, s: _Resp24(200, '<div class="firewall-container"></div>'))
+_f24d = HttpFetcher(_get_page24, proxy_url='', session_factory=lambda: _sess24d, store=_st24)
+_f24d.fetch("https://a/x")
+check("капча на сохранённых куках → состояние сброшено", _st24.totals()['invalidated'] == 1)
+
+# Прогрев сразу после создания не выбрасывает сохранённые куки (старт не задвоен);
+# прогрев после работы — новая сессия снова с куками состояния
+_st24.save({'cookies': [{'name': 'ft', 'value': 'saved2'}]}, 'solve')
+_sess24e = []
+_f24e = HttpFetcher(_get_page24, proxy_url='', store=_st24,
+                    session_factory=lambda: _sess24e.append(_Sess24(_script24)) or _sess24e[-1])
+_r24 = _st24.totals()['reused']
+s24e = AvitoScannerV2(None)
+s24e._http_first = lambda: True
+s24e._main_fetcher = _f24e
+import scanner_v2 as _sv24
+_w24 = _sv24.PACER.wait
+_sv24.PACER.wait = lambda *a, **k: 0.0
+s24e._warmup()
+check("первый прогрев — та же сессия, с сохранёнными куками",
+      len(_sess24e) == 1 and any(c.name == 'ft' and c.value == 'saved2' for c in _sess24e[0].cookies.jar)
+      and _st24.totals()['reused'] == _r24)
+s24e._warmup()
+check("повторный прогрев — новая сессия, куки состояния снова в ней",
+      len(_sess24e) == 2 and any(c.name == 'ft' for c in _sess24e[1].cookies.jar)
+      and _st24.totals()['reused'] == _r24 + 1)
+_st24.invalidate("тест")
+_fr24 = _st24.totals()['fresh']
+_f24e._used = True
+_f24e.restart_session()
+check("без сохранённых кук — старт не «из сохранённой»", _st24.totals()['fresh'] == _fr24 + 1
+      and _st24.totals()['reused'] == _r24 + 1)
+_sv24.PACER.wait = _w24
+
+
+# ─── 25. Резидентный режим (--daemon) ─────────────────────────────────────────
+print("\n[25] --daemon: расписание, триггер, резидентная сессия")
+import socket as _sock25
+import threading as _thr25
+import time as _time25
+import urllib.request as _ur25
+from scanner_v2 import DaemonSchedule, process_tree_rss_mb, start_trigger_server
+
+ds = DaemonSchedule([('intake', 60), ('scan', 900), ('stale', 86400)], now=1000)
+check("на старте всё готово, intake первым", ds.due(1000) == 'intake')
+ds.done('intake', 1000)
+check("дальше scan", ds.due(1000) == 'scan')
+ds.done('scan', 1000); ds.done('stale', 1000)
+check("ничего не готово, ждать до intake", ds.due(1001) is None and ds.wait_for(1001) == 59)
+check("триггер ставит вне очереди", ds.trigger('stale') and ds.due(1001) == 'stale')
+check("неизвестное задание не принимается", not ds.trigger('rm -rf'))
+ds2 = DaemonSchedule([('intake', 60), ('stale', 86400)], now=5000)
+ds2.load_state({'stale': 4000, 'junk': 1}, now=5000)
+check("stale после рестарта не гоняется заново", ds2.due(5000) == 'intake' and ds2.next_at['stale'] == 90400)
+check("RSS процесса читается", process_tree_rss_mb() > 1)
+
+_sv.DAEMON_STATE_FILE = Path(_tmp.mkdtemp()) / "daemon.json"
+s25 = AvitoScannerV2(None)
+s25._open_resident = lambda: None
+_order25 = []
+
+
+def _boom25():
+    _order25.append('intake')
+    raise RuntimeError("упало")
+
+
+_stop25 = _thr25.Event()
+s25._daemon_jobs = lambda: [('intake', 60, _boom25),
+                            ('scan', 900, lambda: (_order25.append('scan'), _stop25.set()))]
+s25.run_daemon(stop=_stop25, port=0)
+check("задания по приоритету, падение intake не роняет демон", _order25 == ['intake', 'scan'])
+check("время запусков сохранено",
+      set(_json.loads(_sv.DAEMON_STATE_FILE.read_text(encoding='utf-8'))) == {'intake', 'scan'})
+check("после выхода — не резидентный", s25._resident is False)
+
+# Внеочередной запуск через локальный триггер: ничего не готово по расписанию
+with _sock25.socket() as _so:
+    _so.bind(('127.0.0.1', 0))
+    _port25 = _so.getsockname()[1]
+_sv.DAEMON_STATE_FILE.write_text(_json.dumps({'intake': _time25.time(), 'scan': _time25.time()}), encoding='utf-8')
+_order25.clear()
+_stop25 = _thr25.Event()
+_hit25 = {}
+s25._daemon_jobs = lambda: [('intake', 60, lambda: _order25.append('intake')),
+                            ('scan', 900, lambda: (_hit25.setdefault('t', _time25.monotonic()), _stop25.set()))]
+_th25 = _thr25.Thread(target=s25.run_daemon, kwargs={'stop': _stop25, 'port': _port25}, daemon=True)
+_th25.start()
+_status25 = None
+for _ in range(100):
+    try:
+        with _ur25.urlopen(f"http://127.0.0.1:{_port25}/status", timeout=1) as r:
+            _status25 = _json.loads(r.read())
+        break
+    except OSError:
+        _thr25.Event().wait(0.02)
+check("GET /status отвечает", bool(_status25 and _status25.get('ok')))
+_t0 = _time25.monotonic()
+_req25 = _ur25.Request(f"http://127.0.0.1:{_port25}/trigger/scan", data=b'', method='POST')
+with _ur25.urlopen(_req25, timeout=2) as r:
+    _code25 = r.status
+_th25.join(timeout=10)
+check("POST /trigger/scan → 202", _code25 == 202)
+check("задание по триггеру за < 1 с", 't' in _hit25 and _hit25['t'] - _t0 < 1.0)
+check("intake по расписанию ещё не наступил", _order25 == [])
+
+# Резидентная сессия: конец задания браузер не закрывает, прогрев не повторяется
+class _Closable25:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+s25b = AvitoScannerV2(None)
+s25b.browser, s25b.context, s25b.page = _Closable25(), _Closable25(), object()
+s25b._resident = True
+s25b._close()
+check("резидентный _close() браузер не закрывает", s25b.browser.closed == 0)
+_warm25 = []
+s25b._warmup = lambda: _warm25.append(1)
+s25b._tls.warmed_at = _time25.time()
+s25b._ensure_warm()
+check("прогретая сессия — без повторного прогрева", _warm25 == [])
+s25b._tls.warmed_at = _time25.time() - _sv.DAEMON_REWARM_MIN * 60 - 1
+s25b._ensure_warm()
+check("старше DAEMON_REWARM_MIN — прогрев", _warm25 == [1])
+_br25 = s25b.browser
+s25b._close(force=True)
+check("_close(force=True) закрывает", _br25.closed == 1 and s25b.browser is None)
+
+# Водяной знак памяти → пересоздание
+s25c = AvitoScannerV2(None)
+_rec25 = []
+s25c._recycle = lambda reason: _rec25.append(reason)
+_rss_orig, _lim_orig = _sv.process_tree_rss_mb, _sv.DAEMON_RSS_MB
+_sv.process_tree_rss_mb, _sv.DAEMON_RSS_MB = (lambda: 5000.0), 1500
+_info25 = {'runs': {}, 'recycles': 0, 'current': None}
+s25c._daemon_step('intake', lambda: None, DaemonSchedule([('intake', 60)], 0), _info25, _time25.time)
+check("RSS выше порога → пересоздание", len(_rec25) == 1 and _info25['recycles'] == 1)
+_sv.process_tree_rss_mb, _sv.DAEMON_RSS_MB = _rss_orig, _lim_orig
+
+
+# ─── 26. Адаптивный темп (PACER) ──────────────────────────────────────────────
+print("\n[26] Темп: пустая 1-я страница → откат, удачная загрузка → быстрее")
+from common.pacing import Pacer
+
+_pc26 = Pacer(path=None, start=3.5, sleep=lambda d: None)
+_old_pacer26, _sv.PACER = _sv.PACER, _pc26
+s26 = AvitoScannerV2(None)
+s26._warmup = lambda: None
+s26._load_page = lambda url: "<html></html>"
+s26._collect_listings = lambda html: ([], 0)
+s26._fetch_search_page("MacBook Air", "https://www.avito.ru/all/noutbuki?q=air", 1)
+check("пустая 1-я → пауза выросла", _pc26.delay("https://www.avito.ru/x") == 7.0
+      and _pc26.backoffs[("www.avito.ru", "empty")] == 1)
+_f26 = HttpFetcher(lambda: _Page24(), proxy_url='',
+                   session_factory=lambda: _Sess24(lambda u, s: _Resp24(200, "<html>ok</html>")))
+_f26.fetch("https://www.avito.ru/ok")
+check("удачная загрузка → пауза сократилась", _pc26.delay("https://www.avito.ru/x") < 7.0
+      and _pc26.ok["www.avito.ru"] == 1)
+_sv.PACER = _old_pacer26
+
+
+# ─── 27. Журнал просмотренных (SeenStore) ─────────────────────────────────────
+print("\n[27] SeenStore: журнал, свёртка, срок хранения")
+from scanner_v2 import SeenStore
+
+_d27 = Path(_tmp.mkdtemp())
+_f27 = _d27 / "seen.json"
+_now27 = [1_760_000_000.0]
+_clk27 = lambda: _now27[0]
+_s27 = SeenStore(_f27, flush_sec=60, retention_days=10, max_items=3, clock=_clk27)
+_s27.add("https://www.avito.ru/a")
+_s27.add("https://www.avito.ru/a")
+check("add/in", "https://www.avito.ru/a" in _s27 and len(_s27) == 1)
+check("дописано в журнал одной строкой, снимок не тронут",
+      (_d27 / "seen.json.log").read_text().count("\n") == 1 and not _f27.exists())
+_crash27 = SeenStore(_f27, clock=_clk27)
+check("после падения (без свёртки) — восстановлено из журнала", "https://www.avito.ru/a" in _crash27)
+_other27 = SeenStore(_f27, clock=_clk27)
+_now27[0] += 1
+_other27.add("https://www.avito.ru/b")           # другой процесс дописал журнал
+_now27[0] += 1
+_s27.add("https://www.avito.ru/c")
+_s27.compact()
+_snap27 = _json.loads(_f27.read_text())
+check("свёртка: снимок от старых к новым + время", _snap27["seen_urls"] == [
+    "https://www.avito.ru/a", "https://www.avito.ru/b", "https://www.avito.ru/c"]
+    and _snap27["seen_ts"] == sorted(_snap27["seen_ts"]))
+check("свёртка подхватила строки другого процесса", "https://www.avito.ru/b" in _s27)
+check("журнал обнулён", (_d27 / "seen.json.log").read_text() == "")
+_now27[0] += 1
+_s27.add("https://www.avito.ru/d")
+_s27.compact()
+check("max_items: отрезан самый старый", "https://www.avito.ru/a" not in _s27 and len(_s27) == 3)
+_now27[0] += 11 * 86400
+check("старше срока хранения — забыт", len(SeenStore(_f27, retention_days=10, clock=_clk27)) == 0)
+# два процесса: писатель дописывает и падает без свёртки, мы в это время сворачиваем
+import subprocess as _sp27
+_f27b = _d27 / "seen2.json"
+_w27 = _sp27.Popen([sys.executable, "-c", (
+    "import os, sys; sys.path[:0] = %r\n"
+    "from scanner_v2 import SeenStore\n"
+    "s = SeenStore(%r)\n"
+    "print('go', flush=True)\n"
+    "for i in range(3000): s.add('https://www.avito.ru/w%%d' %% i)\n"
+    "os._exit(0)") % (sys.path[:2], str(_f27b))], stdout=_sp27.PIPE, text=True)
+_w27.stdout.readline()
+_c27 = SeenStore(_f27b)
+while _w27.poll() is None:
+    _c27.compact()
+_c27.compact()
+check("свёртка другого процесса не теряет строки писателя (3000 из 3000)",
+      _w27.returncode == 0 and sum(1 for u in SeenStore(_f27b) if "/w" in u) == 3000)
+_f27.write_text(_json.dumps({"seen_urls": ["https://www.avito.ru/old?x=1"]}))
+check("старый формат (без seen_ts) читается", "https://www.avito.ru/old" in SeenStore(_f27))
+
+
+# ─── 28. Реестр объявлений в SQLite ──────────────────────────────────────────
+print("\n[28] ListingRegistry: upsert, индексный запрос охотника, импорт JSON")
+from scanner_v2 import ListingRegistry
+
+_d28 = Path(_tmp.mkdtemp())
+_now28 = datetime(2026, 7, 1, 12, 0)
+_iso28 = lambda d: (_now28 - timedelta(days=d)).isoformat(timespec='seconds')
+(_d28 / "reg.json").write_text(_json.dumps({
+    "https://www.avito.ru/old": {"first_seen": _iso28(20), "last_seen": _iso28(1), "first_price": 80000,
+                                 "last_price": 80000, "min_price": 80000, "times_seen": 9,
+                                 "title": "MacBook Air M2", "max_age_days": 0},
+    "https://www.avito.ru/gone": {"first_seen": _iso28(40), "last_seen": _iso28(30), "first_price": 90000,
+                                  "last_price": 90000, "title": "iMac"},
+}))
+_r28 = ListingRegistry(_d28 / "reg.sqlite3", legacy_json=_d28 / "reg.json", max_items=3)
+check("пустая база → импорт из JSON", len(_r28) == 2 and _r28.get("https://www.avito.ru/old")["times_seen"] == 9)
+_r28.touch("https://www.avito.ru/new", 100000, "MacBook Pro", 0, _iso28(0))
+_r28.touch("https://www.avito.ru/new", 90000, "MacBook Pro 14", 2, _iso28(0))
+_e28 = _r28.get("https://www.avito.ru/new")
+check("upsert: история цены и счётчик", _e28["first_price"] == 100000 and _e28["last_price"] == 90000
+      and _e28["min_price"] == 90000 and _e28["times_seen"] == 2 and _e28["max_age_days"] == 2
+      and _e28["title"] == "MacBook Pro 14")
+check("_entry_drop по записи из базы", abs(AvitoScannerV2._entry_drop(_e28) - 0.10) < 1e-9)
+_r28.touch("https://www.avito.ru/fresh", 70000, "Mac mini", 0, _iso28(0))
+_st28 = dict(_r28.stale(_now28, 14, 0.05, active_days=14))
+check("охотник: старый по first_seen + снизивший цену", set(_st28) == {
+    "https://www.avito.ru/old", "https://www.avito.ru/new"})
+check("давно не виденный (скорее продан) — не кандидат", "https://www.avito.ru/gone" not in _st28)
+_plan28 = " ".join(str(r[-1]) for r in _r28._db.execute(
+    "EXPLAIN QUERY PLAN SELECT * FROM listings WHERE last_seen >= ? AND "
+    "(first_seen <= ? OR max_age_days >= ? OR drop_frac >= ?)", ("a", "b", 1, 0.1)))
+check("запрос охотника идёт по индексу", "INDEX" in _plan28)
+_r28.commit()
+check("commit: сверх max_items отрезан самый давно не виденный",
+      len(_r28) == 3 and _r28.get("https://www.avito.ru/gone") is None)
+_r28b = ListingRegistry(_d28 / "reg.sqlite3", legacy_json=_d28 / "reg.json")
+check("повторный старт: данные на месте, JSON не переимпортируется", len(_r28b) == 3)
+import scanner_v2 as _sv28
+_sv28.REGISTRY_DB = _d28 / "default.sqlite3"
+check("путь по умолчанию — REGISTRY_DB на момент вызова",
+      ListingRegistry(legacy_json=None).path == _d28 / "default.sqlite3" and (_d28 / "default.sqlite3").exists())
+
+
+# ─── 29. Пуш карточек в демон: триаж между шагами заданий, задержка ────────────
+print("\n[29] --daemon: карточки от intake-сервера (POST /cards), p50/p95 задержки")
+from scanner_v2 import latency_percentiles
+
+s29 = AvitoScannerV2(None)
+s29.seen = set()
+s29._market_for = lambda cfg, comps: ((None, 'none') if cfg.ram == 8 else (_stats, 'db'))
+s29._raw_market = lambda cfg, exclude=None: None
+s29._alert_ceiling = lambda cfg: None
+s29._db_stat = lambda cfg: None
+s29._start_browser = lambda: None
+s29._warmup = lambda: None
+s29._close = lambda: None
+s29._save_seen = lambda: None
+s29._write_proc_stats = lambda *a: None
+_raw29, _notif29 = [], []
+s29._accumulate_raw = lambda batch: _raw29.append(sum(len(v) for v in batch.values()))
+s29.notify = lambda c: _notif29.append(c['url'])
+s29._send_copilot = lambda c: None
+s29._enqueue_lead = lambda c, **kw: None
+_order29 = {}
+
+
+def _deep29(url):
+    _order29[url] = list(_notif29)       # что уже разослано к моменту дозахода
+    return _fake_deep(url)
+
+
+s29.deep_analyze = _deep29
+_now29 = _time25.time()
+_pushed29 = [{'url': 'https://www.avito.ru/deal_29a', 'title': 'MacBook Air 13 M2 16/512 ГБ',
+              'price': 75000, 'received_at': _now29 - 3},
+             {'url': 'https://www.avito.ru/nobase_29', 'title': 'MacBook Air 13 M1 8/256',
+              'price': 60000, 'received_at': _now29 - 3}]
+s29._pushed.put(_pushed29)
+s29._triage_checkpoint()
+check("вне демона точка триажа ничего не делает", _notif29 == [] and not s29._pushed.empty())
+s29._resident = True
+s29._assess_family('Air', [], deep=None)     # точка в начале семейства скана
+check("точка в скане разбирает толкнутые карточки", _notif29 == ['https://www.avito.ru/deal_29a']
+      and s29._pushed.empty())
+check("цены пуша — в накопитель один раз", _raw29 == [2])
+run_intake_cards = [dict(c) for c in _pushed29] + [
+    {'url': 'https://www.avito.ru/deal_29b', 'title': 'MacBook Air 13 M2 16/512 ГБ', 'price': 74000},
+    {'url': 'https://www.avito.ru/deal_29c', 'title': 'MacBook Air 13 M2 16/512 ГБ', 'price': 73000}]
+s29.process_cards(run_intake_cards)          # те же карточки из спула + новые
+check("из спула разобранные пушем не повторяются (и цены не копятся дважды)",
+      _notif29.count('https://www.avito.ru/deal_29a') == 1 and _raw29 == [2, 2])
+check("алерт рассылается сразу, не дожидаясь конца пачки (дешёвый лот — первым)",
+      'https://www.avito.ru/deal_29c' in _order29.get('https://www.avito.ru/deal_29b', []))
+_lat29 = s29.latency_summary()
+check("задержка: триаж по карточкам с received_at, алерт — по разосланным",
+      _lat29['triage_sec']['n'] == 2 and _lat29['alert_sec']['n'] == 1
+      and 3 <= _lat29['alert_sec']['p50'] < 10)
+check("перцентили окна", latency_percentiles([]) == {'n': 0}
+      and latency_percentiles([i / 10 for i in range(1, 21)]) == {'n': 20, 'p50': 1.1, 'p95': 2.0})
+
+# POST /cards триггера демона
+with _sock25.socket() as _so:
+    _so.bind(('127.0.0.1', 0))
+    _port29 = _so.getsockname()[1]
+_got29 = []
+_srv29 = start_trigger_server(_port29, ['intake'], None, lambda: {}, push=_got29.append)
+
+
+def _post29(body):
+    req = _ur25.Request(f"http://127.0.0.1:{_port29}/cards", data=body, method='POST')
+    try:
+        with _ur25.urlopen(req, timeout=2) as r:
+            return r.status
+    except _ur25.HTTPError as e:
+        return e.code
+
+
+_c29 = _post29(_json.dumps({'cards': [{'url': 'u1', 'price': 1}, 'junk', {'title': 'без url'}]}).encode())
+check("POST /cards → 202, мусор отброшен", _c29 == 202 and _got29 == [[{'url': 'u1', 'price': 1}]])
+check("битое тело → 400", _post29(b'{"cards": ') == 400 and _post29(b'[1]') == 400)
+_srv29.shutdown()
+_srv29.server_close()
+
+# ─── 30. Потолки цены алерта (intake: отсев одним сравнением) ─────────────────
+print("\n[30] _alert_ceiling: потолок по конфигу = полный расчёт рынка")
+import random as _rnd30
+from common.price_sketch import PriceSketchStore
+
+_sv.RAW_SKETCH_FILE = Path(_tmp.mkdtemp()) / "sketch30.json"
+_sv.RAW_PRICES_FILE = _sv.RAW_SKETCH_FILE.with_name("raw30.json")
+s30 = AvitoScannerV2(None)
+_ts30 = int(_time25.time())
+_fresh30 = datetime.now().strftime("%Y-%m-%d %H:%M")
+_cfgs30 = {t: classify(t) for t in ('MacBook Air 13 M2 16/512', 'MacBook Pro 14 M3 18/512',
+                                     'MacBook Air 13 M3 16/256', 'MacBook Air 15 M3 16/512',
+                                     'MacBook Air 13 M1 8/256')}
+_c30 = list(_cfgs30.values())
+s30.prices = {}                             # match_to_db — не по живой базе из public/data
+s30.prices_by_livekey = {
+    live_key(_c30[0]): {'median_price': 100000, 'samples_count': 20, 'updated_at': _fresh30},     # свежая
+    live_key(_c30[1]): {'median_price': 150000, 'samples_count': 20, 'updated_at': "2026-01-01 10:00"},  # протухла
+}
+_rng30 = _rnd30.Random(30)
+_raw30 = {}
+for _cfg, _n, _med in ((_c30[1], 30, 140000), (_c30[2], 9, 90000), (_c30[3], 5, 110000), (_c30[4], 3, 60000)):
+    _raw30[str(live_key(_cfg))] = [[int(_rng30.gauss(_med, _med * 0.08)) // 500 * 500, _ts30, 1]
+                                   for _ in range(_n)]
+s30._raw_sketches = PriceSketchStore.from_raw(_raw30, _ts30)
+_ceil30 = {t: s30._alert_ceiling(c) for t, c in _cfgs30.items()}
+check("свежая база: потолок = медиана × (1 − MIN_MARGIN)",
+      _ceil30['MacBook Air 13 M2 16/512'] == int(100000 * (1 - MIN_MARGIN)) + 1)
+check("3 цены без базы — рынка может не оказаться → без потолка",
+      _ceil30['MacBook Air 13 M1 8/256'] is None)
+_bad30 = 0
+for _t, _cfg in _cfgs30.items():
+    _keys = sorted({e[0] for e in _raw30.get(str(live_key(_cfg)), [])})
+    for _price in _keys + [_rng30.randrange(50000, 200000) // 500 * 500 for _ in range(200)]:
+        _m, _ = s30._market_for(_cfg, s30._raw_market(_cfg, exclude=_price))
+        _ok = _m is not None and assess_deal(_price, _m, min_margin=MIN_MARGIN,
+                                             scam_floor=SCAM_FLOOR).margin >= MIN_MARGIN
+        if _ok and _ceil30[_t] is not None and _price > _ceil30[_t]:
+            _bad30 += 1
+check("выше потолка полный расчёт не находит сделки ни разу (в т.ч. цены из самого скетча)",
+      _bad30 == 0)
+check("потолок не сильно выше границы (протухшая база + живой рынок)",
+      _ceil30['MacBook Pro 14 M3 18/512'] <= 150000 * (1 - MIN_MARGIN) * 1.02 + 1)
+
+# партия intake сбрасывает потолки только своих конфигов
+_sv.RAW_SKETCH_FILE.write_text(_json.dumps(s30._raw_sketches.to_json()))
+s30._raw_sketch_mtime = _sv.RAW_SKETCH_FILE.stat().st_mtime
+_k30 = str(live_key(_c30[2]))
+s30._accumulate_raw({_k30: [[60000, _ts30, 1]] * 10})
+check("новые цены конфига → его потолок пересчитан, чужие — в таблице",
+      all(str(ck[0]) != _k30 for ck in s30._ceilings)
+      and any(ck[0] == live_key(_c30[0]) for ck in s30._ceilings)
+      and s30._alert_ceiling(_c30[2]) < _ceil30['MacBook Air 13 M3 16/256'])
+s30._load_prices()
+check("перечитка базы сбрасывает таблицу", s30._ceilings == {})
+
+# горячий путь process_cards: дороже потолка — без рынка и дозахода
+s30.prices_by_livekey = {live_key(_c30[0]): {'median_price': 100000, 'samples_count': 20,
+                                              'updated_at': _fresh30}}
+s30.seen = set()
+_calls30 = []
+s30._raw_market = lambda cfg, exclude=None: _calls30.append('market')
+s30.deep_analyze = lambda url: _calls30.append('deep') or {}
+for _name in ('_start_browser', '_warmup', '_close', '_save_seen'):
+    setattr(s30, _name, lambda: None)
+s30._write_proc_stats = lambda *a: None
+s30._accumulate_raw = lambda batch: _calls30.append(sum(len(v) for v in batch.values()))
+s30.process_cards([{'url': 'https://www.avito.ru/fair_30', 'title': 'MacBook Air 13 M2 16/512', 'price': 95000}])
+check("дороже потолка → seen, цена в накопитель, рынок и дозаход не зовутся",
+      'https://www.avito.ru/fair_30' in s30.seen and _calls30 == [1])
+
+# ─── 31. Очередь дозахода по ожидаемой выгоде, бюджет, отложенные ──────────────
+print("\n[31] deep_prescore + DeepBudget: лучшие первыми, хвост — в следующий цикл")
+from scanner_v2 import deep_prescore, DeepBudget, take_deferred
+
+_p31 = lambda price, mins=0, text='': deep_prescore(price, 100000, (100000 - price) / 100000, 80000, mins, text)
+check("дешевле (больше запас до выкупа) — выше", _p31(60000) > _p31(75000))
+check("свежий — выше часового", _p31(70000, 5) > _p31(70000, 180))
+check("частник выше перекупа при той же цене",
+      _p31(70000, text='MacBook, собственник') > _p31(70000) > _p31(70000, text='Магазин, в наличии'))
+
+_clk31 = [0.0]
+_b31 = DeepBudget(seconds=10, visits=3, fail_streak=2, clock=lambda: _clk31[0])
+check("бюджет: лимит дозаходов", [_b31.take() for _ in range(4)] == [True, True, True, False]
+      and _b31.reason() == "3 дозаходов" and _b31.deferred == 1)
+_b31 = DeepBudget(seconds=10, visits=0, fail_streak=2, clock=lambda: _clk31[0])
+_b31.take(); _b31.record(False); _b31.record(True); _b31.record(False)
+check("бюджет: одиночный отказ не закрывает", _b31.take())
+_b31.record(False)
+check("бюджет: отказы подряд закрывают (троттлинг)", not _b31.take() and "отказ" in _b31.reason())
+_b31 = DeepBudget(seconds=10, visits=0, fail_streak=2, clock=lambda: _clk31[0])
+_clk31[0] = 10.5
+check("бюджет: время прогона", not _b31.take() and _b31.reason() == "время")
+
+_got31 = []
+_ds31 = DeepStage(_got31.append, 1, 8)
+for _x, _prio in (('c', 1.0), ('a', 9.0), ('d', 1.0), ('b', 5.0)):
+    _ds31.put(_x, _prio)
+_ds31.start().close()
+check("воркер берёт лучший из ждущих, при равном — по порядку", _got31 == ['a', 'b', 'c', 'd'])
+
+_sv.DEFERRED_FILE = Path(_tmp.mkdtemp()) / "deferred31.json"
+s31 = AvitoScannerV2(None)
+s31.seen = set()
+s31._market_for = lambda cfg, comps: (_stats, 'db')
+s31._raw_market = lambda cfg, exclude=None: None
+s31._alert_ceiling = lambda cfg: None
+s31._db_stat = lambda cfg: None
+for _name in ('_start_browser', '_warmup', '_close', '_save_seen'):
+    setattr(s31, _name, lambda: None)
+s31._write_proc_stats = lambda *a: None
+s31._accumulate_raw = lambda batch: None
+s31._send_copilot = lambda c: None
+s31._enqueue_lead = lambda c, **kw: None
+_deep31, _notif31 = [], []
+s31.deep_analyze = lambda url: _deep31.append(url) or _fake_deep(url)
+s31.notify = lambda c: _notif31.append((c['url'], c.get('source_kind')))
+_cards31 = [{'url': f'https://www.avito.ru/lot31_{p}', 'title': 'MacBook Air 13 M2 16/512', 'price': p}
+            for p in (79000, 64000, 72000, 68000)]
+_DB31 = _sv.DeepBudget
+_sv.DeepBudget = lambda: _DB31(visits=2)
+s31.process_cards(_cards31)
+check("бюджет 2 из 4: дозаход в два самых выгодных",
+      _deep31 == ['https://www.avito.ru/lot31_64000', 'https://www.avito.ru/lot31_68000'])
+_left31 = _json.loads(_sv.DEFERRED_FILE.read_text())
+check("хвост отложен, не помечен seen",
+      sorted(e['listing']['price'] for e in _left31) == [72000, 79000]
+      and 'https://www.avito.ru/lot31_72000' not in s31.seen)
+_sv.DeepBudget = _DB31
+s31.process_cards([])
+check("следующий цикл дозаходит в отложенные (лучший первым), тег intake сохранён",
+      _deep31[2:] == ['https://www.avito.ru/lot31_72000', 'https://www.avito.ru/lot31_79000']
+      and ('https://www.avito.ru/lot31_72000', 'browser') in _notif31
+      and take_deferred(_sv.DEFERRED_FILE) == [])
+_sv.DeepBudget = lambda: _DB31(fail_streak=2)
+s31.deep_analyze = lambda url: _deep31.append(url) or {**_base, 'loaded': False, 'is_private': False, 'seller_type': '?',
+                                                      'seller_reviews': None, 'location': '', 'desc_text': ''}
+s31.process_cards([{'url': f'https://www.avito.ru/thr31_{p}', 'title': 'MacBook Air 13 M2 16/512',
+                    'price': p} for p in (60000, 61000, 62000, 63000)])
+_sv.DeepBudget = _DB31
+check("два отказа подряд → остальное отложено",
+      len(_deep31) == 6 and len(take_deferred(_sv.DEFERRED_FILE)) == 2)
+_sv.defer_deep(_sv.DEFERRED_FILE, [{'listing': {'url': 'old'}, 'deferred_at': 0, 'prio': 1}])
+check("протухшие отложенные выбрасываются", take_deferred(_sv.DEFERRED_FILE) == [])
 
 # ─── Итог ────────────────────────────────────────────────────────────────────
 print()
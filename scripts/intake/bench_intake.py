@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк приёма intake-сервера: прежний _append (чтение всего
+incoming-cards.json, множество url, перезапись файла под глобальным замком —
+эталон append_reference) против спула common.intake_spool (server._append).
+
+Запуск:
+    python3 scripts/intake/bench_intake.py                      # очередь 0 / 1000 / 3000 карточек
+    python3 scripts/intake/bench_intake.py --backlog 3000 --posts 500 --cards 20
+
+Печатает мс на POST (медиана и p99) при уже накопленной очереди: у прежнего
+пути время растёт с очередью, у спула — нет.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server  # noqa: E402
+from common.intake_spool import CardSpool  # noqa: E402
+
+
+def append_reference(path, cards, max_cards=3000):
+    """Прежний server._append — без изменений (кроме пути)."""
+    cur = []
+    if path.exists():
+        try:
+            cur = json.loads(path.read_text(encoding='utf-8')) or []
+        except Exception:
+            cur = []
+    seen = {c.get('url') for c in cur if isinstance(c, dict)}
+    added = 0
+    for c in cards:
+        u = c.get('url')
+        if not u or u in seen:
+            continue
+        cur.append({'url': str(u), 'title': str(c.get('title', ''))[:160],
+                    'price': int(c['price']), 'date': str(c.get('date', ''))[:40]})
+        seen.add(u)
+        added += 1
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(cur[-max_cards:], ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+    return added
+
+
+def _card(i):
+    return {'url': f'https://www.avito.ru/moskva/noutbuki/macbook_air_13_m2_{i}',
+            'title': f'MacBook Air 13 M2 16/512 — лот {i}', 'price': 60000 + i % 400 * 100,
+            'date': '2 часа назад'}
+
+
+def _timed(fn, posts, cards, start):
+    times = []
+    for p in range(posts):
+        batch = [_card(start + p * cards + j) for j in range(cards)]
+        t0 = time.perf_counter()
+        fn(batch)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99) - 1]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--backlog', type=int, nargs='+', default=[0, 1000, 3000])
+    ap.add_argument('--posts', type=int, default=200)
+    ap.add_argument('--cards', type=int, default=10, help='карточек в POST')
+    args = ap.parse_args(argv)
+
+    print(f"{'очередь':>8} {'прежний мед.':>13} {'p99':>7} {'спул мед.':>10} {'p99':>7}")
+    for backlog in args.backlog:
+        tmp = Path(tempfile.mkdtemp())
+        old = tmp / 'old.json'
+        old.write_text(json.dumps([_card(i) for i in range(backlog)]), encoding='utf-8')
+        ref = _timed(lambda b: append_reference(old, b), args.posts, args.cards, backlog)
+
+        new = tmp / 'new.json'
+        CardSpool(new).add([_card(i) for i in range(backlog)])
+        server.INCOMING, server._spool = new, None
+        spool = _timed(server._append, args.posts, args.cards, backlog)
+        server._spool.close()
+        print(f"{backlog:>8} {ref[0]:>13.3f} {ref[1]:>7.3f} {spool[0]:>10.3f} {spool[1]:>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Формат intake-пачек на проводе (common.intake_wire): байт на карточку и CPU
+сервера на пачку — обычный JSON (как шлёт расширение) против сжатия gzip/zstd и
+компактной схемы cards/1.
+
+Карточки синтетические, как у content.js: url выдачи Авито (город/категория/слаг_id),
+русский заголовок, цена, «N минут назад». CPU сервера — decode_batch (распаковка с
+лимитом MAX_BODY, json, распаковка схемы) + _valid_cards, как в server._post;
+CPU релея — encode_batch.
+
+Запуск:
+    python3 scripts/intake/bench_wire.py
+    python3 scripts/intake/bench_wire.py --batch 1 5 20 100 500 --repeat 300
+
+zstd — только если установлен пакет zstandard (иначе строк с ним нет).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server  # noqa: E402
+from common import intake_wire  # noqa: E402
+
+MODELS = ['MacBook Air 13 M1', 'MacBook Air 13 M2', 'MacBook Air 15 M3', 'MacBook Pro 14 M3 Pro',
+          'MacBook Pro 16 M1 Max', 'iMac 24 M1', 'Mac mini M2']
+CITIES = ['moskva'] * 8 + ['moskovskaya_oblast_balashiha', 'sankt-peterburg']
+TAILS = ['', 'идеальное состояние', 'как новый, акб 98%', 'рст, полный комплект', 'срочно']
+
+
+def _cards(rng, n):
+    out = []
+    for _ in range(n):
+        m, ram, ssd = rng.choice(MODELS), rng.choice([8, 16, 32]), rng.choice([256, 512, 1024])
+        slug = '%s_%d%d' % (m.lower().replace(' ', '_'), ram, ssd)
+        out.append({'url': 'https://www.avito.ru/%s/noutbuki/%s_%d' % (rng.choice(CITIES), slug,
+                                                                      rng.randrange(10 ** 9, 5 * 10 ** 9)),
+                    'title': ('%s %d/%d %s' % (m, ram, ssd, rng.choice(TAILS))).strip(),
+                    'price': rng.randrange(40, 250) * 1000,
+                    'date': rng.choice(['%d минут назад' % rng.randrange(1, 59),
+                                        '%d часа назад' % rng.randrange(1, 23), 'вчера'])})
+    return out
+
+
+def _us(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / repeat
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--batch', type=int, nargs='+', default=[1, 20, 100, 500], help='карточек в пачке')
+    ap.add_argument('--repeat', type=int, default=200)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(25)
+    modes = [('json (как есть)', None, False), ('json cards/1', 'identity', True)]
+    for enc in reversed(intake_wire.ENCODINGS):
+        modes += [('%s' % enc, enc, False), ('%s cards/1' % enc, enc, True)]
+    print("%6s %-18s %10s %13s %14s" % ('пачка', 'формат', 'байт/карт.', 'сервер, мкс', 'релей, мкс'))
+    for n in args.batch:
+        cards = _cards(rng, n)
+        repeat = max(5, args.repeat * 20 // max(n, 20))
+        for name, enc, compact in modes:
+            if enc is None:       # расширение: JSON.stringify — utf-8, без сжатия
+                body, hdr = json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8'), {}
+                encode = lambda: json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8')  # noqa: E731
+            else:
+                body, hdr = intake_wire.encode_batch(cards, enc, compact)
+                encode = lambda: intake_wire.encode_batch(cards, enc, compact)  # noqa: E731
+            ce = hdr.get('content-encoding')
+            assert intake_wire.decode_batch(body, ce, server.MAX_BODY) == cards
+            srv = _us(lambda: server._valid_cards(intake_wire.decode_batch(body, ce, server.MAX_BODY)), repeat)
+            print("%6d %-18s %10.1f %13.0f %14.0f" % (n, name, len(body) / n, srv, _us(encode, repeat)))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест intake-сервера: поднимает server.py отдельным процессом
+(привязанным к одному ядру, если ОС умеет sched_setaffinity) со спулом во
+временном каталоге и бьёт его POST /intake из --conns keep-alive соединений.
+
+Запуск:
+    python3 scripts/intake/loadtest.py                         # 32 соединения × 10 с, по 20 карточек
+    python3 scripts/intake/loadtest.py --conns 64 --cards 50 --seconds 20
+    python3 scripts/intake/loadtest.py --url http://127.0.0.1:8787 --token ...   # уже запущенный
+
+Печатает принятые карточки/с, задержку ответа (p50/p99 у клиента), число 429 и
+метрики сервера (GET /metrics: глубина очереди, задержка, пачек писателя).
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+SD = Path(__file__).resolve().parent
+
+
+async def _request(reader, writer, method, path, token, body=b''):
+    head = (f'{method} {path} HTTP/1.1\r\nhost: intake\r\nx-intake-token: {token}\r\n'
+            f'content-type: application/json\r\ncontent-length: {len(body)}\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    status = await reader.readuntil(b'\r\n\r\n')
+    lines = status.decode('latin-1').split('\r\n')
+    hdrs = {k.lower(): v.strip() for k, _, v in (ln.partition(':') for ln in lines[1:] if ln)}
+    payload = await reader.readexactly(int(hdrs.get('content-length', 0)))
+    return int(lines[0].split()[1]), json.loads(payload or b'{}')
+
+
+async def _client(i, host, port, token, cards, deadline, out):
+    reader, writer = await asyncio.open_connection(host, port)
+    n = 0
+    try:
+        while time.perf_counter() < deadline:
+            batch = [{'url': f'https://www.avito.ru/moskva/noutbuki/lot_{i}_{n}_{j}',
+                      'title': 'MacBook Air 13 M2 16/512', 'price': 60000 + j, 'date': 'сегодня'}
+                     for j in range(cards)]
+            n += 1
+            t0 = time.perf_counter()
+            code, obj = await _request(reader, writer, 'POST', '/intake', token,
+                                       json.dumps({'cards': batch}).encode())
+            out['lat'].append((time.perf_counter() - t0) * 1000)
+            if code == 200:
+                out['added'] += obj.get('added', 0)
+            elif code == 429:
+                out['busy'] += 1
+                await asyncio.sleep(0.05)
+            else:
+                out['errors'] += 1
+    finally:
+        writer.close()
+
+
+async def _run(host, port, token, conns, cards, seconds):
+    out = {'lat': [], 'added': 0, 'busy': 0, 'errors': 0}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(i, host, port, token, cards, t0 + seconds, out) for i in range(conns)))
+    elapsed = time.perf_counter() - t0
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await _request(reader, writer, 'GET', '/metrics', token)
+    writer.close()
+    return out, elapsed, metrics
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_server(token):
+    port = _free_port()
+    tmp = Path(tempfile.mkdtemp())
+    env = dict(os.environ, INTAKE_TOKEN=token, INTAKE_PORT=str(port), INTAKE_HOST='127.0.0.1',
+               INTAKE_CARDS_PATH=str(tmp / 'incoming-cards.json'),
+               INTAKE_STATS_PATH=str(tmp / 'intake-stats.json'), SCANNER_DAEMON_URL='')
+    proc = subprocess.Popen([sys.executable, str(SD / 'server.py')], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cores = None
+    if hasattr(os, 'sched_setaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(proc.pid, {cores[0]})            # сервер — одно ядро
+        if len(cores) > 1:
+            os.sched_setaffinity(0, set(cores[1:]))           # клиент — остальные
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return proc, port, (cores[0] if cores else None)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', help='уже запущенный сервер (иначе поднимаем свой)')
+    ap.add_argument('--token', default=os.environ.get('INTAKE_TOKEN', 'loadtest'))
+    ap.add_argument('--conns', type=int, default=32)
+    ap.add_argument('--cards', type=int, default=20, help='карточек в POST')
+    ap.add_argument('--seconds', type=float, default=10)
+    args = ap.parse_args(argv)
+
+    proc = None
+    if args.url:
+        u = urlparse(args.url)
+        host, port = u.hostname, u.port or 80
+    else:
+        proc, port, core = _start_server(args.token)
+        host = '127.0.0.1'
+        print(f"сервер: pid {proc.pid}" + (f", ядро {core}" if core is not None else ", без привязки к ядру"))
+    try:
+        out, elapsed, metrics = asyncio.run(_run(host, port, args.token, args.conns, args.cards, args.seconds))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    lat = sorted(out['lat'])
+    p = (lambda q: lat[min(len(lat) - 1, int(len(lat) * q))] if lat else float('nan'))
+    print(f"соединений {args.conns}, карточек в POST {args.cards}, {elapsed:.1f} с")
+    print(f"POST: {len(lat)} ({len(lat) / elapsed:.0f}/с), 429: {out['busy']}, ошибок: {out['errors']}")
+    print(f"принято карточек: {out['added']} — {out['added'] / elapsed:.0f}/с")
+    print(f"задержка у клиента, мс: p50 {p(0.5):.2f}, p99 {p(0.99):.2f}")
+    print(f"сервер: {json.dumps({k: metrics.get(k) for k in ('queue', 'queue_max', 'requests', 'rejected', 'batches', 'latency_ms')}, ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
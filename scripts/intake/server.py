@@ -1,73 +1,164 @@
 #!/usr/bin/env python3
 """
 Intake-сервер: принимает карточки Avito от домашнего расширения (через HTTPS-прокси
-bestmac.ru/api/intake) и складывает в incoming-cards.json (дедуп по url).
-Лёгкий, только stdlib. По умолчанию слушает 127.0.0.1 — наружу порт НЕ открыт,
+bestmac.ru/api/intake) и дописывает в спул incoming-cards.jsonl (дедуп по url в
+памяти; common/intake_spool.py — запись O(карточек POST), групповой fsync).
+Лёгкий, только stdlib (asyncio): соединения обслуживает один цикл событий, POST
+кладёт пачку в ограниченную очередь (INTAKE_QUEUE_MAX), её разбирает единственный
+писатель — несколько POST одной записью в спул, каждому ответ со своим added.
+Очередь полна → 429 + Retry-After (расширение повторит на следующем обходе).
+Глубина очереди и задержка ответа — GET /metrics (с токеном).
+По умолчанию слушает 127.0.0.1 — наружу порт НЕ открыт,
 TLS терминирует Caddy на поддомене (intake.bestmac.ru) и проксирует на localhost:8787
 (см. scripts/intake/Caddyfile). Безопасность: TLS + ОБЯЗАТЕЛЬНЫЙ токен в заголовке.
 INTAKE_HOST=0.0.0.0 — только как временный escape-hatch (тогда обязательно закрой
 порт фаерволом). Без INTAKE_TOKEN сервер не стартует.
 
 Запуск:  INTAKE_TOKEN=... python3 scripts/intake/server.py
-Обработку карточек делает: scanner_v2.py --intake (по таймеру раз в 1-2 мин).
+Обработку карточек делает: scanner_v2.py --intake (по таймеру раз в 1-2 мин) или
+резидентный scanner_v2.py --daemon — тогда задай SCANNER_DAEMON_URL, и новые карточки
+(с received_at — временем приёма) сервер сразу толкнёт в демон (POST /cards): триаж
+без ожидания таймера и конца скана; спул остаётся надёжным путём, если демон лежит.
 """
 import os
 import sys
 import time
 import hmac
 import json
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import urllib.error
+import urllib.request
+from collections import deque
 from pathlib import Path
-from threading import Lock
+from threading import Lock, Thread
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/ (common.*)
+from common import intake_wire  # noqa: E402
+from common.intake_spool import FLUSH_MS, CardSpool  # noqa: E402
 
 PORT = int(os.environ.get('INTAKE_PORT', '8787'))
 HOST = os.environ.get('INTAKE_HOST', '127.0.0.1')  # за Caddy-TLS на localhost; токен обязателен
 TOKEN = os.environ.get('INTAKE_TOKEN', '')
 INCOMING = Path(os.environ.get('INTAKE_CARDS_PATH', 'public/data/incoming-cards.json'))
 STATS = Path(os.environ.get('INTAKE_STATS_PATH', 'public/data/intake-stats.json'))
-MAX_CARDS = 3000
-MAX_BODY = 2 * 1024 * 1024   # 2 МБ — защита от раздувания памяти
+MAX_CARDS = 3000             # окно дедупа по url (последние столько карточек)
+STATS_FLUSH_SEC = 2.0       # пульс для бота пишется на диск не чаще
+MAX_BODY = 2 * 1024 * 1024   # 2 МБ — защита от раздувания памяти (и после распаковки)
+MAX_HEAD = 64 * 1024         # строка запроса + заголовки
+# Таймаут на запрос: молчащий клиент (порт-сканер, оборванное соединение) раньше
+# вешал однопоточный сервер НАВСЕГДА (инцидент 04.07) — теперь просто закрываем.
+REQUEST_TIMEOUT = 20
+QUEUE_MAX = int(os.environ.get('INTAKE_QUEUE_MAX', '256'))   # POST в очереди писателя; больше — 429
+BATCH_MAX = 64               # POST за один проход писателя (одна запись в спул)
+RETRY_AFTER = int(os.environ.get('INTAKE_RETRY_AFTER', '2'))   # секунд — в 429
+# Триггер резидентного сканера (scanner_v2.py --daemon), напр. http://127.0.0.1:8788
+DAEMON_URL = os.environ.get('SCANNER_DAEMON_URL', '').rstrip('/')
 
 
-def _bump_stats(n_received, n_added):
-    """Пульс приёмника для кнопки «Статус» в боте: когда последняя отправка от
-    расширения и сколько карточек за окно времени."""
-    try:
-        s = json.loads(STATS.read_text(encoding='utf-8')) if STATS.exists() else {}
-        if not isinstance(s, dict):
-            s = {}
-    except Exception:
-        s = {}
-    now = time.time()
-    s['last_at'] = now
-    s['received_total'] = int(s.get('received_total', 0)) + n_received
-    s['added_total'] = int(s.get('added_total', 0)) + n_added
-    rec = s.get('recent') if isinstance(s.get('recent'), list) else []
-    rec.append([now, n_received])
-    s['recent'] = rec[-1000:]
+def _nudge_daemon(cards=None):
+    """Толкает принятые карточки в демон сканера (POST /cards) в фоне: ответ клиенту
+    не ждёт. Без карточек или у демона без /cards (404) — просто будит задание
+    intake (POST /trigger/intake); демон лежит — карточки подхватит из спула его
+    расписание."""
+    if not DAEMON_URL:
+        return
+
+    def _post(path, body):
+        req = urllib.request.Request(DAEMON_URL + path, data=body, method='POST',
+                                     headers={'content-type': 'application/json'})
+        urllib.request.urlopen(req, timeout=2).close()
+
+    def _run():
+        try:
+            if cards:
+                try:
+                    return _post('/cards', json.dumps({'cards': cards}, ensure_ascii=False).encode('utf-8'))
+                except urllib.error.HTTPError as e:
+                    if e.code != 404:
+                        return
+            _post('/trigger/intake', b'')
+        except Exception:
+            pass
+    Thread(target=_run, daemon=True).start()
+
+
+# Пульс в памяти: POST правит счётчики, на диск — не чаще STATS_FLUSH_SEC
+# (и фоновым _flush_loop), а не read-modify-write файла на каждый запрос.
+_STATS_LOCK = Lock()
+_stats = None
+_stats_dirty = False
+_stats_saved_at = 0.0
+
+
+def _save_stats():
+    """Под _STATS_LOCK: пульс на диск (атомарно)."""
+    global _stats_dirty, _stats_saved_at
+    _stats_dirty, _stats_saved_at = False, time.monotonic()
     try:
         tmp = STATS.parent / (STATS.name + '.tmp')
         STATS.parent.mkdir(parents=True, exist_ok=True)
-        tmp.write_text(json.dumps(s), encoding='utf-8')
+        tmp.write_text(json.dumps(_stats), encoding='utf-8')
         os.replace(tmp, STATS)
     except Exception:
         pass
 
 
-def _append(cards):
-    cur = []
-    if INCOMING.exists():
-        try:
-            cur = json.loads(INCOMING.read_text(encoding='utf-8')) or []
-        except Exception:
-            cur = []
-    seen = {c.get('url') for c in cur if isinstance(c, dict)}
-    added = 0
+def _bump_stats(n_received, n_added):
+    """Пульс приёмника для кнопки «Статус» в боте: когда последняя отправка от
+    расширения и сколько карточек за окно времени."""
+    global _stats, _stats_dirty
+    with _STATS_LOCK:
+        if _stats is None:
+            try:
+                _stats = json.loads(STATS.read_text(encoding='utf-8')) if STATS.exists() else {}
+                if not isinstance(_stats, dict):
+                    _stats = {}
+            except Exception:
+                _stats = {}
+        s = _stats
+        now = time.time()
+        s['last_at'] = now
+        s['received_total'] = int(s.get('received_total', 0)) + n_received
+        s['added_total'] = int(s.get('added_total', 0)) + n_added
+        rec = s.get('recent') if isinstance(s.get('recent'), list) else []
+        rec.append([now, n_received])
+        s['recent'] = rec[-1000:]
+        _stats_dirty = True
+        if time.monotonic() - _stats_saved_at >= STATS_FLUSH_SEC:
+            _save_stats()
+
+
+def _flush_stats():
+    with _STATS_LOCK:
+        if _stats_dirty:
+            _save_stats()
+
+
+_SPOOL_LOCK = Lock()
+_spool = None
+
+
+def _get_spool():
+    """Спул для текущего INCOMING (создаётся при первом POST: на старте собирает
+    множество url всего, что ещё ждёт обработчика)."""
+    global _spool
+    with _SPOOL_LOCK:
+        if _spool is None or _spool.path != INCOMING:
+            if _spool is not None:
+                _spool.close()
+            _spool = CardSpool(INCOMING, flush_ms=FLUSH_MS, dedup_max=MAX_CARDS)
+        return _spool
+
+
+def _valid_cards(cards):
+    """Проверенные и обрезанные карточки POST (мусор и цена <= 0 — мимо) с
+    received_at — временем приёма (по нему демон считает задержку до алерта)."""
+    valid, now = [], time.time()
     for c in cards:
         if not isinstance(c, dict):
             continue          # мусор (строка/число) — пропускаем, не роняем всю пачку
         u = c.get('url')
-        if not u or u in seen:
+        if not u:
             continue
         try:
             price = int(c.get('price') or 0)
@@ -75,75 +166,229 @@ def _append(cards):
             price = 0
         if price <= 0:
             continue
-        cur.append({'url': str(u), 'title': str(c.get('title', ''))[:160],
-                    'price': price, 'date': str(c.get('date', ''))[:40]})
-        seen.add(u)
-        added += 1
-    INCOMING.parent.mkdir(parents=True, exist_ok=True)
-    # Атомарная запись: процессор делает os.replace параллельно — без tmp можно
-    # отдать ему усечённый JSON или потерять карточки.
-    tmp = INCOMING.with_suffix('.tmp')
-    tmp.write_text(json.dumps(cur[-MAX_CARDS:], ensure_ascii=False), encoding='utf-8')
-    os.replace(tmp, INCOMING)
-    return added
-
-
-# _append/_bump_stats делают read-modify-write файлов; в многопоточном сервере
-# параллельные POST могли бы терять карточки — сериализуем записи.
-_WRITE_LOCK = Lock()
-
-
-class Handler(BaseHTTPRequestHandler):
-    # Таймаут сокета на запрос: молчащий клиент (порт-сканер, оборванное соединение)
-    # раньше вешал однопоточный сервер НАВСЕГДА — сервис жив, но не отвечает
-    # (инцидент 04.07: ConnectionResetError + зависание в recv).
-    timeout = 20
-    def _send(self, code, obj):
-        b = json.dumps(obj).encode('utf-8')
-        self.send_response(code)
-        self.send_header('content-type', 'application/json')
-        self.send_header('content-length', str(len(b)))
-        self.end_headers()
-        self.wfile.write(b)
-
-    def do_POST(self):
-        if self.path.split('?')[0] != '/intake':
-            return self._send(404, {'ok': False})
+        valid.append({'url': str(u), 'title': str(c.get('title', ''))[:160],
+                      'price': price, 'date': str(c.get('date', ''))[:40],
+                      'received_at': round(now, 3)})
+    return valid
+
+
+def _append(cards):
+    """Проверяет карточки и дописывает новые (по url) в спул. Возвращает число
+    добавленных. Файл накопителя не читается: дедуп — по множеству в памяти."""
+    valid = _valid_cards(cards)
+    return _get_spool().add(valid) if valid else 0
+
+
+def _commit(batches):
+    """Писатель (в пуле потоков): [(карточек в POST, проверенные)] → added по
+    каждому POST; пачка — одной записью в спул, пульс — по каждому POST.
+    Добавленные карточки — сразу в демон сканера."""
+    fresh = []
+    counts = _get_spool().add_many([valid for _, valid in batches], added=fresh)
+    for (n_received, _), added in zip(batches, counts):
+        try:
+            _bump_stats(n_received, added)
+        except Exception:
+            pass
+    if fresh:
+        _nudge_daemon(fresh)
+    return counts
+
+
+def _flush():
+    """Хвост спула — на диск (fsync) и пульс — в файл, даже если POST затихли."""
+    if _spool is not None:
+        _spool.flush()
+    _flush_stats()
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+            411: 'Length Required', 413: 'Payload Too Large', 415: 'Unsupported Media Type',
+            429: 'Too Many Requests',
+            503: 'Service Unavailable'}
+
+
+class IntakeServer:
+    """Приём на asyncio: очередь POST (не больше queue_max) и один писатель."""
+
+    def __init__(self, queue_max=QUEUE_MAX, batch_max=BATCH_MAX, commit=_commit):
+        self.queue_max = queue_max
+        self.batch_max = batch_max
+        self.commit = commit
+        self.queue = None
+        self.latency_ms = deque(maxlen=2000)   # последние ответы на POST /intake
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self._tasks = []
+
+    async def start(self, host, port):
+        self.queue = asyncio.Queue(self.queue_max)
+        self._tasks = [asyncio.create_task(self._writer()), asyncio.create_task(self._flusher())]
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_HEAD)
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def metrics(self):
+        lat = sorted(self.latency_ms)
+
+        def pct(q):
+            return round(lat[min(len(lat) - 1, int(len(lat) * q))], 2) if lat else None
+        return {'queue': self.queue.qsize() if self.queue else 0, 'queue_max': self.queue_max,
+                'requests': self.requests, 'rejected': self.rejected, 'batches': self.batches,
+                'latency_ms': {'p50': pct(0.5), 'p99': pct(0.99), 'max': pct(1.0)}}
+
+    async def _writer(self):
+        """Единственный писатель: всё, что накопилось в очереди (до batch_max POST), —
+        одним commit в пуле потоков (fsync не держит цикл событий)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_max and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            try:
+                counts = await loop.run_in_executor(None, self.commit, [b for b, _ in items])
+            except Exception as e:
+                for _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            for (_, fut), added in zip(items, counts):
+                if not fut.done():
+                    fut.set_result(added)
+
+    async def _flusher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(FLUSH_MS / 1000, 0.05))
+            await loop.run_in_executor(None, _flush)
+
+    async def _handle(self, reader, writer):
+        """Соединение: запросы подряд (keep-alive), пока клиент не закроет."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    return
+                t0 = time.perf_counter()
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, {'ok': False}, keep=False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    k, sep, v = line.partition(':')
+                    if sep:
+                        headers[k.strip().lower()] = v.strip()
+                conn = headers.get('connection', '').lower()
+                keep = conn == 'keep-alive' or (version == 'HTTP/1.1' and conn != 'close')
+                path = target.split('?')[0]
+                if method == 'POST':
+                    code, obj, extra, keep = await self._post(path, headers, reader, keep)
+                    if path == '/intake':
+                        self.latency_ms.append((time.perf_counter() - t0) * 1000)
+                elif method == 'GET':
+                    code, obj, extra = self._get(path, headers)
+                else:
+                    code, obj, extra, keep = 404, {'ok': False}, None, False
+                if code is None:
+                    return
+                await self._send(writer, code, obj, extra, keep)
+                if not keep:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _token_ok(self, headers):
         # .encode() с обеих сторон: compare_digest на str падает на не-ASCII токене
-        if not hmac.compare_digest(self.headers.get('x-intake-token', '').encode('utf-8'),
-                                   TOKEN.encode('utf-8')):
-            return self._send(403, {'ok': False, 'error': 'token'})
+        return hmac.compare_digest(headers.get('x-intake-token', '').encode('utf-8'),
+                                   TOKEN.encode('utf-8'))
+
+    async def _post(self, path, headers, reader, keep):
+        """→ (код, тело, доп. заголовки, keep-alive); код None — соединение оборвалось."""
+        if path != '/intake':
+            return 404, {'ok': False}, None, False
+        self.requests += 1
+        if not self._token_ok(headers):
+            return 403, {'ok': False, 'error': 'token'}, None, False
+        if 'transfer-encoding' in headers:
+            return 411, {'ok': False, 'error': 'length'}, None, False
         try:
-            n = int(self.headers.get('content-length', 0))
+            n = int(headers.get('content-length', 0))
         except (ValueError, TypeError):
-            return self._send(400, {'ok': False, 'error': 'length'})
-        if n > MAX_BODY:
-            return self._send(413, {'ok': False, 'error': 'too large'})
+            return 400, {'ok': False, 'error': 'length'}, None, False
+        if n > MAX_BODY or n < 0:
+            return 413, {'ok': False, 'error': 'too large'}, None, False
+        encoding = headers.get('content-encoding', 'identity')
+        if not intake_wire.supported(encoding):
+            return 415, {'ok': False, 'error': 'encoding'}, None, False
+        try:
+            body = await asyncio.wait_for(reader.readexactly(n), REQUEST_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None, None, None, False
+        # сжатое тело (gzip/zstd) и компактная схема — common/intake_wire.py
         try:
-            data = json.loads(self.rfile.read(n) or b'{}')
-            cards = data.get('cards') or []
+            card_list = intake_wire.decode_batch(body, encoding, MAX_BODY)
+        except intake_wire.BodyTooLarge:
+            return 413, {'ok': False, 'error': 'too large'}, None, keep
         except Exception:
-            return self._send(400, {'ok': False, 'error': 'json'})
-        card_list = cards if isinstance(cards, list) else []
-        with _WRITE_LOCK:
-            added = _append(card_list)
-            try:
-                _bump_stats(len(card_list), added)
-            except Exception:
-                pass
-        self._send(200, {'ok': True, 'added': added})
+            return 400, {'ok': False, 'error': 'json'}, None, keep
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait(((len(card_list), _valid_cards(card_list)), fut))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return (429, {'ok': False, 'error': 'busy', 'retry_after': RETRY_AFTER},
+                    {'retry-after': str(RETRY_AFTER)}, keep)
+        try:
+            added = await fut
+        except OSError as e:
+            return 503, {'ok': False, 'error': f'spool: {e}'}, None, keep
+        except Exception as e:          # commit упал не на диске — клиент всё равно получает ответ
+            return 503, {'ok': False, 'error': f'commit: {e}'}, None, keep
+        return 200, {'ok': True, 'added': added}, None, keep
 
-    def do_GET(self):  # healthcheck
-        self._send(200, {'ok': True, 'service': 'bestmac-intake'})
+    def _get(self, path, headers):
+        if path == '/metrics':
+            if not self._token_ok(headers):
+                return 403, {'ok': False, 'error': 'token'}, None
+            return 200, {'ok': True, **self.metrics()}, None
+        # healthcheck
+        return 200, {'ok': True, 'service': 'bestmac-intake',
+                     'queue': self.queue.qsize() if self.queue else 0,
+                     'wire': intake_wire.offer()}, None
 
-    def log_message(self, *a):
-        pass
+    @staticmethod
+    async def _send(writer, code, obj, extra=None, keep=True):
+        b = json.dumps(obj).encode('utf-8')
+        head = [f'HTTP/1.1 {code} {_REASONS.get(code, "")}', 'content-type: application/json',
+                f'content-length: {len(b)}', 'connection: ' + ('keep-alive' if keep else 'close')]
+        head += [f'{k}: {v}' for k, v in (extra or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + b)
+        await writer.drain()
+
+
+async def serve(host=HOST, port=PORT):
+    srv = IntakeServer()
+    server = await srv.start(host, port)
+    async with server:
+        await server.serve_forever()
 
 
 if __name__ == '__main__':
     if not TOKEN:
         # Fail-safe: без токена приём был бы открыт (особенно если INTAKE_HOST=0.0.0.0).
         sys.exit('❌ INTAKE_TOKEN не задан — отказ запуска (иначе приём открыт всем).')
-    print(f'🛰 Intake-сервер на {HOST}:{PORT} → {INCOMING}')
-    # ThreadingHTTPServer: медленный/молчащий клиент больше не блокирует остальных
-    ThreadingHTTPServer((HOST, PORT), Handler).serve_forever()
+    print(f'🛰 Intake-сервер на {HOST}:{PORT} → {INCOMING.with_suffix(".jsonl")}')
+    _get_spool()          # множество url — на старте, а не на первом POST
+    asyncio.run(serve())
@@ -1,18 +1,33 @@
 #!/usr/bin/env python3
-"""Офлайн-тесты intake-сервера: _append (дедуп, валидация цены, cap, атомарность)."""
+"""Офлайн-тесты intake-сервера: _append (дедуп, валидация цены, окно дедупа, спул)."""
+import asyncio
+import gzip
 import os
 import sys
 import json
 import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
+from threading import Event, Thread
 
 sys.path.insert(0, os.path.dirname(__file__))
 import server  # noqa: E402
+from common import intake_spool, intake_wire  # noqa: E402
+
+
+def spooled(path):
+    """Всё, что лежит в спуле: запечатанные сегменты + активный."""
+    cards = []
+    for seg in intake_spool.segments(path) + [intake_spool.active_path(path)]:
+        cards += intake_spool.read_segment(seg)
+    return cards
 
 
 def run():
     tmp = Path(tempfile.mkdtemp()) / 'incoming.json'
     server.INCOMING = tmp
+    server.STATS = tmp.with_name('intake-stats.json')     # пульс — не в public/data
 
     # 1) базовое добавление + валидация
     added = server._append([
@@ -26,9 +41,11 @@ def run():
         42,                                            # число → отброс (не падаем!)
     ])
     assert added == 2, f'added={added}'
-    data = json.loads(tmp.read_text(encoding='utf-8'))
+    assert not tmp.exists(), 'цельный файл больше не пишется'
+    data = spooled(tmp)
     assert {c['url'] for c in data} == {'u1', 'u3'}
     assert next(c for c in data if c['url'] == 'u3')['price'] == 200
+    assert all(abs(c['received_at'] - time.time()) < 60 for c in data), 'время приёма в карточке'
 
     # 2) дедуп по url между вызовами; дубль не перезаписывает цену
     added2 = server._append([
@@ -36,26 +53,235 @@ def run():
         {'url': 'u4', 'title': 'F', 'price': 10},
     ])
     assert added2 == 1, f'added2={added2}'
-    data = json.loads(tmp.read_text(encoding='utf-8'))
+    data = spooled(tmp)
     assert len({c['url'] for c in data}) == 3
     assert next(c for c in data if c['url'] == 'u1')['price'] == 100
 
     # 3) обрезка длинных полей
     server._append([{'url': 'u6', 'title': 'Z' * 500, 'price': 5, 'date': 'D' * 80}])
-    rec = next(c for c in json.loads(tmp.read_text(encoding='utf-8')) if c['url'] == 'u6')
+    rec = next(c for c in spooled(tmp) if c['url'] == 'u6')
     assert len(rec['title']) == 160 and len(rec['date']) == 40
 
-    # 4) cap MAX_CARDS
+    # 4) перезапуск: множество url собирается из спула (и старого цельного файла)
+    server._spool.close()
+    server._spool = None
+    tmp.write_text(json.dumps([{'url': 'legacy', 'price': 1}]), encoding='utf-8')
+    assert server._append([{'url': 'u1', 'price': 5}, {'url': 'legacy', 'price': 5}]) == 0
+    tmp.unlink()
+
+    # 5) окно дедупа MAX_CARDS: старые url забываются, спул не режется
     server.MAX_CARDS = 5
-    server._append([{'url': f'x{i}', 'title': 'x', 'price': i + 1} for i in range(20)])
-    data = json.loads(tmp.read_text(encoding='utf-8'))
-    assert len(data) == 5, f'cap={len(data)}'
+    tmp = Path(tempfile.mkdtemp()) / 'incoming.json'
+    server.INCOMING = tmp
+    assert server._append([{'url': f'x{i}', 'title': 'x', 'price': i + 1} for i in range(20)]) == 20
+    assert len(spooled(tmp)) == 20
+    assert server._append([{'url': 'x0', 'price': 1}, {'url': 'x19', 'price': 1}]) == 1
+    server.MAX_CARDS = 3000
+
+    # 5a) запечатывание под нагрузкой: параллельные POST + забор сегментов — ни одной потери
+    tmp = Path(tempfile.mkdtemp()) / 'incoming.json'
+    server.INCOMING = tmp
+    got = []
+
+    def _post(t):
+        for i in range(50):
+            server._append([{'url': f't{t}_{i}_{j}', 'price': 1} for j in range(3)])
+
+    workers = [Thread(target=_post, args=(t,)) for t in range(4)]
+    for w in workers:
+        w.start()
+    while any(w.is_alive() for w in workers):
+        cards, segs = intake_spool.take(tmp)
+        got += cards
+        for seg in segs:
+            seg.unlink()
+    for w in workers:
+        w.join()
+    cards, segs = intake_spool.take(tmp)
+    got += cards
+    assert sorted(c['url'] for c in got) == sorted(f't{t}_{i}_{j}' for t in range(4)
+                                                  for i in range(50) for j in range(3)), len(got)
+    server._spool.flush()
+
+    # 6) пуш демону сканера: карточки — POST /cards; демон без /cards (404) или
+    #    без карточек — POST /trigger/intake; без SCANNER_DAEMON_URL — тишина
+    hits = []
+
+    class _Daemon(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('content-length') or 0))
+            hits.append((self.path, json.loads(body) if body else None))
+            self.send_response(404 if self.server.old and self.path == '/cards' else 202)
+            self.end_headers()
+
+        def log_message(self, *a):
+            pass
 
-    # 5) атомарность: временный файл убран
-    assert not tmp.with_suffix('.tmp').exists()
+    def _nudged(old, cards, n):
+        hits.clear()
+        srv = HTTPServer(('127.0.0.1', 0), _Daemon)
+        srv.old = old
+        Thread(target=lambda: [srv.handle_request() for _ in range(n)], daemon=True).start()
+        server.DAEMON_URL = f'http://127.0.0.1:{srv.server_address[1]}'
+        server._nudge_daemon(cards)
+        for _ in range(100):
+            if len(hits) >= n:
+                break
+            time.sleep(0.02)
+        time.sleep(0.05)
+        srv.server_close()
+        return list(hits)
+
+    pushed = [{'url': 'p1', 'title': 'A', 'price': 5, 'date': '', 'received_at': 1.5}]
+    assert _nudged(False, pushed, 1) == [('/cards', {'cards': pushed})], hits
+    assert _nudged(True, pushed, 2) == [('/cards', {'cards': pushed}), ('/trigger/intake', None)], hits
+    assert _nudged(False, None, 1) == [('/trigger/intake', None)], hits
+    server.DAEMON_URL = ''
+    server._nudge_daemon()   # не падает и никуда не ходит
+
+    # 7) asyncio-сервер: контракт /intake, keep-alive, очередь и 429
+    asyncio.run(_server_scenario())
 
     print('✅ intake _append тесты прошли')
 
 
+async def _request(reader, writer, method, path, body=None, token='t0k', close=False,
+                   encoding=None, raw=None):
+    """Сырой HTTP/1.1-запрос по открытому соединению → (код, заголовки, json).
+    encoding='gzip' — тело сжимается (как у релея); raw — тело как есть."""
+    data = json.dumps(body).encode() if body is not None else b''
+    if encoding and intake_wire.supported(encoding):
+        data = intake_wire.compress(data, encoding)
+    if raw is not None:
+        data = raw
+    head = [f'{method} {path} HTTP/1.1', 'host: x', f'content-length: {len(data)}']
+    if encoding:
+        head.append(f'content-encoding: {encoding}')
+    if token is not None:
+        head.append(f'x-intake-token: {token}')
+    if close:
+        head.append('connection: close')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + data)
+    await writer.drain()
+    status = await reader.readuntil(b'\r\n\r\n')
+    lines = status.decode('latin-1').split('\r\n')
+    hdrs = {k.lower(): v.strip() for k, _, v in (ln.partition(':') for ln in lines[1:] if ln)}
+    payload = await reader.readexactly(int(hdrs['content-length']))
+    return int(lines[0].split()[1]), hdrs, json.loads(payload)
+
+
+async def _server_scenario():
+    server.TOKEN = 't0k'
+    server.INCOMING = Path(tempfile.mkdtemp()) / 'incoming.json'
+    server.STATS = server.INCOMING.with_name('intake-stats.json')
+    server._spool = None
+    srv = server.IntakeServer(queue_max=2)
+    tcp = await srv.start('127.0.0.1', 0)
+    port = tcp.sockets[0].getsockname()[1]
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': [{'url': 'a1', 'price': 5}, 'junk']})
+    assert (code, obj) == (200, {'ok': True, 'added': 1}), (code, obj)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': [{'url': 'a1', 'price': 5}]})
+    assert (code, obj['added']) == (200, 0), 'дубль по тому же соединению (keep-alive)'
+    code, _, obj = await _request(r, w, 'GET', '/', token=None)
+    assert code == 200 and obj['service'] == 'bestmac-intake' and obj['queue'] == 0
+    code, _, _ = await _request(r, w, 'POST', '/nope', {})
+    assert code == 404
+    w.close()
+
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': []}, token='bad')
+    assert (code, obj['error']) == (403, 'token')
+    w.close()
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    w.write(b'POST /intake HTTP/1.1\r\nx-intake-token: t0k\r\ncontent-length: 99999999\r\n\r\n')
+    status = await r.readuntil(b'\r\n\r\n')
+    assert b' 413 ' in status
+    w.close()
+
+    # сжатие от релея: распаковывается; бомба (больше MAX_BODY после распаковки) — 413,
+    # битый gzip — 400, незнакомое сжатие — 415 (релей тогда шлёт без сжатия)
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': [{'url': 'z1', 'price': 7}]},
+                                  encoding='gzip')
+    assert (code, obj) == (200, {'ok': True, 'added': 1}), (code, obj)
+    bomb = gzip.compress(b'{"cards": [' + b' ' * (server.MAX_BODY + 10) + b']}')
+    assert len(bomb) < server.MAX_BODY
+    code, _, obj = await _request(r, w, 'POST', '/intake', encoding='gzip', raw=bomb)
+    assert (code, obj['error']) == (413, 'too large'), (code, obj)
+    code, _, obj = await _request(r, w, 'POST', '/intake', encoding='gzip', raw=b'not gzip at all')
+    assert (code, obj['error']) == (400, 'json'), (code, obj)
+    # компактная схема (cards/1), в т.ч. сжатая лучшим общим с сервером
+    code, _, obj = await _request(r, w, 'GET', '/', token=None)
+    enc, compact = intake_wire.choose(obj['wire'], compact=True)
+    assert compact and enc == intake_wire.ENCODINGS[0], obj
+    packed = intake_wire.pack_cards([{'url': 'https://www.avito.ru/moskva/noutbuki/z2', 'price': 9},
+                                     {'url': 'https://www.avito.ru/moskva/noutbuki/z3', 'price': 0}])
+    code, _, obj = await _request(r, w, 'POST', '/intake', packed, encoding=enc)
+    assert (code, obj) == (200, {'ok': True, 'added': 1}), (code, obj)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'schema': 'cards/1', 'prefixes': [],
+                                                            'shapes': [['url']], 'rows': [[0, [5, 'x']]]})
+    assert code == 400, 'битая компактная пачка'
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': []}, encoding='br')
+    assert (code, obj['error']) == (415, 'encoding'), (code, obj)
+    w.close()
+
+    # писатель занят → очередь (2) заполняется → 429 с Retry-After, потом всё дописано
+    gate = Event()
+    real = srv.commit
+
+    def _slow(batches):
+        gate.wait(5)
+        return real(batches)
+    srv.commit = _slow
+    conns = [await asyncio.open_connection('127.0.0.1', port) for _ in range(5)]
+    tasks = []
+    for i, (r, w) in enumerate(conns):
+        tasks.append(asyncio.create_task(
+            _request(r, w, 'POST', '/intake', {'cards': [{'url': f'q{i}', 'price': 1}]})))
+        await asyncio.sleep(0.05)
+    gate.set()
+    res = await asyncio.gather(*tasks)
+    codes = sorted(c for c, _, _ in res)
+    assert codes == [200, 200, 200, 429, 429], codes
+    busy = [h for c, h, _ in res if c == 429]
+    assert busy[0]['retry-after'] == str(server.RETRY_AFTER)
+    for r, w in conns:
+        w.close()
+    srv.commit = real
+
+    # commit упал не OSError (пульс, спул, пул потоков) → 503 с ошибкой, соединение живо
+    def _broken(batches):
+        raise RuntimeError('boom')
+    srv.commit = _broken
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': [{'url': 'e1', 'price': 1}]})
+    assert (code, obj) == (503, {'ok': False, 'error': 'commit: boom'}), (code, obj)
+    srv.commit = real
+    code, _, obj = await _request(r, w, 'POST', '/intake', {'cards': [{'url': 'e1', 'price': 1}]})
+    assert code == 200 and obj['added'] == 1, (code, obj)
+    w.close()
+
+    # пачка из нескольких POST — одной записью; added — свой у каждого
+    counts = server._commit([(2, [{'url': 'b1', 'price': 1}, {'url': 'b2', 'price': 1}]),
+                             (1, [{'url': 'b2', 'price': 1}])])
+    assert counts == [2, 0], counts
+
+    r, w = await asyncio.open_connection('127.0.0.1', port)
+    code, _, m = await _request(r, w, 'GET', '/metrics')
+    assert code == 200 and m['queue'] == 0 and m['queue_max'] == 2 and m['rejected'] == 2
+    assert m['latency_ms']['p50'] is not None and m['batches'] >= 3
+    code, _, _ = await _request(r, w, 'GET', '/metrics', token='bad')
+    assert code == 403
+    w.close()
+    tcp.close()
+    await tcp.wait_closed()
+    await srv.stop()
+    urls = [c['url'] for c in spooled(server.INCOMING)]
+    assert sorted(urls) == ['a1', 'b1', 'b2', 'e1', 'https://www.avito.ru/moskva/noutbuki/z2',
+                            'q0', 'q1', 'q2', 'z1'], urls
+    assert json.loads(server.STATS.read_text())['received_total'] > 0, 'пульс — во временном каталоге'
+
+
 if __name__ == '__main__':
     run()
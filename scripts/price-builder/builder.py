@@ -27,7 +27,11 @@ from datetime import datetime, timedelta
 # Добавляем scripts/ в path для импорта common
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from common.classifier import classify, AppleConfig
+from common.classifier import CACHE as CLASSIFY_CACHE, AppleConfig, classify_many
+from common.extract import listings_from_page
+from common.browser import ResourceFilter, launch_chromium, new_context
+from common.session_store import default_store
+from common.pacing import SCALE_AFTER_DEEP, default_pacer
 from common.config import (
     MIN_YEARS, JUNK_KEYWORDS,
     MIN_PRICE, MAX_PRICE,
@@ -134,9 +138,15 @@ def solve_captcha(page, target_url: str = None) -> bool:
         return False
 
 
+# Сохранённая сессия Авито (common.session_store), общая со сканером
+SESSIONS = default_store()
+# Темп запросов (AIMD по хосту, common.pacing) — общий со сканером
+PACER = default_pacer()
+
+
 def navigate_with_captcha(page, url: str) -> bool:
     try:
-        page.goto(url, wait_until='domcontentloaded', timeout=30000)
+        resp = page.goto(url, wait_until='domcontentloaded', timeout=30000)
         page.wait_for_timeout(random.randint(1500, 3000))
     except PWTimeout:
         logger.warning(f"⏱ Таймаут: {url[:60]}")
@@ -144,16 +154,28 @@ def navigate_with_captcha(page, url: str) -> bool:
     except Exception as e:
         logger.warning(f"⚠️ Ошибка goto: {e}")
         return False
+    if resp is not None and getattr(resp, 'status', 200) == 429:
+        PACER.backoff(url, 'http429')
 
+    solved = False
     for attempt in range(1, 4):
         if not is_captcha_page(page):
+            SESSIONS.passed(page.context, solved=solved)
+            if not solved:
+                PACER.success(url)
             return True
         logger.warning(f"🛡 Капча (попытка {attempt}/3)")
+        SESSIONS.captcha(page.context)
+        PACER.backoff(url, 'captcha')
         if not solve_captcha(page, target_url=url):  # передаём целевой URL
             return False
+        solved = True
         page.wait_for_timeout(2000)
 
-    return not is_captcha_page(page)
+    if is_captcha_page(page):
+        return False
+    SESSIONS.passed(page.context, solved=solved)
+    return True
 
 
 # ─── IQR анализ цен ─────────────────────────────────────────────────────────
@@ -193,23 +215,10 @@ def processor_label(config: AppleConfig) -> str:
 
 class PriceBuilder:
     def __init__(self, playwright):
-        self.browser = playwright.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox',
-                  '--disable-blink-features=AutomationControlled']
-        )
-        self.context = self.browser.new_context(
-            viewport={'width': 1440, 'height': 900},
-            user_agent=USER_AGENT,
-            locale='ru-RU',
-            timezone_id='Europe/Moscow',
-            extra_http_headers={'Accept-Language': 'ru-RU,ru;q=0.9'},
-        )
-        self.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            Object.defineProperty(navigator, 'plugins',   { get: () => [1, 2, 3] });
-            window.chrome = { runtime: {} };
-        """)
+        # Фильтр запросов: только document/script/xhr/fetch и капча (common.browser)
+        self.rfilter = ResourceFilter()
+        self.browser = launch_chromium(playwright)
+        self.context = new_context(self.browser, USER_AGENT, self.rfilter, store=SESSIONS)
         self.page = self.context.new_page()
 
     def warmup(self):
@@ -338,41 +347,29 @@ class PriceBuilder:
 
         for page_num in range(1, max_pages + 1):
             page_url = f"{url}&p={page_num}" if '?' in url else f"{url}?p={page_num}"
-            time.sleep(random.uniform(2, 4))
+            PACER.wait(page_url)
 
             ok = navigate_with_captcha(self.page, page_url)
             if not ok:
                 logger.warning(f"   ⚠️ Не удалось загрузить стр. {page_num}")
                 break
 
-            soup = BeautifulSoup(self.page.content(), 'lxml')
+            # Состояние страницы (page.evaluate), иначе один проход lxml по DOM;
+            # объявления из других городов отсекаются
+            items, n_items = listings_from_page(self.page, drop_other_cities=True)
+            logger.info(f"   📄 Стр. {page_num}: {n_items} объявлений")
 
-            # Отсекаем объявления из других городов
-            other_cities = soup.find(string=re.compile(
-                r'объявлени\S* есть в других городах', re.I
-            ))
-            if other_cities:
-                parent = other_cities.find_parent(['div', 'section', 'h2', 'h3', 'span'])
-                if parent:
-                    for sibling in list(parent.find_next_siblings()):
-                        sibling.decompose()
-                    parent.decompose()
-
-            items = soup.select('[data-marker="item"]')
-            logger.info(f"   📄 Стр. {page_num}: {len(items)} объявлений")
-
-            if not items:
+            if not n_items:
+                if page_num == 1:
+                    PACER.backoff(page_url, 'empty')
                 break
 
-            for item in items:
+            # классификация — пачкой на страницу (кэш и движок за один заход)
+            configs = classify_many([item.get('title') or '' for item in items])
+            for item, config in zip(items, configs):
                 try:
-                    title_tag = item.select_one('[data-marker="item-title"]')
-                    if not title_tag:
-                        continue
-                    title = title_tag.get('title', '') or title_tag.get_text(strip=True)
-
-                    snippet_tag = item.select_one('[data-marker="item-description"]')
-                    snippet = snippet_tag.get_text().lower() if snippet_tag else ''
+                    title = item['title']
+                    snippet = item['description'].lower()
 
                     check_text = (title + ' ' + snippet).lower()
 
@@ -382,18 +379,14 @@ class PriceBuilder:
                         continue
 
                     # ── Цена ─────────────────────────────────────────────────
-                    price_tag = item.select_one('[itemprop="price"]')
-                    if not price_tag:
+                    price = item['price']
+                    if price is None:
                         continue
-                    price = int(price_tag['content'])
                     if price < MIN_PRICE or price > MAX_PRICE:
                         continue
 
                     total_items += 1
 
-                    # ── Классификация по заголовку ────────────────────────────
-                    config = classify(title)
-
                     # Санити-чек: семейство должно совпадать с тем, что ожидаем
                     if allowed_families and config.family and config.family not in allowed_families:
                         total_skipped_family += 1
@@ -401,8 +394,7 @@ class PriceBuilder:
 
                     # ── Deep analysis при отсутствии RAM или SSD ──────────────
                     if config.ram == 0 or config.ssd == 0:
-                        link_tag = item.select_one('[data-marker="item-title"]')
-                        listing_href = link_tag.get('href', '') if link_tag else ''
+                        listing_href = item['href']
                         if listing_href:
                             listing_url = ('https://www.avito.ru' + listing_href).split('?')[0]
                             logger.debug(f"     🔍 Deep: {title[:50]}")
@@ -421,7 +413,7 @@ class PriceBuilder:
                                     config.chip_gen = m.group(1).upper()
                                     if m.group(2):
                                         config.chip_tier = m.group(2).capitalize()
-                            time.sleep(random.uniform(0.8, 1.8))
+                            PACER.wait(page_url, SCALE_AFTER_DEEP)
 
                     # После deep — если всё ещё нет RAM или SSD → пропускаем
                     if config.ram == 0 or config.ssd == 0:
@@ -445,7 +437,7 @@ class PriceBuilder:
                     continue
 
             # Мало объявлений — следующая страница пустая
-            if len(items) < 10:
+            if n_items < 10:
                 break
 
         logger.info(
@@ -463,6 +455,9 @@ class PriceBuilder:
     def close(self):
         self.context.close()
         self.browser.close()
+        self.rfilter.log_summary(logger)
+        PACER.log_summary(logger)
+        CLASSIFY_CACHE.log_summary(logger)
 
 
 # ─── Генерация avito-urls.json для фронта ───────────────────────────────────
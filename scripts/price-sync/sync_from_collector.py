@@ -29,11 +29,16 @@ SD = Path(__file__).resolve().parent
 sys.path.insert(0, str(SD.parent))                        # scripts/  (common.*)
 sys.path.insert(0, str(SD.parent / "hot-deals-scanner"))  # scanner_v2
 
-from scanner_v2 import modal_center, live_key, db_entry_is_stale, _norm_raw_entry  # noqa: E402
+from scanner_v2 import db_entry_is_stale  # noqa: E402
 from common.classifier import classify  # noqa: E402
+from common.market import modal_centers  # noqa: E402
+from common.price_index import live_key, load_price_index, row_live_key  # noqa: E402
+from common.price_sketch import PriceSketchStore, QuantileSketch  # noqa: E402
+from common.raw_prices import RawPriceLog, norm_raw_entry  # noqa: E402
 
 PRICES_FILE = Path(os.environ.get('PRICES_FILE_PATH', SD / "../../public/data/avito-prices.json"))
 RAW_FILE = Path(os.environ.get('INTAKE_RAW_PRICES_PATH', SD / "../../public/data/intake-raw-prices.json"))
+SKETCH_FILE = Path(os.environ.get('INTAKE_RAW_SKETCH_PATH', SD / "../../public/data/intake-raw-sketch.json"))
 
 MAX_AGE_DAYS = 30      # цены коллектора старше — не учитываем
 MSK_MIN = 6            # минимум московских цен для московской модальной
@@ -61,34 +66,44 @@ def _key_to_row_skeleton(key_str):
     }
 
 
+def _fresh_prices(entries, now_ts, cutoff):
+    """Записи накопителя → (московские цены, все цены) не старше cutoff."""
+    fresh = [e for e in (norm_raw_entry(e, now_ts) for e in entries) if e[1] >= cutoff]
+    return [e[0] for e in fresh if e[2] == 1], [e[0] for e in fresh]
+
+
 def sync_stats(stats, raw_store, now=None,
                max_age_days=MAX_AGE_DAYS, msk_min=MSK_MIN, all_min=ALL_MIN,
-               new_msk_min=NEW_MSK_MIN, new_all_min=NEW_ALL_MIN, max_dev=MAX_DEV):
-    """Мутирует stats на месте. Возвращает (updated, inserted, changes: list[str])."""
+               new_msk_min=NEW_MSK_MIN, new_all_min=NEW_ALL_MIN, max_dev=MAX_DEV,
+               keys=None):
+    """Мутирует stats на месте. Возвращает (updated, inserted, changes: list[str]).
+    raw_store — накопитель {live_key: [[цена, ts, москва], …]} или его скетчи
+    (PriceSketchStore: окно max_age_days и модальная — по корзинам скетча).
+    keys — live_key каждой строки stats (PriceIndex.live_keys), чтобы не
+    классифицировать базу заново; без него считаются здесь."""
     now = now or datetime.now()
     now_ts = int(now.timestamp())
     cutoff = now_ts - max_age_days * 86400
     stamp = now.strftime("%Y-%m-%d %H:%M")
 
     # индекс строк базы по live_key (дубликаты конфига — все в список)
+    if keys is None:
+        keys = [row_live_key(s) for s in stats]
     idx = {}
-    for s in stats:
-        try:
-            c = classify(f"{s['model_name']} {s.get('processor', '')}",
-                         {'ram': int(s.get('ram', 0)), 'ssd': int(s.get('ssd', 0))})
-            if c.is_valid:
-                idx.setdefault(str(live_key(c)), []).append(s)
-        except Exception:
-            continue
-
-    updated, inserted, changes = 0, 0, []
-    for key, entries in sorted(raw_store.items()):
-        if not isinstance(entries, list):
-            continue
-        norm = [_norm_raw_entry(e, now_ts) for e in entries]
-        fresh = [e for e in norm if e[1] >= cutoff]
-        msk = [e[0] for e in fresh if e[2] == 1]
-        allp = [e[0] for e in fresh]
+    for s, k in zip(stats, keys):
+        if k is not None:
+            idx.setdefault(str(k), []).append(s)
+
+    # выборки по конфигам (списки цен или скетчи), модальные центры — пакетом
+    if isinstance(raw_store, PriceSketchStore):
+        raw_store.prune(now_ts)   # окна — от now
+        samples = ((key, raw_store.query(key, max_age_days, msk=True), raw_store.query(key, max_age_days))
+                   for key in sorted(raw_store.keys()))
+    else:
+        samples = ((key, *_fresh_prices(entries, now_ts, cutoff))
+                   for key, entries in sorted(raw_store.items()) if isinstance(entries, list))
+    picked = []
+    for key, msk, allp in samples:
         rows = idx.get(key)
 
         # выбор выборки: Москва приоритетнее (эталон перепродажи)
@@ -99,7 +114,14 @@ def sync_stats(stats, raw_store, now=None,
             prices, src = allp, f"рф n={len(allp)}"
         else:
             continue
-        modal = modal_center(prices)
+        picked.append((key, rows, prices, src))
+    modals = modal_centers({key: prices for key, _, prices, _ in picked if isinstance(prices, list)})
+    modals.update((key, prices.modal_center()) for key, _, prices, _ in picked
+                  if isinstance(prices, QuantileSketch))
+
+    updated, inserted, changes = 0, 0, []
+    for key, rows, prices, src in picked:
+        modal = modals[key]
         if modal <= 0:
             continue
         buyout = max(0, int(modal * 0.80 // 1000 * 1000))
@@ -125,8 +147,10 @@ def sync_stats(stats, raw_store, now=None,
             skel = _key_to_row_skeleton(key)
             if not skel:
                 continue
+            lo, hi = ((prices.quantile(0), prices.quantile(1)) if isinstance(prices, QuantileSketch)
+                      else (min(prices), max(prices)))
             row = {**skel,
-                   "min_price": int(min(prices)), "max_price": int(max(prices)),
+                   "min_price": int(lo), "max_price": int(hi),
                    "median_price": int(modal), "buyout_price": buyout,
                    "samples_count": len(prices), "updated_at": stamp,
                    "collector_synced": True}
@@ -141,18 +165,21 @@ def main():
     ap.add_argument("--apply", action="store_true", help="записать изменения в базу (иначе dry-run)")
     args = ap.parse_args()
 
-    if not RAW_FILE.exists():
-        print("Накопитель пуст — синкать нечего.")
-        return
-    try:
-        raw = json.loads(RAW_FILE.read_text(encoding='utf-8')) or {}
-    except Exception as e:
-        print(f"Не прочитать накопитель: {e}")
+    # скетчи накопителя (ведёт сканер, история за месяцы); нет — сырой накопитель
+    # (снимок + журнал добавлений)
+    raw = PriceSketchStore.load(SKETCH_FILE)
+    if raw is None:
+        raw = RawPriceLog(RAW_FILE).read()
+        if not raw:
+            print("Накопитель пуст — синкать нечего.")
+            return
+    index = load_price_index(PRICES_FILE)
+    if index is None:
+        print(f"Нет базы цен: {PRICES_FILE}")
         sys.exit(1)
-    data = json.load(open(PRICES_FILE, encoding='utf-8'))
-    stats = data.get('stats', [])
+    data = index.data
 
-    updated, inserted, changes = sync_stats(stats, raw)
+    updated, inserted, changes = sync_stats(index.stats, raw, keys=index.live_keys)
     print(f"Синк из коллектора: обновлено {updated}, добавлено {inserted} "
           f"(конфигов в накопителе: {len(raw)})")
     for line in changes:
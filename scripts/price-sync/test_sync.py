@@ -3,12 +3,18 @@
 
 Запуск:  python3 scripts/price-sync/test_sync.py
 """
+import os
 import sys
 from pathlib import Path
 from datetime import datetime
 
+# кэш classify и сайдкар индекса цен — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from sync_from_collector import sync_stats, _key_to_row_skeleton  # noqa: E402
+from common.price_sketch import PriceSketchStore  # noqa: E402
 
 _fails = []
 
@@ -100,6 +106,31 @@ stats = []
 u, i, _ = sync_stats(stats, {K_M5: entries([89000] * 7, msk=1)}, now=NOW)
 check("для вставки порог строже (мск<8 → нет)", i == 0)
 
+stats = [row(70000, updated="2026-05-01 10:00")]
+u, i, _ = sync_stats(stats, {K_AIR: msk8}, now=NOW, keys=[None])
+check("keys из индекса: строка без ключа не сопоставлена → вставка", u == 0 and i == 1)
+
+print("\n[5] Скетчи накопителя вместо сырых списков")
+def both(updated, raw):
+    """sync_stats по сырому накопителю и по его скетчам → ((u, i, строка), …)."""
+    out = []
+    for store in (raw, PriceSketchStore.from_raw(raw, TS)):
+        stats = [row(100000, updated=updated)] if updated else []
+        u, i, _ = sync_stats(stats, store, now=NOW)
+        out.append((u, i, stats[0] if stats else None))
+    return out
+
+(a, b) = both("2026-06-20 10:00", {K_AIR: msk8})
+check("протухшая: то же решение и та же модальная", a == b and b[0] == 1)
+(a, b) = both("2026-06-01 10:00", {K_AIR: entries([80000, 81000, 82000], msk=1) + entries([70000] * 8, msk=0)})
+check("фолбэк на всероссийскую", a == b and b[0] == 1)
+(a, b) = both("2026-06-01 10:00", {K_AIR: entries([80000] * 8, msk=1, age_days=40)})
+check("окно 30 дней — по дневным корзинам", a == b and b[0] == 0)
+(a, b) = both(None, {K_M5: entries([89000, 89490, 90000, 88990, 91000, 88000, 92000, 89900], msk=1)})
+check("вставка: min/max как по списку, модальная — с точностью скетча (88990 и 89000 в одной корзине)",
+      b[1] == 1 and b[2]["min_price"] == 88000 and b[2]["max_price"] == 92000
+      and abs(b[2]["median_price"] - a[2]["median_price"]) <= a[2]["median_price"] * 0.005)
+
 check("skeleton: round-trip через классификатор", _key_to_row_skeleton(K_M5) is not None)
 check("skeleton: мусорный ключ → None", _key_to_row_skeleton("не ключ") is None)
 
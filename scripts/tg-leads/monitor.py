@@ -27,6 +27,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # scripts/
 
 from common.classifier import classify
+from common.price_index import live_key, load_price_index
 from common.condition import analyze_condition
 from common.config import (
     JUNK_KEYWORDS, MIN_PRICE, MAX_PRICE, MIN_YEARS, EXCLUDE_INTEL_FAMILIES,
@@ -46,10 +47,6 @@ _SELL = ['прода', 'отда', 'продаю', 'продам', 'срочно
 _BUY  = ['куплю', 'ищу', 'в поиске', 'приму в дар', 'помогите найти', 'нужен macbook', 'нужен мак']
 
 
-def live_key(c):
-    return (c.family, c.chip_gen, c.chip_tier, c.screen, c.ram, c.ssd)
-
-
 def extract_price(text: str):
     """Извлекает цену (только с денежным маркером — безопаснее, без ложных из 16/512)."""
     t = (text or '').lower().replace(' ', ' ').replace(' ', ' ')
@@ -104,22 +101,12 @@ def detect_listing(text: str):
 
 def load_prices_index(path=PRICES_FILE):
     """{live_key: stat} из avito-prices.json (для медианы/выкупа)."""
-    idx = {}
-    p = Path(path)
-    if not p.exists():
-        return idx
     try:
-        for s in json.loads(p.read_text(encoding='utf-8')).get('stats', []):
-            try:
-                c = classify(f"{s['model_name']} {s.get('processor', '')}",
-                             {'ram': int(s.get('ram', 0)), 'ssd': int(s.get('ssd', 0))})
-                if c.is_valid:
-                    idx[live_key(c)] = s
-            except Exception:
-                continue
+        idx = load_price_index(path)
     except Exception as e:
         logger.warning(f"prices index: {e}")
-    return idx
+        return {}
+    return idx.by_live_key if idx is not None else {}
 
 
 def build_lead(cfg, price, msg_url, location, idx, title, now_iso):
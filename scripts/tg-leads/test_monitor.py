@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 """Офлайн-тесты ядра монитора чатов (без Telethon/сети).
 Запуск:  python3 scripts/tg-leads/test_monitor.py"""
+import os
 import sys
 from pathlib import Path
 
+# кэш classify и сайдкар индекса цен — не в ~/.cache/bestmac (общий с боевыми прогонами)
+os.environ['CLASSIFY_CACHE_PATH'] = ''
+os.environ['PRICE_INDEX_CACHE_DIR'] = ''
+
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from monitor import detect_listing, extract_price, build_lead, live_key